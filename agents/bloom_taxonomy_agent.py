@@ -16,6 +16,7 @@ from tools.bloom_taxonomy_tools import (
     tag_knowledge_point_analyze,
     tag_knowledge_point_evaluate,
     tag_knowledge_point_create,
+    tag_knowledge_points_bulk,
     get_knowledge_points,
     get_all_knowledge_points,
     get_tagging_progress,
@@ -77,6 +78,8 @@ def create_bloom_taxonomy_agent(model: str = "gpt-4o") -> Agent:
 - 设计和构建新方法通常是"创造"层级
 
 注意事项：
+- 一次判断多个知识点时，优先使用 tag_knowledge_points_bulk 批量提交标签
+- 续标时用 get_knowledge_points(untagged_only=True) 只获取尚未标注的知识点，也可按 theme / bloom_level 筛选
 - 每个知识点只能归类到一个主要层级
 - 选择最能体现该知识点核心要求的层级
 - 基础性的预备知识通常在较低层级
@@ -98,6 +101,7 @@ def create_bloom_taxonomy_agent(model: str = "gpt-4o") -> Agent:
             PythonFunction(function=tag_knowledge_point_analyze),
             PythonFunction(function=tag_knowledge_point_evaluate),
             PythonFunction(function=tag_knowledge_point_create),
+            PythonFunction(function=tag_knowledge_points_bulk),
         ],
         show_tool_calls=True,
         markdown=True,
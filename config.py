@@ -36,6 +36,15 @@ class Config:
     NOVELTY_THRESHOLD = 0.5
     CONFIDENCE_THRESHOLD = 0.7
     
+    # 候选级联配置（节点对讨论前的廉价筛选）
+    CASCADE_SIMILARITY_THRESHOLD = float(os.getenv("CASCADE_SIMILARITY_THRESHOLD", "0.35"))
+    CASCADE_TRIAGE_ENABLED = os.getenv("CASCADE_TRIAGE_ENABLED", "true").lower() == "true"
+    CASCADE_TRIAGE_MODEL = os.getenv("CASCADE_TRIAGE_MODEL", "gemini-2.5-flash")
+    
+    # 预算配置（每千 token 的美元价格，用于按金额控制预算）
+    PRICE_PER_1K_PROMPT_TOKENS = float(os.getenv("PRICE_PER_1K_PROMPT_TOKENS", "0.00125"))
+    PRICE_PER_1K_COMPLETION_TOKENS = float(os.getenv("PRICE_PER_1K_COMPLETION_TOKENS", "0.01"))
+    
     @classmethod
     def validate(cls):
         """验证配置是否完整"""
@@ -0,0 +1,161 @@
+"""
+原子写入与文件锁
+
+所有 JSON 输出（图谱、边文件、进度文件、知识缓冲箱）共用的写入工具：
+1. 原子写入：先写同目录的临时文件并 fsync，再用 os.replace 替换目标文件，
+   读者（包括崩溃后重启的进程）看到的要么是旧版本、要么是完整的新版本，不会是写了一半的文件
+2. 文件锁：对 <文件名>.lock 加 fcntl.flock 建议锁。读-改-写必须整个放在锁内，
+   多个并发 worker 写同一个输出文件时才不会互相覆盖。锁在同一线程内可重入，
+   持锁的读-改-写流程可以直接调用同样会加锁的写入函数
+
+Windows 上没有 fcntl，只做原子替换、不加锁。
+
+    with file_lock(path):
+        data = read_json(path)
+        data['edges'].append(edge)
+        atomic_write_bytes(path, dumps_json(data))
+"""
+from typing import Dict, Iterator, IO, Optional, Union
+from contextlib import contextmanager
+from pathlib import Path
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows：不加文件锁
+    fcntl = None
+
+
+LOCK_SUFFIX = ".lock"
+
+# 新建文件时的权限与普通 open(path, 'w') 一致（mkstemp 默认是 0600）
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# 当前线程已持有的锁：锁文件路径 -> [锁文件对象, 重入次数]
+_held = threading.local()
+
+
+def lock_path(path: Union[str, Path]) -> Path:
+    """文件对应的锁文件路径"""
+    path = Path(path)
+    return path.with_name(path.name + LOCK_SUFFIX)
+
+
+@contextmanager
+def file_lock(path: Union[str, Path]) -> Iterator[None]:
+    """
+    文件的排他建议锁（锁文件为 <文件名>.lock）
+
+    同一线程内可重入；不同线程 / 进程之间互斥。只约束同样使用 file_lock 的写入者。
+
+    Args:
+        path: 要保护的文件路径
+    """
+    key = str(Path(lock_path(path)).resolve())
+    held: Dict[str, list] = getattr(_held, "locks", None)
+    if held is None:
+        held = _held.locks = {}
+
+    if key in held:
+        held[key][1] += 1
+        try:
+            yield
+        finally:
+            held[key][1] -= 1
+        return
+
+    Path(key).parent.mkdir(parents=True, exist_ok=True)
+    lock_file = open(key, 'a')
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        held[key] = [lock_file, 1]
+        try:
+            yield
+        finally:
+            del held[key]
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    finally:
+        lock_file.close()
+
+
+def _fsync_directory(directory: Path) -> None:
+    """fsync 目录，使 rename 本身也落盘（不支持的平台 / 文件系统上忽略）"""
+    if os.name == 'nt':
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_open(
+    path: Union[str, Path],
+    mode: str = 'wb',
+    encoding: Optional[str] = None,
+    durable: bool = True
+) -> Iterator[IO]:
+    """
+    以原子替换的方式写文件
+
+    在目标目录下创建临时文件供写入，with 块正常结束后 fsync 并替换目标文件；
+    出现异常时删除临时文件，目标文件保持不变。
+
+    Args:
+        path: 目标文件路径
+        mode: 'wb' 或 'w'
+        encoding: 文本模式的编码（默认 utf-8）
+        durable: 是否 fsync（快照等可重建的缓存可以关闭）
+    """
+    if mode not in ('w', 'wb'):
+        raise ValueError(f"atomic_open 只支持 'w' / 'wb'，收到 {mode!r}")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if 'b' not in mode and encoding is None:
+        encoding = 'utf-8'
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            if hasattr(os, 'fchmod'):
+                try:
+                    file_mode = os.stat(path).st_mode & 0o777
+                except FileNotFoundError:
+                    file_mode = 0o666 & ~_UMASK
+                os.fchmod(f.fileno(), file_mode)
+            yield f
+            f.flush()
+            if durable:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    if durable:
+        _fsync_directory(path.parent)
+
+
+def atomic_write_bytes(path: Union[str, Path], data: bytes, durable: bool = True) -> None:
+    """原子写入字节内容"""
+    with atomic_open(path, 'wb', durable=durable) as f:
+        f.write(data)
+
+
+def atomic_write_text(path: Union[str, Path], text: str, encoding: str = 'utf-8') -> None:
+    """原子写入文本内容"""
+    with atomic_open(path, 'w', encoding=encoding) as f:
+        f.write(text)
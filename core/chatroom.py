@@ -5,6 +5,10 @@ from typing import List, Dict, Any, Optional, Union
 from pathlib import Path
 from core.agent import Agent
 from core.edge import KnowledgeEdge
+from core.graph_index import GraphIndex
+from core.graph_store import GraphStore, is_graph_store_path
+from core.graph_io import write_json, update_json
+from core.atomic_io import file_lock
 from agents.meta_agent import MetaAgent
 from agents.evaluator_agent import EvaluatorAgent
 from processors import (
@@ -417,14 +421,18 @@ def write_knowledge_graph(file_path: str, graph_data: Dict[str, Any]) -> None:
     """
     写入知识图谱数据（Function Call 接口）
     
-    这是一个标准化的写入接口，确保数据格式的一致性
+    这是一个标准化的写入接口，确保数据格式的一致性（在文件锁内原子替换）
     
     Args:
-        file_path: 输出文件路径
+        file_path: 输出文件路径（.db / .sqlite 后缀时写入 SQLite 图谱存储）
         graph_data: 图谱数据
     """
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(graph_data, f, ensure_ascii=False, indent=2)
+    if is_graph_store_path(file_path):
+        with GraphStore(file_path) as store:
+            store.import_graph(graph_data)
+        return
+    with file_lock(file_path):
+        write_json(file_path, graph_data)
 
 
 def add_edge_to_graph(
@@ -432,23 +440,23 @@ def add_edge_to_graph(
     edge_data: Dict[str, Any]
 ) -> None:
     """
-    向已有图谱添加边（Function Call 接口）
+    向已有图谱添加边（Function Call 接口，读-改-写在文件锁内完成）
     
     Args:
-        file_path: 图谱文件路径
+        file_path: 图谱文件路径（.db / .sqlite 后缀时只追加一行，不重写整个文件）
         edge_data: 边数据
     """
-    # 读取现有数据
-    with open(file_path, 'r', encoding='utf-8') as f:
-        graph_data = json.load(f)
-    
-    # 添加边
-    graph_data["edges"].append(edge_data)
-    graph_data["statistics"]["num_edges"] = len(graph_data["edges"])
-    
-    # 写回
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(graph_data, f, ensure_ascii=False, indent=2)
+    if is_graph_store_path(file_path):
+        with GraphStore(file_path) as store:
+            total = store.add_edge(edge_data)
+            statistics = store.get_meta('statistics', {})
+            statistics['num_edges'] = total
+            store.set_meta('statistics', statistics)
+        return
+
+    with update_json(file_path) as graph_data:
+        graph_data["edges"].append(edge_data)
+        graph_data["statistics"]["num_edges"] = len(graph_data["edges"])
 
 
 class StrictKnowledgeGraphChatroom:
@@ -465,8 +473,8 @@ class StrictKnowledgeGraphChatroom:
         self,
         topic: str,
         agents: List[Agent],
-        physics_graph: Dict[str, Any],
-        math_graph: Dict[str, Any],
+        physics_graph: Union[Dict[str, Any], GraphIndex],
+        math_graph: Union[Dict[str, Any], GraphIndex],
         meta_agent: Optional[MetaAgent] = None
     ):
         """
@@ -475,21 +483,23 @@ class StrictKnowledgeGraphChatroom:
         Args:
             topic: 讨论主题
             agents: 智能体列表（应包含物理和数学专家）
-            physics_graph: 物理知识图谱
-            math_graph: 数学知识图谱
+            physics_graph: 物理知识图谱（或共享的 GraphIndex）
+            math_graph: 数学知识图谱（或共享的 GraphIndex）
             meta_agent: 元协调者（可选）
         """
         self.topic = topic
         self.agents = agents
         self.meta_agent = meta_agent or MetaAgent()
         
-        # 知识图谱
-        self.physics_graph = physics_graph
-        self.math_graph = math_graph
+        # 知识图谱索引（与其他子系统共享，见 core.graph_index）
+        self.physics_index = GraphIndex.of(physics_graph)
+        self.math_index = GraphIndex.of(math_graph)
+        self.physics_graph = self.physics_index.graph
+        self.math_graph = self.math_index.graph
         
-        # 构建节点索引
-        self.physics_nodes = {n['id']: n for n in physics_graph.get('nodes', [])}
-        self.math_nodes = {n['id']: n for n in math_graph.get('nodes', [])}
+        # 节点索引
+        self.physics_nodes = self.physics_index.by_id
+        self.math_nodes = self.math_index.by_id
         
         # 讨论历史
         self.discussion_history: List[Dict[str, Any]] = []
@@ -523,11 +533,11 @@ class StrictKnowledgeGraphChatroom:
         
         # 筛选节点
         physics_focus_nodes = self._filter_nodes_by_themes(
-            self.physics_nodes,
+            self.physics_index,
             focus_themes.get("physics", []) if focus_themes else []
         )
         math_focus_nodes = self._filter_nodes_by_themes(
-            self.math_nodes,
+            self.math_index,
             focus_themes.get("math", []) if focus_themes else []
         )
         
@@ -597,23 +607,14 @@ class StrictKnowledgeGraphChatroom:
     
     def _filter_nodes_by_themes(
         self,
-        nodes_dict: Dict[str, Dict],
+        index: GraphIndex,
         themes: List[str]
     ) -> List[Dict[str, Any]]:
-        """根据主题筛选节点"""
+        """根据主题筛选节点（通过图谱索引中的 theme / category 取值匹配）"""
         if not themes:
-            return list(nodes_dict.values())[:30]  # 默认返回前30个
-        
-        filtered = []
-        for node in nodes_dict.values():
-            props = node.get('properties', {})
-            node_theme = props.get('theme', '')
-            node_category = props.get('category', '')
-            
-            if any(theme in node_theme or theme in node_category for theme in themes):
-                filtered.append(node)
+            return index.nodes[:30]  # 默认返回前30个
         
-        return filtered[:50]  # 最多50个节点
+        return [index.nodes[i] for i in index.match_themes(themes)[:50]]  # 最多50个节点
     
     def _build_node_context(
         self,
@@ -627,7 +628,7 @@ class StrictKnowledgeGraphChatroom:
         for node in physics_nodes[:20]:
             node_id = node['id']
             label = node.get('label', '')
-            desc = node.get('properties', {}).get('description', '')
+            desc = (node.get('properties') or {}).get('description', '')
             context += f"- **[{node_id}]** {label}\n"
             context += f"  {desc[:150]}...\n\n"
         
@@ -636,7 +637,7 @@ class StrictKnowledgeGraphChatroom:
         for node in math_nodes[:20]:
             node_id = node['id']
             label = node.get('label', '')
-            desc = node.get('properties', {}).get('description', '')
+            desc = (node.get('properties') or {}).get('description', '')
             context += f"- **[{node_id}]** {label}\n"
             context += f"  {desc[:150]}...\n\n"
         
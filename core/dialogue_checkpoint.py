@@ -0,0 +1,109 @@
+"""
+节点对多轮对话检查点
+
+每完成一轮对话就把对话状态（各轮发言、矫正、成效评估、已完成轮数）持久化到磁盘，
+worker 在第 N 轮中途被中断后，无论由自己还是其他 worker 重新领取该节点对，
+都可以从最后一个完整轮次继续，而不必从第 1 轮重新支付对话费用。
+
+检查点按节点对保存为独立的 JSON 文件（先写临时文件再原子替换），
+并记录两个节点的内容指纹和提示词模板版本，节点或提示词变化后旧检查点自动失效。
+"""
+from typing import Dict, Any, Optional
+from pathlib import Path
+import hashlib
+import json
+from core.atomic_io import atomic_write_text
+from core.fingerprint import node_fingerprint
+
+
+class DialogueCheckpointStore:
+    """按节点对保存的多轮对话检查点"""
+
+    def __init__(self, directory: Path, prompt_version: str):
+        """
+        初始化检查点目录
+
+        Args:
+            directory: 检查点目录（多个 worker 可共享）
+            prompt_version: 提示词模板版本
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prompt_version = prompt_version
+
+    def _path(self, physics_id: str, math_id: str) -> Path:
+        """节点对的检查点文件路径（ID 可能含特殊字符，使用哈希作为文件名）"""
+        digest = hashlib.sha256(f"{physics_id}|{math_id}".encode('utf-8')).hexdigest()[:32]
+        return self.directory / f"{digest}.json"
+
+    def load(self, physics_node: Dict[str, Any], math_node: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        读取节点对的检查点
+
+        Returns:
+            {"round": 已完成轮数, "finished": 对话是否已结束, "transcript": 讨论记录}，
+            不存在或已失效时返回None
+        """
+        path = self._path(physics_node['id'], math_node['id'])
+        if not path.exists():
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        if (checkpoint.get('prompt_version') != self.prompt_version
+                or checkpoint.get('physics_hash') != node_fingerprint(physics_node)
+                or checkpoint.get('math_hash') != node_fingerprint(math_node)):
+            # 节点内容或提示词已变化，旧对话不再适用
+            self.clear(physics_node['id'], math_node['id'])
+            return None
+
+        return checkpoint['state']
+
+    def save(
+        self,
+        physics_node: Dict[str, Any],
+        math_node: Dict[str, Any],
+        round_num: int,
+        transcript: Dict[str, Any],
+        finished: bool = False
+    ):
+        """
+        保存一个完整轮次之后的对话状态
+
+        Args:
+            physics_node: 物理节点
+            math_node: 数学节点
+            round_num: 已完成的轮数
+            transcript: 截至该轮的讨论记录
+            finished: 对话是否已结束（只剩边提取和评估）
+        """
+        checkpoint = {
+            "physics_id": physics_node['id'],
+            "math_id": math_node['id'],
+            "physics_hash": node_fingerprint(physics_node),
+            "math_hash": node_fingerprint(math_node),
+            "prompt_version": self.prompt_version,
+            "state": {
+                "round": round_num,
+                "finished": finished,
+                "transcript": transcript
+            }
+        }
+
+        path = self._path(physics_node['id'], math_node['id'])
+        atomic_write_text(path, json.dumps(checkpoint, ensure_ascii=False))
+
+    def clear(self, physics_id: str, math_id: str):
+        """删除节点对的检查点（讨论得出结论后调用）"""
+        try:
+            self._path(physics_id, math_id).unlink()
+        except FileNotFoundError:
+            pass
+
+    def pending_count(self) -> int:
+        """尚未得出结论的检查点数量"""
+        return sum(1 for _ in self.directory.glob("*.json"))
@@ -0,0 +1,33 @@
+"""
+内容指纹
+
+对节点、边等 JSON 数据计算与键顺序无关的内容哈希，
+用于跨运行缓存、增量计算等场景判断内容是否发生变化。
+"""
+from typing import Any, Dict, Iterable
+import hashlib
+import json
+
+
+# 节点指纹忽略的属性：布鲁姆标注是图谱的下游产物，节点对讨论的提示词中不展示这些字段
+# （见 NodePairChatroom._build_node_context），重新标注不应使讨论结果缓存、对话检查点和增量计算失效
+DERIVED_PROPERTIES = ("bloom_level", "bloom_reasoning")
+
+
+def content_hash(data: Any) -> str:
+    """
+    计算 JSON 兼容数据的内容哈希（SHA-256 十六进制）
+
+    字典按键排序后序列化，因此键顺序不同但内容相同的数据哈希一致。
+    """
+    canonical = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def node_fingerprint(node: Dict[str, Any], ignore_properties: Iterable[str] = DERIVED_PROPERTIES) -> str:
+    """节点的内容指纹（包含 id、label 和除标注字段外的全部 properties）"""
+    ignore = set(ignore_properties)
+    props = node.get('properties') or {}
+    if not ignore.intersection(props):
+        return content_hash(node)
+    return content_hash({**node, "properties": {k: v for k, v in props.items() if k not in ignore}})
@@ -0,0 +1,154 @@
+"""
+知识图谱版本差异
+
+按内容指纹比较同一图谱的两个版本：
+1. 节点按 ID 对齐，比较内容哈希，得到新增 / 删除 / 修改的节点
+2. 边按内容哈希做多重集合比较，得到新增 / 删除的边
+
+比较时默认忽略布鲁姆标注字段（bloom_level / bloom_reasoning）：
+它们是图谱的下游产物，只改标签不应触发向量、相似度和节点对的重算。
+
+清单（manifest）只保存 ID -> 哈希，体积远小于图谱本身，
+增量流程保存上一次的清单即可与新版本比较，无需保留旧图谱文件。
+"""
+from typing import Dict, Any, List, Iterable, Optional, Union
+from collections import Counter
+from pathlib import Path
+import json
+from core.fingerprint import content_hash, DERIVED_PROPERTIES
+from core.atomic_io import atomic_write_text
+
+
+def node_content_hash(node: Dict[str, Any], ignore_properties: Iterable[str] = DERIVED_PROPERTIES) -> str:
+    """节点内容哈希（忽略指定的属性）"""
+    ignore = set(ignore_properties)
+    props = {k: v for k, v in (node.get('properties') or {}).items() if k not in ignore}
+    return content_hash({**node, "properties": props})
+
+
+def graph_manifest(graph: Dict[str, Any], ignore_properties: Iterable[str] = DERIVED_PROPERTIES) -> Dict[str, Any]:
+    """
+    图谱的内容清单
+
+    Returns:
+        {"nodes": {节点ID: 内容哈希}, "edges": {边内容哈希: 出现次数}}
+    """
+    ignore = tuple(ignore_properties)
+    nodes = {}
+    edges: Counter = Counter()
+    for node in graph.get('nodes', []):
+        nodes[node['id']] = node_content_hash(node, ignore)
+    for edge in graph.get('edges', []):
+        edges[content_hash(edge)] += 1
+    return {"nodes": nodes, "edges": dict(edges)}
+
+
+def load_manifest(path: Union[str, Path]) -> Optional[Dict[str, Any]]:
+    """读取保存的清单，不存在时返回 None"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(path: Union[str, Path], manifest: Dict[str, Any]) -> None:
+    """保存清单"""
+    atomic_write_text(path, json.dumps(manifest, ensure_ascii=False))
+
+
+class GraphDiff:
+    """两个图谱版本之间的差异"""
+
+    def __init__(
+        self,
+        added_nodes: List[str],
+        removed_nodes: List[str],
+        modified_nodes: List[str],
+        unchanged_nodes: int,
+        added_edges: int,
+        removed_edges: int
+    ):
+        self.added_nodes = added_nodes
+        self.removed_nodes = removed_nodes
+        self.modified_nodes = modified_nodes
+        self.unchanged_nodes = unchanged_nodes
+        self.added_edges = added_edges
+        self.removed_edges = removed_edges
+
+    @property
+    def changed_nodes(self) -> List[str]:
+        """需要重新计算的节点（新增 + 修改）"""
+        return self.added_nodes + self.modified_nodes
+
+    @property
+    def is_empty(self) -> bool:
+        """两个版本内容是否一致"""
+        return not (self.added_nodes or self.removed_nodes or self.modified_nodes
+                    or self.added_edges or self.removed_edges)
+
+    def summary(self) -> str:
+        """一行摘要"""
+        return (f"节点 +{len(self.added_nodes)} -{len(self.removed_nodes)} ~{len(self.modified_nodes)} "
+                f"(未变 {self.unchanged_nodes})，边 +{self.added_edges} -{self.removed_edges}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "added_nodes": self.added_nodes,
+            "removed_nodes": self.removed_nodes,
+            "modified_nodes": self.modified_nodes,
+            "unchanged_nodes": self.unchanged_nodes,
+            "added_edges": self.added_edges,
+            "removed_edges": self.removed_edges
+        }
+
+
+def diff_manifests(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> GraphDiff:
+    """
+    比较两个清单（old 为 None 时视为全部新增）
+
+    Args:
+        old: 旧版本清单
+        new: 新版本清单
+
+    Returns:
+        GraphDiff（节点 ID 按新版本 / 旧版本中的顺序排列）
+    """
+    old = old or {"nodes": {}, "edges": {}}
+    old_nodes, new_nodes = old["nodes"], new["nodes"]
+
+    added = [node_id for node_id in new_nodes if node_id not in old_nodes]
+    removed = [node_id for node_id in old_nodes if node_id not in new_nodes]
+    modified = [
+        node_id for node_id, digest in new_nodes.items()
+        if node_id in old_nodes and old_nodes[node_id] != digest
+    ]
+
+    old_edges, new_edges = Counter(old["edges"]), Counter(new["edges"])
+    return GraphDiff(
+        added_nodes=added,
+        removed_nodes=removed,
+        modified_nodes=modified,
+        unchanged_nodes=len(new_nodes) - len(added) - len(modified),
+        added_edges=sum((new_edges - old_edges).values()),
+        removed_edges=sum((old_edges - new_edges).values())
+    )
+
+
+def diff_graphs(
+    old: Dict[str, Any],
+    new: Dict[str, Any],
+    ignore_properties: Iterable[str] = DERIVED_PROPERTIES
+) -> GraphDiff:
+    """
+    比较同一图谱的两个版本
+
+    Args:
+        old: 旧版本图谱
+        new: 新版本图谱
+        ignore_properties: 比较节点时忽略的属性
+
+    Returns:
+        GraphDiff
+    """
+    return diff_manifests(graph_manifest(old, ignore_properties), graph_manifest(new, ignore_properties))
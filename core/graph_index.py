@@ -0,0 +1,229 @@
+"""
+共享的知识图谱内存索引
+
+同一个图谱 JSON 以前会被聊天室、KnowledgeGraphProcessor、布鲁姆标注工具和各示例脚本
+分别解析并各自构建字典。GraphIndex 把这些索引集中起来：
+
+1. id -> 节点、id -> 位置
+2. theme / category / bloom_level -> 节点 ID 列表
+3. 邻接表（与 NodePairChatroom 原有的邻接表结构一致）
+4. 内容指纹
+5. 按筛选条件缓存的节点位置列表（分页查询直接切片）
+6. label / description 的倒排索引（TextIndex，首次访问时构建）
+
+load_graph_index(path) 通过 core.graph_io.load_graph 解析（可直接读取二进制快照），在进程内按文件缓存，文件的 mtime / 大小 / inode 变化后自动重新加载，
+因此多个子系统共享同一份解析结果。索引中的节点字典是共享对象，使用方应只读；
+需要修改图谱时请写回文件（缓存会随之失效）或自行复制。
+"""
+from typing import Dict, Any, List, Optional, Tuple, Union
+from pathlib import Path
+import os
+import threading
+from core.fingerprint import content_hash
+from core.graph_io import load_graph
+from core.text_index import TextIndex
+
+
+# 建立倒排索引的节点属性
+INDEXED_PROPERTIES = ("theme", "category", "bloom_level")
+
+
+class GraphIndex:
+    """单个知识图谱的内存索引"""
+
+    def __init__(self, graph: Dict[str, Any], path: Optional[Path] = None):
+        """
+        Args:
+            graph: 知识图谱数据 {"nodes": [...], "edges": [...]}
+            path: 图谱文件路径（可选）
+        """
+        self.graph = graph
+        self.path = Path(path) if path else None
+        self.nodes: List[Dict[str, Any]] = graph.get('nodes', [])
+        self.edges: List[Dict[str, Any]] = graph.get('edges', [])
+
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.position: Dict[str, int] = {}
+        self.by_property: Dict[str, Dict[str, List[str]]] = {key: {} for key in INDEXED_PROPERTIES}
+        for i, node in enumerate(self.nodes):
+            node_id = node.get('id')
+            self.by_id[node_id] = node
+            self.position[node_id] = i
+            props = node.get('properties') or {}
+            for key in INDEXED_PROPERTIES:
+                value = props.get(key)
+                if value:
+                    self.by_property[key].setdefault(value, []).append(node_id)
+
+        self.adjacency = self._build_adjacency(self.edges)
+        self._fingerprint: Optional[str] = None
+        self._selections: Dict[Tuple, List[int]] = {}
+        self._text: Optional[TextIndex] = None
+
+    @staticmethod
+    def _build_adjacency(edges: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """构建邻接表（节点的相关节点）"""
+        adj: Dict[str, List[str]] = {}
+        for edge in edges:
+            source = edge.get('source', '')
+            target = edge.get('target', '')
+            if source:
+                adj.setdefault(source, [])
+                if target:
+                    adj[source].append(target)
+            if target:
+                adj.setdefault(target, [])
+                if source:
+                    adj[target].append(source)
+        return adj
+
+    @classmethod
+    def of(cls, graph: Union["GraphIndex", Dict[str, Any]]) -> "GraphIndex":
+        """
+        获取图谱的索引：已是索引则直接返回；
+        由 load_graph_index 加载的图谱复用共享索引；否则新建
+        """
+        if isinstance(graph, GraphIndex):
+            return graph
+        shared = _INDEX_BY_GRAPH.get(id(graph))
+        if shared is not None and shared.graph is graph:
+            return shared
+        return cls(graph)
+
+    # ---------- 查询 ----------
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.by_id
+
+    def get(self, node_id: str) -> Optional[Dict[str, Any]]:
+        """按 ID 取节点"""
+        return self.by_id.get(node_id)
+
+    def neighbors(self, node_id: str) -> List[str]:
+        """相关节点 ID"""
+        return self.adjacency.get(node_id, [])
+
+    def ids_where(self, key: str, value: str) -> List[str]:
+        """属性等于给定值的节点 ID（key 为 theme / category / bloom_level）"""
+        return self.by_property[key].get(value, [])
+
+    def values(self, key: str) -> List[str]:
+        """某属性的全部取值（按首次出现顺序）"""
+        return list(self.by_property[key].keys())
+
+    def select(
+        self,
+        theme: Optional[str] = None,
+        category: Optional[str] = None,
+        bloom_level: Optional[str] = None,
+        untagged_only: bool = False
+    ) -> List[int]:
+        """
+        满足筛选条件的节点位置（按图谱中的顺序），同一组条件只计算一次
+
+        Args:
+            theme: 主题
+            category: 类别
+            bloom_level: 布鲁姆层级
+            untagged_only: 只保留尚未标注布鲁姆层级的节点
+
+        Returns:
+            节点在 nodes 中的下标列表
+        """
+        key = (theme, category, bloom_level, untagged_only)
+        if key not in self._selections:
+            candidates = None
+            for prop, value in (("theme", theme), ("category", category), ("bloom_level", bloom_level)):
+                if value is not None:
+                    ids = set(self.ids_where(prop, value))
+                    candidates = ids if candidates is None else candidates & ids
+            if candidates is None:
+                positions = range(len(self.nodes))
+            else:
+                positions = sorted(self.position[node_id] for node_id in candidates)
+            if untagged_only:
+                positions = [
+                    i for i in positions
+                    if not (self.nodes[i].get('properties') or {}).get('bloom_level')
+                ]
+            self._selections[key] = list(positions)
+        return self._selections[key]
+
+    def match_themes(self, themes: List[str]) -> List[int]:
+        """
+        theme 或 category 包含任一给定主题（子串匹配）的节点位置（按图谱中的顺序）
+
+        只需对 theme / category 的不同取值做子串判断，再合并对应的节点
+        """
+        ids = set()
+        for key in ("theme", "category"):
+            for value, node_ids in self.by_property[key].items():
+                if any(theme in value for theme in themes):
+                    ids.update(node_ids)
+        return sorted(self.position[node_id] for node_id in ids)
+
+    @property
+    def text(self) -> TextIndex:
+        """节点文本的倒排索引（首次访问时构建）"""
+        if self._text is None:
+            self._text = TextIndex(self.nodes)
+        return self._text
+
+    @property
+    def fingerprint(self) -> str:
+        """图谱内容指纹（首次访问时计算）"""
+        if self._fingerprint is None:
+            self._fingerprint = content_hash(self.graph)
+        return self._fingerprint
+
+
+# ---------- 进程内共享缓存 ----------
+
+_CACHE: Dict[str, Tuple[Tuple[int, int, int], GraphIndex]] = {}
+_INDEX_BY_GRAPH: Dict[int, GraphIndex] = {}
+_LOCK = threading.Lock()
+
+
+def _file_signature(path: Path) -> Tuple[int, int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def load_graph_index(path: Union[str, Path]) -> GraphIndex:
+    """
+    加载图谱文件的共享索引（每个进程只解析一次，文件变化后重新加载）
+
+    Args:
+        path: 知识图谱 JSON 文件路径
+
+    Returns:
+        GraphIndex
+    """
+    path = Path(path)
+    key = str(path.resolve())
+    signature = _file_signature(path)
+    with _LOCK:
+        cached = _CACHE.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    graph = load_graph(path)
+    index = GraphIndex(graph, path)
+
+    with _LOCK:
+        old = _CACHE.get(key)
+        if old is not None:
+            _INDEX_BY_GRAPH.pop(id(old[1].graph), None)
+        _CACHE[key] = (signature, index)
+        _INDEX_BY_GRAPH[id(graph)] = index
+    return index
+
+
+def clear_graph_cache() -> None:
+    """清空进程内的图谱索引缓存"""
+    with _LOCK:
+        _CACHE.clear()
+        _INDEX_BY_GRAPH.clear()
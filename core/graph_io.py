@@ -0,0 +1,252 @@
+"""
+知识图谱文件的快速读写
+
+1. JSON 快速路径：安装了 orjson 时用它解析和序列化，否则退回标准库 json。
+   输出与 json.dump(indent=2, ensure_ascii=False) 的结构和数值一致，但并非逐字节相同：
+   指数形式的浮点数写法不同（1e-05 写成 0.00001，1e+20 写成 1e20，读回的值完全一样）。
+   orjson 无法表示的数据（NaN / Infinity、超出 64 位的整数）退回标准库，保持原有行为
+2. 二进制快照：在 JSON 文件旁写一份 <文件名>.snapshot（有 msgpack 时用 msgpack，否则用标准库 marshal），
+   头部记录源 JSON 的大小、mtime 和内容摘要。load_graph 在快照与 JSON 的内容摘要一致时直接读取快照，
+   不一致（JSON 被修改过）时重新解析 JSON 并刷新快照。每次都核对摘要而不只看 mtime：
+   mtime 粒度内的同长度改写（如布鲁姆标签重标）不会改变大小和 mtime，而计算摘要远比解析 JSON 便宜
+
+快照只是缓存，删除后会自动重建；JSON 文件始终是唯一的数据来源。
+JSON 与快照都通过 core.atomic_io 原子替换写入；update_json 在文件锁内完成读-改-写。
+"""
+from typing import Dict, Any, Callable, Iterator, Optional, Union
+from contextlib import contextmanager
+from pathlib import Path
+import hashlib
+import json
+import marshal
+import math
+import os
+import struct
+from core.atomic_io import atomic_open, atomic_write_bytes, file_lock
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖
+    msgpack = None
+
+
+SNAPSHOT_SUFFIX = ".snapshot"
+_MAGIC = b"AGSNAP1\n"
+
+
+# ---------- JSON ----------
+
+def loads_json(data: Union[bytes, str]) -> Any:
+    """解析 JSON（优先使用 orjson）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _has_nonfinite(data: Any) -> bool:
+    """数据中是否含有 NaN / Infinity（orjson 会把它们静默写成 null）"""
+    if isinstance(data, float):
+        return not math.isfinite(data)
+    if isinstance(data, dict):
+        return any(_has_nonfinite(v) for v in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(_has_nonfinite(v) for v in data)
+    return False
+
+
+def dumps_json(data: Any) -> bytes:
+    """序列化为带 2 空格缩进、不转义非 ASCII 字符的 UTF-8 JSON"""
+    if orjson is not None:
+        try:
+            raw = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            raw = None  # 如超出 64 位的整数：交给标准库
+        # 只有输出里出现 null 时才需要检查是否有被改写的 NaN / Infinity
+        if raw is not None and not (b"null" in raw and _has_nonfinite(data)):
+            return raw
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def read_json(path: Union[str, Path]) -> Any:
+    """读取 JSON 文件"""
+    with open(path, 'rb') as f:
+        return loads_json(f.read())
+
+
+def write_json(path: Union[str, Path], data: Any) -> None:
+    """原子写入 JSON 文件（与 json.dump(indent=2, ensure_ascii=False) 等价，见模块说明）"""
+    atomic_write_bytes(path, dumps_json(data))
+
+
+@contextmanager
+def update_json(path: Union[str, Path], default: Optional[Callable[[], Any]] = None) -> Iterator[Any]:
+    """
+    在文件锁内读-改-写 JSON 文件，with 块正常结束后原子写回
+
+        with update_json(path) as data:
+            data['edges'].append(edge)
+
+    Args:
+        path: JSON 文件路径
+        default: 文件不存在时生成初始数据的函数（为 None 时文件必须存在）
+    """
+    with file_lock(path):
+        if default is not None and not Path(path).exists():
+            data = default()
+        else:
+            data = read_json(path)
+        yield data
+        write_json(path, data)
+
+
+# ---------- 二进制快照 ----------
+
+def snapshot_path(path: Union[str, Path]) -> Path:
+    """JSON 文件对应的快照路径"""
+    path = Path(path)
+    return path.with_name(path.name + SNAPSHOT_SUFFIX)
+
+
+def _codec() -> str:
+    return "msgpack" if msgpack is not None else "marshal"
+
+
+def _encode(data: Any, codec: str) -> bytes:
+    if codec == "msgpack":
+        return msgpack.packb(data, use_bin_type=True)
+    return marshal.dumps(data)
+
+
+def _decode(payload: bytes, codec: str) -> Any:
+    if codec == "msgpack":
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    return marshal.loads(payload)
+
+
+def _digest(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _source_info(path: Path, raw: Optional[bytes] = None, stat: Optional[os.stat_result] = None) -> Dict[str, Any]:
+    stat = stat or os.stat(path)
+    if raw is None:
+        with open(path, 'rb') as f:
+            raw = f.read()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "digest": _digest(raw)}
+
+
+def write_snapshot(
+    path: Union[str, Path],
+    data: Dict[str, Any],
+    raw: Optional[bytes] = None,
+    stat: Optional[os.stat_result] = None
+) -> Path:
+    """
+    为 JSON 文件写入二进制快照
+
+    Args:
+        path: JSON 文件路径（必须已存在）
+        data: 该文件解析后的数据
+        raw: JSON 文件的原始字节（已读取时传入，避免再读一次）
+        stat: 读取 raw 时文件的 stat 结果（与 raw 一起传入，避免读取后文件被替换造成错配）
+
+    Returns:
+        快照路径
+    """
+    path = Path(path)
+    codec = _codec()
+    header = json.dumps({"codec": codec, "source": _source_info(path, raw, stat)}).encode('utf-8')
+    target = snapshot_path(path)
+    # 快照可以随时重建，不需要 fsync
+    with atomic_open(target, 'wb', durable=False) as f:
+        f.write(_MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(_encode(data, codec))
+    return target
+
+
+def read_snapshot(path: Union[str, Path]) -> Optional[Dict[str, Any]]:
+    """
+    读取与 JSON 文件匹配的快照
+
+    先比较大小，再计算 JSON 的内容摘要确认（不依赖 mtime，同长度、同 mtime 的改写也能发现）。
+
+    Returns:
+        图谱数据，快照不存在、已过期、损坏或编码器不可用时返回 None
+    """
+    path = Path(path)
+    target = snapshot_path(path)
+    try:
+        with open(target, 'rb') as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                return None
+            (header_len,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_len))
+            source = header["source"]
+            stat = os.stat(path)
+            if stat.st_size != source["size"]:
+                return None
+            with open(path, 'rb') as src:
+                if _digest(src.read()) != source["digest"]:
+                    return None
+            if header["codec"] == "msgpack" and msgpack is None:
+                return None
+            return _decode(f.read(), header["codec"])
+    except (OSError, ValueError, KeyError, EOFError, struct.error):
+        return None
+
+
+def load_graph(path: Union[str, Path], use_snapshot: bool = True) -> Dict[str, Any]:
+    """
+    加载知识图谱 JSON 文件（快照匹配时直接读快照，否则解析 JSON 并刷新快照）
+
+    Args:
+        path: 知识图谱 JSON 文件路径
+        use_snapshot: 是否使用 / 维护二进制快照
+
+    Returns:
+        图谱数据
+    """
+    path = Path(path)
+    if use_snapshot:
+        data = read_snapshot(path)
+        if data is not None:
+            return data
+
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        raw = f.read()
+    data = loads_json(raw)
+
+    if use_snapshot:
+        try:
+            write_snapshot(path, data, raw, stat)
+        except OSError:
+            pass  # 只读目录等情况：只是没有快照可用
+    return data
+
+
+def save_graph(path: Union[str, Path], data: Dict[str, Any], snapshot: bool = True) -> None:
+    """
+    原子保存知识图谱 JSON 文件，并同步刷新快照
+
+    并发写入同一文件时，调用方应持有 file_lock（读-改-写整个放在锁内）。
+
+    Args:
+        path: 知识图谱 JSON 文件路径
+        data: 图谱数据
+        snapshot: 是否同时写快照
+    """
+    raw = dumps_json(data)
+    atomic_write_bytes(path, raw)
+    if snapshot:
+        try:
+            write_snapshot(path, data, raw)
+        except (OSError, ValueError):
+            snapshot_path(path).unlink(missing_ok=True)  # 旧快照会被判为过期，删掉更干净
@@ -0,0 +1,477 @@
+"""
+SQLite 知识图谱存储（可选后端）
+
+JSON 图谱文件查一个节点要整体解析、改一个属性要整体重写。GraphStore 把同样的数据
+存进 SQLite：
+
+1. nodes 表：节点 ID、顺序、label，以及 theme / category / subject / bloom_level 冗余列（均建索引）
+2. properties 表：每个节点的全部属性（键、JSON 值、原始顺序），导出时原样还原
+3. edges 表：边（按 source / target 建索引）
+4. meta 表：图谱中 nodes / edges 以外的顶层字段（如边文件的 metadata）
+
+按 ID 读写单个节点、按属性筛选都走 B 树索引，复杂度 O(log n)；
+数据库使用 WAL 模式，多个读者与单个写者可以并发。
+import_json / export_json 与现有 JSON 格式互相转换，往返后内容与顺序保持不变。
+
+    store = GraphStore.from_json("dataset/graph/math_knowledge_graph_new.json", "output/math.db")
+    store.set_properties("set_concepts", {"bloom_level": "Understand"})
+    store.export_json("output/math_knowledge_graph_new.json")
+"""
+from typing import Dict, Any, List, Optional, Iterator, Union
+from pathlib import Path
+import sqlite3
+import json
+from core.atomic_io import atomic_write_text
+
+
+# 有独立索引列的节点属性
+INDEXED_PROPERTIES = ("theme", "category", "subject", "bloom_level")
+
+# 被视为 SQLite 图谱存储的文件后缀
+STORE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    label TEXT,
+    extra TEXT,
+    theme TEXT,
+    category TEXT,
+    subject TEXT,
+    bloom_level TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_nodes_position ON nodes (position);
+CREATE INDEX IF NOT EXISTS idx_nodes_theme ON nodes (theme);
+CREATE INDEX IF NOT EXISTS idx_nodes_category ON nodes (category);
+CREATE INDEX IF NOT EXISTS idx_nodes_subject ON nodes (subject);
+CREATE INDEX IF NOT EXISTS idx_nodes_bloom_level ON nodes (bloom_level);
+
+CREATE TABLE IF NOT EXISTS properties (
+    node_id TEXT NOT NULL REFERENCES nodes (id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT,
+    ord INTEGER NOT NULL,
+    PRIMARY KEY (node_id, key)
+);
+
+CREATE TABLE IF NOT EXISTS edges (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    label TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_edges_source ON edges (source);
+CREATE INDEX IF NOT EXISTS idx_edges_target ON edges (target);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT,
+    ord INTEGER NOT NULL
+);
+"""
+
+
+def is_graph_store_path(file_path: Union[str, Path]) -> bool:
+    """文件路径是否指向 SQLite 图谱存储（按后缀判断）"""
+    return Path(file_path).suffix.lower() in STORE_SUFFIXES
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _indexed_value(value: Any) -> Optional[str]:
+    """索引列只存字符串取值，其他类型不参与筛选"""
+    return value if isinstance(value, str) and value else None
+
+
+class GraphStore:
+    """SQLite 知识图谱存储"""
+
+    def __init__(self, db_path: Union[str, Path]):
+        """
+        打开（或创建）图谱数据库
+
+        Args:
+            db_path: SQLite 数据库文件路径
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_json(cls, json_path: Union[str, Path], db_path: Union[str, Path]) -> "GraphStore":
+        """
+        从 JSON 图谱文件创建存储（覆盖数据库中已有的图谱）
+
+        Args:
+            json_path: 知识图谱 JSON 文件路径
+            db_path: SQLite 数据库文件路径
+        """
+        store = cls(db_path)
+        store.import_json(json_path)
+        return store
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def __enter__(self) -> "GraphStore":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # ---------- 导入 / 导出 ----------
+
+    def import_graph(self, graph: Dict[str, Any]) -> None:
+        """
+        导入图谱数据（单个事务内替换全部内容）
+
+        Args:
+            graph: {"nodes": [...], "edges": [...], 其他顶层字段}
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM properties")
+            self.conn.execute("DELETE FROM nodes")
+            self.conn.execute("DELETE FROM edges")
+            self.conn.execute("DELETE FROM meta")
+            for position, node in enumerate(graph.get('nodes', [])):
+                self._insert_node(node, position)
+            self.conn.executemany(
+                "INSERT INTO edges (source, target, label, data) VALUES (?, ?, ?, ?)",
+                [self._edge_row(edge) for edge in graph.get('edges', [])]
+            )
+            self.conn.executemany(
+                "INSERT INTO meta (key, value, ord) VALUES (?, ?, ?)",
+                # nodes / edges 只记录位置，内容在各自的表中
+                [(key, None if key in ('nodes', 'edges') else _dumps(value), i)
+                 for i, (key, value) in enumerate(graph.items())]
+            )
+
+    def import_json(self, json_path: Union[str, Path]) -> None:
+        """从 JSON 图谱文件导入"""
+        with open(json_path, 'r', encoding='utf-8') as f:
+            self.import_graph(json.load(f))
+
+    def export_graph(self) -> Dict[str, Any]:
+        """
+        导出为与 JSON 文件相同结构的图谱数据（顶层字段、节点、属性的顺序与导入时一致）
+        """
+        nodes = list(self.iter_nodes())
+        edges = [json.loads(row[0]) for row in self.conn.execute("SELECT data FROM edges ORDER BY id")]
+        graph: Dict[str, Any] = {}
+        meta = self.conn.execute("SELECT key, value FROM meta ORDER BY ord").fetchall()
+        if not meta:
+            meta = [("nodes", None), ("edges", None)]
+        for key, value in meta:
+            if key == 'nodes':
+                graph['nodes'] = nodes
+            elif key == 'edges':
+                graph['edges'] = edges
+            else:
+                graph[key] = json.loads(value)
+        if nodes and 'nodes' not in graph:
+            graph['nodes'] = nodes
+        if edges and 'edges' not in graph:
+            graph['edges'] = edges
+        return graph
+
+    def export_json(self, json_path: Union[str, Path]) -> None:
+        """导出为 JSON 图谱文件（原子替换）"""
+        atomic_write_text(json_path, json.dumps(self.export_graph(), ensure_ascii=False, indent=2))
+
+    # ---------- 节点 ----------
+
+    def _insert_node(self, node: Dict[str, Any], position: int) -> None:
+        props = node.get('properties') or {}
+        extra = {k: v for k, v in node.items() if k not in ('id', 'label', 'properties')}
+        self.conn.execute(
+            "INSERT INTO nodes (id, position, label, extra, theme, category, subject, bloom_level) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (node['id'], position, node.get('label'), _dumps(extra) if extra else None,
+             *(_indexed_value(props.get(key)) for key in INDEXED_PROPERTIES))
+        )
+        self.conn.executemany(
+            "INSERT INTO properties (node_id, key, value, ord) VALUES (?, ?, ?, ?)",
+            [(node['id'], key, _dumps(value), i) for i, (key, value) in enumerate(props.items())]
+        )
+
+    def _build_nodes(self, rows: List[tuple]) -> List[Dict[str, Any]]:
+        """nodes 表的行 (id, label, extra) -> 节点字典（一次查询取回这些节点的属性）"""
+        if not rows:
+            return []
+        props: Dict[str, Dict[str, Any]] = {row[0]: {} for row in rows}
+        ids = list(props)
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            for node_id, key, value in self.conn.execute(
+                f"SELECT node_id, key, value FROM properties WHERE node_id IN ({','.join('?' * len(chunk))}) "
+                "ORDER BY node_id, ord",
+                chunk
+            ):
+                props[node_id][key] = json.loads(value)
+
+        nodes = []
+        for node_id, label, extra in rows:
+            node: Dict[str, Any] = {"id": node_id}
+            if label is not None:
+                node["label"] = label
+            node["properties"] = props[node_id]
+            if extra:
+                node.update(json.loads(extra))
+            nodes.append(node)
+        return nodes
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+
+    def __contains__(self, node_id: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM nodes WHERE id = ?", (node_id,)).fetchone() is not None
+
+    def get_node(self, node_id: str) -> Optional[Dict[str, Any]]:
+        """按 ID 取节点，不存在时返回 None"""
+        rows = self.conn.execute("SELECT id, label, extra FROM nodes WHERE id = ?", (node_id,)).fetchall()
+        nodes = self._build_nodes(rows)
+        return nodes[0] if nodes else None
+
+    def put_node(self, node: Dict[str, Any]) -> None:
+        """
+        写入节点：已存在则整体替换（保持原位置），否则追加到末尾
+        """
+        with self.conn:
+            row = self.conn.execute("SELECT position FROM nodes WHERE id = ?", (node['id'],)).fetchone()
+            if row is not None:
+                position = row[0]
+                self.conn.execute("DELETE FROM nodes WHERE id = ?", (node['id'],))
+            else:
+                position = self.conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM nodes").fetchone()[0]
+            self._insert_node(node, position)
+
+    def set_properties(self, node_id: str, properties: Dict[str, Any]) -> bool:
+        """
+        更新节点的部分属性（新属性追加在末尾）
+
+        Args:
+            node_id: 节点 ID
+            properties: 要写入的属性
+
+        Returns:
+            节点是否存在
+        """
+        with self.conn:
+            return self._set_properties(node_id, properties)
+
+    def update_nodes(self, updates: Dict[str, Dict[str, Any]]) -> List[str]:
+        """
+        在一个事务内更新多个节点的属性
+
+        Args:
+            updates: 节点 ID -> 要写入的属性
+
+        Returns:
+            不存在的节点 ID
+        """
+        with self.conn:
+            return [node_id for node_id, properties in updates.items()
+                    if not self._set_properties(node_id, properties)]
+
+    def _set_properties(self, node_id: str, properties: Dict[str, Any]) -> bool:
+        if node_id not in self:
+            return False
+        next_ord = self.conn.execute(
+            "SELECT COALESCE(MAX(ord) + 1, 0) FROM properties WHERE node_id = ?", (node_id,)
+        ).fetchone()[0]
+        for key, value in properties.items():
+            updated = self.conn.execute(
+                "UPDATE properties SET value = ? WHERE node_id = ? AND key = ?",
+                (_dumps(value), node_id, key)
+            ).rowcount
+            if not updated:
+                self.conn.execute(
+                    "INSERT INTO properties (node_id, key, value, ord) VALUES (?, ?, ?, ?)",
+                    (node_id, key, _dumps(value), next_ord)
+                )
+                next_ord += 1
+            if key in INDEXED_PROPERTIES:
+                self.conn.execute(
+                    f"UPDATE nodes SET {key} = ? WHERE id = ?", (_indexed_value(value), node_id)
+                )
+        return True
+
+    def remove_properties(self, node_ids: List[str], keys: List[str]) -> int:
+        """
+        在一个事务内删除多个节点的指定属性
+
+        Returns:
+            实际删除了属性的节点数量
+        """
+        keys = list(keys)
+        placeholders = ', '.join('?' for _ in keys)
+        changed = 0
+        with self.conn:
+            for node_id in node_ids:
+                removed = self.conn.execute(
+                    f"DELETE FROM properties WHERE node_id = ? AND key IN ({placeholders})", (node_id, *keys)
+                ).rowcount
+                for key in keys:
+                    if key in INDEXED_PROPERTIES:
+                        self.conn.execute(f"UPDATE nodes SET {key} = NULL WHERE id = ?", (node_id,))
+                changed += removed > 0
+        return changed
+
+    def delete_node(self, node_id: str) -> bool:
+        """删除节点及其属性（不删除相关的边）"""
+        with self.conn:
+            return self.conn.execute("DELETE FROM nodes WHERE id = ?", (node_id,)).rowcount > 0
+
+    def _where(
+        self,
+        theme: Optional[str],
+        category: Optional[str],
+        subject: Optional[str],
+        bloom_level: Optional[str],
+        untagged_only: bool
+    ) -> tuple:
+        clauses, params = [], []
+        for key, value in zip(INDEXED_PROPERTIES, (theme, category, subject, bloom_level)):
+            if value is not None:
+                clauses.append(f"{key} = ?")
+                params.append(value)
+        if untagged_only:
+            clauses.append("bloom_level IS NULL")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def find_nodes(
+        self,
+        theme: Optional[str] = None,
+        category: Optional[str] = None,
+        subject: Optional[str] = None,
+        bloom_level: Optional[str] = None,
+        untagged_only: bool = False,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按索引属性筛选节点（按图谱中的顺序，支持分页）
+
+        Args:
+            theme / category / subject / bloom_level: 属性取值（None 表示不限）
+            untagged_only: 只返回尚未标注布鲁姆层级的节点
+            offset: 跳过的节点数
+            limit: 最多返回的节点数
+
+        Returns:
+            节点列表
+        """
+        where, params = self._where(theme, category, subject, bloom_level, untagged_only)
+        rows = self.conn.execute(
+            f"SELECT id, label, extra FROM nodes{where} ORDER BY position LIMIT ? OFFSET ?",
+            params + [-1 if limit is None else limit, offset]
+        ).fetchall()
+        return self._build_nodes(rows)
+
+    def count_nodes(
+        self,
+        theme: Optional[str] = None,
+        category: Optional[str] = None,
+        subject: Optional[str] = None,
+        bloom_level: Optional[str] = None,
+        untagged_only: bool = False
+    ) -> int:
+        """满足筛选条件的节点数量"""
+        where, params = self._where(theme, category, subject, bloom_level, untagged_only)
+        return self.conn.execute(f"SELECT COUNT(*) FROM nodes{where}", params).fetchone()[0]
+
+    def ids_where(self, key: str, value: str) -> List[str]:
+        """属性等于给定值的节点 ID（key 为 INDEXED_PROPERTIES 之一）"""
+        if key not in INDEXED_PROPERTIES:
+            raise ValueError(f"{key} 没有索引，可选: {', '.join(INDEXED_PROPERTIES)}")
+        return [row[0] for row in self.conn.execute(
+            f"SELECT id FROM nodes WHERE {key} = ? ORDER BY position", (value,)
+        )]
+
+    def iter_nodes(self, chunk_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """按图谱顺序遍历全部节点"""
+        last = -1
+        while True:
+            rows = self.conn.execute(
+                "SELECT id, label, extra, position FROM nodes WHERE position > ? ORDER BY position LIMIT ?",
+                (last, chunk_size)
+            ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][3]
+            yield from self._build_nodes([row[:3] for row in rows])
+
+    # ---------- 边 ----------
+
+    @staticmethod
+    def _edge_row(edge: Dict[str, Any]) -> tuple:
+        return (edge.get('source', ''), edge.get('target', ''), edge.get('label'), _dumps(edge))
+
+    def add_edge(self, edge: Dict[str, Any]) -> int:
+        """
+        追加一条边
+
+        Returns:
+            边的数量
+        """
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO edges (source, target, label, data) VALUES (?, ?, ?, ?)", self._edge_row(edge)
+            )
+        return self.count_edges()
+
+    def count_edges(self) -> int:
+        """边的数量"""
+        return self.conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+
+    def edges_of(self, node_id: str) -> List[Dict[str, Any]]:
+        """以该节点为起点或终点的边"""
+        return [json.loads(row[0]) for row in self.conn.execute(
+            "SELECT data FROM edges WHERE source = ? UNION ALL "
+            "SELECT data FROM edges WHERE target = ? AND source != ?",
+            (node_id, node_id, node_id)
+        )]
+
+    def has_edge(self, source: str, target: str) -> bool:
+        """是否存在 source -> target 的边"""
+        return self.conn.execute(
+            "SELECT 1 FROM edges WHERE source = ? AND target = ? LIMIT 1", (source, target)
+        ).fetchone() is not None
+
+    # ---------- 顶层字段 ----------
+
+    @staticmethod
+    def _check_meta_key(key: str) -> None:
+        # nodes / edges 在 meta 表中只是占位行（记录导出时的位置），内容在各自的表中
+        if key in ('nodes', 'edges'):
+            raise ValueError(f"{key} 不是顶层字段，请使用节点 / 边的读写方法")
+
+    def get_meta(self, key: str, default: Any = None) -> Any:
+        """读取顶层字段（如边文件的 metadata）"""
+        self._check_meta_key(key)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key: str, value: Any) -> None:
+        """写入顶层字段（新字段追加在末尾）"""
+        self._check_meta_key(key)
+        with self.conn:
+            updated = self.conn.execute(
+                "UPDATE meta SET value = ? WHERE key = ?", (_dumps(value), key)
+            ).rowcount
+            if not updated:
+                self.conn.execute(
+                    "INSERT INTO meta (key, value, ord) VALUES (?, ?, (SELECT COALESCE(MAX(ord) + 1, 0) FROM meta))",
+                    (key, _dumps(value))
+                )
@@ -8,16 +8,34 @@
 4. 评估agent判断是否保留边
 5. 通过function call写入JSON
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from pathlib import Path
 from core.agent import Agent
 from agents.meta_agent import MetaAgent
 from agents.evaluator_agent import EvaluatorAgent
+from core.pair_cascade import PairCascade
+from core.pair_outcome_cache import PairOutcomeCache
+from core.transcript_store import TranscriptStore
+from core.dialogue_checkpoint import DialogueCheckpointStore
+from core.graph_index import GraphIndex
+from core.graph_store import GraphStore, is_graph_store_path
+from core.graph_io import write_json, update_json
+from core.atomic_io import file_lock
+from core.fingerprint import DERIVED_PROPERTIES
 from datetime import datetime
 import json
 import re
 
 
+# 提示词模板版本：修改讨论、提取或评估提示词后需要更新，使历史结果缓存失效
+PROMPT_TEMPLATE_VERSION = "node-pair-v1"
+
+# 边提取 / 评估调用本身出错（超时、5xx、无法解析的回复）时的原因，
+# 与模型明确给出的否定结论区分：不写入结果缓存，保留检查点以便重试
+EXTRACTION_FAILED = "提取失败"
+EVALUATION_FAILED = "评估失败"
+
+
 class NodePairChatroom:
     """节点对节点的聊天室"""
     
@@ -25,11 +43,15 @@ class NodePairChatroom:
         self,
         physics_agent: Agent,
         math_agent: Agent,
-        physics_graph: Dict[str, Any],
-        math_graph: Dict[str, Any],
+        physics_graph: Union[Dict[str, Any], GraphIndex],
+        math_graph: Union[Dict[str, Any], GraphIndex],
         meta_agent: Optional[MetaAgent] = None,
         evaluator: Optional[EvaluatorAgent] = None,
-        output_file: Optional[Path] = None
+        output_file: Optional[Path] = None,
+        cascade: Optional[PairCascade] = None,
+        outcome_cache: Optional[PairOutcomeCache] = None,
+        transcript_store: Optional[TranscriptStore] = None,
+        checkpoint_store: Optional[DialogueCheckpointStore] = None
     ):
         """
         初始化节点对聊天室
@@ -37,27 +59,41 @@ class NodePairChatroom:
         Args:
             physics_agent: 物理专家
             math_agent: 数学专家
-            physics_graph: 物理知识图谱
-            math_graph: 数学知识图谱
+            physics_graph: 物理知识图谱（或共享的 GraphIndex）
+            math_graph: 数学知识图谱（或共享的 GraphIndex）
             meta_agent: 元协调者（可选）
             evaluator: 评估agent（可选）
-            output_file: 输出JSON文件路径
+            output_file: 输出JSON文件路径（.db / .sqlite 后缀时使用 SQLite 图谱存储）
+            cascade: 候选级联筛选器（可选，讨论前剔除明显无关的节点对）
+            outcome_cache: 跨运行结果缓存（可选，节点内容和提示词未变的节点对直接复用历史结果）
+            transcript_store: 讨论记录存储（可选，保存每个节点对的完整多轮对话）
+            checkpoint_store: 对话检查点（可选，每轮结束后保存，中断后从最后完整轮次继续）
         """
         self.physics_agent = physics_agent
         self.math_agent = math_agent
         self.meta_agent = meta_agent or MetaAgent()
         self.evaluator = evaluator or EvaluatorAgent()
-        
-        # 知识图谱
-        self.physics_graph = physics_graph
-        self.math_graph = math_graph
-        
-        # 构建节点索引和邻接表
-        self.physics_nodes = {n['id']: n for n in physics_graph['nodes']}
-        self.math_nodes = {n['id']: n for n in math_graph['nodes']}
-        
-        self.physics_edges = self._build_adjacency_list(physics_graph['edges'])
-        self.math_edges = self._build_adjacency_list(math_graph['edges'])
+        self.cascade = cascade
+        self.outcome_cache = outcome_cache
+        self.transcript_store = transcript_store
+        self.checkpoint_store = checkpoint_store
+        # 上一个节点对被级联筛选跳过时的原因（未经讨论，不应作为训练负样本）
+        self.last_pruned: Optional[str] = None
+        # 上一个节点对因模型调用出错而未得出结论时的原因（应重试，不应作为负样本）
+        self.last_error: Optional[str] = None
+        
+        # 知识图谱索引（与其他子系统共享，见 core.graph_index）
+        self.physics_index = GraphIndex.of(physics_graph)
+        self.math_index = GraphIndex.of(math_graph)
+        self.physics_graph = self.physics_index.graph
+        self.math_graph = self.math_index.graph
+        
+        # 节点索引和邻接表
+        self.physics_nodes = self.physics_index.by_id
+        self.math_nodes = self.math_index.by_id
+        
+        self.physics_edges = self.physics_index.adjacency
+        self.math_edges = self.math_index.adjacency
         
         # 输出文件
         self.output_file = output_file or Path("output/cross_domain_edges.json")
@@ -71,27 +107,6 @@ class NodePairChatroom:
         print(f"  数学节点: {len(self.math_nodes)}")
         print(f"  输出文件: {self.output_file}")
     
-    def _build_adjacency_list(self, edges: List[Dict]) -> Dict[str, List[str]]:
-        """构建邻接表（节点的相关节点）"""
-        adj = {}
-        for edge in edges:
-            source = edge.get('source', '')
-            target = edge.get('target', '')
-            
-            if source:
-                if source not in adj:
-                    adj[source] = []
-                if target:
-                    adj[source].append(target)
-            
-            if target:
-                if target not in adj:
-                    adj[target] = []
-                if source:
-                    adj[target].append(source)
-        
-        return adj
-    
     def _init_output_file(self):
         """初始化输出文件"""
         if not self.output_file.exists():
@@ -131,6 +146,9 @@ class NodePairChatroom:
         print(f"多轮讨论节点对: [{physics_node_id}] ↔ [{math_node_id}]")
         print(f"{'='*70}\n")
         
+        self.last_pruned = None
+        self.last_error = None
+        
         # 验证节点存在
         if physics_node_id not in self.physics_nodes:
             print(f"✗ 物理节点不存在: {physics_node_id}")
@@ -158,12 +176,58 @@ class NodePairChatroom:
             depth=context_depth
         )
         
-        # 初始化对话历史
-        physics_history = []
-        math_history = []
+        # 历史结果缓存：节点内容、提示词版本、渲染后的上下文（含邻居节点）和轮数均未变化时直接复用
+        cache_context = [physics_context, math_context, max_rounds]
+        if self.outcome_cache:
+            cached = self.outcome_cache.get(physics_node, math_node, cache_context)
+            if cached is not None:
+                verdict = "接受" if cached['accepted'] else "拒绝"
+                print(f"♻️  命中历史结果（{verdict}）: {cached['reason']}\n")
+                if not cached['accepted']:
+                    return None
+                # 与新生成的边走同一写入路径（输出文件中已有同一条边时不重复写入）
+                self._write_edge_to_file(cached['edge'], skip_existing=True)
+                return cached['edge']
+        
+        # 对话检查点：上次中断的节点对从最后一个完整轮次继续
+        checkpoint = None
+        if self.checkpoint_store is not None:
+            checkpoint = self.checkpoint_store.load(physics_node, math_node)
+        
+        # 级联筛选：相似度过滤 + 小模型快速判断（已有检查点说明此前已通过）
+        if self.cascade and checkpoint is None:
+            passed, reason = self.cascade.screen(physics_node, math_node)
+            if not passed:
+                print(f"⏭  级联筛选跳过: {reason}\n")
+                self.last_pruned = reason
+                return None
+            print(f"✓ 级联筛选通过: {reason}\n")
+        
+        # 初始化对话历史（有检查点时从检查点恢复）
+        if checkpoint:
+            transcript = checkpoint['transcript']
+            start_round = checkpoint['round'] + 1
+            if checkpoint['finished']:
+                # 对话已结束，直接进入边提取和评估
+                start_round = max_rounds + 1
+            print(f"⏯  从检查点恢复：已完成 {checkpoint['round']} 轮对话\n")
+        else:
+            transcript = {
+                "physics_id": physics_node_id,
+                "math_id": math_node_id,
+                "prompt_version": PROMPT_TEMPLATE_VERSION,
+                "started_at": datetime.now().isoformat(),
+                "turns": [],
+                "corrections": [],
+                "assessments": []
+            }
+            start_round = 1
+        
+        physics_history = [t['content'] for t in transcript['turns'] if t['speaker'] == 'physics']
+        math_history = [t['content'] for t in transcript['turns'] if t['speaker'] == 'math']
         
         # 多轮对话循环
-        for round_num in range(1, max_rounds + 1):
+        for round_num in range(start_round, max_rounds + 1):
             print(f"\n--- 第 {round_num} 轮对话 ---")
             
             # 物理agent发言
@@ -179,6 +243,7 @@ class NodePairChatroom:
                 round_num
             )
             physics_history.append(physics_response)
+            transcript["turns"].append({"round": round_num, "speaker": "physics", "content": physics_response})
             print(f"[{self.physics_agent.name}]: {physics_response}\n")
             
             # 数学agent发言
@@ -194,6 +259,7 @@ class NodePairChatroom:
                 round_num
             )
             math_history.append(math_response)
+            transcript["turns"].append({"round": round_num, "speaker": "math", "content": math_response})
             print(f"[{self.math_agent.name}]: {math_response}\n")
             
             # 检查是否偏离主题
@@ -205,7 +271,9 @@ class NodePairChatroom:
                     physics_history,
                     math_history
                 )
+                transcript["corrections"].append({"round": round_num, "content": correction})
                 print(f"[{self.meta_agent.name}]: {correction}\n")
+                self._save_checkpoint(physics_node, math_node, round_num, transcript)
                 continue  # 继续下一轮，给机会矫正
             
             # 每两轮检查一次讨论成效
@@ -218,6 +286,11 @@ class NodePairChatroom:
                     math_history,
                     round_num
                 )
+                transcript["assessments"].append({
+                    "round": round_num,
+                    "continue": should_continue,
+                    "content": assessment
+                })
                 print(f"[{self.meta_agent.name}]: {assessment}\n")
                 
                 if not should_continue:
@@ -227,19 +300,33 @@ class NodePairChatroom:
             # 检查是否达到最大轮数
             if round_num == max_rounds:
                 print(f"[{self.meta_agent.name}] 已达到最大轮数 {max_rounds}，结束对话\n")
+            
+            self._save_checkpoint(physics_node, math_node, round_num, transcript)
         
         print(f"💬 对话结束，共进行了 {len(physics_history)} 轮\n")
+        if start_round <= max_rounds:
+            self._save_checkpoint(physics_node, math_node, len(physics_history), transcript, finished=True)
         
         # 从完整的对话历史中提取边
-        edge = self._extract_edge_from_history(
+        edge, reason = self._extract_edge_from_history(
             physics_node_id,
             math_node_id,
             physics_history,
             math_history
         )
+        transcript["extraction"] = edge
         
         if not edge:
+            if reason == EXTRACTION_FAILED:
+                # 提取调用本身出错时不缓存，并保留检查点，下次只需重新提取和评估
+                print("✗ 边提取失败，保留检查点以便重试\n")
+                self.last_error = reason
+                self._save_transcript(transcript, False, reason, error=True)
+                return None
             print("✗ 未能从对话历史中提取有效的边\n")
+            self._save_transcript(transcript, False, "未提取到边")
+            self._record_outcome(physics_node, math_node, None, "未提取到边", cache_context)
+            self._clear_checkpoint(physics_node_id, math_node_id)
             return None
         
         # 评估边
@@ -248,15 +335,75 @@ class NodePairChatroom:
         
         if is_valid:
             print(f"[{self.evaluator.name}] ✓ 边评估通过: {reason}\n")
+            self._save_transcript(transcript, True, reason)
             
             # 写入文件
             self._write_edge_to_file(edge)
+            self._record_outcome(physics_node, math_node, edge, reason, cache_context)
+            self._clear_checkpoint(physics_node_id, math_node_id)
             
             return edge
         else:
             print(f"[{self.evaluator.name}] ✗ 边被拒绝: {reason}\n")
+            # 评估调用本身出错时不缓存，并保留检查点，下次只需重新提取和评估
+            if reason == EVALUATION_FAILED:
+                self.last_error = reason
+                self._save_transcript(transcript, False, reason, error=True)
+                return None
+            self._save_transcript(transcript, False, reason)
+            self._record_outcome(physics_node, math_node, None, reason, cache_context)
+            self._clear_checkpoint(physics_node_id, math_node_id)
             return None
     
+    def _save_checkpoint(
+        self,
+        physics_node: Dict,
+        math_node: Dict,
+        round_num: int,
+        transcript: Dict[str, Any],
+        finished: bool = False
+    ):
+        """保存一个完整轮次之后的对话检查点"""
+        if self.checkpoint_store is not None:
+            self.checkpoint_store.save(physics_node, math_node, round_num, transcript, finished)
+    
+    def _clear_checkpoint(self, physics_node_id: str, math_node_id: str):
+        """节点对得出结论后删除检查点"""
+        if self.checkpoint_store is not None:
+            self.checkpoint_store.clear(physics_node_id, math_node_id)
+    
+    def _save_transcript(
+        self,
+        transcript: Dict[str, Any],
+        accepted: bool,
+        reason: str,
+        error: bool = False
+    ):
+        """
+        将完整讨论记录（含评估结论）写入讨论记录存储（error 表示模型调用出错、未得出结论）
+        
+        立即写盘：随后会记录结果并删除检查点，进程被杀时缓冲区中的记录不能丢失。
+        """
+        if self.transcript_store is not None:
+            transcript["verdict"] = {"accepted": accepted, "reason": reason}
+            if error:
+                transcript["verdict"]["error"] = True
+            transcript["finished_at"] = datetime.now().isoformat()
+            self.transcript_store.append(transcript)
+            self.transcript_store.flush()
+    
+    def _record_outcome(
+        self,
+        physics_node: Dict,
+        math_node: Dict,
+        edge: Optional[Dict[str, Any]],
+        reason: str,
+        context: Any = None
+    ):
+        """将讨论结果写入跨运行缓存"""
+        if self.outcome_cache:
+            self.outcome_cache.put(physics_node, math_node, edge is not None, edge, reason, context)
+    
     def _build_node_context(
         self,
         node_id: str,
@@ -271,11 +418,13 @@ class NodePairChatroom:
         node = nodes_dict[node_id]
         context += f"**[{node_id}]** {node.get('label', '')}\n\n"
         
-        # 输出完整的properties
-        properties = node.get('properties', {})
+        # 输出完整的properties（布鲁姆标注是下游产物，不进入提示词）
+        properties = node.get('properties') or {}
         if properties:
             context += "**属性信息**：\n"
             for key, value in properties.items():
+                if key in DERIVED_PROPERTIES:
+                    continue
                 if isinstance(value, str):
                     context += f"- {key}: {value}\n"
                 elif isinstance(value, list):
@@ -295,7 +444,7 @@ class NodePairChatroom:
                     context += f"- **[{related_id}]** {related.get('label', '')}\n"
                     
                     # 相关节点也显示完整properties
-                    related_props = related.get('properties', {})
+                    related_props = related.get('properties') or {}
                     if 'description' in related_props:
                         desc = related_props['description']
                         context += f"  描述: {desc[:150]}...\n"
@@ -360,7 +509,7 @@ class NodePairChatroom:
 # 对方的知识节点
 
 **[{other_node['id']}]** {other_node.get('label', '')}
-{other_node.get('properties', {}).get('description', '')}
+{(other_node.get('properties') or {}).get('description', '')}
 
 """
         
@@ -410,7 +559,7 @@ class NodePairChatroom:
 # 对方的知识节点
 
 **[{other_node['id']}]** {other_node.get('label', '')}
-{other_node.get('properties', {}).get('description', '')}
+{(other_node.get('properties') or {}).get('description', '')}
 
 """
         
@@ -673,8 +822,14 @@ class NodePairChatroom:
         math_node_id: str,
         physics_history: List[str],
         math_history: List[str]
-    ) -> Optional[Dict[str, Any]]:
-        """从完整的对话历史中提取边"""
+    ) -> tuple[Optional[Dict[str, Any]], str]:
+        """
+        从完整的对话历史中提取边
+        
+        Returns:
+            (边, 理由)：模型判断不存在关联时边为None、理由为模型给出的原因；
+            调用出错或回复无法解析时边为None、理由为 EXTRACTION_FAILED
+        """
         # 构建完整的对话历史
         dialogue_text = f"关于 [{physics_node_id}] 和 [{math_node_id}] 的完整对话:\n\n"
         
@@ -723,16 +878,16 @@ class NodePairChatroom:
                 
                 # 检查是否标记为不存在
                 if edge_data.get('exists') == False:
-                    return None
+                    return None, edge_data.get('reason') or "未发现明确关联"
                 
                 # 验证必需字段
                 if all(k in edge_data for k in ['source', 'target', 'label', 'properties']):
-                    return edge_data
+                    return edge_data, ""
         
         except Exception as e:
             print(f"从对话历史提取边时出错：{e}")
         
-        return None
+        return None, EXTRACTION_FAILED
     
     def _extract_edge(
         self,
@@ -832,12 +987,41 @@ class NodePairChatroom:
             print(f"评估时出错：{e}")
         
         # 默认拒绝
-        return False, "评估失败"
+        return False, EVALUATION_FAILED
     
-    def _write_edge_to_file(self, edge: Dict[str, Any]):
+    def _write_edge_to_file(self, edge: Dict[str, Any], skip_existing: bool = False):
         """通过function call写入边到JSON文件"""
-        add_edge_to_json(str(self.output_file), edge)
-        print(f"✓ 边已写入文件: {self.output_file}\n")
+        if add_edge_to_json(str(self.output_file), edge, skip_existing=skip_existing):
+            print(f"✓ 边已写入文件: {self.output_file}\n")
+    
+    def get_token_usage(self) -> Dict[str, int]:
+        """
+        汇总聊天室内所有模型客户端的累计 token 用量
+        
+        Returns:
+            {"prompt_tokens": ..., "completion_tokens": ..., "total_tokens": ..., "calls": ...}
+        """
+        clients = [
+            self.physics_agent.client,
+            self.math_agent.client,
+            self.meta_agent.client,
+            self.evaluator.client
+        ]
+        if self.cascade and self.cascade.triage_client:
+            clients.append(self.cascade.triage_client)
+        
+        total = {"prompt_tokens": 0, "completion_tokens": 0, "calls": 0}
+        seen = set()
+        for client in clients:
+            usage = getattr(client, "usage", None)
+            if usage is None or id(client) in seen:
+                continue
+            seen.add(id(client))
+            for key in total:
+                total[key] += usage.get(key, 0)
+        
+        total["total_tokens"] = total["prompt_tokens"] + total["completion_tokens"]
+        return total
     
     def batch_discuss(
         self,
@@ -870,6 +1054,14 @@ class NodePairChatroom:
         
         print(f"\n{'='*70}")
         print(f"完成！生成并保留了 {len(valid_edges)}/{len(node_pairs)} 条边")
+        if self.cascade:
+            self.cascade.print_report()
+        if self.outcome_cache:
+            cache_stats = self.outcome_cache.stats()
+            print(f"历史结果缓存: 命中 {cache_stats['hits']} 对，新讨论 {cache_stats['misses']} 对")
+        if self.transcript_store is not None:
+            self.transcript_store.flush()
+            print(f"讨论记录: {self.transcript_store.path}")
         print(f"{'='*70}\n")
         
         return valid_edges
@@ -879,35 +1071,51 @@ class NodePairChatroom:
 
 def write_edge_json(file_path: str, data: Dict[str, Any]) -> None:
     """
-    写入边的JSON文件
+    写入边的JSON文件（在文件锁内原子替换）
     
     Args:
-        file_path: 文件路径
+        file_path: 文件路径（.db / .sqlite 后缀时写入 SQLite 图谱存储）
         data: 数据
     """
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    if is_graph_store_path(file_path):
+        with GraphStore(file_path) as store:
+            store.import_graph(data)
+        return
+    with file_lock(file_path):
+        write_json(file_path, data)
 
 
-def add_edge_to_json(file_path: str, edge: Dict[str, Any]) -> None:
+def add_edge_to_json(file_path: str, edge: Dict[str, Any], skip_existing: bool = False) -> bool:
     """
-    向JSON文件添加一条边
+    向JSON文件添加一条边（读-改-写在文件锁内完成，并发 worker 不会丢边）
     
     Args:
-        file_path: 文件路径
+        file_path: 文件路径（.db / .sqlite 后缀时只追加一行，不重写整个文件）
         edge: 边数据
+        skip_existing: 文件中已有相同 source -> target 的边时不再添加
+        
+    Returns:
+        是否添加了边
     """
-    # 读取现有数据
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # 添加边
-    data['edges'].append(edge)
-    data['metadata']['total_edges'] = len(data['edges'])
-    data['metadata']['last_updated'] = datetime.now().isoformat()
-    
-    # 写回
-    write_edge_json(file_path, data)
+    if is_graph_store_path(file_path):
+        with GraphStore(file_path) as store:
+            if skip_existing and store.has_edge(edge['source'], edge['target']):
+                return False
+            total = store.add_edge(edge)
+            metadata = store.get_meta('metadata', {})
+            metadata['total_edges'] = total
+            metadata['last_updated'] = datetime.now().isoformat()
+            store.set_meta('metadata', metadata)
+        return True
+
+    with update_json(file_path) as data:
+        if skip_existing and any(e.get('source') == edge['source'] and e.get('target') == edge['target']
+                                 for e in data['edges']):
+            return False
+        data['edges'].append(edge)
+        data['metadata']['total_edges'] = len(data['edges'])
+        data['metadata']['last_updated'] = datetime.now().isoformat()
+    return True
 
 
 if __name__ == "__main__":
@@ -40,6 +40,17 @@ class OpenAIClient:
             api_key=self.api_key,
             base_url=self.base_url if self.base_url else None
         )
+        
+        # 累计 token 用量（用于预算控制）
+        self.usage = {"prompt_tokens": 0, "completion_tokens": 0, "calls": 0}
+    
+    def _record_usage(self, response) -> None:
+        """累计一次调用的 token 用量"""
+        self.usage["calls"] += 1
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.usage["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            self.usage["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
     
     def generate(
         self,
@@ -81,6 +92,7 @@ class OpenAIClient:
                 temperature=kwargs.get("temperature", self.temperature),
                 max_tokens=kwargs.get("max_tokens", self.max_tokens)
             )
+            self._record_usage(response)
             
             return response.choices[0].message.content
         except Exception as e:
@@ -139,6 +151,7 @@ class OpenAIClient:
                 temperature=self.temperature,
                 max_tokens=self.max_tokens
             )
+            self._record_usage(response)
             
             return response.choices[0].message.content
         except Exception as e:
@@ -178,6 +191,7 @@ class OpenAIClient:
                 temperature=self.temperature,
                 max_tokens=self.max_tokens
             )
+            self._record_usage(response)
             
             return response.choices[0].message.content
         except Exception as e:
@@ -0,0 +1,320 @@
+"""
+节点对候选级联筛选
+
+在昂贵的多轮对话之前，用两级廉价筛选剔除明显无关的节点对：
+1. 第一级：基于 SemanticProcessor 嵌入的余弦相似度过滤
+2. 第二级：小模型单次 是/否 快速判断
+只有通过两级筛选的节点对才进入 NodePairChatroom 的完整讨论。
+
+驱动脚本（full_cartesian_discussion.py / budgeted_cartesian_discussion.py）通过 --cascade 启用，
+运行前在历史运行的带标签样本上估计召回损失，运行后保存各阶段剪枝统计。
+"""
+from typing import List, Dict, Any, Optional, Tuple
+from pathlib import Path
+from datetime import datetime
+import json
+import random
+import numpy as np
+from core.openai_client import OpenAIClient
+from core.atomic_io import atomic_write_text
+from config import Config
+
+
+# 级联阶段名称
+STAGE_SIMILARITY = "similarity"
+STAGE_TRIAGE = "triage"
+
+
+def normalize_embeddings(embeddings: Dict[str, List[float]]) -> Dict[str, np.ndarray]:
+    """将嵌入向量归一化，便于直接点积求余弦相似度（零向量被丢弃）"""
+    normalized = {}
+    for node_id, vector in embeddings.items():
+        arr = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(arr)
+        if norm > 0:
+            normalized[node_id] = arr / norm
+    return normalized
+
+
+class PairCascade:
+    """节点对候选级联筛选器"""
+
+    def __init__(
+        self,
+        physics_embeddings: Dict[str, List[float]],
+        math_embeddings: Dict[str, List[float]],
+        similarity_threshold: Optional[float] = None,
+        triage_client: Optional[OpenAIClient] = None,
+        triage_enabled: Optional[bool] = None
+    ):
+        """
+        初始化级联筛选器
+
+        Args:
+            physics_embeddings: 物理节点嵌入 {node_id: vector}
+            math_embeddings: 数学节点嵌入 {node_id: vector}
+            similarity_threshold: 第一级余弦相似度阈值（默认从配置读取）
+            triage_client: 第二级使用的小模型客户端（默认按配置创建）
+            triage_enabled: 是否启用第二级小模型判断（默认从配置读取）
+        """
+        self.similarity_threshold = (
+            similarity_threshold if similarity_threshold is not None
+            else Config.CASCADE_SIMILARITY_THRESHOLD
+        )
+        self.triage_enabled = (
+            triage_enabled if triage_enabled is not None
+            else Config.CASCADE_TRIAGE_ENABLED
+        )
+        self.triage_client = None
+        if self.triage_enabled:
+            self.triage_client = triage_client or OpenAIClient(
+                model_name=Config.CASCADE_TRIAGE_MODEL,
+                max_tokens=16
+            )
+
+        self.physics_vectors = normalize_embeddings(physics_embeddings)
+        self.math_vectors = normalize_embeddings(math_embeddings)
+
+        self.stats = self._empty_stats()
+
+    @classmethod
+    def from_semantic_processor(
+        cls,
+        processor,
+        physics_graph: Dict[str, Any],
+        math_graph: Dict[str, Any],
+        **kwargs
+    ) -> "PairCascade":
+        """
+        使用 SemanticProcessor 生成（或读取缓存的）嵌入并创建级联筛选器
+
+        Args:
+            processor: SemanticProcessor 实例
+            physics_graph: 物理知识图谱
+            math_graph: 数学知识图谱
+            **kwargs: 传给构造函数的其他参数
+        """
+        physics_embeddings = processor.generate_node_embeddings(physics_graph, "physics")
+        math_embeddings = processor.generate_node_embeddings(math_graph, "math")
+        return cls(physics_embeddings, math_embeddings, **kwargs)
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, int]:
+        return {
+            "screened": 0,
+            "pruned_similarity": 0,
+            "pruned_triage": 0,
+            "no_embedding": 0,
+            "triage_errors": 0,
+            "passed": 0
+        }
+
+    def similarity(self, physics_node_id: str, math_node_id: str) -> Optional[float]:
+        """获取节点对的余弦相似度（缺少嵌入时返回None）"""
+        p_vec = self.physics_vectors.get(physics_node_id)
+        m_vec = self.math_vectors.get(math_node_id)
+        if p_vec is None or m_vec is None:
+            return None
+        return float(np.dot(p_vec, m_vec))
+
+    def screen(
+        self,
+        physics_node: Dict[str, Any],
+        math_node: Dict[str, Any]
+    ) -> Tuple[bool, str]:
+        """
+        对节点对执行级联筛选，并累计统计
+
+        Returns:
+            (是否通过, 说明)
+        """
+        self.stats["screened"] += 1
+        passed, stage, reason = self._run_stages(physics_node, math_node, self.stats)
+
+        if passed:
+            self.stats["passed"] += 1
+        elif stage == STAGE_SIMILARITY:
+            self.stats["pruned_similarity"] += 1
+        else:
+            self.stats["pruned_triage"] += 1
+
+        return passed, reason
+
+    def _run_stages(
+        self,
+        physics_node: Dict[str, Any],
+        math_node: Dict[str, Any],
+        stats: Dict[str, int]
+    ) -> Tuple[bool, Optional[str], str]:
+        """
+        依次执行各级筛选
+
+        Returns:
+            (是否通过, 被剪枝的阶段, 说明)
+        """
+        # 第一级：余弦相似度
+        similarity = self.similarity(physics_node['id'], math_node['id'])
+        if similarity is None:
+            # 缺少嵌入时无法判断，放行以免损失召回
+            stats["no_embedding"] += 1
+        elif similarity < self.similarity_threshold:
+            return False, STAGE_SIMILARITY, (
+                f"相似度 {similarity:.3f} < 阈值 {self.similarity_threshold}"
+            )
+
+        # 第二级：小模型快速判断
+        if self.triage_enabled:
+            keep = self._triage(physics_node, math_node, stats)
+            if not keep:
+                return False, STAGE_TRIAGE, "小模型判断无明显关联"
+
+        if similarity is None:
+            return True, None, "缺少嵌入，跳过相似度过滤"
+        return True, None, f"相似度 {similarity:.3f}"
+
+    def _triage(
+        self,
+        physics_node: Dict[str, Any],
+        math_node: Dict[str, Any],
+        stats: Dict[str, int]
+    ) -> bool:
+        """单次小模型 是/否 判断"""
+        physics_desc = (physics_node.get('properties') or {}).get('description', '')
+        math_desc = (math_node.get('properties') or {}).get('description', '')
+
+        prompt = f"""
+物理知识点：[{physics_node['id']}] {physics_node.get('label', '')}
+{physics_desc[:200]}
+
+数学知识点：[{math_node['id']}] {math_node.get('label', '')}
+{math_desc[:200]}
+
+这两个知识点之间是否可能存在有意义的跨学科关联（依赖、建模、类比、应用等）？
+只回答 YES 或 NO。
+"""
+        try:
+            response = self.triage_client.generate(prompt, temperature=0.0)
+        except Exception as e:
+            # 判断失败时放行，宁可多讨论也不误删
+            print(f"  级联小模型判断出错：{e}")
+            stats["triage_errors"] += 1
+            return True
+
+        answer = (response or "").strip().upper()
+        return not (answer.startswith("NO") or answer.startswith("否"))
+
+    def get_report(self) -> Dict[str, Any]:
+        """获取各阶段剪枝统计"""
+        screened = self.stats["screened"]
+        pruned = self.stats["pruned_similarity"] + self.stats["pruned_triage"]
+        return {
+            "thresholds": {
+                "similarity": self.similarity_threshold,
+                "triage_enabled": self.triage_enabled
+            },
+            **self.stats,
+            "pruned_total": pruned,
+            "prune_rate": round(pruned / screened, 4) if screened else 0.0
+        }
+
+    def print_report(self):
+        """打印剪枝统计"""
+        report = self.get_report()
+        print(f"级联筛选统计:")
+        print(f"  已筛选: {report['screened']} 对")
+        print(f"  第一级（相似度 < {self.similarity_threshold}）剪枝: {report['pruned_similarity']} 对")
+        print(f"  第二级（小模型判断）剪枝: {report['pruned_triage']} 对")
+        print(f"  进入完整讨论: {report['passed']} 对")
+        print(f"  剪枝率: {report['prune_rate']*100:.1f}%")
+
+    def estimate_recall_loss(
+        self,
+        labelled_pairs: List[Tuple[str, str, bool]],
+        physics_nodes: Dict[str, Dict[str, Any]],
+        math_nodes: Dict[str, Dict[str, Any]],
+        max_samples: Optional[int] = None,
+        seed: int = 0
+    ) -> Dict[str, Any]:
+        """
+        在带标签样本上估计各阶段的召回损失
+
+        样本的标签通常来自历史运行（见 core.pair_yield_model.load_outcomes）：
+        被接受的边为正样本，讨论后被拒绝的为负样本。该方法不计入 screen() 的运行统计。
+
+        Args:
+            labelled_pairs: [(physics_id, math_id, 是否为有效边), ...]
+            physics_nodes: 物理节点索引 {node_id: node}
+            math_nodes: 数学节点索引 {node_id: node}
+            max_samples: 最多使用的样本数（第二级每个样本调用一次小模型，样本过多时随机抽取）
+            seed: 抽样随机种子
+
+        Returns:
+            各阶段剪掉的正/负样本数量及召回损失
+        """
+        if max_samples is not None and len(labelled_pairs) > max_samples:
+            labelled_pairs = random.Random(seed).sample(labelled_pairs, max_samples)
+
+        scratch_stats = self._empty_stats()
+        positives = 0
+        negatives = 0
+        pruned_pos = {STAGE_SIMILARITY: 0, STAGE_TRIAGE: 0}
+        pruned_neg = {STAGE_SIMILARITY: 0, STAGE_TRIAGE: 0}
+
+        for physics_id, math_id, is_positive in labelled_pairs:
+            if physics_id not in physics_nodes or math_id not in math_nodes:
+                continue
+
+            passed, stage, _ = self._run_stages(
+                physics_nodes[physics_id],
+                math_nodes[math_id],
+                scratch_stats
+            )
+
+            if is_positive:
+                positives += 1
+                if not passed:
+                    pruned_pos[stage] += 1
+            else:
+                negatives += 1
+                if not passed:
+                    pruned_neg[stage] += 1
+
+        lost = sum(pruned_pos.values())
+        return {
+            "positives": positives,
+            "negatives": negatives,
+            "pruned_positives": pruned_pos,
+            "pruned_negatives": pruned_neg,
+            "recall_loss": {
+                stage: round(count / positives, 4) if positives else 0.0
+                for stage, count in pruned_pos.items()
+            },
+            "total_recall_loss": round(lost / positives, 4) if positives else 0.0,
+            "negative_prune_rate": (
+                round(sum(pruned_neg.values()) / negatives, 4) if negatives else 0.0
+            ),
+            "triage_errors": scratch_stats["triage_errors"]
+        }
+
+    @staticmethod
+    def print_recall_loss(loss: Dict[str, Any]):
+        """打印 estimate_recall_loss 的结果"""
+        print(f"级联召回损失估计（正样本 {loss['positives']} | 负样本 {loss['negatives']}）:")
+        for stage in (STAGE_SIMILARITY, STAGE_TRIAGE):
+            print(f"  {stage}: 剪掉正样本 {loss['pruned_positives'][stage]} 对 "
+                  f"（召回损失 {loss['recall_loss'][stage]*100:.1f}%），"
+                  f"剪掉负样本 {loss['pruned_negatives'][stage]} 对")
+        print(f"  总召回损失: {loss['total_recall_loss']*100:.1f}% | "
+              f"负样本剪枝率: {loss['negative_prune_rate']*100:.1f}%")
+
+    def save_report(self, output_path: Path, recall_loss: Optional[Dict[str, Any]] = None) -> Path:
+        """保存各阶段剪枝统计（及召回损失估计）到JSON文件"""
+        output_path = Path(output_path)
+        report = {
+            "created_at": datetime.now().isoformat(),
+            "prune": self.get_report(),
+            "recall_loss": recall_loss
+        }
+        atomic_write_text(output_path, json.dumps(report, ensure_ascii=False, indent=2))
+        print(f"✓ 级联筛选报告已保存: {output_path}")
+        return output_path
@@ -0,0 +1,150 @@
+"""
+跨运行的节点对讨论结果缓存
+
+以 (物理节点内容哈希, 数学节点内容哈希, 提示词模板版本, 讨论上下文) 为键持久化每个节点对的讨论结果。
+讨论上下文由调用方提供（渲染后的学科内上下文、最大轮数等），邻居节点内容或讨论参数变化时缓存同样失效。
+修改图谱中的少量节点后重新运行时，只有内容或提示词真正变化的节点对才需要重新讨论，
+其余节点对（包括大量已被拒绝的）直接复用历史结果。
+节点内容哈希忽略布鲁姆标注字段（见 core.fingerprint.DERIVED_PROPERTIES），重新标注不会使缓存失效。
+"""
+from typing import Dict, Any, Optional
+from pathlib import Path
+import sqlite3
+import json
+import time
+from core.fingerprint import content_hash, node_fingerprint
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outcomes (
+    key TEXT PRIMARY KEY,
+    physics_id TEXT NOT NULL,
+    math_id TEXT NOT NULL,
+    physics_hash TEXT NOT NULL,
+    math_hash TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    accepted INTEGER NOT NULL,
+    edge TEXT,
+    reason TEXT,
+    created_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outcomes_pair ON outcomes (physics_id, math_id);
+"""
+
+
+class PairOutcomeCache:
+    """按内容指纹缓存的节点对讨论结果"""
+
+    def __init__(self, db_path: Path, prompt_version: str):
+        """
+        初始化结果缓存
+
+        Args:
+            db_path: SQLite 数据库文件路径
+            prompt_version: 提示词模板版本（修改提示词后应更新，使旧结果失效）
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.prompt_version = prompt_version
+
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+        self.hits = 0
+        self.misses = 0
+
+    def pair_key(
+        self,
+        physics_node: Dict[str, Any],
+        math_node: Dict[str, Any],
+        context: Any = None
+    ) -> str:
+        """节点对的缓存键（context 为任意 JSON 兼容的讨论上下文）"""
+        return content_hash([
+            node_fingerprint(physics_node),
+            node_fingerprint(math_node),
+            self.prompt_version,
+            context
+        ])
+
+    def get(
+        self,
+        physics_node: Dict[str, Any],
+        math_node: Dict[str, Any],
+        context: Any = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        查询历史结果
+
+        Args:
+            physics_node: 物理节点
+            math_node: 数学节点
+            context: 讨论上下文（与写入时一致才会命中）
+
+        Returns:
+            {"accepted": bool, "edge": 边或None, "reason": str}，未命中时返回None
+        """
+        row = self.conn.execute(
+            "SELECT accepted, edge, reason FROM outcomes WHERE key = ?",
+            (self.pair_key(physics_node, math_node, context),)
+        ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return {
+            "accepted": bool(row[0]),
+            "edge": json.loads(row[1]) if row[1] else None,
+            "reason": row[2] or ""
+        }
+
+    def put(
+        self,
+        physics_node: Dict[str, Any],
+        math_node: Dict[str, Any],
+        accepted: bool,
+        edge: Optional[Dict[str, Any]] = None,
+        reason: str = "",
+        context: Any = None
+    ) -> None:
+        """记录节点对的讨论结果"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO outcomes "
+                "(key, physics_id, math_id, physics_hash, math_hash, prompt_version, "
+                "accepted, edge, reason, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.pair_key(physics_node, math_node, context),
+                    physics_node['id'],
+                    math_node['id'],
+                    node_fingerprint(physics_node),
+                    node_fingerprint(math_node),
+                    self.prompt_version,
+                    int(accepted),
+                    json.dumps(edge, ensure_ascii=False) if edge else None,
+                    reason,
+                    time.time()
+                )
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        total, accepted = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(accepted), 0) FROM outcomes WHERE prompt_version = ?",
+            (self.prompt_version,)
+        ).fetchone()
+        return {
+            "prompt_version": self.prompt_version,
+            "entries": total,
+            "accepted": accepted,
+            "rejected": total - accepted,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
@@ -0,0 +1,428 @@
+"""
+基于 SQLite 的持久化节点对任务队列
+
+用于笛卡尔积讨论的多进程/多机并行：
+1. 每个节点对一行，记录状态 pending/running/accepted/rejected/failed
+2. worker 以租约（lease）方式领取任务，租约过期的任务会被其他 worker 回收
+3. 长时间讨论期间通过心跳（heartbeat）续约
+4. 失败任务按重试次数重新排队，超过上限则标记为 failed
+
+多台机器共享同一文件系统时，请使用 journal_mode="DELETE"
+（WAL 模式依赖共享内存，不适用于网络文件系统）。
+"""
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+from pathlib import Path
+from contextlib import contextmanager
+import sqlite3
+import threading
+import json
+import time
+
+
+# 任务状态
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_ACCEPTED = "accepted"
+STATUS_REJECTED = "rejected"
+STATUS_FAILED = "failed"
+
+ALL_STATUSES = [
+    STATUS_PENDING,
+    STATUS_RUNNING,
+    STATUS_ACCEPTED,
+    STATUS_REJECTED,
+    STATUS_FAILED
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pairs (
+    id INTEGER PRIMARY KEY,
+    physics_id TEXT NOT NULL,
+    math_id TEXT NOT NULL,
+    priority REAL NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    heartbeat_at REAL,
+    last_error TEXT,
+    result TEXT,
+    updated_at REAL,
+    UNIQUE (physics_id, math_id)
+);
+CREATE INDEX IF NOT EXISTS idx_pairs_status ON pairs (status, priority DESC, id);
+CREATE INDEX IF NOT EXISTS idx_pairs_owner ON pairs (lease_owner);
+CREATE INDEX IF NOT EXISTS idx_pairs_math ON pairs (math_id);
+"""
+
+
+class PairQueue:
+    """带租约、心跳和重试的节点对任务队列"""
+
+    def __init__(
+        self,
+        db_path: Path,
+        lease_seconds: float = 600.0,
+        max_attempts: int = 3,
+        journal_mode: str = "WAL",
+        busy_timeout: float = 30.0
+    ):
+        """
+        初始化任务队列
+
+        Args:
+            db_path: SQLite 数据库文件路径
+            lease_seconds: 租约时长（秒），超时未续约的任务可被回收
+            max_attempts: 单个节点对的最大尝试次数
+            journal_mode: SQLite 日志模式（单机用 WAL，网络文件系统用 DELETE）
+            busy_timeout: 等待数据库锁的超时时间（秒）
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.journal_mode = journal_mode
+        self.busy_timeout = busy_timeout
+
+        # 每个线程使用独立连接（心跳线程与主线程互不干扰）
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                str(self.db_path),
+                timeout=self.busy_timeout,
+                isolation_level=None
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """立即获取写锁的事务，保证领取任务的原子性"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def enqueue_pairs(
+        self,
+        pairs: Iterable[Tuple[str, str]],
+        priority: float = 0.0,
+        chunk_size: int = 5000
+    ) -> int:
+        """
+        批量加入节点对（已存在的节点对保持原状态不变）
+
+        Args:
+            pairs: 可迭代的 (physics_id, math_id)
+            priority: 优先级（越大越先被领取）
+            chunk_size: 每个事务写入的行数
+
+        Returns:
+            新加入的节点对数量
+        """
+        added = 0
+        chunk = []
+        for physics_id, math_id in pairs:
+            chunk.append((physics_id, math_id, priority, time.time()))
+            if len(chunk) >= chunk_size:
+                added += self._insert_chunk(chunk)
+                chunk = []
+        if chunk:
+            added += self._insert_chunk(chunk)
+        return added
+
+    def _insert_chunk(self, rows: List[Tuple[str, str, float, float]]) -> int:
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO pairs (physics_id, math_id, priority, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            return conn.total_changes - before
+
+    def lease(self, worker_id: str, n: int = 1) -> List[Tuple[str, str]]:
+        """
+        领取最多 n 个待处理的节点对
+
+        优先领取 pending 任务，其次回收租约已过期的 running 任务。
+        已用尽重试次数的过期任务直接标记为 failed。
+
+        Args:
+            worker_id: worker 标识
+            n: 最多领取数量
+
+        Returns:
+            领取到的 [(physics_id, math_id), ...]
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            # 过期且已达重试上限的任务不再回收
+            conn.execute(
+                "UPDATE pairs SET status = ?, lease_owner = NULL, lease_expires = NULL, "
+                "last_error = 'lease expired', updated_at = ? "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (STATUS_FAILED, now, STATUS_RUNNING, now, self.max_attempts)
+            )
+
+            rows = conn.execute(
+                "SELECT id, physics_id, math_id FROM pairs "
+                "WHERE status = ? OR (status = ? AND lease_expires < ?) "
+                "ORDER BY priority DESC, id LIMIT ?",
+                (STATUS_PENDING, STATUS_RUNNING, now, n)
+            ).fetchall()
+
+            if rows:
+                conn.executemany(
+                    "UPDATE pairs SET status = ?, lease_owner = ?, lease_expires = ?, "
+                    "heartbeat_at = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    [
+                        (STATUS_RUNNING, worker_id, now + self.lease_seconds, now, now, row["id"])
+                        for row in rows
+                    ]
+                )
+
+        return [(row["physics_id"], row["math_id"]) for row in rows]
+
+    def heartbeat(self, worker_id: str) -> int:
+        """
+        为该 worker 持有的所有租约续约
+
+        Returns:
+            续约的任务数量
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE pairs SET lease_expires = ?, heartbeat_at = ? "
+                "WHERE lease_owner = ? AND status = ?",
+                (now + self.lease_seconds, now, worker_id, STATUS_RUNNING)
+            )
+            return cursor.rowcount
+
+    @contextmanager
+    def keep_alive(self, worker_id: str, interval: Optional[float] = None):
+        """
+        在后台线程中定期发送心跳，适合包裹耗时较长的讨论
+
+        Args:
+            worker_id: worker 标识
+            interval: 心跳间隔（秒），默认为租约时长的 1/3
+        """
+        interval = interval or self.lease_seconds / 3
+        stop = threading.Event()
+
+        def _beat():
+            while not stop.wait(interval):
+                try:
+                    self.heartbeat(worker_id)
+                except sqlite3.Error as e:
+                    print(f"⚠️  心跳失败: {e}")
+            self.close()
+
+        thread = threading.Thread(target=_beat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def complete(
+        self,
+        physics_id: str,
+        math_id: str,
+        worker_id: str,
+        accepted: bool,
+        result: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        标记节点对处理完成
+
+        Args:
+            physics_id: 物理节点ID
+            math_id: 数学节点ID
+            worker_id: worker 标识（只能完成自己持有租约的任务）
+            accepted: 是否生成了被接受的边
+            result: 结果数据（如生成的边）
+
+        Returns:
+            是否更新成功（租约已被他人接管时返回False）
+        """
+        status = STATUS_ACCEPTED if accepted else STATUS_REJECTED
+        payload = json.dumps(result, ensure_ascii=False) if result is not None else None
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE pairs SET status = ?, result = ?, lease_owner = NULL, "
+                "lease_expires = NULL, last_error = NULL, updated_at = ? "
+                "WHERE physics_id = ? AND math_id = ? AND lease_owner = ? AND status = ?",
+                (status, payload, time.time(), physics_id, math_id, worker_id, STATUS_RUNNING)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, physics_id: str, math_id: str, worker_id: str, error: str) -> str:
+        """
+        记录处理失败；未达重试上限则重新排队
+
+        Returns:
+            更新后的状态
+        """
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts FROM pairs WHERE physics_id = ? AND math_id = ? "
+                "AND lease_owner = ? AND status = ?",
+                (physics_id, math_id, worker_id, STATUS_RUNNING)
+            ).fetchone()
+            if row is None:
+                return ""
+
+            status = STATUS_FAILED if row["attempts"] >= self.max_attempts else STATUS_PENDING
+            conn.execute(
+                "UPDATE pairs SET status = ?, last_error = ?, lease_owner = NULL, "
+                "lease_expires = NULL, updated_at = ? "
+                "WHERE physics_id = ? AND math_id = ?",
+                (status, error, time.time(), physics_id, math_id)
+            )
+            return status
+
+    def release(self, worker_id: str) -> int:
+        """
+        释放该 worker 持有的全部租约（如收到中断信号时），不计入重试次数
+
+        Returns:
+            释放的任务数量
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE pairs SET status = ?, lease_owner = NULL, lease_expires = NULL, "
+                "attempts = MAX(attempts - 1, 0), updated_at = ? "
+                "WHERE lease_owner = ? AND status = ?",
+                (STATUS_PENDING, time.time(), worker_id, STATUS_RUNNING)
+            )
+            return cursor.rowcount
+
+    def requeue(self, statuses: Iterable[str] = (STATUS_FAILED,)) -> int:
+        """
+        将指定状态的任务重置为 pending 并清零重试次数
+
+        Returns:
+            重置的任务数量
+        """
+        statuses = list(statuses)
+        placeholders = ", ".join("?" for _ in statuses)
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                f"UPDATE pairs SET status = ?, attempts = 0, lease_owner = NULL, "
+                f"lease_expires = NULL, updated_at = ? WHERE status IN ({placeholders})",
+                (STATUS_PENDING, time.time(), *statuses)
+            )
+            return cursor.rowcount
+
+    @staticmethod
+    def _node_chunks(physics_ids: Iterable[str], math_ids: Iterable[str], size: int = 500):
+        """按列分块的节点 ID：(列名, ID 列表)，避免超出 SQLite 的参数数量上限"""
+        for column, ids in (("physics_id", list(physics_ids)), ("math_id", list(math_ids))):
+            for i in range(0, len(ids), size):
+                yield column, ids[i:i + size]
+
+    def remove_nodes(self, physics_ids: Iterable[str] = (), math_ids: Iterable[str] = ()) -> int:
+        """
+        删除涉及给定节点的全部节点对（节点已从图谱中删除时使用）
+
+        Returns:
+            删除的节点对数量
+        """
+        removed = 0
+        with self._transaction() as conn:
+            for column, chunk in self._node_chunks(physics_ids, math_ids):
+                removed += conn.execute(
+                    f"DELETE FROM pairs WHERE {column} IN ({', '.join('?' for _ in chunk)})", chunk
+                ).rowcount
+        return removed
+
+    def reset_nodes(self, physics_ids: Iterable[str] = (), math_ids: Iterable[str] = ()) -> int:
+        """
+        将涉及给定节点的已结束节点对重置为 pending（节点内容修改后结论需要重新讨论）
+
+        正在运行的节点对不受影响。
+
+        Returns:
+            重置的节点对数量
+        """
+        reset = 0
+        with self._transaction() as conn:
+            for column, chunk in self._node_chunks(physics_ids, math_ids):
+                reset += conn.execute(
+                    f"UPDATE pairs SET status = ?, attempts = 0, result = NULL, last_error = NULL, "
+                    f"updated_at = ? WHERE status NOT IN (?, ?) "
+                    f"AND {column} IN ({', '.join('?' for _ in chunk)})",
+                    (STATUS_PENDING, time.time(), STATUS_PENDING, STATUS_RUNNING, *chunk)
+                ).rowcount
+        return reset
+
+    def get_status(self, physics_id: str, math_id: str) -> Optional[Dict[str, Any]]:
+        """查询单个节点对的状态"""
+        row = self._conn().execute(
+            "SELECT * FROM pairs WHERE physics_id = ? AND math_id = ?",
+            (physics_id, math_id)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def stats(self) -> Dict[str, int]:
+        """各状态的任务数量"""
+        counts = {status: 0 for status in ALL_STATUSES}
+        for row in self._conn().execute(
+            "SELECT status, COUNT(*) AS n FROM pairs GROUP BY status"
+        ):
+            counts[row["status"]] = row["n"]
+        counts["total"] = sum(counts[s] for s in ALL_STATUSES)
+        return counts
+
+    def finished_pairs(self, include_result: bool = False) -> List[Tuple]:
+        """
+        获取所有已讨论完成的节点对
+
+        Args:
+            include_result: 是否附带 complete() 记录的结果数据
+
+        Returns:
+            [(physics_id, math_id, status), ...]，include_result 时为 [(physics_id, math_id, status, result), ...]
+        """
+        rows = self._conn().execute(
+            "SELECT physics_id, math_id, status, result FROM pairs WHERE status IN (?, ?) ORDER BY id",
+            (STATUS_ACCEPTED, STATUS_REJECTED)
+        )
+        if include_result:
+            return [(row["physics_id"], row["math_id"], row["status"],
+                     json.loads(row["result"]) if row["result"] else None) for row in rows]
+        return [(row["physics_id"], row["math_id"], row["status"]) for row in rows]
+
+    def accepted_edges(self) -> List[Dict[str, Any]]:
+        """获取所有被接受的边（按完成时间排序）"""
+        rows = self._conn().execute(
+            "SELECT result FROM pairs WHERE status = ? AND result IS NOT NULL "
+            "ORDER BY updated_at",
+            (STATUS_ACCEPTED,)
+        )
+        return [json.loads(row["result"]) for row in rows]
@@ -0,0 +1,366 @@
+"""
+产出优先、预算封顶的节点对调度器
+
+按嵌套循环顺序遍历节点对时，因预算中断的运行覆盖面几乎是随机的。
+调度器根据预测的边产出（语义相似度、主题重叠、节点度数）把节点对放入优先队列，
+先讨论最有价值的节点对，并在全局 token / 美元预算用尽时停止，
+运行报告中记录“预期产出 - 花费”曲线。
+
+对整个笛卡尔积打分时用 max_queue_size 限制队列长度：只保留预测产出最高的 N 对，
+内存随 N 而不是 物理节点数 × 数学节点数 增长。
+"""
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Callable
+from pathlib import Path
+from datetime import datetime
+import heapq
+import json
+import math
+import numpy as np
+from config import Config
+from core.pair_cascade import normalize_embeddings
+from core.atomic_io import atomic_write_text
+
+
+class PairFeaturizer:
+    """节点对特征提取（语义相似度、主题重叠、节点度数）"""
+
+    def __init__(
+        self,
+        physics_graph: Dict[str, Any],
+        math_graph: Dict[str, Any],
+        physics_embeddings: Optional[Dict[str, List[float]]] = None,
+        math_embeddings: Optional[Dict[str, List[float]]] = None
+    ):
+        """
+        Args:
+            physics_graph: 物理知识图谱
+            math_graph: 数学知识图谱
+            physics_embeddings: 物理节点嵌入（可选）
+            math_embeddings: 数学节点嵌入（可选）
+        """
+        self.physics_nodes = {n['id']: n for n in physics_graph.get('nodes', [])}
+        self.math_nodes = {n['id']: n for n in math_graph.get('nodes', [])}
+
+        self.physics_degree = self._normalized_degrees(physics_graph)
+        self.math_degree = self._normalized_degrees(math_graph)
+
+        self.physics_tokens = {nid: self._theme_tokens(n) for nid, n in self.physics_nodes.items()}
+        self.math_tokens = {nid: self._theme_tokens(n) for nid, n in self.math_nodes.items()}
+
+        self.physics_vectors = normalize_embeddings(physics_embeddings or {})
+        self.math_vectors = normalize_embeddings(math_embeddings or {})
+
+    @staticmethod
+    def _normalized_degrees(graph: Dict[str, Any]) -> Dict[str, float]:
+        """节点度数的对数归一化（0~1）"""
+        degree = {n['id']: 0 for n in graph.get('nodes', [])}
+        for edge in graph.get('edges', []):
+            for key in ('source', 'target'):
+                node_id = edge.get(key)
+                if node_id in degree:
+                    degree[node_id] += 1
+
+        max_log = math.log1p(max(degree.values(), default=0)) or 1.0
+        return {nid: math.log1p(d) / max_log for nid, d in degree.items()}
+
+    @staticmethod
+    def _theme_tokens(node: Dict[str, Any]) -> set:
+        """节点主题相关文本的字符二元组（大多数节点没有theme时退化为label）"""
+        props = node.get('properties') or {}
+        parts = [node.get('label', ''), props.get('theme', ''), props.get('category', '')]
+        abilities = props.get('cultivated_abilities', [])
+        if isinstance(abilities, list):
+            parts.extend(abilities)
+
+        tokens = set()
+        for text in parts:
+            text = str(text)
+            tokens.update(text[i:i + 2] for i in range(len(text) - 1))
+        return tokens
+
+    def features(self, physics_id: str, math_id: str) -> Dict[str, float]:
+        """计算节点对的产出预测特征"""
+        p_vec = self.physics_vectors.get(physics_id)
+        m_vec = self.math_vectors.get(math_id)
+        similarity = float(np.dot(p_vec, m_vec)) if p_vec is not None and m_vec is not None else 0.0
+
+        p_tokens = self.physics_tokens.get(physics_id, set())
+        m_tokens = self.math_tokens.get(math_id, set())
+        union = p_tokens | m_tokens
+        theme = len(p_tokens & m_tokens) / len(union) if union else 0.0
+
+        degree = math.sqrt(
+            self.physics_degree.get(physics_id, 0.0) * self.math_degree.get(math_id, 0.0)
+        )
+
+        return {
+            "similarity": max(0.0, min(1.0, similarity)),
+            "theme": theme,
+            "degree": degree
+        }
+
+
+class PairScheduler:
+    """产出优先、预算封顶的节点对调度器"""
+
+    DEFAULT_WEIGHTS = {"similarity": 0.6, "theme": 0.25, "degree": 0.15}
+
+    def __init__(
+        self,
+        physics_graph: Dict[str, Any],
+        math_graph: Dict[str, Any],
+        physics_embeddings: Optional[Dict[str, List[float]]] = None,
+        math_embeddings: Optional[Dict[str, List[float]]] = None,
+        weights: Optional[Dict[str, float]] = None,
+        yield_fn: Optional[Callable[[str, str], float]] = None,
+        token_budget: Optional[int] = None,
+        dollar_budget: Optional[float] = None,
+        min_yield: Optional[float] = None,
+        max_queue_size: Optional[int] = None
+    ):
+        """
+        初始化调度器
+
+        Args:
+            physics_graph: 物理知识图谱
+            math_graph: 数学知识图谱
+            physics_embeddings: 物理节点嵌入（可选，用于相似度特征）
+            math_embeddings: 数学节点嵌入（可选，用于相似度特征）
+            weights: 各特征权重 {"similarity", "theme", "degree"}
+            yield_fn: 自定义产出预测函数 (physics_id, math_id) -> [0, 1]，提供时替代默认加权打分
+            token_budget: 全局 token 预算（可选）
+            dollar_budget: 全局美元预算（可选，按 Config 中的单价换算）
+            min_yield: 预测产出低于该值的节点对直接跳过（可选，如学习模型校准出的阈值）
+            max_queue_size: 队列最多保留的节点对数量（可选，超出时丢弃预测产出最低的）
+        """
+        self.weights = {**self.DEFAULT_WEIGHTS, **(weights or {})}
+        self.yield_fn = yield_fn
+        self.token_budget = token_budget
+        self.dollar_budget = dollar_budget
+        self.min_yield = min_yield
+        self.max_queue_size = max_queue_size
+        self.skipped = 0
+        self.dropped = 0
+
+        self.featurizer = PairFeaturizer(
+            physics_graph, math_graph, physics_embeddings, math_embeddings
+        )
+
+        # 优先队列：(-预测产出, 入队序号, physics_id, math_id)
+        self._heap: List[Tuple[float, int, str, str]] = []
+        self._seq = 0
+
+        self.curve: List[Dict[str, Any]] = []
+        self.stop_reason = ""
+
+    def features(self, physics_id: str, math_id: str) -> Dict[str, float]:
+        """计算节点对的产出预测特征"""
+        return self.featurizer.features(physics_id, math_id)
+
+    def predict_yield(self, physics_id: str, math_id: str) -> float:
+        """预测节点对产出被接受边的可能性（0~1）"""
+        if self.yield_fn is not None:
+            return float(self.yield_fn(physics_id, math_id))
+
+        feats = self.features(physics_id, math_id)
+        total_weight = sum(self.weights.values()) or 1.0
+        return sum(self.weights[k] * feats[k] for k in self.weights) / total_weight
+
+    def push(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        """
+        将节点对按预测产出加入优先队列（低于 min_yield 的节点对被跳过）
+
+        设置了 max_queue_size 时边打分边淘汰，队列中只保留预测产出最高的节点对，
+        pairs 可以是惰性的整个笛卡尔积（如 PairSpace）。
+
+        Returns:
+            加入的数量（含之后被淘汰的）
+        """
+        if self.max_queue_size is not None:
+            return self._push_bounded(pairs)
+
+        count = 0
+        for physics_id, math_id in pairs:
+            score = self.predict_yield(physics_id, math_id)
+            if self.min_yield is not None and score < self.min_yield:
+                self.skipped += 1
+                continue
+            heapq.heappush(self._heap, (-score, self._seq, physics_id, math_id))
+            self._seq += 1
+            count += 1
+        return count
+
+    def _push_bounded(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        """边打分边淘汰，只保留预测产出最高的 max_queue_size 对"""
+        # 小顶堆：(预测产出, -入队序号, physics_id, math_id)，堆顶是最先被淘汰的节点对
+        # （同分时先入队的保留，与无上限时的出队顺序一致）
+        kept = [(-neg, -seq, p, m) for neg, seq, p, m in self._heap]
+        heapq.heapify(kept)
+        capacity = self.max_queue_size
+        count = 0
+        for physics_id, math_id in pairs:
+            score = self.predict_yield(physics_id, math_id)
+            if self.min_yield is not None and score < self.min_yield:
+                self.skipped += 1
+                continue
+            entry = (score, -self._seq, physics_id, math_id)
+            self._seq += 1
+            count += 1
+            if len(kept) < capacity:
+                heapq.heappush(kept, entry)
+            else:
+                self.dropped += 1
+                if capacity and entry > kept[0]:
+                    heapq.heapreplace(kept, entry)
+
+        self._heap = [(-score, -neg_seq, p, m) for score, neg_seq, p, m in kept]
+        heapq.heapify(self._heap)
+        return count
+
+    def pop(self) -> Optional[Tuple[str, str, float]]:
+        """取出预测产出最高的节点对"""
+        if not self._heap:
+            return None
+        neg_score, _, physics_id, math_id = heapq.heappop(self._heap)
+        return physics_id, math_id, -neg_score
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    @staticmethod
+    def tokens_to_dollars(usage: Dict[str, int]) -> float:
+        """按配置单价把 token 用量换算为美元"""
+        return (
+            usage.get("prompt_tokens", 0) / 1000 * Config.PRICE_PER_1K_PROMPT_TOKENS
+            + usage.get("completion_tokens", 0) / 1000 * Config.PRICE_PER_1K_COMPLETION_TOKENS
+        )
+
+    def _budget_check(self, tokens: int, dollars: float, pairs_done: int) -> Optional[str]:
+        """
+        判断预算是否用尽
+
+        除了已花费超过预算，也会在按平均单对花费估算“下一对将超出预算”时提前停止。
+
+        Returns:
+            停止原因，未用尽时返回None
+        """
+        checks = []
+        if self.token_budget is not None:
+            checks.append(("token", tokens, self.token_budget))
+        if self.dollar_budget is not None:
+            checks.append(("美元", dollars, self.dollar_budget))
+
+        for name, spent, budget in checks:
+            if spent >= budget:
+                return f"{name}预算已用尽 ({spent:.4g}/{budget})"
+            if pairs_done > 0 and spent + spent / pairs_done > budget:
+                return f"{name}预算不足以讨论下一对 ({spent:.4g}/{budget})"
+        return None
+
+    def run(
+        self,
+        chatroom,
+        context_depth: int = 1,
+        max_rounds: int = 6
+    ) -> List[Dict[str, Any]]:
+        """
+        按预测产出顺序讨论节点对，直到队列为空或预算用尽
+
+        Args:
+            chatroom: NodePairChatroom 实例
+            context_depth: 上下文深度
+            max_rounds: 每对节点的最大对话轮数
+
+        Returns:
+            生成并保留的边列表
+        """
+        print(f"\n{'='*70}")
+        print(f"按预测产出调度讨论 {len(self)} 对节点")
+        if self.token_budget is not None:
+            print(f"token 预算: {self.token_budget}")
+        if self.dollar_budget is not None:
+            print(f"美元预算: ${self.dollar_budget}")
+        print(f"{'='*70}\n")
+
+        baseline = chatroom.get_token_usage()
+        valid_edges = []
+        expected_yield = 0.0
+        pairs_done = 0
+        self.curve = []
+        self.stop_reason = "队列已清空"
+
+        while self._heap:
+            usage = self._usage_since(chatroom.get_token_usage(), baseline)
+            reason = self._budget_check(
+                usage["total_tokens"], self.tokens_to_dollars(usage), pairs_done
+            )
+            if reason:
+                self.stop_reason = reason
+                print(f"⏹  {reason}，停止调度")
+                break
+
+            physics_id, math_id, score = self.pop()
+            print(f"\n调度: 第{pairs_done + 1}对 预测产出 {score:.3f} | 剩余 {len(self)} 对")
+
+            try:
+                edge = chatroom.discuss_node_pair(physics_id, math_id, context_depth, max_rounds)
+            except Exception as e:
+                print(f"✗ 处理失败: {e}")
+                edge = None
+
+            pairs_done += 1
+            expected_yield += score
+            if edge:
+                valid_edges.append(edge)
+
+            usage = self._usage_since(chatroom.get_token_usage(), baseline)
+            self.curve.append({
+                "pairs": pairs_done,
+                "physics_id": physics_id,
+                "math_id": math_id,
+                "predicted_yield": round(score, 4),
+                "tokens": usage["total_tokens"],
+                "dollars": round(self.tokens_to_dollars(usage), 6),
+                "expected_yield": round(expected_yield, 4),
+                "accepted_edges": len(valid_edges)
+            })
+
+        print(f"\n{'='*70}")
+        print(f"调度结束（{self.stop_reason}）：讨论 {pairs_done} 对，保留 {len(valid_edges)} 条边")
+        print(f"{'='*70}\n")
+
+        return valid_edges
+
+    @staticmethod
+    def _usage_since(current: Dict[str, int], baseline: Dict[str, int]) -> Dict[str, int]:
+        usage = {k: current.get(k, 0) - baseline.get(k, 0) for k in ("prompt_tokens", "completion_tokens")}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        return usage
+
+    def get_report(self) -> Dict[str, Any]:
+        """运行报告（含预期产出 - 花费曲线）"""
+        last = self.curve[-1] if self.curve else {}
+        return {
+            "created_at": datetime.now().isoformat(),
+            "weights": self.weights if self.yield_fn is None else "custom",
+            "budget": {"tokens": self.token_budget, "dollars": self.dollar_budget},
+            "min_yield": self.min_yield,
+            "pairs_skipped": self.skipped,
+            "max_queue_size": self.max_queue_size,
+            "pairs_dropped": self.dropped,
+            "stop_reason": self.stop_reason,
+            "pairs_discussed": last.get("pairs", 0),
+            "pairs_remaining": len(self),
+            "tokens_spent": last.get("tokens", 0),
+            "dollars_spent": last.get("dollars", 0.0),
+            "expected_yield": last.get("expected_yield", 0.0),
+            "accepted_edges": last.get("accepted_edges", 0),
+            "curve": self.curve
+        }
+
+    def save_report(self, output_path: Path) -> Path:
+        """保存运行报告到JSON文件"""
+        output_path = Path(output_path)
+        atomic_write_text(output_path, json.dumps(self.get_report(), ensure_ascii=False, indent=2))
+        print(f"✓ 调度报告已保存: {output_path}")
+        return output_path
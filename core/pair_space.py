@@ -0,0 +1,150 @@
+"""
+笛卡尔积节点对的索引空间
+
+不生成 [(p, m) for p in ... for m in ...] 列表，而是把每个节点对看作一个整数下标：
+按混合进制（mixed-radix）把下标解码为各维坐标 (i, j)，再映射为节点 ID。
+
+1. 随机采样只需在 [0, total) 中无放回地抽取下标，内存 O(采样数)
+2. 遍历按下标区间分块惰性解码，内存与图谱规模无关
+"""
+from typing import List, Tuple, Iterator, Sequence, Optional
+import numpy as np
+
+
+def decode_indices(indices: np.ndarray, radices: Sequence[int]) -> Tuple[np.ndarray, ...]:
+    """
+    混合进制解码：下标 -> 各维坐标
+
+    Args:
+        indices: 整数下标数组
+        radices: 各维的基数（高位在前），如 (数学节点数, 物理节点数)
+
+    Returns:
+        与 radices 对应的坐标数组元组
+    """
+    remainder = np.asarray(indices, dtype=np.int64)
+    digits = []
+    for radix in reversed(radices):
+        remainder, digit = np.divmod(remainder, radix)
+        digits.append(digit)
+    return tuple(reversed(digits))
+
+
+def encode_indices(digits: Sequence[np.ndarray], radices: Sequence[int]) -> np.ndarray:
+    """
+    混合进制编码：各维坐标 -> 下标（decode_indices 的逆运算）
+    """
+    index = np.zeros_like(np.asarray(digits[0], dtype=np.int64))
+    for digit, radix in zip(digits, radices):
+        index = index * radix + np.asarray(digit, dtype=np.int64)
+    return index
+
+
+def sample_indices(total: int, n: int, seed: Optional[int] = None) -> np.ndarray:
+    """
+    从 [0, total) 中无放回随机抽取 n 个下标
+
+    内存为 O(n)，与 total 无关：n 不超过 total 的一半时分批抽取随机下标、去掉重复和已选中的，
+    直到凑满 n 个（期望抽取不到 2n 次）；否则 total ≤ 2n，直接取全排列的前 n 个。
+    （numpy 的 choice(replace=False) 在 total ≤ 10000 或 n > total / 50 时会对整个下标空间洗牌。）
+
+    Args:
+        total: 下标空间大小
+        n: 采样数量（超过 total 时取 total）
+        seed: 随机种子
+
+    Returns:
+        随机顺序的下标数组
+    """
+    n = min(n, total)
+    if n <= 0:
+        return np.zeros(0, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    if n * 2 >= total:
+        return rng.permutation(total)[:n].astype(np.int64)
+
+    chosen = np.zeros(0, dtype=np.int64)
+    while len(chosen) < n:
+        need = n - len(chosen)
+        draws = rng.integers(0, total, size=need + need // 4 + 16, dtype=np.int64)
+        # 保留每个下标第一次出现的位置，抽取顺序本身就是随机顺序
+        _, first = np.unique(draws, return_index=True)
+        draws = draws[np.sort(first)]
+        draws = draws[~np.isin(draws, chosen)]
+        chosen = np.concatenate([chosen, draws[:need]])
+    return chosen
+
+
+class PairSpace:
+    """物理节点 × 数学节点的笛卡尔积，按下标访问而不展开"""
+
+    def __init__(self, physics_ids: Sequence[str], math_ids: Sequence[str], math_major: bool = True):
+        """
+        Args:
+            physics_ids: 物理节点 ID 列表
+            math_ids: 数学节点 ID 列表
+            math_major: 下标顺序是否以数学节点为外层循环
+                （True 与 `for m in math: for p in physics` 的顺序一致）
+        """
+        self.physics_ids = list(physics_ids)
+        self.math_ids = list(math_ids)
+        self.math_major = math_major
+        if math_major:
+            self.radices = (len(self.math_ids), len(self.physics_ids))
+        else:
+            self.radices = (len(self.physics_ids), len(self.math_ids))
+
+    def __len__(self) -> int:
+        return len(self.physics_ids) * len(self.math_ids)
+
+    def _coordinates(self, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """下标 -> (物理节点行号, 数学节点行号)"""
+        outer, inner = decode_indices(indices, self.radices)
+        return (inner, outer) if self.math_major else (outer, inner)
+
+    def pairs_at(self, indices: np.ndarray) -> List[Tuple[str, str]]:
+        """
+        按下标取节点对
+
+        Returns:
+            (physics_id, math_id) 列表，顺序与 indices 一致
+        """
+        physics_rows, math_rows = self._coordinates(indices)
+        return [(self.physics_ids[i], self.math_ids[j]) for i, j in zip(physics_rows.tolist(), math_rows.tolist())]
+
+    def __getitem__(self, index: int) -> Tuple[str, str]:
+        if not 0 <= index < len(self):
+            raise IndexError(f"pair index {index} out of range for {len(self)} pairs")
+        return self.pairs_at(np.array([index]))[0]
+
+    def index_of(self, physics_id: str, math_id: str) -> int:
+        """节点对 -> 下标（线性查找节点行号，仅用于少量查询）"""
+        i, j = self.physics_ids.index(physics_id), self.math_ids.index(math_id)
+        digits = (j, i) if self.math_major else (i, j)
+        return int(encode_indices([np.array(d) for d in digits], self.radices))
+
+    def iter_pairs(self, start: int = 0, stop: Optional[int] = None, chunk_size: int = 4096) -> Iterator[Tuple[str, str]]:
+        """
+        惰性遍历 [start, stop) 范围内的节点对
+
+        Args:
+            start: 起始下标
+            stop: 结束下标（默认到末尾）
+            chunk_size: 每次解码的下标数量
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        for chunk_start in range(start, stop, chunk_size):
+            yield from self.pairs_at(np.arange(chunk_start, min(chunk_start + chunk_size, stop)))
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        return self.iter_pairs()
+
+    def sample(self, n: int, seed: Optional[int] = None) -> List[Tuple[str, str]]:
+        """
+        无放回随机采样 n 个节点对（内存 O(n)）
+
+        Args:
+            n: 采样数量
+            seed: 随机种子
+        """
+        return self.pairs_at(sample_indices(len(self), n, seed))
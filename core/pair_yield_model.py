@@ -0,0 +1,439 @@
+"""
+节点对产出预测模型
+
+每次 NodePairChatroom 运行都会产生带标签的数据：哪些节点对的边通过了 _evaluate_edge，
+哪些没有。本模块用这些历史结果训练一个小型本地模型（纯 numpy 逻辑回归，仅用 CPU），
+特征来自嵌入相似度、嵌入逐元素乘积和图结构特征。
+
+模型给未讨论过的节点对打分，驱动脚本可以跳过校准概率低于阈值的节点对；
+训练时在留出集上报告精确率和召回率。
+"""
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+from pathlib import Path
+import json
+import numpy as np
+from core.pair_scheduler import PairFeaturizer
+from core.pair_queue import PairQueue, STATUS_ACCEPTED, STATUS_REJECTED
+from core.transcript_store import TranscriptStore
+from core.atomic_io import atomic_open
+
+
+# 基础特征名称（顺序即特征向量中的位置）
+BASE_FEATURES = ["similarity", "theme", "degree", "physics_degree", "math_degree"]
+
+
+def _is_error_verdict(verdict: Dict[str, Any]) -> bool:
+    """讨论记录的结论是否为模型调用出错（而非模型给出的否定结论）"""
+    # 早期记录没有 error 标记，评估调用出错时的理由固定为“评估失败”
+    return bool(verdict.get("error")) or verdict.get("reason") == "评估失败"
+
+
+def load_outcomes(
+    edge_files: Iterable[Path] = (),
+    queue_dbs: Iterable[Path] = (),
+    progress_files: Iterable[Path] = (),
+    transcript_stores: Iterable[Path] = ()
+) -> List[Tuple[str, str, bool]]:
+    """
+    从历史运行的输出中收集带标签的节点对
+
+    - 边文件（cross_domain_edges*.json）中的边为正样本
+    - 任务队列中 accepted 为正样本、rejected 为负样本；被级联筛选直接跳过（未经讨论）的
+      节点对不作为样本，否则模型学到的只是级联自己的判断
+    - 旧版 progress.json 的 completed_pairs 中未产出边的为负样本
+    - 讨论记录（TranscriptStore）中每个节点对最新一次讨论的评估结论；
+      最新一次因模型调用出错（超时、5xx）而未得出结论的节点对不作为负样本，
+      即使旧版队列把它记为 rejected
+
+    Args:
+        edge_files: 边JSON文件
+        queue_dbs: PairQueue 数据库文件
+        progress_files: 旧版进度文件
+        transcript_stores: 讨论记录数据文件（transcripts*.bin）
+
+    Returns:
+        [(physics_id, math_id, 是否产出被接受的边), ...]
+    """
+    accepted = set()
+    discussed = set()
+    errored = set()
+
+    for edge_file in edge_files:
+        with open(edge_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for edge in data.get('edges', []):
+            pair = (edge.get('source'), edge.get('target'))
+            accepted.add(pair)
+            discussed.add(pair)
+
+    for db_path in queue_dbs:
+        queue = PairQueue(db_path)
+        for physics_id, math_id, status, result in queue.finished_pairs(include_result=True):
+            pair = (physics_id, math_id)
+            if status == STATUS_REJECTED and isinstance(result, dict) and result.get("pruned"):
+                continue
+            discussed.add(pair)
+            if status == STATUS_ACCEPTED:
+                accepted.add(pair)
+        queue.close()
+
+    for progress_file in progress_files:
+        with open(progress_file, 'r', encoding='utf-8') as f:
+            progress = json.load(f)
+        discussed.update(tuple(p) for p in progress.get('completed_pairs', []))
+
+    for store_path in transcript_stores:
+        # 只读打开：其他 worker 可能仍在写入
+        store = TranscriptStore(store_path, read_only=True)
+        for transcript in store.iter_transcripts():
+            pair = (transcript['physics_id'], transcript['math_id'])
+            verdict = transcript.get('verdict') or {}
+            if _is_error_verdict(verdict):
+                errored.add(pair)
+                continue
+            discussed.add(pair)
+            if verdict.get('accepted'):
+                accepted.add(pair)
+
+    discussed -= errored - accepted
+    return [(p, m, (p, m) in accepted) for p, m in sorted(discussed)]
+
+
+def collect_outcomes(output_dir: Path) -> List[Tuple[str, str, bool]]:
+    """
+    收集输出目录下所有历史运行的带标签节点对（边文件、任务队列、旧版进度文件、讨论记录）
+
+    Args:
+        output_dir: 输出根目录（通常为 Config.OUTPUT_DIR）
+    """
+    output_dir = Path(output_dir)
+    edge_files = sorted(output_dir.glob("**/cross_domain_edges*.json"))
+    edge_files += sorted(output_dir.glob("**/edges_*.json"))
+    queue_dbs = sorted(output_dir.glob("**/pair_queue.sqlite"))
+    progress_files = sorted(output_dir.glob("**/progress.json"))
+    transcript_stores = sorted(output_dir.glob("**/transcripts*.bin"))
+    return load_outcomes(edge_files, queue_dbs, progress_files, transcript_stores)
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -35, 35)))
+
+
+class PairYieldModel:
+    """节点对产出预测模型（L2 正则逻辑回归 + Platt 校准）"""
+
+    def __init__(
+        self,
+        featurizer: PairFeaturizer,
+        use_embedding_product: bool = True,
+        l2: float = 1.0,
+        learning_rate: float = 0.05,
+        epochs: int = 400
+    ):
+        """
+        初始化模型
+
+        Args:
+            featurizer: 节点对特征提取器
+            use_embedding_product: 是否加入两端嵌入的逐元素乘积特征
+            l2: L2 正则强度
+            learning_rate: Adam 学习率
+            epochs: 全批量训练轮数
+        """
+        self.featurizer = featurizer
+        self.use_embedding_product = use_embedding_product
+        self.l2 = l2
+        self.learning_rate = learning_rate
+        self.epochs = epochs
+
+        self.weights: Optional[np.ndarray] = None
+        self.bias = 0.0
+        self.mean: Optional[np.ndarray] = None
+        self.std: Optional[np.ndarray] = None
+        # Platt 校准参数：p = sigmoid(a * logit + b)
+        self.calibration = (1.0, 0.0)
+        self.threshold = 0.5
+
+    def feature_vector(self, physics_id: str, math_id: str) -> np.ndarray:
+        """构建节点对的特征向量"""
+        fz = self.featurizer
+        feats = fz.features(physics_id, math_id)
+        base = [
+            feats["similarity"],
+            feats["theme"],
+            feats["degree"],
+            fz.physics_degree.get(physics_id, 0.0),
+            fz.math_degree.get(math_id, 0.0)
+        ]
+        if not self.use_embedding_product:
+            return np.asarray(base, dtype=np.float32)
+
+        p_vec = fz.physics_vectors.get(physics_id)
+        m_vec = fz.math_vectors.get(math_id)
+        if p_vec is None or m_vec is None:
+            dim = self._embedding_dim()
+            product = np.zeros(dim, dtype=np.float32)
+        else:
+            product = p_vec * m_vec
+        return np.concatenate([np.asarray(base, dtype=np.float32), product])
+
+    def _embedding_dim(self) -> int:
+        for vec in self.featurizer.physics_vectors.values():
+            return len(vec)
+        return 0
+
+    def _design_matrix(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        return np.stack([self.feature_vector(p, m) for p, m in pairs]).astype(np.float64)
+
+    def _logits(self, X: np.ndarray) -> np.ndarray:
+        return ((X - self.mean) / self.std) @ self.weights + self.bias
+
+    def fit(self, samples: List[Tuple[str, str, bool]]) -> "PairYieldModel":
+        """
+        训练逻辑回归
+
+        Args:
+            samples: [(physics_id, math_id, label), ...]
+        """
+        X = self._design_matrix([(p, m) for p, m, _ in samples])
+        y = np.asarray([float(label) for _, _, label in samples])
+
+        self.mean = X.mean(axis=0)
+        self.std = X.std(axis=0)
+        self.std[self.std < 1e-8] = 1.0
+        Xs = (X - self.mean) / self.std
+
+        n, d = Xs.shape
+        w = np.zeros(d)
+        b = float(np.log((y.mean() + 1e-6) / (1 - y.mean() + 1e-6)))
+
+        # Adam 全批量梯度下降
+        m_w, v_w = np.zeros(d), np.zeros(d)
+        m_b, v_b = 0.0, 0.0
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        for t in range(1, self.epochs + 1):
+            err = _sigmoid(Xs @ w + b) - y
+            grad_w = Xs.T @ err / n + self.l2 * w / n
+            grad_b = err.mean()
+
+            m_w = beta1 * m_w + (1 - beta1) * grad_w
+            v_w = beta2 * v_w + (1 - beta2) * grad_w ** 2
+            m_b = beta1 * m_b + (1 - beta1) * grad_b
+            v_b = beta2 * v_b + (1 - beta2) * grad_b ** 2
+
+            lr_t = self.learning_rate * np.sqrt(1 - beta2 ** t) / (1 - beta1 ** t)
+            w -= lr_t * m_w / (np.sqrt(v_w) + eps)
+            b -= lr_t * m_b / (np.sqrt(v_b) + eps)
+
+        self.weights = w
+        self.bias = b
+        return self
+
+    def calibrate(
+        self,
+        samples: List[Tuple[str, str, bool]],
+        target_recall: float = 0.9
+    ) -> float:
+        """
+        在验证集上做 Platt 校准，并选出满足目标召回率的跳过阈值
+
+        Args:
+            samples: 验证样本（不应与训练样本重叠）
+            target_recall: 目标召回率（阈值以下的正样本被视为损失）
+
+        Returns:
+            校准后的概率阈值
+        """
+        logits = self._logits(self._design_matrix([(p, m) for p, m, _ in samples]))
+        y = np.asarray([float(label) for _, _, label in samples])
+
+        # 两参数 Platt 缩放（牛顿法）
+        a, b = 1.0, 0.0
+        for _ in range(50):
+            p = _sigmoid(a * logits + b)
+            g = np.array([np.sum((p - y) * logits), np.sum(p - y)])
+            wgt = p * (1 - p) + 1e-9
+            H = np.array([
+                [np.sum(wgt * logits * logits), np.sum(wgt * logits)],
+                [np.sum(wgt * logits), np.sum(wgt)]
+            ]) + 1e-6 * np.eye(2)
+            step = np.linalg.solve(H, g)
+            a, b = a - step[0], b - step[1]
+            if np.abs(step).max() < 1e-8:
+                break
+        self.calibration = (float(a), float(b))
+
+        # 选择满足目标召回率的最大阈值
+        probs = _sigmoid(a * logits + b)
+        positive_probs = np.sort(probs[y == 1])
+        if len(positive_probs) == 0:
+            self.threshold = 0.0
+        else:
+            max_lost = int(np.floor((1 - target_recall) * len(positive_probs)))
+            self.threshold = float(positive_probs[max_lost])
+        return self.threshold
+
+    def predict_proba(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        """预测节点对产出被接受边的校准概率"""
+        if not pairs:
+            return np.zeros(0)
+        a, b = self.calibration
+        return _sigmoid(a * self._logits(self._design_matrix(pairs)) + b)
+
+    def score(self, physics_id: str, math_id: str) -> float:
+        """单个节点对的校准概率（可直接作为 PairScheduler 的 yield_fn）"""
+        return float(self.predict_proba([(physics_id, math_id)])[0])
+
+    def evaluate(
+        self,
+        samples: List[Tuple[str, str, bool]],
+        threshold: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        在给定样本上评估模型
+
+        Returns:
+            精确率、召回率、跳过比例、AUC、Brier 分数
+        """
+        threshold = self.threshold if threshold is None else threshold
+        probs = self.predict_proba([(p, m) for p, m, _ in samples])
+        y = np.asarray([bool(label) for _, _, label in samples])
+        keep = probs >= threshold
+
+        tp = int(np.sum(keep & y))
+        fp = int(np.sum(keep & ~y))
+        fn = int(np.sum(~keep & y))
+
+        return {
+            "samples": len(samples),
+            "positives": int(y.sum()),
+            "threshold": round(threshold, 6),
+            "precision": round(tp / (tp + fp), 4) if tp + fp else 0.0,
+            "recall": round(tp / (tp + fn), 4) if tp + fn else 0.0,
+            "skip_rate": round(float(np.mean(~keep)), 4) if len(samples) else 0.0,
+            "auc": round(self._auc(probs, y), 4),
+            "brier": round(float(np.mean((probs - y) ** 2)), 6) if len(samples) else 0.0
+        }
+
+    @staticmethod
+    def _auc(scores: np.ndarray, labels: np.ndarray) -> float:
+        """基于秩的 ROC AUC"""
+        n_pos = int(labels.sum())
+        n_neg = len(labels) - n_pos
+        if n_pos == 0 or n_neg == 0:
+            return 0.0
+        order = np.argsort(scores, kind="mergesort")
+        ranks = np.empty(len(scores))
+        ranks[order] = np.arange(1, len(scores) + 1)
+        # 同分取平均秩
+        sorted_scores = scores[order]
+        _, start, counts = np.unique(sorted_scores, return_index=True, return_counts=True)
+        for s, c in zip(start, counts):
+            if c > 1:
+                ranks[order[s:s + c]] = ranks[order[s:s + c]].mean()
+        return float((ranks[labels].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg))
+
+    def save(self, path: Path) -> Path:
+        """保存模型参数（原子替换，中断时不留下残缺的模型文件）"""
+        path = Path(path)
+        # 传文件对象时 np.savez 不再自动补 .npz 后缀
+        if path.suffix != ".npz":
+            path = path.with_name(path.name + ".npz")
+        with atomic_open(path, 'wb') as f:
+            np.savez(
+                f,
+                weights=self.weights,
+                bias=self.bias,
+                mean=self.mean,
+                std=self.std,
+                calibration=np.asarray(self.calibration),
+                threshold=self.threshold,
+                use_embedding_product=self.use_embedding_product,
+                # 训练时的特征配置，加载时与传入的特征提取器核对
+                n_features=self.weights.shape[0],
+                has_embeddings=bool(self.featurizer.physics_vectors),
+                embedding_dim=self._embedding_dim()
+            )
+        return path
+
+    @classmethod
+    def load(cls, path: Path, featurizer: PairFeaturizer) -> "PairYieldModel":
+        """
+        加载模型参数
+
+        Raises:
+            ValueError: 特征提取器的嵌入配置与训练时不一致（特征维度对不上）
+        """
+        data = np.load(path)
+        model = cls(featurizer, use_embedding_product=bool(data["use_embedding_product"]))
+
+        has_embeddings = bool(featurizer.physics_vectors)
+        if "has_embeddings" in data and bool(data["has_embeddings"]) != has_embeddings:
+            trained = "使用" if bool(data["has_embeddings"]) else "未使用"
+            given = "有" if has_embeddings else "没有"
+            raise ValueError(f"模型训练时{trained}嵌入，但传入的特征提取器{given}嵌入（请与训练时的 --use-embeddings 保持一致）")
+        if "embedding_dim" in data and has_embeddings and int(data["embedding_dim"]) != model._embedding_dim():
+            raise ValueError(f"嵌入维度不一致：模型训练时为 {int(data['embedding_dim'])}，"
+                             f"特征提取器为 {model._embedding_dim()}（请使用同一嵌入后端）")
+        expected = len(BASE_FEATURES) + (model._embedding_dim() if model.use_embedding_product else 0)
+        if data["weights"].shape[0] != expected:
+            raise ValueError(f"特征维度不一致：模型有 {data['weights'].shape[0]} 个特征，"
+                             f"当前特征提取器产生 {expected} 个")
+
+        model.weights = data["weights"]
+        model.bias = float(data["bias"])
+        model.mean = data["mean"]
+        model.std = data["std"]
+        model.calibration = tuple(float(v) for v in data["calibration"])
+        model.threshold = float(data["threshold"])
+        return model
+
+
+def train_and_evaluate(
+    samples: List[Tuple[str, str, bool]],
+    featurizer: PairFeaturizer,
+    target_recall: float = 0.9,
+    holdout_fraction: float = 0.2,
+    seed: int = 42,
+    **model_kwargs
+) -> Tuple[PairYieldModel, Dict[str, Any]]:
+    """
+    分层切分训练/校准/留出集，训练并评估模型
+
+    Args:
+        samples: 带标签的节点对
+        featurizer: 特征提取器
+        target_recall: 校准阈值时的目标召回率
+        holdout_fraction: 校准集和留出集各占的比例
+        seed: 随机种子
+        **model_kwargs: 传给 PairYieldModel 的参数
+
+    Returns:
+        (模型, 报告)
+    """
+    rng = np.random.default_rng(seed)
+    splits = {"train": [], "calibration": [], "holdout": []}
+
+    # 按标签分层切分，保证各集合都有正样本
+    for label in (True, False):
+        group = [s for s in samples if s[2] == label]
+        order = rng.permutation(len(group))
+        n_hold = int(round(len(group) * holdout_fraction))
+        for rank, idx in enumerate(order):
+            if rank < n_hold:
+                splits["holdout"].append(group[idx])
+            elif rank < 2 * n_hold:
+                splits["calibration"].append(group[idx])
+            else:
+                splits["train"].append(group[idx])
+
+    model = PairYieldModel(featurizer, **model_kwargs).fit(splits["train"])
+    model.calibrate(splits["calibration"], target_recall=target_recall)
+
+    report = {
+        "target_recall": target_recall,
+        "split_sizes": {k: len(v) for k, v in splits.items()},
+        "train": model.evaluate(splits["train"]),
+        "holdout": model.evaluate(splits["holdout"])
+    }
+    return model, report
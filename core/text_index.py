@@ -0,0 +1,126 @@
+"""
+知识点文本的倒排索引
+
+为每个节点的 label 和 description 建立倒排表：
+1. 中文：单字与相邻两字（bigram）
+2. 其他：按字母数字切分的单词（小写）
+
+查询关键词时先把关键词拆成同样的词项、对倒排表求交集得到候选节点，
+再对候选节点做一次原始的子串判断（`keyword in label or keyword in description`），
+因此结果与逐个节点扫描完全一致，代价只与倒排表长度和候选数量有关。
+"""
+from typing import Dict, Any, List, Set, Sequence, Iterable, Tuple
+import re
+
+
+_TOKEN_PATTERN = re.compile(r'[㐀-鿿]+|[A-Za-z0-9_]+')
+_CJK_PATTERN = re.compile(r'[㐀-鿿]')
+
+
+def _terms(text: str) -> Set[str]:
+    """文本中的全部词项（中文单字 + bigram，其他单词小写）"""
+    terms: Set[str] = set()
+    for run in _TOKEN_PATTERN.findall(text):
+        if _CJK_PATTERN.match(run):
+            terms.update(run)
+            terms.update(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            terms.add(run.lower())
+    return terms
+
+
+class TextIndex:
+    """节点 label / description 的倒排索引（按节点在列表中的位置记录）"""
+
+    def __init__(self, nodes: Sequence[Dict[str, Any]]):
+        """
+        Args:
+            nodes: 节点列表
+        """
+        self.nodes = nodes
+        self.labels: List[str] = []
+        self.descriptions: List[str] = []
+        self.postings: Dict[str, Set[int]] = {}
+        for i, node in enumerate(nodes):
+            label = node.get('label', '') or ''
+            description = (node.get('properties') or {}).get('description', '') or ''
+            self.labels.append(label)
+            self.descriptions.append(description)
+            for term in _terms(label) | _terms(description):
+                self.postings.setdefault(term, set()).add(i)
+        self._words = [term for term in self.postings if not _CJK_PATTERN.match(term)]
+
+    def _candidates(self, keyword: str) -> Iterable[int]:
+        """可能包含关键词的节点位置（超集）"""
+        candidates = None
+        for run in _TOKEN_PATTERN.findall(keyword):
+            if _CJK_PATTERN.match(run):
+                terms = [run] if len(run) == 1 else [run[i:i + 2] for i in range(len(run) - 1)]
+                for term in terms:
+                    posting = self.postings.get(term, set())
+                    candidates = posting if candidates is None else candidates & posting
+            else:
+                # 关键词中的单词可能只是文本中某个单词的一部分：合并所有包含它的单词的倒排表
+                piece = run.lower()
+                posting = set()
+                for word in self._words:
+                    if piece in word:
+                        posting |= self.postings[word]
+                candidates = posting if candidates is None else candidates & posting
+            if not candidates:
+                return ()
+        # 只有标点等无法切分的关键词：退回全量扫描
+        return range(len(self.nodes)) if candidates is None else candidates
+
+    def search(self, keyword: str) -> List[int]:
+        """
+        label 或 description 中包含关键词的节点
+
+        Args:
+            keyword: 关键词（子串匹配，区分大小写）
+
+        Returns:
+            节点位置列表（升序）
+        """
+        return sorted(
+            i for i in self._candidates(keyword)
+            if keyword in self.descriptions[i] or keyword in self.labels[i]
+        )
+
+
+def keyword_pairs(
+    physics_index: TextIndex,
+    math_index: TextIndex,
+    keywords: Sequence[str],
+    max_pairs: int
+) -> List[Tuple[int, int]]:
+    """
+    两侧都包含同一关键词的节点对（按数学节点、物理节点的原始顺序）
+
+    等价于对每个数学节点遍历全部物理节点、检查是否存在共同关键词，
+    但只访问命中关键词的节点：每个关键词查询一次，再按数学节点合并对应的物理节点集合。
+
+    Args:
+        physics_index: 物理节点的倒排索引
+        math_index: 数学节点的倒排索引
+        keywords: 关键词列表
+        max_pairs: 最多返回的节点对数量
+
+    Returns:
+        (物理节点位置, 数学节点位置) 列表
+    """
+    physics_by_math: Dict[int, Set[int]] = {}
+    for keyword in keywords:
+        physics_hits = physics_index.search(keyword)
+        if not physics_hits:
+            continue
+        for m in math_index.search(keyword):
+            physics_by_math.setdefault(m, set()).update(physics_hits)
+
+    pairs: List[Tuple[int, int]] = []
+    for m in sorted(physics_by_math):
+        for p in sorted(physics_by_math[m]):
+            pairs.append((p, m))
+            if len(pairs) >= max_pairs:
+                return pairs
+    return pairs
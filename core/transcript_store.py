@@ -0,0 +1,231 @@
+"""
+节点对讨论记录存储
+
+把每个节点对的完整讨论记录（各轮发言、矫正、成效评估、边提取结果、评估结论）
+按 JSONL 写入分块压缩文件，并维护偏移量索引：
+
+    transcripts.bin       每 chunk_size 条记录压缩为一个独立的数据块，依次追加
+    transcripts.bin.idx   每行一条索引 {"key", "offset", "length", "line", "codec"}
+
+读取单个节点对时只需按索引定位并解压其所在的数据块，无需解压整个文件，
+因此可以离线重新评分而不必重新支付对话费用。
+
+安装了 zstandard 时使用 zstd 压缩，否则退回标准库 zlib。
+"""
+from typing import Dict, Any, Optional, Iterator, List
+from pathlib import Path
+import json
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+CODEC_ZSTD = "zstd"
+CODEC_ZLIB = "zlib"
+DEFAULT_CODEC = CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    """压缩一个数据块"""
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    """解压一个数据块"""
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ImportError("该记录使用 zstd 压缩，请安装: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def transcript_key(physics_id: str, math_id: str) -> str:
+    """节点对在索引中的键"""
+    return f"{physics_id}|{math_id}"
+
+
+class TranscriptStore:
+    """分块压缩、带偏移量索引的讨论记录存储"""
+
+    def __init__(
+        self,
+        path: Path,
+        chunk_size: int = 16,
+        codec: Optional[str] = None,
+        read_only: bool = False
+    ):
+        """
+        打开（或创建）讨论记录存储
+
+        Args:
+            path: 数据文件路径，索引文件为同名加 .idx 后缀
+            chunk_size: 每个压缩数据块包含的记录数（缓冲区中的记录在 flush 前不落盘，
+                在线讨论每条记录后都会 flush，较大的值适合离线批量写入）
+            codec: 压缩方式（zstd/zlib），默认优先 zstd
+            read_only: 只读打开（读取其他仍在运行的 worker 的存储时使用，不截断未写完的尾部）
+        """
+        self.path = Path(path)
+        self.index_path = self.path.with_name(self.path.name + ".idx")
+        self.read_only = read_only
+        if not read_only:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.chunk_size = max(1, chunk_size)
+        self.codec = codec or DEFAULT_CODEC
+        if not read_only and self.codec == CODEC_ZSTD and zstandard is None:
+            raise ImportError("zstd 压缩需要安装: pip install zstandard")
+
+        # 键 -> 最新一条记录的索引项（同一节点对重跑时以最后一次为准）
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._buffer: List[Dict[str, Any]] = []
+        self._load_index()
+
+    def _load_index(self):
+        """加载索引，截掉索引末尾写了一半的行，以及数据文件末尾未写入索引的残缺数据块"""
+        end = 0
+        if self.index_path.exists():
+            with open(self.index_path, 'rb' if self.read_only else 'r+b') as f:
+                good = 0
+                for line in f:
+                    # 索引最后一行可能在写入时中断（没有换行或无法解析）
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        entry = json.loads(line)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        break
+                    self._index[entry['key']] = entry
+                    end = max(end, entry['offset'] + entry['length'])
+                    good += len(line)
+                # 必须在追加之前截掉，否则新的索引行会接在残缺行后面，下次打开时全部丢失
+                if not self.read_only and f.seek(0, os.SEEK_END) > good:
+                    f.truncate(good)
+
+        if not self.read_only and self.path.exists() and self.path.stat().st_size > end:
+            with open(self.path, 'r+b') as f:
+                f.truncate(end)
+
+    def append(self, transcript: Dict[str, Any]):
+        """
+        追加一条讨论记录（缓冲满 chunk_size 条后压缩写盘）
+
+        Args:
+            transcript: 讨论记录，必须包含 physics_id 和 math_id
+        """
+        self._buffer.append(transcript)
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """将缓冲区中的记录压缩为一个数据块写盘"""
+        if not self._buffer:
+            return
+        if self.read_only:
+            raise ValueError(f"讨论记录存储以只读方式打开: {self.path}")
+
+        lines = [json.dumps(t, ensure_ascii=False) for t in self._buffer]
+        block = _compress(("\n".join(lines) + "\n").encode('utf-8'), self.codec)
+
+        with open(self.path, 'ab') as f:
+            offset = f.tell()
+            f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # 数据块落盘后再写索引，中断时最多丢失未索引的数据块
+        entries = []
+        for i, t in enumerate(self._buffer):
+            entries.append({
+                "key": transcript_key(t['physics_id'], t['math_id']),
+                "offset": offset,
+                "length": len(block),
+                "line": i,
+                "codec": self.codec
+            })
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        for entry in entries:
+            self._index[entry['key']] = entry
+        self._buffer = []
+
+    def _read_block(self, offset: int, length: int, codec: str) -> List[str]:
+        """读取并解压一个数据块，返回其中的 JSONL 行"""
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+        return _decompress(data, codec).decode('utf-8').splitlines()
+
+    def get(self, physics_id: str, math_id: str) -> Optional[Dict[str, Any]]:
+        """
+        读取单个节点对的讨论记录（只解压其所在的数据块）
+
+        Returns:
+            讨论记录，不存在时返回None
+        """
+        key = transcript_key(physics_id, math_id)
+
+        # 仍在缓冲区中的记录
+        for t in reversed(self._buffer):
+            if transcript_key(t['physics_id'], t['math_id']) == key:
+                return t
+
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        lines = self._read_block(entry['offset'], entry['length'], entry['codec'])
+        return json.loads(lines[entry['line']])
+
+    def keys(self) -> List[str]:
+        """所有已存储的节点对键"""
+        keys = dict.fromkeys(self._index)
+        for t in self._buffer:
+            keys[transcript_key(t['physics_id'], t['math_id'])] = None
+        return list(keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index or any(
+            transcript_key(t['physics_id'], t['math_id']) == key for t in self._buffer
+        )
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def iter_transcripts(self) -> Iterator[Dict[str, Any]]:
+        """
+        按块顺序遍历每个节点对的最新讨论记录（用于离线重新评分）
+
+        每个数据块只解压一次。
+        """
+        buffered = {transcript_key(t['physics_id'], t['math_id']) for t in self._buffer}
+        blocks: Dict[int, List[Dict[str, Any]]] = {}
+        for entry in self._index.values():
+            if entry['key'] not in buffered:
+                blocks.setdefault(entry['offset'], []).append(entry)
+
+        for offset in sorted(blocks):
+            entries = blocks[offset]
+            lines = self._read_block(offset, entries[0]['length'], entries[0]['codec'])
+            for entry in sorted(entries, key=lambda e: e['line']):
+                yield json.loads(lines[entry['line']])
+
+        latest = {transcript_key(t['physics_id'], t['math_id']): t for t in self._buffer}
+        yield from latest.values()
+
+    def close(self):
+        """写出缓冲区中剩余的记录"""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
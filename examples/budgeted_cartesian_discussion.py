@@ -0,0 +1,171 @@
+"""
+预算封顶的笛卡尔积讨论
+
+按预测边产出（语义相似度、主题重叠、节点度数）从高到低讨论节点对，
+在 token 或美元预算用尽时停止，保证被预算截断的运行覆盖的是最有价值的节点对。
+
+    python examples/budgeted_cartesian_discussion.py --token-budget 2000000
+    python examples/budgeted_cartesian_discussion.py --dollar-budget 20 --use-embeddings
+    python examples/budgeted_cartesian_discussion.py --token-budget 2000000 \
+        --yield-model output/models/pair_yield_model.npz
+    python examples/budgeted_cartesian_discussion.py --token-budget 2000000 --cascade
+"""
+import sys
+from pathlib import Path
+import argparse
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from core.node_pair_chatroom import NodePairChatroom
+from core.pair_scheduler import PairScheduler, PairFeaturizer
+from core.pair_space import PairSpace
+from core.pair_yield_model import PairYieldModel, collect_outcomes
+from core.pair_cascade import PairCascade
+from core.graph_index import load_graph_index
+from agents import PhysicsAgent, MathAgent
+from config import Config
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="预算封顶、产出优先的笛卡尔积讨论")
+    parser.add_argument("--token-budget", type=int, default=None, help="全局 token 预算")
+    parser.add_argument("--dollar-budget", type=float, default=None, help="全局美元预算")
+    parser.add_argument("--use-embeddings", action="store_true",
+                        help="使用 SemanticProcessor 嵌入计算相似度特征")
+    parser.add_argument("--embedding-backend", choices=["gemini", "openai", "local"], default=None,
+                        help="嵌入后端，local 为无需网络的本地模型（默认 Gemini）")
+    parser.add_argument("--yield-model", default=None,
+                        help="学习得到的产出预测模型（见 train_pair_yield_model.py），"
+                             "低于其校准阈值的节点对将被跳过")
+    parser.add_argument("--max-queue", type=int, default=10000,
+                        help="调度队列最多保留的节点对数量（只保留预测产出最高的，"
+                             "内存不随笛卡尔积规模增长）")
+    parser.add_argument("--cascade", action="store_true",
+                        help="讨论前用候选级联剔除明显无关的节点对（需要嵌入）")
+    parser.add_argument("--recall-sample", type=int, default=200,
+                        help="估计级联召回损失时最多使用的历史样本数")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+
+    # 验证配置
+    try:
+        Config.validate()
+    except Exception as e:
+        print(f"✗ 配置错误: {e}")
+        return
+
+    if args.token_budget is None and args.dollar_budget is None:
+        print("✗ 请至少指定 --token-budget 或 --dollar-budget")
+        return
+
+    print("="*70)
+    print("预算封顶的笛卡尔积讨论")
+    print("="*70)
+    print()
+
+    # 加载图谱
+    dataset_dir = Path(__file__).parent.parent / "dataset" / "graph"
+    physics_index = load_graph_index(dataset_dir / "physics_knowledge_graph_new.json")
+    math_index = load_graph_index(dataset_dir / "math_knowledge_graph_new.json")
+    physics_graph = physics_index.graph
+    math_graph = math_index.graph
+
+    # 语义嵌入（可选；级联筛选也使用同一份嵌入，但只有 --use-embeddings 时才作为调度特征）
+    embeddings = None
+    if args.use_embeddings or args.cascade:
+        try:
+            from processors.semantic_processor import SemanticProcessor
+            processor = SemanticProcessor(backend=args.embedding_backend)
+            embeddings = (
+                processor.generate_node_embeddings(physics_graph, "physics"),
+                processor.generate_node_embeddings(math_graph, "math")
+            )
+        except Exception as e:
+            print(f"⚠️  无法生成嵌入，仅使用主题重叠和度数特征: {e}")
+    physics_embeddings, math_embeddings = embeddings if embeddings and args.use_embeddings else (None, None)
+
+    # 候选级联（可选）：先在历史样本上估计召回损失
+    cascade = recall_loss = None
+    if args.cascade:
+        if embeddings is None:
+            print("✗ 候选级联需要嵌入")
+            return
+        cascade = PairCascade(*embeddings)
+        labelled = collect_outcomes(Config.OUTPUT_DIR)
+        if labelled:
+            recall_loss = cascade.estimate_recall_loss(
+                labelled, physics_index.by_id, math_index.by_id, max_samples=args.recall_sample
+            )
+            cascade.print_recall_loss(recall_loss)
+        else:
+            print("⚠️  没有历史运行的带标签样本，无法估计级联召回损失")
+
+    # 学习模型（可选）：替代默认加权打分，并跳过低于校准阈值的节点对
+    yield_fn = min_yield = None
+    if args.yield_model:
+        featurizer = PairFeaturizer(physics_graph, math_graph, physics_embeddings, math_embeddings)
+        model = PairYieldModel.load(Path(args.yield_model), featurizer)
+        yield_fn, min_yield = model.score, model.threshold
+        print(f"✓ 已加载产出预测模型，跳过阈值: {min_yield:.4f}")
+
+    scheduler = PairScheduler(
+        physics_graph,
+        math_graph,
+        physics_embeddings=physics_embeddings,
+        math_embeddings=math_embeddings,
+        yield_fn=yield_fn,
+        token_budget=args.token_budget,
+        dollar_budget=args.dollar_budget,
+        min_yield=min_yield,
+        max_queue_size=args.max_queue
+    )
+    scheduler.push(PairSpace(
+        [p['id'] for p in physics_graph['nodes']],
+        [m['id'] for m in math_graph['nodes']]
+    ))
+    print(f"✓ 已按预测产出排序 {len(scheduler)} 对节点"
+          f"（跳过 {scheduler.skipped} 对，超出队列上限丢弃 {scheduler.dropped} 对）")
+    print()
+
+    # 创建聊天室
+    output_dir = Config.OUTPUT_DIR / "budgeted_cartesian"
+    chatroom = NodePairChatroom(
+        physics_agent=PhysicsAgent(),
+        math_agent=MathAgent(),
+        physics_graph=physics_graph,
+        math_graph=math_graph,
+        output_file=output_dir / "cross_domain_edges.json",
+        cascade=cascade
+    )
+
+    valid_edges = scheduler.run(chatroom, context_depth=1)
+    report_file = scheduler.save_report(output_dir / "run_report.json")
+    if cascade:
+        cascade.print_report()
+        cascade.save_report(output_dir / "cascade_report.json", recall_loss)
+
+    # 显示结果
+    report = scheduler.get_report()
+    print("\n" + "="*70)
+    print("📊 讨论结果")
+    print("="*70)
+    print()
+    print(f"讨论节点对数: {report['pairs_discussed']}（剩余 {report['pairs_remaining']}）")
+    print(f"花费: {report['tokens_spent']} tokens ≈ ${report['dollars_spent']:.2f}")
+    print(f"预期产出: {report['expected_yield']:.1f} | 实际保留边: {len(valid_edges)}")
+    print(f"停止原因: {report['stop_reason']}")
+    print()
+    print(f"结果文件: {chatroom.output_file}")
+    print(f"运行报告: {report_file}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
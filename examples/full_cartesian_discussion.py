@@ -3,10 +3,26 @@
 
 对所有数学节点和物理节点进行两两配对讨论
 math节点数 × physics节点数 = 总讨论次数
+
+节点对存放在 SQLite 任务队列中（output/full_cartesian/pair_queue.sqlite），
+可以在同一台机器或共享文件系统的多台机器上同时启动多个 worker：
+
+    python examples/full_cartesian_discussion.py --worker-id w1 &
+    python examples/full_cartesian_discussion.py --worker-id w2 &
+
+中断后重新启动即可继续，已完成的节点对不会被重复讨论；
+讨论到一半的节点对会从最后一个完整轮次的检查点继续。
+全部完成后使用 --export 合并所有被接受的边。
+
+加 --cascade 时在讨论前挂两级候选级联（嵌入相似度 + 小模型 是/否），
+启动时用历史运行的带标签样本估计召回损失，结束时保存各阶段剪枝统计。
 """
 import sys
 from pathlib import Path
+import argparse
 import json
+import os
+import socket
 import time
 from datetime import datetime
 
@@ -14,228 +30,325 @@ from datetime import datetime
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from core.node_pair_chatroom import NodePairChatroom
+from core.node_pair_chatroom import NodePairChatroom, write_edge_json, PROMPT_TEMPLATE_VERSION
+from core.pair_queue import PairQueue, STATUS_FAILED, STATUS_ACCEPTED, STATUS_REJECTED
+from core.pair_space import PairSpace
+from core.pair_cascade import PairCascade
+from core.pair_yield_model import collect_outcomes
+from core.pair_outcome_cache import PairOutcomeCache
+from core.transcript_store import TranscriptStore
+from core.dialogue_checkpoint import DialogueCheckpointStore
+from core.graph_index import load_graph_index
+from core.atomic_io import atomic_write_text, file_lock
 from agents import PhysicsAgent, MathAgent
 from config import Config
 
 
-def load_progress(progress_file: Path) -> dict:
-    """加载进度"""
-    if progress_file.exists():
-        with open(progress_file, 'r') as f:
-            return json.load(f)
-    return {"completed_pairs": [], "last_index": 0, "total_valid": 0}
-
-
 def save_progress(progress_file: Path, progress: dict):
-    """保存进度"""
+    """保存进度快照（仅供查看，队列数据库才是进度的唯一来源）"""
     progress["last_updated"] = datetime.now().isoformat()
-    with open(progress_file, 'w') as f:
-        json.dump(progress, f, indent=2)
+    # 多个 worker 会写同一个进度文件：加锁并原子替换，读者不会看到写了一半的 JSON
+    with file_lock(progress_file):
+        atomic_write_text(progress_file, json.dumps(progress, indent=2))
+
+
+def build_progress(queue: PairQueue) -> dict:
+    """根据队列状态构建进度快照"""
+    stats = queue.stats()
+    done = stats["accepted"] + stats["rejected"] + stats["failed"]
+    return {
+        "queue": stats,
+        "total_pairs": stats["total"],
+        "total_valid": stats["accepted"],
+        "progress_percentage": done / stats["total"] * 100 if stats["total"] else 0.0
+    }
 
 
-def main():
+def export_edges(queue: PairQueue, output_file: Path) -> int:
+    """将队列中所有被接受的边合并写入一个JSON文件"""
+    edges = queue.accepted_edges()
+    data = {
+        "metadata": {
+            "source_graphs": {
+                "physics": "physics_knowledge_graph_new.json",
+                "math": "math_knowledge_graph_new.json"
+            },
+            "created_at": datetime.now().isoformat(),
+            "total_edges": len(edges)
+        },
+        "edges": edges
+    }
+    write_edge_json(str(output_file), data)
+    return len(edges)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="全遍历笛卡尔积讨论（支持多 worker 并行）")
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}",
+                        help="worker 标识（默认：主机名-进程号）")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="每次领取的节点对数量")
+    parser.add_argument("--lease-seconds", type=float, default=900.0,
+                        help="租约时长（秒），超时未续约的任务会被其他 worker 回收")
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="单个节点对的最大尝试次数")
+    parser.add_argument("--journal-mode", default="WAL",
+                        help="SQLite 日志模式（多台机器共享网络文件系统时用 DELETE）")
+    parser.add_argument("--requeue-failed", action="store_true",
+                        help="启动前将 failed 的节点对重新排队")
+    parser.add_argument("--rerun", action="store_true",
+                        help="图谱或提示词修改后重新运行：所有已完成的节点对重新排队，"
+                             "内容未变的节点对直接复用历史结果")
+    parser.add_argument("--cascade", action="store_true",
+                        help="讨论前用候选级联剔除明显无关的节点对")
+    parser.add_argument("--embedding-backend", choices=["gemini", "openai", "local"], default=None,
+                        help="级联使用的嵌入后端，local 为无需网络的本地模型（默认 Gemini）")
+    parser.add_argument("--recall-sample", type=int, default=200,
+                        help="估计级联召回损失时最多使用的历史样本数")
+    parser.add_argument("--export", action="store_true",
+                        help="只合并导出已接受的边，不进行讨论")
+    parser.add_argument("--resume", action="store_true",
+                        help="兼容旧参数：队列本身即支持断点续传")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """全遍历讨论"""
+    args = parse_args(argv)
+
+    # 输出和队列文件
+    output_dir = Config.OUTPUT_DIR / "full_cartesian"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    output_file = output_dir / "cross_domain_edges.json"
+    progress_file = output_dir / "progress.json"
+    queue = PairQueue(
+        output_dir / "pair_queue.sqlite",
+        lease_seconds=args.lease_seconds,
+        max_attempts=args.max_attempts,
+        journal_mode=args.journal_mode
+    )
+
+    if args.export:
+        n_edges = export_edges(queue, output_file)
+        print(f"✓ 已导出 {n_edges} 条边到: {output_file}")
+        return
+
     # 验证配置
     try:
         Config.validate()
     except Exception as e:
         print(f"✗ 配置错误: {e}")
         return
-    
+
     print("="*70)
     print("全遍历笛卡尔积讨论")
     print("="*70)
     print()
-    
+
     # 数据路径
     dataset_dir = Path(__file__).parent.parent / "dataset" / "graph"
     physics_graph_path = dataset_dir / "physics_knowledge_graph_new.json"
     math_graph_path = dataset_dir / "math_knowledge_graph_new.json"
-    
+
     # 加载图谱
     print("📊 加载知识图谱...")
-    with open(physics_graph_path, 'r', encoding='utf-8') as f:
-        physics_graph = json.load(f)
-    with open(math_graph_path, 'r', encoding='utf-8') as f:
-        math_graph = json.load(f)
-    
+    physics_index = load_graph_index(physics_graph_path)
+    math_index = load_graph_index(math_graph_path)
+    physics_graph = physics_index.graph
+    math_graph = math_index.graph
+
     math_nodes = math_graph['nodes']
     physics_nodes = physics_graph['nodes']
-    
+
     print(f"✓ 数学节点: {len(math_nodes)}")
     print(f"✓ 物理节点: {len(physics_nodes)}")
-    
+
     # 计算笛卡尔积
     total_pairs = len(math_nodes) * len(physics_nodes)
     print(f"✓ 总节点对数: {total_pairs}")
     print()
-    
-    # 生成所有节点对（笛卡尔积）
-    print("🔄 生成节点对（笛卡尔积）...")
-    all_pairs = []
-    for math_node in math_nodes:
-        for physics_node in physics_nodes:
-            all_pairs.append((physics_node['id'], math_node['id']))
-    
-    print(f"✓ 生成 {len(all_pairs)} 对节点")
+
+    # 节点对入队（已存在的节点对保持原状态，多个 worker 重复执行也安全）
+    print("🔄 节点对入队（笛卡尔积）...")
+    # 按下标惰性解码节点对，不在内存中展开笛卡尔积
+    pair_space = PairSpace([n['id'] for n in physics_nodes], [n['id'] for n in math_nodes])
+    added = queue.enqueue_pairs(pair_space.iter_pairs())
+    if args.requeue_failed:
+        requeued = queue.requeue([STATUS_FAILED])
+        print(f"✓ 重新排队失败的节点对: {requeued}")
+    if args.rerun:
+        requeued = queue.requeue([STATUS_ACCEPTED, STATUS_REJECTED, STATUS_FAILED])
+        print(f"✓ 重新排队已完成的节点对: {requeued}")
+
+    stats = queue.stats()
+    print(f"✓ 新入队 {added} 对，队列共 {stats['total']} 对")
+    print(f"   待处理: {stats['pending']} | 处理中: {stats['running']} | "
+          f"已接受: {stats['accepted']} | 已拒绝: {stats['rejected']} | 失败: {stats['failed']}")
     print()
-    
-    # 输出和进度文件
-    output_dir = Config.OUTPUT_DIR / "full_cartesian"
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
-    output_file = output_dir / "cross_domain_edges.json"
-    progress_file = output_dir / "progress.json"
-    
-    # 加载进度
-    progress = load_progress(progress_file)
-    completed_pairs = set(tuple(p) for p in progress.get("completed_pairs", []))
-    last_index = progress.get("last_index", 0)
-    total_valid = progress.get("total_valid", 0)
-    
-    if completed_pairs:
-        print(f"📂 发现已有进度:")
-        print(f"   已完成: {len(completed_pairs)} 对")
-        print(f"   有效边: {total_valid} 条")
-        print(f"   继续从第 {last_index + 1} 对开始...")
-        print()
-    
-    # 创建聊天室
+
+    # 创建聊天室（每个 worker 写自己的边文件，避免并发写同一文件）
     print("🎯 创建聊天室...")
     physics_agent = PhysicsAgent()
     math_agent = MathAgent()
-    
+
+    # 跨运行结果缓存：节点内容和提示词未变的节点对不再重复讨论
+    outcome_cache = PairOutcomeCache(
+        Config.OUTPUT_DIR / "pair_outcomes.sqlite",
+        prompt_version=PROMPT_TEMPLATE_VERSION
+    )
+
+    # 候选级联（可选）：先在历史样本上估计召回损失
+    cascade = recall_loss = None
+    if args.cascade:
+        from processors.semantic_processor import SemanticProcessor
+        cascade = PairCascade.from_semantic_processor(
+            SemanticProcessor(backend=args.embedding_backend), physics_graph, math_graph
+        )
+        labelled = collect_outcomes(Config.OUTPUT_DIR)
+        if labelled:
+            recall_loss = cascade.estimate_recall_loss(
+                labelled, physics_index.by_id, math_index.by_id, max_samples=args.recall_sample
+            )
+            cascade.print_recall_loss(recall_loss)
+        else:
+            print("⚠️  没有历史运行的带标签样本，无法估计级联召回损失")
+
+    worker_output_file = output_dir / "workers" / f"cross_domain_edges.{args.worker_id}.json"
+    # 完整讨论记录（压缩存储，可按节点对随机读取，用于离线重新评分）
+    transcript_store = TranscriptStore(output_dir / "transcripts" / f"transcripts.{args.worker_id}.bin")
+    # 对话检查点（所有 worker 共享，租约被回收的节点对可由其他 worker 从断点继续）
+    checkpoint_store = DialogueCheckpointStore(
+        output_dir / "checkpoints",
+        prompt_version=PROMPT_TEMPLATE_VERSION
+    )
     chatroom = NodePairChatroom(
         physics_agent=physics_agent,
         math_agent=math_agent,
         physics_graph=physics_graph,
         math_graph=math_graph,
-        output_file=output_file
+        output_file=worker_output_file,
+        cascade=cascade,
+        outcome_cache=outcome_cache,
+        transcript_store=transcript_store,
+        checkpoint_store=checkpoint_store
     )
-    
+
     print()
     print("="*70)
-    print("开始全遍历讨论")
+    print(f"开始全遍历讨论 (worker: {args.worker_id})")
     print("="*70)
     print()
-    
+
     # 统计信息
     start_time = time.time()
-    valid_count = total_valid
-    skipped_count = len(completed_pairs)
-    
-    # 遍历所有节点对
-    for i, (physics_id, math_id) in enumerate(all_pairs):
-        # 跳过已完成的
-        if (physics_id, math_id) in completed_pairs:
-            continue
-        
-        # 如果从中断恢复，跳过到上次的位置
-        if i < last_index:
-            continue
-        
-        # 显示进度
-        progress_pct = (i + 1) / total_pairs * 100
-        elapsed = time.time() - start_time
-        avg_time_per_pair = elapsed / (i - skipped_count + 1) if (i - skipped_count) > 0 else 0
-        eta_seconds = avg_time_per_pair * (total_pairs - i - 1)
-        
-        print(f"\n{'='*70}")
-        print(f"进度: {i + 1}/{total_pairs} ({progress_pct:.2f}%)")
-        print(f"已完成: {i - skipped_count + 1} 对 | 有效边: {valid_count} 条")
-        print(f"平均耗时: {avg_time_per_pair:.2f}秒/对")
-        print(f"预计剩余: {eta_seconds/60:.1f}分钟")
-        print(f"{'='*70}")
-        
-        # 讨论节点对
-        try:
-            edge = chatroom.discuss_node_pair(
-                physics_node_id=physics_id,
-                math_node_id=math_id,
-                context_depth=1
-            )
-            
-            if edge:
-                valid_count += 1
-                print(f"✓ 生成有效边 ({valid_count})")
-            else:
-                print(f"○ 未生成边")
-            
-            # 记录完成
-            completed_pairs.add((physics_id, math_id))
-            
-            # 每10对保存一次进度
-            if (i + 1) % 10 == 0:
-                progress = {
-                    "completed_pairs": list(completed_pairs),
-                    "last_index": i,
-                    "total_valid": valid_count,
-                    "total_pairs": total_pairs,
-                    "progress_percentage": progress_pct
-                }
-                save_progress(progress_file, progress)
-                print(f"💾 进度已保存")
-        
-        except KeyboardInterrupt:
-            print("\n\n⚠️  检测到中断信号，保存进度...")
-            progress = {
-                "completed_pairs": list(completed_pairs),
-                "last_index": i,
-                "total_valid": valid_count,
-                "total_pairs": total_pairs,
-                "progress_percentage": progress_pct
-            }
-            save_progress(progress_file, progress)
-            print(f"✓ 进度已保存到: {progress_file}")
-            print(f"✓ 下次运行将从第 {i + 1} 对继续")
-            return
-        
-        except Exception as e:
-            print(f"✗ 处理失败: {e}")
-            # 继续处理下一对
-            continue
-    
+    processed_count = 0
+    valid_count = 0
+
+    try:
+        while True:
+            batch = queue.lease(args.worker_id, n=args.batch_size)
+            if not batch:
+                break
+
+            for physics_id, math_id in batch:
+                # 显示进度
+                stats = queue.stats()
+                done = stats["accepted"] + stats["rejected"] + stats["failed"]
+                progress_pct = done / stats["total"] * 100
+                elapsed = time.time() - start_time
+                avg_time_per_pair = elapsed / processed_count if processed_count else 0
+                eta_seconds = avg_time_per_pair * stats["pending"]
+
+                print(f"\n{'='*70}")
+                print(f"进度: {done}/{stats['total']} ({progress_pct:.2f}%) | 处理中: {stats['running']}")
+                print(f"本 worker 已完成: {processed_count} 对 | 有效边: {valid_count} 条")
+                print(f"平均耗时: {avg_time_per_pair:.2f}秒/对")
+                print(f"预计剩余（单 worker）: {eta_seconds/60:.1f}分钟")
+                print(f"{'='*70}")
+
+                # 讨论节点对（讨论期间后台续约）
+                try:
+                    with queue.keep_alive(args.worker_id):
+                        edge = chatroom.discuss_node_pair(
+                            physics_node_id=physics_id,
+                            math_node_id=math_id,
+                            context_depth=1
+                        )
+
+                    if chatroom.last_error:
+                        # 提取 / 评估调用出错：按失败处理，节点对重新排队并从检查点重试
+                        status = queue.fail(physics_id, math_id, args.worker_id, chatroom.last_error)
+                        print(f"✗ 未得出结论 ({status}): {chatroom.last_error}")
+                        continue
+
+                    if edge:
+                        valid_count += 1
+                        print(f"✓ 生成有效边 ({valid_count})")
+                    else:
+                        print(f"○ 未生成边")
+
+                    # 被级联筛选跳过的节点对记下原因，训练产出模型时不当作负样本
+                    result = edge if edge else ({"pruned": chatroom.last_pruned} if chatroom.last_pruned else None)
+                    if not queue.complete(physics_id, math_id, args.worker_id, edge is not None, result):
+                        print(f"⚠️  租约已失效，结果可能已由其他 worker 记录")
+                    processed_count += 1
+
+                except Exception as e:
+                    status = queue.fail(physics_id, math_id, args.worker_id, str(e))
+                    print(f"✗ 处理失败 ({status}): {e}")
+                    # 继续处理下一对
+                    continue
+
+            # 每个批次后更新进度快照
+            save_progress(progress_file, build_progress(queue))
+
+    except KeyboardInterrupt:
+        print("\n\n⚠️  检测到中断信号，释放租约...")
+        released = queue.release(args.worker_id)
+        transcript_store.close()
+        save_progress(progress_file, build_progress(queue))
+        if cascade:
+            cascade.save_report(output_dir / f"cascade_report.{args.worker_id}.json", recall_loss)
+        print(f"✓ 已释放 {released} 个节点对，其他 worker 或下次运行将继续处理")
+        return
+
     # 最终保存
-    progress = {
-        "completed_pairs": list(completed_pairs),
-        "last_index": len(all_pairs) - 1,
-        "total_valid": valid_count,
-        "total_pairs": total_pairs,
-        "progress_percentage": 100.0,
-        "status": "completed"
-    }
+    transcript_store.close()
+    progress = build_progress(queue)
+    if progress["queue"]["pending"] == 0 and progress["queue"]["running"] == 0:
+        progress["status"] = "completed"
     save_progress(progress_file, progress)
-    
+
     # 显示最终统计
     total_time = time.time() - start_time
-    
+    stats = progress["queue"]
+
     print("\n" + "="*70)
-    print("🎉 全遍历完成！")
+    print("🎉 本 worker 已无可领取的节点对")
     print("="*70)
     print()
-    print(f"总节点对数: {total_pairs}")
-    print(f"已处理: {len(completed_pairs)}")
-    print(f"生成有效边: {valid_count}")
-    print(f"有效率: {valid_count/len(completed_pairs)*100:.2f}%")
+    print(f"总节点对数: {stats['total']}")
+    print(f"已接受: {stats['accepted']} | 已拒绝: {stats['rejected']} | "
+          f"失败: {stats['failed']} | 处理中: {stats['running']}")
+    print(f"本 worker 处理: {processed_count}，生成有效边: {valid_count}")
+    cache_stats = outcome_cache.stats()
+    print(f"历史结果缓存: 命中 {cache_stats['hits']} 对，新讨论 {cache_stats['misses']} 对")
+    if cascade:
+        cascade.print_report()
+        cascade.save_report(output_dir / f"cascade_report.{args.worker_id}.json", recall_loss)
+    print(f"未完成的对话检查点: {checkpoint_store.pending_count()}")
+    if processed_count:
+        print(f"本 worker 有效率: {valid_count/processed_count*100:.2f}%")
     print(f"总耗时: {total_time/3600:.2f}小时")
     print()
-    print(f"结果文件: {output_file}")
-    print(f"进度文件: {progress_file}")
+    print(f"本 worker 结果文件: {worker_output_file}")
+    print(f"本 worker 讨论记录: {transcript_store.path}")
+    print(f"队列数据库: {queue.db_path}")
+    print(f"合并导出: python examples/full_cartesian_discussion.py --export")
     print()
 
 
-def resume_from_progress():
-    """从进度文件恢复运行"""
-    print("尝试从进度恢复...")
-    main()
-
-
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) > 1 and sys.argv[1] == "--resume":
-        resume_from_progress()
-    else:
-        main()
-
+    main()
@@ -0,0 +1,193 @@
+"""
+图谱增量更新
+
+图谱文件修改后，只重新计算受影响的下游结果，而不是全部重跑：
+
+1. 与上一次运行保存的内容清单（output/incremental/<领域>_<步骤>_manifest.json）比较，得到新增 / 删除 / 修改的节点和边。
+   每个下游步骤有自己的清单，只在该步骤实际执行后才更新；被跳过的步骤（--skip-embeddings、
+   未加 --clear-stale-tags、没有任务队列）下次运行时仍会看到这些变化
+2. 向量：按节点文本哈希缓存，只有新增或修改的节点会调用嵌入 API
+3. 相似度矩阵：复制未变节点的单元格，只重算变化节点所在的行和列
+4. 布鲁姆标签：列出内容已修改的节点（--clear-stale-tags 清除其旧标签，便于按“未标注”筛选重新标注）
+5. 节点对任务队列：删除涉及已删除节点的节点对，重置涉及修改节点的节点对，为新增节点加入新的节点对
+
+    python examples/incremental_update.py --dry-run
+    python examples/incremental_update.py --embedding-backend local --clear-stale-tags
+"""
+import sys
+from pathlib import Path
+import argparse
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from core.graph_diff import graph_manifest, load_manifest, save_manifest, diff_manifests
+from core.graph_index import load_graph_index
+from core.pair_queue import PairQueue
+from config import Config
+
+
+DOMAINS = ("physics", "math")
+STAGES = ("embeddings", "tags", "queue")
+
+
+def manifest_path(state_dir: Path, domain: str, stage: str) -> Path:
+    """某个领域、某个下游步骤的内容清单路径"""
+    return state_dir / f"{domain}_{stage}_manifest.json"
+
+
+def save_manifests(state_dir: Path, stage: str, manifests):
+    """下游步骤完成后保存其内容清单"""
+    for domain in DOMAINS:
+        save_manifest(manifest_path(state_dir, domain, stage), manifests[domain])
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """解析命令行参数"""
+    dataset_dir = Path(__file__).parent.parent / "dataset" / "graph"
+    parser = argparse.ArgumentParser(description="图谱修改后增量更新下游结果")
+    parser.add_argument("--physics-graph", default=str(dataset_dir / "physics_knowledge_graph_new.json"))
+    parser.add_argument("--math-graph", default=str(dataset_dir / "math_knowledge_graph_new.json"))
+    parser.add_argument("--state-dir", default=str(Config.OUTPUT_DIR / "incremental"),
+                        help="保存内容清单的目录")
+    parser.add_argument("--similarity-file", default=str(Config.OUTPUT_DIR / "similarity_matrix.npz"),
+                        help="相似度矩阵文件")
+    parser.add_argument("--queue", default=str(Config.OUTPUT_DIR / "full_cartesian" / "pair_queue.sqlite"),
+                        help="笛卡尔积讨论的任务队列（不存在时跳过）")
+    parser.add_argument("--embedding-backend", choices=["gemini", "openai", "local"], default=None,
+                        help="嵌入后端，local 为无需网络的本地模型（默认 Gemini）")
+    parser.add_argument("--skip-embeddings", action="store_true",
+                        help="不更新向量和相似度矩阵")
+    parser.add_argument("--clear-stale-tags", action="store_true",
+                        help="清除内容已修改节点的布鲁姆标签")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="只显示差异，不做任何修改")
+    return parser.parse_args(argv)
+
+
+def update_embeddings(graphs, diffs, similarity_file: str, backend=None):
+    """更新两个领域的向量，并增量更新相似度矩阵"""
+    from processors.semantic_processor import SemanticProcessor
+    print("\n🧮 更新向量与相似度矩阵...")
+    processor = SemanticProcessor(backend=backend)
+    physics_embeddings = processor.generate_node_embeddings(graphs["physics"], "physics")
+    math_embeddings = processor.generate_node_embeddings(graphs["math"], "math")
+    Path(similarity_file).parent.mkdir(parents=True, exist_ok=True)
+    processor.update_similarity_matrix(
+        physics_embeddings, math_embeddings,
+        changed_physics=diffs["physics"].changed_nodes,
+        changed_math=diffs["math"].changed_nodes,
+        previous_file=similarity_file
+    )
+
+
+def update_tags(paths, graphs, diffs, clear: bool):
+    """列出（并可清除）内容已修改节点的布鲁姆标签"""
+    from tools.bloom_taxonomy_tools import clear_bloom_tags
+    print("\n🏷️  布鲁姆标签...")
+    for domain in DOMAINS:
+        stale = diffs[domain].modified_nodes
+        added = set(diffs[domain].added_nodes)
+        untagged = [node['id'] for node in graphs[domain]['nodes']
+                    if node['id'] in added and not (node.get('properties') or {}).get('bloom_level')]
+        print(f"   {domain}: {len(stale)} 个已修改节点需要复核，{len(untagged)} 个新增节点待标注")
+        if clear and stale:
+            result = clear_bloom_tags(str(paths[domain]), stale)
+            print(f"   {'✓' if result['success'] else '✗'} {result['message']}")
+
+
+def update_queue(queue_path: Path, graphs, diffs):
+    """同步节点对任务队列"""
+    print(f"\n📋 更新任务队列: {queue_path}")
+    queue = PairQueue(queue_path)
+    physics_diff, math_diff = diffs["physics"], diffs["math"]
+
+    removed = queue.remove_nodes(physics_diff.removed_nodes, math_diff.removed_nodes)
+    reset = queue.reset_nodes(physics_diff.modified_nodes, math_diff.modified_nodes)
+
+    # 新增节点与另一侧全部节点组成的节点对
+    physics_ids = [node['id'] for node in graphs["physics"]['nodes']]
+    math_ids = [node['id'] for node in graphs["math"]['nodes']]
+    added_physics = set(physics_diff.added_nodes)
+
+    def new_pairs():
+        for physics_id in physics_diff.added_nodes:
+            for math_id in math_ids:
+                yield physics_id, math_id
+        for math_id in math_diff.added_nodes:
+            for physics_id in physics_ids:
+                if physics_id not in added_physics:
+                    yield physics_id, math_id
+
+    added = queue.enqueue_pairs(new_pairs())
+    queue.close()
+    print(f"   ✓ 删除 {removed} 对，重置 {reset} 对，新增 {added} 对")
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    paths = {"physics": Path(args.physics_graph), "math": Path(args.math_graph)}
+    state_dir = Path(args.state_dir)
+
+    print("="*70)
+    print("图谱增量更新")
+    print("="*70)
+
+    graphs, manifests = {}, {}
+    for domain in DOMAINS:
+        graphs[domain] = load_graph_index(paths[domain]).graph
+        manifests[domain] = graph_manifest(graphs[domain])
+
+    # 每个步骤与自己上次完成时的清单比较
+    diffs = {stage: {} for stage in STAGES}
+    for stage in STAGES:
+        for domain in DOMAINS:
+            previous = load_manifest(manifest_path(state_dir, domain, stage))
+            diffs[stage][domain] = diff_manifests(previous, manifests[domain])
+            first = "（首次运行，视为全部新增）" if previous is None else ""
+            print(f"📊 {stage:<10} {domain}: {diffs[stage][domain].summary()}{first}")
+
+    if all(diff.is_empty for stage_diffs in diffs.values() for diff in stage_diffs.values()):
+        print("\n✓ 图谱没有变化，无需更新")
+        return
+    if args.dry_run:
+        for stage in STAGES:
+            for domain in DOMAINS:
+                diff = diffs[stage][domain]
+                for label, ids in (("新增", diff.added_nodes), ("删除", diff.removed_nodes), ("修改", diff.modified_nodes)):
+                    if ids:
+                        print(f"   {stage} {domain} {label}: {', '.join(ids[:10])}{' ...' if len(ids) > 10 else ''}")
+        return
+
+    def pending(stage):
+        return not all(diff.is_empty for diff in diffs[stage].values())
+
+    if args.skip_embeddings:
+        if pending("embeddings"):
+            print("\n🧮 跳过向量与相似度矩阵（变化保留到下次运行）")
+    elif pending("embeddings"):
+        update_embeddings(graphs, diffs["embeddings"], args.similarity_file, args.embedding_backend)
+        save_manifests(state_dir, "embeddings", manifests)
+
+    if pending("tags"):
+        update_tags(paths, graphs, diffs["tags"], args.clear_stale_tags)
+        stale = any(diff.modified_nodes for diff in diffs["tags"].values())
+        if args.clear_stale_tags or not stale:
+            save_manifests(state_dir, "tags", manifests)
+        else:
+            print("   （未清除旧标签，下次运行仍会列出这些节点）")
+
+    queue_path = Path(args.queue)
+    if pending("queue"):
+        if queue_path.exists():
+            update_queue(queue_path, graphs, diffs["queue"])
+            save_manifests(state_dir, "queue", manifests)
+        else:
+            print(f"\n📋 未找到任务队列 {queue_path}，跳过（变化保留到下次运行）")
+
+    print(f"\n✓ 内容清单目录: {state_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from core.node_pair_chatroom import NodePairChatroom
+from core.graph_index import load_graph_index
 from agents import PhysicsAgent, MathAgent
 from config import Config
 import json
@@ -44,10 +45,8 @@ def main():
     print("📊 加载知识图谱...\n")
     
     # 加载图谱
-    with open(physics_graph_path, 'r', encoding='utf-8') as f:
-        physics_graph = json.load(f)
-    with open(math_graph_path, 'r', encoding='utf-8') as f:
-        math_graph = json.load(f)
+    physics_graph = load_graph_index(physics_graph_path).graph
+    math_graph = load_graph_index(math_graph_path).graph
     
     print(f"✓ 物理图谱: {len(physics_graph['nodes'])} 节点")
     print(f"✓ 数学图谱: {len(math_graph['nodes'])} 节点")
@@ -147,10 +146,8 @@ def demonstrate_single_pair():
     # 简化：只讨论一对
     dataset_dir = Path(__file__).parent.parent / "dataset" / "graph"
     
-    with open(dataset_dir / "physics_knowledge_graph_new.json", 'r') as f:
-        physics_graph = json.load(f)
-    with open(dataset_dir / "math_knowledge_graph_new.json", 'r') as f:
-        math_graph = json.load(f)
+    physics_graph = load_graph_index(dataset_dir / "physics_knowledge_graph_new.json").graph
+    math_graph = load_graph_index(dataset_dir / "math_knowledge_graph_new.json").graph
     
     physics_agent = PhysicsAgent()
     math_agent = MathAgent()
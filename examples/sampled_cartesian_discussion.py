@@ -5,66 +5,43 @@
 1. 随机采样N对
 2. 基于关键词匹配采样
 3. 基于主题筛选采样
+4. 语义相似且多样化的采样（MMR，限制单节点和单主题的配额）
 """
 import sys
 from pathlib import Path
-import json
-import random
 
 # 添加项目根目录到路径
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from core.node_pair_chatroom import NodePairChatroom
+from core.pair_space import PairSpace
+from core.graph_index import GraphIndex, load_graph_index
+from core.text_index import TextIndex, keyword_pairs
 from agents import PhysicsAgent, MathAgent
 from config import Config
 
 
-def random_sample(math_nodes, physics_nodes, n=100):
-    """随机采样N对"""
+def random_sample(math_nodes, physics_nodes, n=100, seed=None):
+    """随机采样N对（按下标采样，不展开全部节点对）"""
     print(f"🎲 随机采样 {n} 对节点...")
     
-    all_pairs = [
-        (p['id'], m['id'])
-        for m in math_nodes
-        for p in physics_nodes
-    ]
-    
-    sampled = random.sample(all_pairs, min(n, len(all_pairs)))
+    space = PairSpace([p['id'] for p in physics_nodes], [m['id'] for m in math_nodes])
+    sampled = space.sample(n, seed=seed)
     print(f"✓ 采样完成: {len(sampled)} 对")
     return sampled
 
 
 def keyword_based_sample(math_nodes, physics_nodes, keywords, max_pairs=200):
-    """基于关键词匹配采样"""
+    """基于关键词匹配采样（倒排索引查找命中节点，再按数学节点合并，不遍历全部节点对）"""
     print(f"🔍 基于关键词采样: {keywords}")
     
-    pairs = []
-    
-    for math_node in math_nodes:
-        math_desc = math_node.get('properties', {}).get('description', '')
-        math_label = math_node.get('label', '')
-        
-        for physics_node in physics_nodes:
-            physics_desc = physics_node.get('properties', {}).get('description', '')
-            physics_label = physics_node.get('label', '')
-            
-            # 检查是否包含关键词
-            has_keyword = False
-            for keyword in keywords:
-                if (keyword in math_desc or keyword in math_label) and \
-                   (keyword in physics_desc or keyword in physics_label):
-                    has_keyword = True
-                    break
-            
-            if has_keyword:
-                pairs.append((physics_node['id'], math_node['id']))
-                
-                if len(pairs) >= max_pairs:
-                    break
-        
-        if len(pairs) >= max_pairs:
-            break
+    physics_text = TextIndex(physics_nodes)
+    math_text = TextIndex(math_nodes)
+    pairs = [
+        (physics_nodes[p]['id'], math_nodes[m]['id'])
+        for p, m in keyword_pairs(physics_text, math_text, keywords, max_pairs)
+    ]
     
     print(f"✓ 找到 {len(pairs)} 对包含关键词的节点")
     return pairs
@@ -76,25 +53,9 @@ def theme_based_sample(math_nodes, physics_nodes, math_themes, physics_themes):
     print(f"   数学主题: {math_themes}")
     print(f"   物理主题: {physics_themes}")
     
-    # 筛选数学节点
-    filtered_math = []
-    for node in math_nodes:
-        props = node.get('properties', {})
-        theme = props.get('theme', '')
-        category = props.get('category', '')
-        
-        if any(t in theme or t in category for t in math_themes):
-            filtered_math.append(node)
-    
-    # 筛选物理节点
-    filtered_physics = []
-    for node in physics_nodes:
-        props = node.get('properties', {})
-        theme = props.get('theme', '')
-        category = props.get('category', '')
-        
-        if any(t in theme or t in category for t in physics_themes):
-            filtered_physics.append(node)
+    # 按 theme / category 的取值筛选节点
+    filtered_math = [math_nodes[i] for i in GraphIndex({'nodes': math_nodes}).match_themes(math_themes)]
+    filtered_physics = [physics_nodes[i] for i in GraphIndex({'nodes': physics_nodes}).match_themes(physics_themes)]
     
     print(f"✓ 筛选后: {len(filtered_math)} 个数学节点, {len(filtered_physics)} 个物理节点")
     
@@ -109,6 +70,32 @@ def theme_based_sample(math_nodes, physics_nodes, math_themes, physics_themes):
     return pairs
 
 
+def diverse_sample(physics_graph, math_graph, n=100, max_per_node=3, theme_quota=20):
+    """语义相似度 + 多样性采样（MMR），避免大量节点对集中在少数枢纽节点上"""
+    from processors.semantic_processor import SemanticProcessor
+    print(f"🧭 多样化采样 {n} 对节点 (单节点上限 {max_per_node}，单主题上限 {theme_quota})...")
+    
+    processor = SemanticProcessor()
+    physics_embeddings = processor.generate_node_embeddings(physics_graph, "physics")
+    math_embeddings = processor.generate_node_embeddings(math_graph, "math")
+    similarity, physics_ids, math_ids = processor.calculate_similarity_matrix(physics_embeddings, math_embeddings)
+    
+    pairs = processor.get_diverse_pairs(
+        similarity, physics_ids, math_ids,
+        top_k=n,
+        min_similarity=0.3,
+        physics_embeddings=physics_embeddings,
+        math_embeddings=math_embeddings,
+        max_per_physics=max_per_node,
+        max_per_math=max_per_node,
+        physics_graph=physics_graph,
+        math_graph=math_graph,
+        quotas={"theme": theme_quota, "category": theme_quota}
+    )
+    print(f"✓ 采样完成: {len(pairs)} 对")
+    return [(p, m) for p, m, _ in pairs]
+
+
 def main():
     """主函数"""
     # 验证配置
@@ -126,10 +113,8 @@ def main():
     # 加载图谱
     dataset_dir = Path(__file__).parent.parent / "dataset" / "graph"
     
-    with open(dataset_dir / "physics_knowledge_graph_new.json", 'r') as f:
-        physics_graph = json.load(f)
-    with open(dataset_dir / "math_knowledge_graph_new.json", 'r') as f:
-        math_graph = json.load(f)
+    physics_graph = load_graph_index(dataset_dir / "physics_knowledge_graph_new.json").graph
+    math_graph = load_graph_index(dataset_dir / "math_knowledge_graph_new.json").graph
     
     math_nodes = math_graph['nodes']
     physics_nodes = physics_graph['nodes']
@@ -146,9 +131,10 @@ def main():
     print("2. 基于关键词采样")
     print("3. 基于主题筛选")
     print("4. 自定义")
+    print("5. 语义多样化采样100对（需要嵌入 API）")
     print()
     
-    choice = input("请输入选项 (1-4，默认1): ").strip() or "1"
+    choice = input("请输入选项 (1-5，默认1): ").strip() or "1"
     
     node_pairs = []
     output_suffix = ""
@@ -173,6 +159,10 @@ def main():
         node_pairs = random_sample(math_nodes, physics_nodes, n=n)
         output_suffix = f"custom_{n}"
     
+    elif choice == "5":
+        node_pairs = diverse_sample(physics_graph, math_graph, n=100)
+        output_suffix = "diverse_100"
+    
     if not node_pairs:
         print("✗ 未生成节点对")
         return
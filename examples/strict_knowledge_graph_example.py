@@ -7,6 +7,7 @@
 3. 输出纯边的JSON（节点ID到节点ID）
 """
 from core.chatroom import StrictKnowledgeGraphChatroom
+from core.graph_index import load_graph_index
 from agents import PhysicsAgent, MathAgent
 from processors import KnowledgeGraphProcessor
 from config import Config
@@ -42,10 +43,8 @@ def main():
     print("📊 加载知识图谱数据...\n")
     
     # 加载图谱
-    with open(physics_graph_path, 'r', encoding='utf-8') as f:
-        physics_graph = json.load(f)
-    with open(math_graph_path, 'r', encoding='utf-8') as f:
-        math_graph = json.load(f)
+    physics_graph = load_graph_index(physics_graph_path).graph
+    math_graph = load_graph_index(math_graph_path).graph
     
     print(f"✓ 物理图谱: {len(physics_graph['nodes'])} 节点, {len(physics_graph['edges'])} 边")
     print(f"✓ 数学图谱: {len(math_graph['nodes'])} 节点, {len(math_graph['edges'])} 边")
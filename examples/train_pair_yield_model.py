@@ -0,0 +1,94 @@
+"""
+训练节点对产出预测模型
+
+从 output/ 下历史运行的边文件、任务队列、进度文件和讨论记录中收集带标签的节点对，
+训练本地逻辑回归模型，在留出集上报告精确率/召回率，并保存模型供驱动脚本使用：
+
+    python examples/train_pair_yield_model.py --target-recall 0.9
+    python examples/budgeted_cartesian_discussion.py --token-budget 2000000 \
+        --yield-model output/models/pair_yield_model.npz
+"""
+import sys
+from pathlib import Path
+import argparse
+import json
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from core.pair_scheduler import PairFeaturizer
+from core.pair_yield_model import collect_outcomes, train_and_evaluate
+from core.graph_index import load_graph_index
+from core.atomic_io import atomic_write_text
+from config import Config
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="训练节点对产出预测模型")
+    parser.add_argument("--target-recall", type=float, default=0.9,
+                        help="校准跳过阈值时的目标召回率")
+    parser.add_argument("--use-embeddings", action="store_true",
+                        help="使用 SemanticProcessor 嵌入作为特征")
+    parser.add_argument("--embedding-backend", choices=["gemini", "openai", "local"], default=None,
+                        help="嵌入后端，local 为无需网络的本地模型（默认 Gemini）")
+    parser.add_argument("--output", default=str(Config.OUTPUT_DIR / "models" / "pair_yield_model.npz"),
+                        help="模型输出路径")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+
+    print("="*70)
+    print("训练节点对产出预测模型")
+    print("="*70)
+    print()
+
+    # 收集历史运行结果（模型调用出错、未得出结论的节点对不作为负样本）
+    samples = collect_outcomes(Config.OUTPUT_DIR)
+    positives = sum(1 for s in samples if s[2])
+    print(f"📊 带标签节点对: {len(samples)}（正样本 {positives}）")
+    print(f"   来源目录: {Config.OUTPUT_DIR}")
+
+    if positives < 5 or len(samples) - positives < 5:
+        print("✗ 样本过少，请先运行几次节点对讨论")
+        return
+
+    # 加载图谱
+    dataset_dir = Path(__file__).parent.parent / "dataset" / "graph"
+    physics_graph = load_graph_index(dataset_dir / "physics_knowledge_graph_new.json").graph
+    math_graph = load_graph_index(dataset_dir / "math_knowledge_graph_new.json").graph
+
+    physics_embeddings = math_embeddings = None
+    if args.use_embeddings:
+        from processors.semantic_processor import SemanticProcessor
+        processor = SemanticProcessor(backend=args.embedding_backend)
+        physics_embeddings = processor.generate_node_embeddings(physics_graph, "physics")
+        math_embeddings = processor.generate_node_embeddings(math_graph, "math")
+
+    featurizer = PairFeaturizer(physics_graph, math_graph, physics_embeddings, math_embeddings)
+    model, report = train_and_evaluate(
+        samples,
+        featurizer,
+        target_recall=args.target_recall,
+        use_embedding_product=args.use_embeddings
+    )
+
+    model_path = model.save(Path(args.output))
+    report_path = model_path.with_suffix(".report.json")
+    atomic_write_text(report_path, json.dumps(report, ensure_ascii=False, indent=2))
+
+    holdout = report["holdout"]
+    print()
+    print(f"✓ 校准跳过阈值: {model.threshold:.4f}（目标召回率 {args.target_recall}）")
+    print(f"✓ 留出集: 精确率 {holdout['precision']:.3f} | 召回率 {holdout['recall']:.3f} | "
+          f"跳过比例 {holdout['skip_rate']*100:.1f}% | AUC {holdout['auc']:.3f}")
+    print(f"✓ 模型: {model_path}")
+    print(f"✓ 报告: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+ANN Index Benchmark
+Build time, query throughput and recall@k of the available ANN backends
+(hnswlib / faiss / pure-numpy IVF) against exact brute-force search
+
+    python experiments/benchmark_ann_index.py
+    python experiments/benchmark_ann_index.py --size 50000 --k 20 --nprobe 16
+"""
+
+import sys
+import time
+import argparse
+import contextlib
+import io
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from processors.embedding_table import EmbeddingTable
+from processors.ann_index import AnnIndex, available_backends, exact_topk, recall_at_k
+
+
+def clustered_table(size: int, dim: int, clusters: int, seed: int, prefix: str) -> EmbeddingTable:
+    """Random vectors around cluster centres (closer to real embeddings than uniform noise)"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    vectors = centres[labels] + 1.5 * rng.standard_normal((size, dim)).astype(np.float32)
+    return EmbeddingTable([f"{prefix}{i}" for i in range(size)], vectors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ANN backends")
+    parser.add_argument("--size", type=int, default=20000, help="Indexed (math) node count")
+    parser.add_argument("--queries", type=int, default=2000, help="Query (physics) node count")
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=8, help="IVF lists scanned per query")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    base = clustered_table(args.size, args.dim, args.clusters, args.seed, "m")
+    queries = clustered_table(args.queries, args.dim, args.clusters, args.seed, "p").matrix
+
+    start = time.time()
+    exact_topk(base, queries, args.k)
+    exact_time = time.time() - start
+
+    print(f"\n{args.queries} queries against {args.size} vectors (dim={args.dim}, k={args.k})")
+    print("=" * 70)
+    print(f"{'Backend':<12}{'Build (s)':>12}{'Query (s)':>12}{'Queries/s':>12}{'Recall@k':>12}")
+    print("=" * 70)
+    print(f"{'exact':<12}{'-':>12}{exact_time:>12.3f}{args.queries / exact_time:>12.0f}{1.0:>12.3f}")
+
+    for backend in available_backends():
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.time()
+            index = AnnIndex(base, backend, nprobe=args.nprobe).build()
+            build_time = time.time() - start
+            start = time.time()
+            index.query(queries, args.k)
+            query_time = time.time() - start
+            recall = recall_at_k(index, queries, args.k, sample=len(queries))
+        print(f"{backend:<12}{build_time:>12.3f}{query_time:>12.3f}"
+              f"{args.queries / query_time:>12.0f}{recall:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Embedding Throughput Benchmark
+Compares the per-node embedding loop with batched, concurrent embedding
+in SemanticProcessor (nodes/second)
+
+By default a simulated OpenAI-style client with fixed per-request latency is
+used, so the benchmark runs offline and measures round-trip savings only:
+
+    python experiments/benchmark_embedding_batching.py
+    python experiments/benchmark_embedding_batching.py --latency 0.3 --failure-rate 0.05
+
+With --live the real embedding API is called (costs tokens):
+
+    python experiments/benchmark_embedding_batching.py --live --limit 100
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from processors.semantic_processor import SemanticProcessor
+
+
+class SimulatedEmbeddingClient:
+    """
+    OpenAI-shaped embeddings client with a fixed round-trip latency,
+    a small per-input cost and optional random request failures
+    """
+
+    def __init__(self, latency: float, per_item: float, failure_rate: float, dim: int = 256, seed: int = 0):
+        self.latency = latency
+        self.per_item = per_item
+        self.failure_rate = failure_rate
+        self.dim = dim
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.embeddings = SimpleNamespace(create=self._create)
+
+    def _create(self, model: str, input):
+        texts = [input] if isinstance(input, str) else list(input)
+        with self._lock:
+            self.requests += 1
+            fail = self._rng.random() < self.failure_rate
+        time.sleep(self.latency + self.per_item * len(texts))
+        if fail:
+            raise RuntimeError("simulated transient API error")
+
+        data = []
+        for i, text in enumerate(texts):
+            rng = random.Random(hash(text))
+            data.append(SimpleNamespace(index=i, embedding=[rng.random() for _ in range(self.dim)]))
+        return SimpleNamespace(data=data)
+
+
+def load_texts(limit: int):
+    """Load node texts from both knowledge graphs"""
+    dataset_dir = Path(__file__).parent.parent / "dataset" / "graph"
+    nodes = []
+    for name in ["physics_knowledge_graph_new.json", "math_knowledge_graph_new.json"]:
+        with open(dataset_dir / name, 'r', encoding='utf-8') as f:
+            nodes.extend(json.load(f)['nodes'])
+    return nodes[:limit] if limit else nodes
+
+
+def run_per_node(processor: SemanticProcessor, texts):
+    """Baseline: one request per node, sequentially"""
+    start = time.time()
+    ok = 0
+    for text in texts:
+        try:
+            processor.get_embedding(text)
+            ok += 1
+        except Exception:
+            pass
+    return time.time() - start, ok
+
+
+def run_batched(processor: SemanticProcessor, texts):
+    """Batched, concurrent dispatch with retry"""
+    start = time.time()
+    vectors = processor.embed_texts(texts)
+    return time.time() - start, sum(1 for v in vectors if v is not None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched embedding generation")
+    parser.add_argument("--live", action="store_true", help="Call the real embedding API")
+    parser.add_argument("--use-gemini", action="store_true", help="Use Gemini instead of OpenAI with --live")
+    parser.add_argument("--limit", type=int, default=0, help="Number of nodes (0 = all)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.15, help="Simulated round-trip latency (s)")
+    parser.add_argument("--per-item", type=float, default=0.002, help="Simulated per-input cost (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Simulated request failure rate")
+    args = parser.parse_args()
+
+    nodes = load_texts(args.limit)
+
+    if args.live:
+        processor = SemanticProcessor(
+            use_gemini=args.use_gemini,
+            batch_size=args.batch_size,
+            max_workers=args.max_workers
+        )
+        client = None
+    else:
+        client = SimulatedEmbeddingClient(args.latency, args.per_item, args.failure_rate)
+        processor = SemanticProcessor(
+            use_gemini=False,
+            batch_size=args.batch_size,
+            max_workers=args.max_workers,
+            client=client
+        )
+
+    texts = [processor._get_node_text(node) for node in nodes]
+    print(f"\nBenchmarking {len(texts)} nodes "
+          f"({'live API' if args.live else f'simulated latency {args.latency}s'})")
+
+    results = {}
+    for name, fn in [("per-node loop", run_per_node), ("batched", run_batched)]:
+        requests_before = client.requests if client else 0
+        elapsed, ok = fn(processor, texts)
+        requests = (client.requests - requests_before) if client else None
+        results[name] = (elapsed, ok, requests)
+
+    print("\n" + "=" * 70)
+    print(f"{'Mode':<16}{'Time (s)':>10}{'Nodes/s':>12}{'Embedded':>10}{'Requests':>10}")
+    print("=" * 70)
+    for name, (elapsed, ok, requests) in results.items():
+        print(f"{name:<16}{elapsed:>10.2f}{ok / elapsed:>12.1f}{ok:>10}{requests if requests is not None else '-':>10}")
+
+    base, batched = results["per-node loop"][0], results["batched"][0]
+    print(f"\nSpeedup: {base / batched:.1f}x "
+          f"(batch_size={args.batch_size}, max_workers={args.max_workers})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Graph Load/Dump Benchmark
+Compares stdlib json with the orjson fast path and the binary snapshot
+(msgpack, or marshal when msgpack is not installed) from core.graph_io
+
+--scale N replicates the nodes and edges N times (with suffixed ids) to see
+how each format behaves on larger graphs.
+
+    python experiments/benchmark_graph_io.py
+    python experiments/benchmark_graph_io.py --graph math_knowledge_graph_new.json --scale 50
+"""
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core import graph_io
+
+
+def scaled_graph(graph, scale: int):
+    """Graph with every node and edge repeated `scale` times"""
+    if scale <= 1:
+        return graph
+    nodes, edges = [], []
+    for k in range(scale):
+        nodes.extend({**node, "id": f"{node['id']}__{k}"} for node in graph["nodes"])
+        edges.extend({**edge, **{key: f"{edge[key]}__{k}" for key in ("source", "target") if key in edge}}
+                     for edge in graph.get("edges", []))
+    return {**graph, "nodes": nodes, "edges": edges}
+
+
+def timed(fn, repeat: int) -> float:
+    """Median wall time of fn() over `repeat` runs"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark graph JSON / snapshot load and dump")
+    parser.add_argument("--graph", default="physics_knowledge_graph_new.json",
+                        help="Graph file name under dataset/graph")
+    parser.add_argument("--scale", type=int, default=1, help="Replicate the graph N times")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    source = Path(__file__).parent.parent / "dataset" / "graph" / args.graph
+    with open(source, 'r', encoding='utf-8') as f:
+        graph = scaled_graph(json.load(f), args.scale)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / source.name
+        graph_io.write_json(path, graph)
+        snapshot = graph_io.write_snapshot(path, graph)
+        size_json = path.stat().st_size
+        size_snapshot = snapshot.stat().st_size
+
+        def load_stdlib():
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        def dump_stdlib():
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(graph, f, ensure_ascii=False, indent=2)
+
+        codec = "msgpack" if graph_io.msgpack is not None else "marshal"
+        rows = [("json (stdlib)", timed(load_stdlib, args.repeat), timed(dump_stdlib, args.repeat), size_json)]
+        if graph_io.orjson is not None:
+            rows.append(("orjson", timed(lambda: graph_io.read_json(path), args.repeat),
+                         timed(lambda: graph_io.write_json(path, graph), args.repeat), size_json))
+        graph_io.write_json(path, graph)
+        graph_io.write_snapshot(path, graph)
+        assert graph_io.read_snapshot(path) == graph
+        rows.append((f"snapshot ({codec})", timed(lambda: graph_io.read_snapshot(path), args.repeat),
+                     timed(lambda: graph_io.write_snapshot(path, graph), args.repeat), size_snapshot))
+
+    print(f"\n{args.graph} x{args.scale}: {len(graph['nodes'])} nodes, {len(graph.get('edges', []))} edges")
+    if graph_io.orjson is None:
+        print("(orjson not installed: the JSON fast path falls back to stdlib json)")
+    print("=" * 70)
+    print(f"{'Format':<22}{'Load (ms)':>11}{'Dump (ms)':>11}{'Size (KB)':>11}{'Load speedup':>15}")
+    print("=" * 70)
+    base_load = rows[0][1]
+    for name, load_time, dump_time, size in rows:
+        print(f"{name:<22}{load_time * 1e3:>11.2f}{dump_time * 1e3:>11.2f}{size / 1024:>11.1f}"
+              f"{base_load / load_time:>14.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Quantized Embedding Benchmark
+Memory, query latency and recall@k of int8 and 1-bit binary codes, with and
+without exact float re-ranking, against exact float32 search
+
+By default the physics and math graphs are embedded with the offline local
+backend and each domain is queried against the other. --synthetic N uses N
+clustered random vectors instead, to see the effect at larger scale.
+
+    python experiments/benchmark_quantization.py
+    python experiments/benchmark_quantization.py --synthetic 100000 --dim 256 --k 20
+"""
+
+import sys
+import time
+import json
+import argparse
+import contextlib
+import io
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from processors.semantic_processor import SemanticProcessor
+from processors.quantization import QuantizedIndex
+from processors.ann_index import exact_topk, recall_at_k
+from experiments.benchmark_ann_index import clustered_table
+
+
+def graph_tables(local_dim: int):
+    """Physics and math tables embedded offline with the local backend"""
+    dataset_dir = Path(__file__).parent.parent / "dataset" / "graph"
+    with open(dataset_dir / "physics_knowledge_graph_new.json", 'r', encoding='utf-8') as f:
+        physics_graph = json.load(f)
+    with open(dataset_dir / "math_knowledge_graph_new.json", 'r', encoding='utf-8') as f:
+        math_graph = json.load(f)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        processor = SemanticProcessor(backend="local", cache_dir=tempfile.mkdtemp(), local_dim=local_dim)
+        processor.fit_local_model([physics_graph, math_graph])
+        physics = processor.generate_node_embeddings(physics_graph, "physics")
+        math = processor.generate_node_embeddings(math_graph, "math")
+    return physics, math
+
+
+def run(base, queries, k: int, label: str):
+    """Print one results table for queries against base"""
+    n, dim = len(base), base.dim
+    float_bytes = n * dim * 4
+
+    start = time.time()
+    exact_topk(base, queries, k)
+    exact_time = time.time() - start
+
+    print(f"\n{label}: {len(queries)} queries against {n} vectors (dim={dim}, k={k})")
+    print("=" * 78)
+    print(f"{'Method':<22}{'Memory (MB)':>13}{'Ratio':>8}{'Query (s)':>12}{'Queries/s':>12}{'Recall@k':>11}")
+    print("=" * 78)
+    print(f"{'float32 exact':<22}{float_bytes / 1e6:>13.2f}{1.0:>8.1f}{exact_time:>12.3f}"
+          f"{len(queries) / exact_time:>12.0f}{1.0:>11.3f}")
+
+    for method, rerank in [("int8", 1), ("int8", 10), ("binary", 1), ("binary", 10), ("binary", 30)]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            index = QuantizedIndex(base, method, rerank=rerank).build()
+            index.query(queries[:1], k)  # warm up row norms
+            start = time.time()
+            index.query(queries, k)
+            query_time = time.time() - start
+            recall = recall_at_k(index, queries, k, sample=len(queries))
+        name = f"{method}" + (f" + rerank x{rerank}" if rerank > 1 else " (no rerank)")
+        print(f"{name:<22}{index.memory_bytes / 1e6:>13.2f}{float_bytes / index.memory_bytes:>8.1f}"
+              f"{query_time:>12.3f}{len(queries) / query_time:>12.0f}{recall:>11.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized embeddings with exact re-ranking")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--local-dim", type=int, default=256, help="Local embedding dimension for the graphs")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N clustered random vectors instead of the graphs")
+    parser.add_argument("--queries", type=int, default=1000, help="Query count with --synthetic")
+    parser.add_argument("--dim", type=int, default=256, help="Dimension with --synthetic")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        base = clustered_table(args.synthetic, args.dim, 200, args.seed, "m")
+        queries = clustered_table(args.queries, args.dim, 200, args.seed, "p").matrix
+        run(base, queries, args.k, "synthetic")
+        return
+
+    physics, math = graph_tables(args.local_dim)
+    run(math, physics.as_float32(), args.k, "physics -> math")
+    run(physics, math.as_float32(), args.k, "math -> physics")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Keyword / Theme Sampling Benchmark
+Compares the previous linear scans with the inverted-index versions:
+
+1. keyword_based_sample  - nested loops with substring tests on every pair
+                           vs. TextIndex posting-list intersections + join
+2. build_context_for_discussion - `node not in selected_nodes` list scan
+                           vs. theme index lookups
+
+Both versions must return identical results; the graphs are replicated
+--scale times (see benchmark_graph_io.scaled_graph) to show the growth.
+
+    python experiments/benchmark_text_index.py
+    python experiments/benchmark_text_index.py --scale 20 --max-pairs 100000
+"""
+
+import sys
+import json
+import time
+import argparse
+import contextlib
+import io
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from examples.sampled_cartesian_discussion import keyword_based_sample
+from processors.knowledge_graph_processor import KnowledgeGraphProcessor
+from experiments.benchmark_graph_io import scaled_graph
+
+KEYWORDS = ["运动", "速度", "加速度", "力", "能量", "函数", "导数", "极限", "变化", "关系"]
+
+
+def legacy_keyword_sample(math_nodes, physics_nodes, keywords, max_pairs):
+    """Previous implementation: test every (math, physics, keyword) combination"""
+    pairs = []
+    for math_node in math_nodes:
+        math_desc = (math_node.get('properties') or {}).get('description', '')
+        math_label = math_node.get('label', '')
+        for physics_node in physics_nodes:
+            physics_desc = (physics_node.get('properties') or {}).get('description', '')
+            physics_label = physics_node.get('label', '')
+            if any((k in math_desc or k in math_label) and (k in physics_desc or k in physics_label)
+                   for k in keywords):
+                pairs.append((physics_node['id'], math_node['id']))
+                if len(pairs) >= max_pairs:
+                    return pairs
+    return pairs
+
+
+def legacy_context(graph, focus_themes, max_concepts):
+    """Previous build_context_for_discussion"""
+    nodes = graph["nodes"]
+    selected = [n for n in nodes
+                if n["properties"].get("theme", "") in focus_themes
+                or n["properties"].get("category", "") in focus_themes]
+    if len(selected) < max_concepts:
+        for node in nodes:
+            if node not in selected:
+                selected.append(node)
+                if len(selected) >= max_concepts:
+                    break
+    context = "以下是知识图谱中的关键概念：\n\n"
+    for i, node in enumerate(selected, 1):
+        context += f"{i}. **{node.get('label', '未知')}**\n"
+        context += f"   {(node.get('properties') or {}).get('description', '')}\n\n"
+    return context
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inverted-index keyword and theme sampling")
+    parser.add_argument("--scale", type=int, default=5, help="Replicate both graphs N times")
+    parser.add_argument("--max-pairs", type=int, default=10 ** 9, help="Stop after this many pairs")
+    args = parser.parse_args()
+
+    dataset_dir = Path(__file__).parent.parent / "dataset" / "graph"
+    with open(dataset_dir / "physics_knowledge_graph_new.json", 'r', encoding='utf-8') as f:
+        physics_graph = scaled_graph(json.load(f), args.scale)
+    with open(dataset_dir / "math_knowledge_graph_new.json", 'r', encoding='utf-8') as f:
+        math_graph = scaled_graph(json.load(f), args.scale)
+    physics_nodes, math_nodes = physics_graph["nodes"], math_graph["nodes"]
+
+    print(f"\n{len(physics_nodes)} physics x {len(math_nodes)} math nodes, {len(KEYWORDS)} keywords")
+    print("=" * 66)
+    print(f"{'Operation':<28}{'Linear (s)':>12}{'Indexed (s)':>13}{'Speedup':>10}{'Same':>6}")
+    print("=" * 66)
+
+    legacy_time, legacy = timed(legacy_keyword_sample, math_nodes, physics_nodes, KEYWORDS, args.max_pairs)
+    new_time, new = timed(keyword_based_sample, math_nodes, physics_nodes, KEYWORDS, args.max_pairs)
+    print(f"{'keyword sample':<28}{legacy_time:>12.3f}{new_time:>13.3f}"
+          f"{legacy_time / new_time:>9.1f}x{str(legacy == new):>6}  ({len(new)} pairs)")
+
+    themes = list({n["properties"]["theme"] for n in math_nodes if n["properties"].get("theme")})[:3]
+    max_concepts = len(math_nodes) // 2
+    legacy_time, legacy = timed(legacy_context, math_graph, themes, max_concepts)
+    new_time, new = timed(KnowledgeGraphProcessor.build_context_for_discussion, math_graph, themes, max_concepts)
+    print(f"{'build context':<28}{legacy_time:>12.3f}{new_time:>13.3f}"
+          f"{legacy_time / new_time:>9.1f}x{str(legacy == new):>6}")
+
+
+if __name__ == "__main__":
+    main()
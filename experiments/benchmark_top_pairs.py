@@ -0,0 +1,112 @@
+"""
+Top-K Pair Selection Benchmark
+Compares the legacy full-argsort selection with the blocked argpartition
+selection in SemanticProcessor.get_top_similar_pairs
+
+    python experiments/benchmark_top_pairs.py                 # 10k x 10k
+    python experiments/benchmark_top_pairs.py --size 2000 --top-k 1000 --cap 3
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+import io
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from processors.semantic_processor import SemanticProcessor
+
+
+def legacy_top_pairs(similarity_matrix, physics_ids, math_ids, top_k, min_similarity):
+    """Previous implementation: argsort the whole flattened matrix, walk it in Python"""
+    flat_indices = np.argsort(similarity_matrix.ravel())[::-1]
+    pairs = []
+    seen = set()
+    for idx in flat_indices:
+        if len(pairs) >= top_k:
+            break
+        i = idx // similarity_matrix.shape[1]
+        j = idx % similarity_matrix.shape[1]
+        similarity = similarity_matrix[i, j]
+        if similarity < min_similarity:
+            break
+        pair_key = (physics_ids[i], math_ids[j])
+        if pair_key not in seen:
+            pairs.append((physics_ids[i], math_ids[j], float(similarity)))
+            seen.add(pair_key)
+    return pairs
+
+
+def make_similarity(size: int, dim: int, seed: int) -> np.ndarray:
+    """Cosine similarities of random unit vectors (float32)"""
+    rng = np.random.default_rng(seed)
+    a = rng.standard_normal((size, dim), dtype=np.float32)
+    b = rng.standard_normal((size, dim), dtype=np.float32)
+    a /= np.linalg.norm(a, axis=1, keepdims=True)
+    b /= np.linalg.norm(b, axis=1, keepdims=True)
+    return a @ b.T
+
+
+def timed(fn, *args, **kwargs):
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(*args, **kwargs)
+    return time.time() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark top-k similar pair selection")
+    parser.add_argument("--size", type=int, default=10000, help="Physics and math node count")
+    parser.add_argument("--dim", type=int, default=64, help="Random embedding dimension")
+    parser.add_argument("--top-k", type=int, default=300)
+    parser.add_argument("--min-similarity", type=float, default=0.3)
+    parser.add_argument("--cap", type=int, default=2, help="max_per_physics for the capped run")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"\nBuilding {args.size} x {args.size} similarity matrix...")
+    similarity = make_similarity(args.size, args.dim, args.seed)
+    physics_ids = [f"p{i}" for i in range(args.size)]
+    math_ids = [f"m{i}" for i in range(args.size)]
+
+    processor = SemanticProcessor(use_gemini=False, cache_dir=tempfile.mkdtemp(), client=object())
+
+    legacy_time, legacy = timed(
+        legacy_top_pairs, similarity, physics_ids, math_ids, args.top_k, args.min_similarity
+    )
+    new_time, new = timed(
+        processor.get_top_similar_pairs, similarity, physics_ids, math_ids,
+        top_k=args.top_k, min_similarity=args.min_similarity
+    )
+    capped_time, capped = timed(
+        processor.get_top_similar_pairs, similarity, physics_ids, math_ids,
+        top_k=args.top_k, min_similarity=args.min_similarity, max_per_physics=args.cap
+    )
+
+    same = [s for _, _, s in legacy] == [s for _, _, s in new]
+    per_physics = {}
+    for p, _, _ in capped:
+        per_physics[p] = per_physics.get(p, 0) + 1
+
+    print("\n" + "=" * 70)
+    print(f"{'Method':<32}{'Time (s)':>10}{'Pairs':>10}{'Distinct physics':>18}")
+    print("=" * 70)
+    for name, elapsed, pairs in [
+        ("legacy argsort", legacy_time, legacy),
+        ("argpartition", new_time, new),
+        (f"argpartition, cap={args.cap}", capped_time, capped),
+    ]:
+        print(f"{name:<32}{elapsed:>10.3f}{len(pairs):>10}{len({p for p, _, _ in pairs}):>18}")
+
+    print(f"\nSpeedup: {legacy_time / new_time:.1f}x")
+    print(f"Same scores as legacy: {same}")
+    print(f"Max partners per physics node with cap: {max(per_physics.values()) if per_physics else 0}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+Approximate Nearest-Neighbour Index over Embedding Tables
+
+Cosine-similarity ANN search for cross-domain candidate generation, so each
+node only needs to be compared with its likely neighbours instead of every
+node of the other domain.
+
+Backends (first available is used by default):
+1. hnswlib  - HNSW graph (pip install hnswlib)
+2. faiss    - HNSW graph with inner product (pip install faiss-cpu)
+3. ivf      - pure-numpy inverted file: spherical k-means coarse quantizer,
+              queries scan only the nprobe closest lists
+
+Indexes are persisted next to the embedding cache and tagged with the content
+digest of the table they were built from, so a stale index is rebuilt.
+"""
+from typing import Optional, Tuple
+from pathlib import Path
+import hashlib
+import json
+import time
+import zipfile
+import numpy as np
+from core.atomic_io import atomic_open, atomic_write_text
+from processors.embedding_table import EmbeddingTable
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+
+BACKENDS = ("hnswlib", "faiss", "ivf")
+
+
+def available_backends() -> Tuple[str, ...]:
+    """Backends usable in this environment, best first"""
+    available = []
+    if hnswlib is not None:
+        available.append("hnswlib")
+    if faiss is not None:
+        available.append("faiss")
+    available.append("ivf")
+    return tuple(available)
+
+
+def _normalized(matrix: np.ndarray) -> np.ndarray:
+    """Row-normalize as contiguous float32"""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def table_digest(table: EmbeddingTable) -> str:
+    """Content digest identifying the vectors an index was built from"""
+    digest = table.metadata.get("content_digest")
+    if digest:
+        return f"{digest}:{table.matrix.dtype}"
+    h = hashlib.sha256()
+    h.update("\n".join(table.ids).encode('utf-8'))
+    h.update(np.ascontiguousarray(table.matrix).tobytes())
+    return h.hexdigest()
+
+
+class AnnIndex:
+    """ANN index over one domain's embedding table (cosine similarity)"""
+
+    def __init__(self, table: EmbeddingTable, backend: Optional[str] = None, **params):
+        """
+        Create an (unbuilt) index
+
+        Args:
+            table: Embedding table to index
+            backend: 'hnswlib', 'faiss' or 'ivf' (default: best available)
+            **params: Backend parameters
+                hnswlib/faiss: M (16), ef_construction (200), ef_search (64)
+                ivf: nlist (≈sqrt(n)), nprobe (8), n_iter (20), seed (42)
+        """
+        backend = backend or available_backends()[0]
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown ANN backend {backend}, expected one of {BACKENDS}")
+        if backend not in available_backends():
+            raise ImportError(f"ANN backend {backend} is not installed")
+
+        self.table = table
+        self.backend = backend
+        self.params = params
+        self.digest = table_digest(table)
+        self._index = None
+        # ivf state
+        self.centroids = None
+        self.order = None
+        self.offsets = None
+        self._inv_norms = None
+
+    # ---------- build ----------
+
+    def build(self) -> "AnnIndex":
+        """Build the index from the table"""
+        start = time.time()
+        n = len(self.table)
+        if self.backend == "hnswlib":
+            data = _normalized(self.table.matrix)
+            index = hnswlib.Index(space='ip', dim=data.shape[1])
+            index.init_index(
+                max_elements=max(n, 1),
+                ef_construction=self.params.get("ef_construction", 200),
+                M=self.params.get("M", 16)
+            )
+            index.add_items(data, np.arange(n))
+            index.set_ef(self.params.get("ef_search", 64))
+            self._index = index
+        elif self.backend == "faiss":
+            data = _normalized(self.table.matrix)
+            index = faiss.IndexHNSWFlat(data.shape[1], self.params.get("M", 16), faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = self.params.get("ef_construction", 200)
+            index.hnsw.efSearch = self.params.get("ef_search", 64)
+            index.add(data)
+            self._index = index
+        else:
+            self._build_ivf()
+        print(f"✓ Built {self.backend} index over {n} vectors in {time.time() - start:.2f}s")
+        return self
+
+    def _build_ivf(self):
+        """Spherical k-means coarse quantizer + inverted lists"""
+        data = _normalized(self.table.matrix)
+        n = data.shape[0]
+        nlist = min(n, self.params.get("nlist", max(1, int(np.sqrt(n)))))
+        rng = np.random.default_rng(self.params.get("seed", 42))
+
+        # Train on a sample for large tables
+        sample = data[rng.choice(n, size=min(n, nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(self.params.get("n_iter", 20)):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = np.bincount(assign, minlength=nlist) == 0
+            # Re-seed empty lists with random sample points
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = _normalized(sums)
+
+        assign = np.concatenate([
+            np.argmax(data[i:i + 65536] @ centroids.T, axis=1) for i in range(0, n, 65536)
+        ]) if n else np.zeros(0, dtype=np.int64)
+        self.centroids = centroids
+        self.order = np.argsort(assign, kind='stable').astype(np.int64)
+        self.offsets = np.searchsorted(assign[self.order], np.arange(nlist + 1)).astype(np.int64)
+
+    # ---------- query ----------
+
+    def query(self, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k neighbours by cosine similarity
+
+        Args:
+            vectors: (n, d) query vectors
+            k: Number of neighbours
+
+        Returns:
+            (scores, rows): (n, k) similarities and row indices into the table,
+            best first; missing neighbours are padded with -inf / -1
+        """
+        queries = _normalized(np.atleast_2d(vectors))
+        k = min(k, len(self.table))
+        if self.backend == "hnswlib":
+            self._index.set_ef(max(self.params.get("ef_search", 64), k))
+            labels, distances = self._index.knn_query(queries, k=k)
+            return (1.0 - distances).astype(np.float32), labels.astype(np.int64)
+        if self.backend == "faiss":
+            self._index.hnsw.efSearch = max(self.params.get("ef_search", 64), k)
+            scores, labels = self._index.search(queries, k)
+            return scores.astype(np.float32), labels.astype(np.int64)
+        return self._query_ivf(queries, k)
+
+    def _query_ivf(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Scan the nprobe closest inverted lists of each query"""
+        if self._inv_norms is None:
+            # Row norms once, so candidates can be scored from the raw (mmap) table
+            norms = np.concatenate([
+                np.linalg.norm(np.asarray(self.table.matrix[i:i + 65536], dtype=np.float32), axis=1)
+                for i in range(0, len(self.table), 65536)
+            ])
+            norms[norms == 0] = 1.0
+            self._inv_norms = (1.0 / norms).astype(np.float32)
+
+        nprobe = min(self.params.get("nprobe", 8), len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        rows = np.full((len(queries), k), -1, dtype=np.int64)
+        for q, lists in enumerate(probes):
+            # Sorted row order keeps memory-mapped reads sequential
+            candidates = np.sort(np.concatenate([
+                self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists
+            ]))
+            if len(candidates) == 0:
+                continue
+            raw = np.asarray(self.table.matrix[candidates], dtype=np.float32)
+            sims = (raw @ queries[q]) * self._inv_norms[candidates]
+            top = min(k, len(candidates))
+            best = np.argpartition(-sims, top - 1)[:top]
+            best = best[np.argsort(-sims[best], kind='stable')]
+            scores[q, :top] = sims[best]
+            rows[q, :top] = candidates[best]
+        return scores, rows
+
+    # ---------- persistence ----------
+
+    def save(self, path: Path) -> Path:
+        """
+        Persist the index (backend file + .meta.json)
+
+        Args:
+            path: Path prefix, e.g. output/embeddings/math_ann
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data_path = path.with_name(f"{path.name}.{self.backend}")
+        meta_path = path.with_name(f"{path.name}.meta.json")
+        # Metadata is removed first and written last: an interrupted save leaves
+        # no metadata, so load() returns None instead of reading a partial index
+        meta_path.unlink(missing_ok=True)
+        if self.backend == "hnswlib":
+            self._index.save_index(str(data_path))
+        elif self.backend == "faiss":
+            faiss.write_index(self._index, str(data_path))
+        else:
+            with atomic_open(data_path, 'wb') as f:
+                np.savez(f, centroids=self.centroids, order=self.order, offsets=self.offsets)
+
+        atomic_write_text(meta_path, json.dumps(
+            {"backend": self.backend, "params": self.params, "digest": self.digest,
+             "size": len(self.table), "dim": self.table.dim}, indent=2))
+        return data_path
+
+    @classmethod
+    def load(cls, path: Path, table: EmbeddingTable) -> Optional["AnnIndex"]:
+        """
+        Load a persisted index for a table
+
+        Returns:
+            The index, or None if missing, unreadable, built from different vectors, or its
+            backend is not installed
+        """
+        path = Path(path)
+        meta_path = path.with_name(f"{path.name}.meta.json")
+        if not meta_path.exists():
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta["backend"] not in available_backends() or meta["digest"] != table_digest(table):
+            return None
+
+        index = cls(table, meta["backend"], **meta["params"])
+        data_path = path.with_name(f"{path.name}.{index.backend}")
+        if not data_path.exists():
+            return None
+        if index.backend == "hnswlib":
+            index._index = hnswlib.Index(space='ip', dim=meta["dim"])
+            index._index.load_index(str(data_path), max_elements=max(meta["size"], 1))
+        elif index.backend == "faiss":
+            index._index = faiss.read_index(str(data_path))
+        else:
+            try:
+                with np.load(data_path) as data:
+                    index.centroids = data["centroids"]
+                    index.order = data["order"]
+                    index.offsets = data["offsets"]
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+                return None
+        return index
+
+
+def exact_topk(base: EmbeddingTable, queries: np.ndarray, k: int, block_size: int = 1024) -> np.ndarray:
+    """Exact top-k row indices of base for each query (brute force, in blocks)"""
+    base_matrix = _normalized(base.matrix)
+    queries = _normalized(queries)
+    k = min(k, len(base))
+    result = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), block_size):
+        sims = queries[start:start + block_size] @ base_matrix.T
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        result[start:start + block_size] = top
+    return result
+
+
+def recall_at_k(
+    index: AnnIndex,
+    queries: np.ndarray,
+    k: int,
+    sample: int = 1000,
+    seed: int = 42
+) -> float:
+    """
+    Fraction of the exact top-k neighbours that the index returns
+
+    Args:
+        index: ANN index
+        queries: (n, d) query vectors
+        k: Neighbours per query
+        sample: Evaluate on at most this many random queries
+    """
+    rng = np.random.default_rng(seed)
+    if len(queries) > sample:
+        queries = np.asarray(queries)[np.sort(rng.choice(len(queries), size=sample, replace=False))]
+    exact = exact_topk(index.table, queries, k)
+    _, approx = index.query(queries, k)
+    hits = sum(len(np.intersect1d(e, a)) for e, a in zip(exact, approx))
+    return hits / exact.size if exact.size else 1.0
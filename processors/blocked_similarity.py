@@ -0,0 +1,275 @@
+"""
+Blocked, Out-of-Core Cross-Domain Similarity
+
+Computes cosine similarities between two embedding tables tile by tile
+(block_size x block_size matmuls) without ever materializing the P×M matrix.
+From each tile it keeps only:
+
+1. a running top-k per row (best math partners of each physics node)
+2. a running top-k per column (best physics partners of each math node)
+3. optionally, every entry >= threshold as sparse COO triplets
+
+Per-row results are streamed into `.npy` files with `open_memmap`, COO
+triplets are appended to flat binary files, so memory is bounded by
+O(block_size² + k·(block_size + M)) regardless of P×M. Tile matmuls use
+numpy's BLAS, which is multi-threaded; `n_threads` limits it through
+threadpoolctl when that package is installed.
+"""
+from typing import Dict, Any, Optional, List, Tuple, Union
+from pathlib import Path
+import contextlib
+import json
+import time
+import numpy as np
+from numpy.lib.format import open_memmap
+from core.atomic_io import atomic_open, atomic_write_text
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+
+MANIFEST = "manifest.json"
+
+
+def _normalized(block: np.ndarray) -> np.ndarray:
+    """Row-normalize a block as float32 (zero rows stay zero)"""
+    block = np.asarray(block, dtype=np.float32)
+    norms = np.linalg.norm(block, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return block / norms
+
+
+def _merge_topk(
+    scores: np.ndarray,
+    indices: np.ndarray,
+    new_scores: np.ndarray,
+    new_indices: np.ndarray,
+    k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge running top-k with new candidates along axis 1
+
+    Args:
+        scores, indices: (n, k) running best scores and their indices
+        new_scores, new_indices: (n, c) new candidates
+        k: Number of entries to keep
+    """
+    all_scores = np.concatenate([scores, new_scores], axis=1)
+    all_indices = np.concatenate([indices, new_indices], axis=1)
+    keep = np.argpartition(all_scores, all_scores.shape[1] - k, axis=1)[:, -k:]
+    return np.take_along_axis(all_scores, keep, axis=1), np.take_along_axis(all_indices, keep, axis=1)
+
+
+def _tile_topk(tile: np.ndarray, k: int, offset: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best k entries of every row of a tile, with column indices shifted by offset"""
+    n_cols = tile.shape[1]
+    if k < n_cols:
+        cols = np.argpartition(tile, n_cols - k, axis=1)[:, n_cols - k:]
+    else:
+        cols = np.broadcast_to(np.arange(n_cols), tile.shape)
+    return np.take_along_axis(tile, cols, axis=1), cols + offset
+
+
+def _sort_topk(scores: np.ndarray, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Order each row's top-k by score descending"""
+    order = np.argsort(-scores, axis=1, kind='stable')
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+
+def blocked_similarity(
+    physics_matrix: np.ndarray,
+    math_matrix: np.ndarray,
+    output_dir: Union[str, Path],
+    top_k: int = 50,
+    threshold: Optional[float] = None,
+    block_size: int = 2048,
+    n_threads: Optional[int] = None,
+    physics_ids: Optional[List[str]] = None,
+    math_ids: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Compute top-k neighbours (and optionally thresholded COO entries) tile by tile
+
+    Args:
+        physics_matrix: (P, d) physics embeddings (ndarray or read-only memmap)
+        math_matrix: (M, d) math embeddings
+        output_dir: Directory for the streamed results
+        top_k: Neighbours kept per row and per column (0 to disable)
+        threshold: If set, also write every similarity >= threshold as COO
+        block_size: Tile edge length
+        n_threads: BLAS thread count (None = library default, i.e. all cores)
+        physics_ids, math_ids: Row/column node ids, stored with the results (optional)
+
+    Returns:
+        Manifest describing the written files
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    # The manifest is what marks a result as complete: drop the old one before
+    # overwriting its files and write the new one last
+    (output_dir / MANIFEST).unlink(missing_ok=True)
+    n_rows, n_cols = physics_matrix.shape[0], math_matrix.shape[0]
+    k_row = min(top_k, n_cols)
+    k_col = min(top_k, n_rows)
+
+    limits = contextlib.nullcontext()
+    if n_threads is not None:
+        if threadpool_limits is not None:
+            limits = threadpool_limits(limits=n_threads, user_api="blas")
+        else:
+            print("  threadpoolctl not installed; n_threads ignored "
+                  "(set OPENBLAS_NUM_THREADS/OMP_NUM_THREADS before starting Python)")
+
+    manifest: Dict[str, Any] = {
+        "shape": [n_rows, n_cols],
+        "top_k": top_k,
+        "threshold": threshold,
+        "block_size": block_size,
+        "physics_ids": list(physics_ids) if physics_ids is not None else None,
+        "math_ids": list(math_ids) if math_ids is not None else None,
+        "files": {}
+    }
+
+    row_scores_out = row_index_out = None
+    if k_row:
+        row_scores_out = open_memmap(output_dir / "row_topk_scores.npy", mode='w+',
+                                     dtype=np.float32, shape=(n_rows, k_row))
+        row_index_out = open_memmap(output_dir / "row_topk_index.npy", mode='w+',
+                                    dtype=np.int64, shape=(n_rows, k_row))
+        manifest["files"].update(row_topk_scores="row_topk_scores.npy", row_topk_index="row_topk_index.npy")
+
+    # Column top-k is stored transposed (M, k) and kept in memory: O(k·M).
+    # -inf placeholders are displaced by real scores as row blocks arrive.
+    col_scores = np.full((n_cols, k_col), -np.inf, dtype=np.float32)
+    col_index = np.zeros((n_cols, k_col), dtype=np.int64)
+
+    coo_files = None
+    nnz = 0
+    if threshold is not None:
+        coo_files = {
+            name: open(output_dir / f"coo_{name}.bin", 'wb')
+            for name in ("rows", "cols", "scores")
+        }
+        manifest["files"].update(coo_rows="coo_rows.bin", coo_cols="coo_cols.bin", coo_scores="coo_scores.bin")
+
+    start_time = time.time()
+    try:
+        with limits:
+            for r0 in range(0, n_rows, block_size):
+                a = _normalized(physics_matrix[r0:r0 + block_size])
+                row_best_s = np.full((a.shape[0], k_row), -np.inf, dtype=np.float32)
+                row_best_i = np.zeros((a.shape[0], k_row), dtype=np.int64)
+
+                for c0 in range(0, n_cols, block_size):
+                    b = _normalized(math_matrix[c0:c0 + block_size])
+                    tile = a @ b.T
+
+                    if k_row:
+                        s, i = _tile_topk(tile, k_row, c0)
+                        row_best_s, row_best_i = _merge_topk(row_best_s, row_best_i, s, i, k_row)
+
+                    if k_col:
+                        cols = slice(c0, c0 + b.shape[0])
+                        s, i = _tile_topk(tile.T, k_col, r0)
+                        col_scores[cols], col_index[cols] = _merge_topk(
+                            col_scores[cols], col_index[cols], s, i, k_col
+                        )
+
+                    if coo_files is not None:
+                        rr, cc = np.nonzero(tile >= threshold)
+                        (rr + r0).astype(np.int64).tofile(coo_files["rows"])
+                        (cc + c0).astype(np.int64).tofile(coo_files["cols"])
+                        tile[rr, cc].astype(np.float32).tofile(coo_files["scores"])
+                        nnz += len(rr)
+
+                if k_row:
+                    s, i = _sort_topk(row_best_s, row_best_i)
+                    row_scores_out[r0:r0 + a.shape[0]] = s
+                    row_index_out[r0:r0 + a.shape[0]] = i
+
+                done = min(r0 + block_size, n_rows)
+                print(f"  Rows {done}/{n_rows} ({time.time() - start_time:.1f}s)")
+    finally:
+        if coo_files is not None:
+            for f in coo_files.values():
+                f.close()
+
+    if k_row:
+        row_scores_out.flush()
+        row_index_out.flush()
+        del row_scores_out, row_index_out
+
+    if k_col:
+        s, i = _sort_topk(col_scores, col_index)
+        with atomic_open(output_dir / "col_topk_scores.npy", 'wb') as f:
+            np.save(f, s)
+        with atomic_open(output_dir / "col_topk_index.npy", 'wb') as f:
+            np.save(f, i)
+        manifest["files"].update(col_topk_scores="col_topk_scores.npy", col_topk_index="col_topk_index.npy")
+
+    manifest["nnz"] = nnz
+    manifest["seconds"] = round(time.time() - start_time, 3)
+    atomic_write_text(output_dir / MANIFEST, json.dumps(manifest, indent=2))
+
+    return manifest
+
+
+def load_blocked_similarity(output_dir: Union[str, Path], mmap: bool = True) -> Dict[str, Any]:
+    """
+    Open the results written by blocked_similarity
+
+    Returns:
+        Manifest plus arrays: row_topk_scores/row_topk_index (P, k),
+        col_topk_scores/col_topk_index (M, k), coo_rows/coo_cols/coo_scores (nnz,)
+        for whichever outputs were produced
+    """
+    output_dir = Path(output_dir)
+    with open(output_dir / MANIFEST, 'r', encoding='utf-8') as f:
+        result = json.load(f)
+
+    mode = 'r' if mmap else None
+    for name, filename in result["files"].items():
+        path = output_dir / filename
+        if name.startswith("coo_"):
+            dtype = np.float32 if name == "coo_scores" else np.int64
+            result[name] = np.memmap(path, dtype=dtype, mode='r') if mmap and result["nnz"] else np.fromfile(path, dtype=dtype)
+        else:
+            result[name] = np.load(path, mmap_mode=mode)
+    return result
+
+
+def pairs_from_row_topk(
+    result: Dict[str, Any],
+    physics_ids: List[str],
+    math_ids: List[str],
+    top_k: int = 300,
+    min_similarity: float = 0.3,
+    max_per_physics: Optional[int] = None
+) -> List[Tuple[str, str, float]]:
+    """
+    Global top pairs from per-row top-k results
+
+    Exact as long as max_per_physics (or top_k when uncapped) does not exceed
+    the per-row k that was computed.
+
+    Returns:
+        List of (physics_id, math_id, similarity_score) tuples, best first
+    """
+    scores = np.asarray(result["row_topk_scores"])
+    index = np.asarray(result["row_topk_index"])
+    if max_per_physics:
+        # Rows are already sorted best first
+        scores, index = scores[:, :max_per_physics], index[:, :max_per_physics]
+
+    flat_scores = scores.ravel()
+    rows = np.repeat(np.arange(scores.shape[0]), scores.shape[1])
+    cols = index.ravel()
+
+    keep = np.flatnonzero(flat_scores >= min_similarity)
+    if len(keep) > top_k:
+        keep = keep[np.argpartition(flat_scores[keep], len(keep) - top_k)[len(keep) - top_k:]]
+    order = keep[np.lexsort((cols[keep], rows[keep], -flat_scores[keep]))]
+
+    return [(physics_ids[rows[k]], math_ids[cols[k]], float(flat_scores[k])) for k in order]
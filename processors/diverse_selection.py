@@ -0,0 +1,115 @@
+"""
+Diversity-Aware Pair Selection (Maximal Marginal Relevance)
+
+Plain top-similarity selection clusters around a few hub nodes (e.g. every
+mechanics node paired with 函数), so many dialogues explore the same idea.
+MMR picks pairs greedily by
+
+    score(a) = (1 - diversity) * sim(a) - diversity * max_{b selected} redundancy(a, b)
+
+where the redundancy of two pairs (p, m) and (p', m') is the mean of the
+physics-physics and math-math cosine similarities. Each step is one
+vectorized update over the whole candidate pool.
+
+Hard constraints are expressed uniformly as groups with a cap: "at most c
+selected pairs per group". Per-node caps use node ids as groups, theme and
+category quotas use the graphs' `theme` / `category` properties.
+"""
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+import numpy as np
+
+
+def group_codes(labels: Sequence[Optional[str]]) -> np.ndarray:
+    """
+    Integer codes for group labels (None -> -1, i.e. unconstrained)
+
+    Args:
+        labels: Group label of each candidate
+    """
+    codes = np.full(len(labels), -1, dtype=np.int64)
+    index: Dict[str, int] = {}
+    for i, label in enumerate(labels):
+        if label is not None and label != "":
+            codes[i] = index.setdefault(label, len(index))
+    return codes
+
+
+def node_groups(graph: Dict[str, Any], key: str) -> Dict[str, Optional[str]]:
+    """Map node id -> value of a node property (e.g. 'theme' or 'category')"""
+    return {
+        node['id']: (node.get('properties') or {}).get(key)
+        for node in graph.get('nodes', [])
+    }
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def mmr_select(
+    relevance: np.ndarray,
+    physics_index: np.ndarray,
+    math_index: np.ndarray,
+    physics_vectors: np.ndarray,
+    math_vectors: np.ndarray,
+    k: int,
+    diversity: float = 0.3,
+    constraints: Optional[List[Tuple[np.ndarray, int]]] = None
+) -> np.ndarray:
+    """
+    Greedy MMR selection over a candidate pool
+
+    Args:
+        relevance: (n,) similarity of each candidate pair
+        physics_index: (n,) row of each candidate's physics node in physics_vectors
+        math_index: (n,) row of each candidate's math node in math_vectors
+        physics_vectors: (P', d) vectors of the physics nodes in the pool
+        math_vectors: (M', d) vectors of the math nodes in the pool
+        k: Number of pairs to select
+        diversity: 0 = pure similarity ranking, 1 = pure novelty
+        constraints: (group codes over candidates, cap) pairs; code -1 is unconstrained
+
+    Returns:
+        Indices of the selected candidates, in selection order
+    """
+    n = len(relevance)
+    relevance = np.asarray(relevance, dtype=np.float32)
+    physics_vectors = _unit_rows(physics_vectors)
+    math_vectors = _unit_rows(math_vectors)
+    constraints = constraints or []
+    counts = [np.zeros(int(codes.max()) + 1 if len(codes) else 0, dtype=np.int64) for codes, _ in constraints]
+
+    eligible = np.ones(n, dtype=bool)
+    for codes, cap in constraints:
+        if cap <= 0:
+            eligible &= codes < 0
+    max_redundancy = np.zeros(n, dtype=np.float32)
+    selected: List[int] = []
+
+    while len(selected) < k:
+        scores = (1.0 - diversity) * relevance - diversity * max_redundancy
+        scores[~eligible] = -np.inf
+        best = int(np.argmax(scores)) if n else 0
+        if n == 0 or not np.isfinite(scores[best]):
+            break
+        selected.append(best)
+        eligible[best] = False
+
+        # Redundancy of every candidate with the new pick (negatives clip to 0)
+        physics_sim = physics_vectors @ physics_vectors[physics_index[best]]
+        math_sim = math_vectors @ math_vectors[math_index[best]]
+        redundancy = 0.5 * (physics_sim[physics_index] + math_sim[math_index])
+        np.maximum(max_redundancy, redundancy, out=max_redundancy)
+
+        for (codes, cap), count in zip(constraints, counts):
+            code = codes[best]
+            if code < 0:
+                continue
+            count[code] += 1
+            if count[code] >= cap:
+                eligible &= codes != code
+
+    return np.array(selected, dtype=np.int64)
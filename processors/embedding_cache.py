@@ -0,0 +1,139 @@
+"""
+Content-Hash Embedding Cache
+
+Maps hash(embedding model, node text) -> vector in a single SQLite store that
+is shared between domains. Only new or edited node texts need to be embedded;
+unchanged texts (in any domain) are served from the cache.
+
+Each domain also records which keys its nodes currently reference, so vectors
+no longer referenced by any domain (edited or deleted nodes) can be evicted.
+"""
+from typing import List, Dict, Iterable
+from pathlib import Path
+import hashlib
+import sqlite3
+import time
+import numpy as np
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vectors (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    created_at REAL
+);
+CREATE TABLE IF NOT EXISTS refs (
+    domain TEXT NOT NULL,
+    node_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (domain, node_id)
+);
+CREATE INDEX IF NOT EXISTS idx_refs_key ON refs (key);
+"""
+
+
+def embedding_key(model: str, text: str) -> str:
+    """Cache key for a text embedded with a given model"""
+    return hashlib.sha256(f"{model}\0{text}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent content-addressed embedding store"""
+
+    def __init__(self, db_path: Path):
+        """
+        Open (or create) the embedding cache
+
+        Args:
+            db_path: SQLite database file
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up vectors by key
+
+        Returns:
+            Dictionary of the keys found (missing keys are omitted)
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT key, vector FROM vectors WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]):
+        """
+        Store vectors
+
+        Args:
+            model: Embedding model name
+            items: Dictionary mapping key to vector
+        """
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            array = np.asarray(vector, dtype=np.float32)
+            rows.append((key, model, int(array.shape[0]), array.tobytes(), now))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, model, dim, vector, created_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def set_domain_refs(self, domain: str, refs: Dict[str, str]):
+        """
+        Replace the node -> key references of a domain
+
+        Args:
+            domain: Domain name (e.g., 'physics', 'math')
+            refs: Dictionary mapping node_id to cache key
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM refs WHERE domain = ?", (domain,))
+            self.conn.executemany(
+                "INSERT INTO refs (domain, node_id, key) VALUES (?, ?, ?)",
+                [(domain, node_id, key) for node_id, key in refs.items()]
+            )
+
+    def evict_orphans(self) -> int:
+        """
+        Delete vectors not referenced by any domain (edited or removed nodes)
+
+        Returns:
+            Number of vectors deleted
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                "DELETE FROM vectors WHERE key NOT IN (SELECT key FROM refs)"
+            )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """Cache statistics"""
+        vectors = self.conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        orphans = self.conn.execute(
+            "SELECT COUNT(*) FROM vectors WHERE key NOT IN (SELECT key FROM refs)"
+        ).fetchone()[0]
+        domains = dict(self.conn.execute(
+            "SELECT domain, COUNT(*) FROM refs GROUP BY domain"
+        ).fetchall())
+        return {"vectors": vectors, "orphans": orphans, "domains": domains}
+
+    def close(self):
+        """Close the database connection"""
+        self.conn.close()
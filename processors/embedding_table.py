@@ -0,0 +1,136 @@
+"""
+Memory-Mapped Embedding Tables
+
+Stores a domain's embeddings as one contiguous (n_nodes, dim) float32/float16
+`.npy` array plus a JSON sidecar with the row order (node ids). Tables are
+opened with `np.load(mmap_mode='r')`, so loading is near-instant and zero-copy
+and only the rows actually touched are paged in, even for graphs with hundreds
+of thousands of nodes.
+
+EmbeddingTable is a read-only Mapping of node_id -> vector, so it can be passed
+anywhere a `Dict[str, List[float]]` of embeddings was used before.
+"""
+from typing import Dict, Any, Optional, Iterator, Sequence
+from collections.abc import Mapping
+from pathlib import Path
+import json
+import numpy as np
+from core.atomic_io import atomic_open
+
+
+SUPPORTED_DTYPES = ("float32", "float16")
+
+
+def sidecar_path(path: Path) -> Path:
+    """Path of the id index sidecar for a table file"""
+    path = Path(path)
+    return path.with_name(path.stem + ".ids.json")
+
+
+class EmbeddingTable(Mapping):
+    """Contiguous embedding matrix with an id -> row index"""
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        matrix: np.ndarray,
+        path: Optional[Path] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Wrap an embedding matrix
+
+        Args:
+            ids: Node id of each row
+            matrix: (len(ids), dim) array (may be a read-only memmap)
+            path: File the table was loaded from (if any)
+            metadata: Extra sidecar metadata (e.g. content digest)
+        """
+        if len(ids) != matrix.shape[0]:
+            raise ValueError(f"{len(ids)} ids for a matrix with {matrix.shape[0]} rows")
+        self.ids = list(ids)
+        self.matrix = matrix
+        self.path = Path(path) if path else None
+        self.metadata = metadata or {}
+        self.index = {node_id: row for row, node_id in enumerate(self.ids)}
+
+    @classmethod
+    def from_dict(cls, embeddings: Dict[str, Sequence[float]], dtype: str = "float32") -> "EmbeddingTable":
+        """Pack a {node_id: vector} dictionary into a table"""
+        ids = list(embeddings.keys())
+        if not ids:
+            return cls([], np.zeros((0, 0), dtype=dtype))
+        matrix = np.empty((len(ids), len(embeddings[ids[0]])), dtype=dtype)
+        for row, node_id in enumerate(ids):
+            matrix[row] = embeddings[node_id]
+        return cls(ids, matrix)
+
+    @property
+    def dim(self) -> int:
+        """Embedding dimension"""
+        return self.matrix.shape[1] if self.matrix.ndim == 2 else 0
+
+    def __getitem__(self, node_id: str) -> np.ndarray:
+        return self.matrix[self.index[node_id]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, node_id) -> bool:
+        return node_id in self.index
+
+    def rows(self, node_ids: Sequence[str]) -> np.ndarray:
+        """Gather the vectors of several nodes as an array (in the given order)"""
+        return self.matrix[[self.index[node_id] for node_id in node_ids]]
+
+    def as_float32(self) -> np.ndarray:
+        """Matrix as float32 (no copy when already float32)"""
+        return np.asarray(self.matrix, dtype=np.float32)
+
+    def save(self, path: Path, dtype: Optional[str] = None) -> Path:
+        """
+        Write the table as `.npy` plus `.ids.json` sidecar
+
+        The matrix is written to a temporary file and renamed into place, and the
+        sidecar is written last, so readers never see a half-written table.
+
+        Args:
+            path: Target `.npy` path
+            dtype: Storage dtype ('float32' or 'float16'), defaults to the current dtype
+
+        Returns:
+            Path of the written table
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        dtype = dtype or str(self.matrix.dtype)
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype}, expected one of {SUPPORTED_DTYPES}")
+
+        with atomic_open(path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.matrix, dtype=dtype))
+
+        with atomic_open(sidecar_path(path), 'w') as f:
+            json.dump({"ids": self.ids, "dtype": dtype, **self.metadata}, f, ensure_ascii=False)
+
+        return path
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> "EmbeddingTable":
+        """
+        Open a saved table
+
+        Args:
+            path: `.npy` path
+            mmap: Memory-map the matrix read-only instead of reading it into RAM
+        """
+        path = Path(path)
+        with open(sidecar_path(path), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        matrix = np.load(path, mmap_mode='r' if mmap else None)
+        ids = meta.pop("ids")
+        meta.pop("dtype", None)
+        return cls(ids, matrix, path=path, metadata=meta)
@@ -3,7 +3,7 @@
 """
 from pathlib import Path
 from typing import Dict, Any, List
-import json
+from core.graph_index import GraphIndex, load_graph_index
 
 
 class KnowledgeGraphProcessor:
@@ -25,13 +25,12 @@ class KnowledgeGraphProcessor:
         if not file_path.exists():
             raise FileNotFoundError(f"Knowledge graph file not found: {file_path}")
         
-        # 读取知识图谱
-        with open(file_path, 'r', encoding='utf-8') as f:
-            graph_data = json.load(f)
+        # 读取知识图谱（进程内共享索引，文件未变时不重复解析）
+        index = load_graph_index(file_path)
         
         # 提取节点和边
-        nodes = graph_data.get("nodes", [])
-        edges = graph_data.get("edges", [])
+        nodes = index.nodes
+        edges = index.edges
         
         # 构建摘要信息
         summary = KnowledgeGraphProcessor._build_summary(nodes, edges)
@@ -72,7 +71,7 @@ class KnowledgeGraphProcessor:
         themes = set()
         categories = set()
         for node in nodes:
-            props = node.get("properties", {})
+            props = node.get("properties") or {}
             if "theme" in props:
                 themes.add(props["theme"])
             if "category" in props:
@@ -87,7 +86,7 @@ class KnowledgeGraphProcessor:
         summary += "\n核心概念示例：\n"
         for i, node in enumerate(nodes[:20], 1):
             label = node.get("label", "未知")
-            desc = node.get("properties", {}).get("description", "")
+            desc = (node.get("properties") or {}).get("description", "")
             desc_short = desc[:100] + "..." if len(desc) > 100 else desc
             summary += f"{i}. {label}: {desc_short}\n"
         
@@ -114,7 +113,7 @@ class KnowledgeGraphProcessor:
             concept = {
                 "id": node.get("id", ""),
                 "label": node.get("label", ""),
-                "description": node.get("properties", {}).get("description", "")
+                "description": (node.get("properties") or {}).get("description", "")
             }
             key_concepts.append(concept)
         
@@ -139,7 +138,7 @@ class KnowledgeGraphProcessor:
         concepts = []
         
         for node in nodes:
-            props = node.get("properties", {})
+            props = node.get("properties") or {}
             if props.get("theme") == theme or props.get("category") == theme:
                 concepts.append({
                     "id": node.get("id", ""),
@@ -168,23 +167,23 @@ class KnowledgeGraphProcessor:
         """
         nodes = graph_data.get("nodes", [])
         
-        # 如果指定了主题，优先选择相关概念
+        # 如果指定了主题，优先选择相关概念（按主题倒排索引查找）
         if focus_themes:
-            selected_nodes = []
-            for node in nodes:
-                props = node.get("properties", {})
-                theme = props.get("theme", "")
-                category = props.get("category", "")
-                if theme in focus_themes or category in focus_themes:
-                    selected_nodes.append(node)
+            index = GraphIndex.of(graph_data)
+            positions = set()
+            for theme in focus_themes:
+                for key in ("theme", "category"):
+                    positions.update(index.position[node_id] for node_id in index.ids_where(key, theme))
+            selected_positions = sorted(positions)
             
             # 如果找到的不够，补充其他节点
-            if len(selected_nodes) < max_concepts:
-                for node in nodes:
-                    if node not in selected_nodes:
-                        selected_nodes.append(node)
-                        if len(selected_nodes) >= max_concepts:
+            if len(selected_positions) < max_concepts:
+                for i in range(len(nodes)):
+                    if i not in positions:
+                        selected_positions.append(i)
+                        if len(selected_positions) >= max_concepts:
                             break
+            selected_nodes = [nodes[i] for i in selected_positions]
         else:
             selected_nodes = nodes[:max_concepts]
         
@@ -192,7 +191,7 @@ class KnowledgeGraphProcessor:
         context = "以下是知识图谱中的关键概念：\n\n"
         for i, node in enumerate(selected_nodes, 1):
             label = node.get("label", "未知")
-            desc = node.get("properties", {}).get("description", "")
+            desc = (node.get("properties") or {}).get("description", "")
             context += f"{i}. **{label}**\n"
             context += f"   {desc}\n\n"
         
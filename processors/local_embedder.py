@@ -0,0 +1,192 @@
+"""
+Local Offline Embedder
+
+Hashed character n-gram TF-IDF followed by truncated SVD (latent semantic
+analysis), computed with numpy only. Character n-grams need no tokenizer, so
+Chinese labels and descriptions work out of the box, and shared terms such as
+"函数"/"运动"/"向量" across subjects produce similar vectors.
+
+    embedder = LocalEmbedder(dim=256).fit(texts)
+    vectors = embedder.transform(["概念: 匀变速直线运动"])
+    embedder.save("output/embeddings/local_embedder.npz")
+
+No network access or API key is needed; transform runs at thousands of texts
+per second on one CPU core.
+"""
+from typing import List, Tuple, Optional
+from pathlib import Path
+import hashlib
+import json
+import zlib
+import numpy as np
+from core.atomic_io import atomic_open
+
+
+class LocalEmbedder:
+    """Hashed char n-gram TF-IDF + randomized SVD embedder"""
+
+    def __init__(
+        self,
+        dim: int = 256,
+        ngram_range: Tuple[int, int] = (1, 3),
+        n_buckets: int = 2 ** 20,
+        n_iter: int = 4,
+        seed: int = 42
+    ):
+        """
+        Args:
+            dim: Output dimension (capped by corpus size)
+            ngram_range: Min and max character n-gram length
+            n_buckets: Hash space for n-grams
+            n_iter: Power iterations of the randomized SVD
+            seed: Random seed
+        """
+        self.dim = dim
+        self.ngram_range = tuple(ngram_range)
+        self.n_buckets = n_buckets
+        self.n_iter = n_iter
+        self.seed = seed
+
+        # Fitted state
+        self.buckets: Optional[np.ndarray] = None     # sorted hash buckets seen in the corpus
+        self.idf: Optional[np.ndarray] = None         # idf per bucket column
+        self.components: Optional[np.ndarray] = None  # (dim, n_columns)
+
+    # ---------- features ----------
+
+    def _ngram_counts(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Hashed character n-gram buckets of a text and their counts"""
+        text = " ".join(text.lower().split())
+        lo, hi = self.ngram_range
+        grams = [text[i:i + n] for n in range(lo, hi + 1) for i in range(len(text) - n + 1)]
+        if not grams:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        hashes = np.fromiter(
+            (zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.int64, count=len(grams)
+        ) % self.n_buckets
+        buckets, counts = np.unique(hashes, return_counts=True)
+        return buckets, counts.astype(np.float32)
+
+    def _tfidf(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Sparse, L2-normalized TF-IDF rows over the fitted bucket columns (COO)
+
+        Returns:
+            (rows, cols, values)
+        """
+        rows, cols, vals = [], [], []
+        for r, text in enumerate(texts):
+            buckets, counts = self._ngram_counts(text)
+            pos = np.searchsorted(self.buckets, buckets)
+            pos = np.minimum(pos, len(self.buckets) - 1)
+            known = self.buckets[pos] == buckets
+            c = pos[known]
+            v = (1.0 + np.log(counts[known])) * self.idf[c]
+            norm = np.linalg.norm(v)
+            if norm > 0:
+                v = v / norm
+            rows.append(np.full(len(c), r, dtype=np.int64))
+            cols.append(c)
+            vals.append(v.astype(np.float32))
+        if not rows:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.float32)
+        return np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+
+    @staticmethod
+    def _spmm(index: np.ndarray, other: np.ndarray, vals: np.ndarray, dense: np.ndarray, n_out: int) -> np.ndarray:
+        """
+        Sparse (COO) times dense: out[index] += vals * dense[other]
+
+        Used both for X @ D (index=rows, other=cols) and X.T @ D (index=cols, other=rows).
+        """
+        out = np.zeros((n_out, dense.shape[1]), dtype=np.float32)
+        if len(vals) == 0:
+            return out
+        order = np.argsort(index, kind='stable')
+        index, other, vals = index[order], other[order], vals[order]
+        starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+        out[index[starts]] = np.add.reduceat(vals[:, None] * dense[other], starts, axis=0)
+        return out
+
+    # ---------- fit / transform ----------
+
+    def fit(self, texts: List[str]) -> "LocalEmbedder":
+        """
+        Learn IDF weights and SVD components from a corpus
+
+        Args:
+            texts: Corpus (e.g. every node text of every subject graph)
+        """
+        doc_buckets = [self._ngram_counts(t)[0] for t in texts]
+        all_buckets = np.concatenate(doc_buckets) if doc_buckets else np.zeros(0, np.int64)
+        self.buckets, df = np.unique(all_buckets, return_counts=True)
+        n_docs = len(texts)
+        self.idf = (np.log((1.0 + n_docs) / (1.0 + df)) + 1.0).astype(np.float32)
+
+        rows, cols, vals = self._tfidf(texts)
+        n_cols = len(self.buckets)
+        k = max(1, min(self.dim, n_docs, n_cols))
+
+        # Randomized SVD (Halko et al.) on the sparse TF-IDF matrix
+        rng = np.random.default_rng(self.seed)
+        omega = rng.standard_normal((n_cols, min(k + 10, n_cols))).astype(np.float32)
+        y = self._spmm(rows, cols, vals, omega, n_docs)
+        for _ in range(self.n_iter):
+            q, _ = np.linalg.qr(y)
+            z = self._spmm(cols, rows, vals, q, n_cols)
+            q, _ = np.linalg.qr(z)
+            y = self._spmm(rows, cols, vals, q, n_docs)
+        q, _ = np.linalg.qr(y)
+        b = self._spmm(cols, rows, vals, q, n_cols).T          # (k', n_cols) = Q^T X
+        _, _, vt = np.linalg.svd(b, full_matrices=False)
+        self.components = np.ascontiguousarray(vt[:k], dtype=np.float32)
+        return self
+
+    def transform(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts
+
+        Returns:
+            (len(texts), dim) float32 array of L2-normalized vectors
+        """
+        if self.components is None:
+            raise RuntimeError("LocalEmbedder is not fitted; call fit() or load() first")
+        rows, cols, vals = self._tfidf(texts)
+        vectors = self._spmm(rows, cols, vals, self.components.T, len(texts))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the fitted model (part of the embedding cache key)"""
+        h = hashlib.sha256(json.dumps(self._params()).encode('utf-8'))
+        for array in (self.buckets, self.idf, self.components):
+            h.update(np.ascontiguousarray(array).tobytes())
+        return h.hexdigest()
+
+    # ---------- persistence ----------
+
+    def _params(self) -> dict:
+        return {"dim": self.dim, "ngram_range": list(self.ngram_range), "n_buckets": self.n_buckets,
+                "n_iter": self.n_iter, "seed": self.seed}
+
+    def save(self, path: Path) -> Path:
+        """Save the fitted model as .npz (atomically replaced)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_open(path, 'wb') as f:
+            np.savez(f, buckets=self.buckets, idf=self.idf, components=self.components,
+                     params=np.array(json.dumps(self._params())))
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "LocalEmbedder":
+        """Load a fitted model"""
+        with np.load(Path(path)) as data:
+            params = json.loads(str(data["params"]))
+            embedder = cls(**params)
+            embedder.buckets = data["buckets"]
+            embedder.idf = data["idf"]
+            embedder.components = data["components"]
+        return embedder
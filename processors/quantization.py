@@ -0,0 +1,270 @@
+"""
+Quantized Embedding Indexes with Exact Re-Ranking
+
+Compact codes for a domain's embedding table, scanned to build a shortlist
+that is then re-scored with the original float vectors:
+
+1. int8   - symmetric per-dimension scalar quantization of the unit vectors
+             (1 byte per dimension, 4x smaller than float32)
+2. binary - sign bits of randomly rotated unit vectors (SimHash), packed into
+             uint8 (1 bit per dimension, 32x smaller); candidates are ranked
+             by Hamming distance (XOR + popcount over 64-bit words)
+
+The random rotation spreads variance evenly over the bits; without it, sign
+bits of SVD-style embeddings (e.g. the local backend, whose leading components
+carry most of the signal) are dominated by low-variance noise dimensions.
+
+The float table is usually a read-only memmap (see EmbeddingTable), so the
+exact re-ranking only pages in the shortlisted rows. QuantizedIndex has the
+same build/query/save/load interface as AnnIndex, so it can be used wherever
+an ANN index is expected (e.g. SemanticProcessor.candidate_pairs).
+"""
+from typing import Optional, Tuple
+from pathlib import Path
+import json
+import time
+import zipfile
+import numpy as np
+from core.atomic_io import atomic_open, atomic_write_text
+from processors.embedding_table import EmbeddingTable
+from processors.ann_index import table_digest
+
+
+QUANTIZATION_METHODS = ("int8", "binary")
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(x: np.ndarray) -> np.ndarray:
+        """Set bits per uint64 word, via a byte lookup table"""
+        return _POPCOUNT_TABLE[x.view(np.uint8)].reshape(x.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+def _normalized(matrix: np.ndarray) -> np.ndarray:
+    """Row-normalize as float32"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _merge_shortlist(
+    scores: np.ndarray,
+    rows: np.ndarray,
+    new_scores: np.ndarray,
+    offset: int,
+    size: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the best `size` entries per query across the running shortlist and a new block"""
+    new_rows = np.broadcast_to(np.arange(offset, offset + new_scores.shape[1]), new_scores.shape)
+    all_scores = np.concatenate([scores, new_scores], axis=1)
+    all_rows = np.concatenate([rows, new_rows], axis=1)
+    if all_scores.shape[1] > size:
+        keep = np.argpartition(-all_scores, size - 1, axis=1)[:, :size]
+        all_scores = np.take_along_axis(all_scores, keep, axis=1)
+        all_rows = np.take_along_axis(all_rows, keep, axis=1)
+    return all_scores, all_rows
+
+
+class QuantizedIndex:
+    """Quantized codes of one domain's embedding table (cosine similarity)"""
+
+    def __init__(self, table: EmbeddingTable, backend: str = "int8", **params):
+        """
+        Create an (unbuilt) index
+
+        Args:
+            table: Embedding table to quantize
+            backend: 'int8' or 'binary'
+            **params: rerank (shortlist = rerank * k, default 10 for int8 and 30 for binary),
+                block_size (code rows scanned at a time, 16384), seed (binary rotation, 42)
+        """
+        if backend not in QUANTIZATION_METHODS:
+            raise ValueError(f"Unknown quantization {backend}, expected one of {QUANTIZATION_METHODS}")
+        self.table = table
+        self.backend = backend
+        self.params = params
+        self.digest = table_digest(table)
+        self.codes: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None    # int8: per-dimension step
+        self.rotation: Optional[np.ndarray] = None  # binary: random orthogonal (dim, dim), from seed
+        self._inv_norms: Optional[np.ndarray] = None
+
+    # ---------- build ----------
+
+    def build(self) -> "QuantizedIndex":
+        """Quantize the table"""
+        start = time.time()
+        n, dim = len(self.table), self.table.dim
+        chunk = 65536
+
+        if self.backend == "int8":
+            # Per-dimension scale from the largest magnitude over all unit vectors
+            max_abs = np.zeros(dim, dtype=np.float32)
+            for i in range(0, n, chunk):
+                np.maximum(max_abs, np.abs(_normalized(self.table.matrix[i:i + chunk])).max(axis=0), out=max_abs)
+            max_abs[max_abs == 0] = 1.0
+            self.scale = (max_abs / 127.0).astype(np.float32)
+            self.codes = np.empty((n, dim), dtype=np.int8)
+            for i in range(0, n, chunk):
+                block = _normalized(self.table.matrix[i:i + chunk]) / self.scale
+                self.codes[i:i + chunk] = np.clip(np.rint(block), -127, 127)
+        else:
+            self.rotation = self._rotation(dim)
+            self.codes = np.empty((n, (dim + 63) // 64 * 8), dtype=np.uint8)
+            for i in range(0, n, chunk):
+                self.codes[i:i + chunk] = self._pack(_normalized(self.table.matrix[i:i + chunk]))
+
+        print(f"✓ Built {self.backend} codes for {n} vectors in {time.time() - start:.2f}s "
+              f"({self.memory_bytes / 1e6:.1f}MB vs {n * dim * 4 / 1e6:.1f}MB float32)")
+        return self
+
+    @property
+    def memory_bytes(self) -> int:
+        """Size of the per-vector codes (and int8 scales) in bytes"""
+        total = self.codes.nbytes if self.codes is not None else 0
+        return total + (self.scale.nbytes if self.scale is not None else 0)
+
+    def _rotation(self, dim: int) -> np.ndarray:
+        """Random orthogonal matrix, regenerated from the seed instead of being stored"""
+        rng = np.random.default_rng(self.params.get("seed", 42))
+        q, r = np.linalg.qr(rng.standard_normal((dim, dim)))
+        return (q * np.sign(np.diag(r))).astype(np.float32)
+
+    def _pack(self, unit_vectors: np.ndarray) -> np.ndarray:
+        """Sign bits of rotated vectors, zero-padded to whole 64-bit words"""
+        bits = np.packbits(unit_vectors @ self.rotation > 0, axis=1)
+        padded = np.zeros((len(bits), (bits.shape[1] + 7) // 8 * 8), dtype=np.uint8)
+        padded[:, :bits.shape[1]] = bits
+        return padded
+
+    # ---------- query ----------
+
+    def _approximate_scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Approximate similarity of each query to a block of codes (higher is better)"""
+        if self.backend == "int8":
+            return (queries * self.scale) @ codes.T.astype(np.float32)
+        query_words = self._pack(queries).view(np.uint64)
+        # One (queries x codes) XOR + popcount per 64-bit word keeps every temporary 2-D
+        code_words = np.ascontiguousarray(np.ascontiguousarray(codes).view(np.uint64).T)
+        hamming = np.zeros((len(queries), len(codes)), dtype=np.int32)
+        for w in range(code_words.shape[0]):
+            hamming += _popcount(query_words[:, w, None] ^ code_words[w][None, :])
+        return -hamming.astype(np.float32)
+
+    def shortlist(self, queries: np.ndarray, size: int) -> np.ndarray:
+        """
+        Rows of the `size` best candidates per query by approximate score
+
+        Returns:
+            (n_queries, size) row indices (unordered)
+        """
+        n = len(self.table)
+        size = min(size, n)
+        block_size = self.params.get("block_size", 16384)
+        query_block = 1024
+
+        result = np.empty((len(queries), size), dtype=np.int64)
+        for q0 in range(0, len(queries), query_block):
+            q = queries[q0:q0 + query_block]
+            best_scores = np.empty((len(q), 0), dtype=np.float32)
+            best_rows = np.empty((len(q), 0), dtype=np.int64)
+            for b0 in range(0, n, block_size):
+                scores = self._approximate_scores(q, self.codes[b0:b0 + block_size])
+                best_scores, best_rows = _merge_shortlist(best_scores, best_rows, scores, b0, size)
+            result[q0:q0 + len(q)] = best_rows
+        return result
+
+    def query(self, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k neighbours: quantized shortlist, then exact float re-ranking
+
+        Args:
+            vectors: (n, d) query vectors
+            k: Number of neighbours
+
+        Returns:
+            (scores, rows): (n, k) exact cosine similarities and row indices, best first
+        """
+        queries = _normalized(np.atleast_2d(vectors))
+        k = min(k, len(self.table))
+        if k == 0:
+            return np.zeros((len(queries), 0), np.float32), np.zeros((len(queries), 0), np.int64)
+        if self._inv_norms is None:
+            norms = np.concatenate([
+                np.linalg.norm(np.asarray(self.table.matrix[i:i + 65536], dtype=np.float32), axis=1)
+                for i in range(0, len(self.table), 65536)
+            ])
+            norms[norms == 0] = 1.0
+            self._inv_norms = (1.0 / norms).astype(np.float32)
+
+        rerank = self.params.get("rerank", 10 if self.backend == "int8" else 30)
+        candidates = self.shortlist(queries, max(k, rerank * k))
+
+        scores = np.empty((len(queries), k), dtype=np.float32)
+        rows = np.empty((len(queries), k), dtype=np.int64)
+        for q, cand in enumerate(candidates):
+            # Sorted order keeps memory-mapped reads sequential
+            cand = np.sort(cand)
+            sims = (np.asarray(self.table.matrix[cand], dtype=np.float32) @ queries[q]) * self._inv_norms[cand]
+            best = np.argpartition(-sims, k - 1)[:k]
+            best = best[np.argsort(-sims[best], kind='stable')]
+            scores[q], rows[q] = sims[best], cand[best]
+        return scores, rows
+
+    # ---------- persistence ----------
+
+    def save(self, path: Path) -> Path:
+        """
+        Persist the codes (.npz) and metadata (.meta.json)
+
+        Both files are replaced atomically and the metadata is written last, so
+        an interrupted save leaves no metadata and load() returns None.
+
+        Args:
+            path: Path prefix, e.g. output/embeddings/math_int8
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data_path = path.with_name(f"{path.name}.npz")
+        meta_path = path.with_name(f"{path.name}.meta.json")
+        meta_path.unlink(missing_ok=True)
+        with atomic_open(data_path, 'wb') as f:
+            arrays = {"codes": self.codes}
+            if self.scale is not None:
+                arrays["scale"] = self.scale
+            np.savez(f, **arrays)
+        atomic_write_text(meta_path, json.dumps(
+            {"backend": self.backend, "params": self.params, "digest": self.digest,
+             "size": len(self.table), "dim": self.table.dim}, indent=2))
+        return data_path
+
+    @classmethod
+    def load(cls, path: Path, table: EmbeddingTable) -> Optional["QuantizedIndex"]:
+        """
+        Load persisted codes for a table
+
+        Returns:
+            The index, or None if missing, unreadable or built from different vectors
+        """
+        path = Path(path)
+        meta_path = path.with_name(f"{path.name}.meta.json")
+        data_path = path.with_name(f"{path.name}.npz")
+        if not meta_path.exists() or not data_path.exists():
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta["backend"] not in QUANTIZATION_METHODS or meta["digest"] != table_digest(table):
+            return None
+        index = cls(table, meta["backend"], **meta["params"])
+        if index.backend == "binary":
+            index.rotation = index._rotation(meta["dim"])
+        try:
+            with np.load(data_path) as data:
+                index.codes = data["codes"]
+                index.scale = data["scale"] if "scale" in data else None
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+        return index
@@ -2,42 +2,151 @@
 Semantic Processor for Knowledge Graph Nodes
 
 Features:
-1. Generate embeddings for all nodes using OpenAI/Gemini API
-2. Calculate cross-domain similarity matrix
-3. Intelligent sampling based on semantic similarity
+1. Generate embeddings for all nodes using OpenAI/Gemini API, or fully offline
+   with a local hashed char n-gram TF-IDF + SVD model
+   (cached per text content, so only new or edited nodes are embedded)
+   and keep them as memory-mapped .npy tables
+2. Calculate cross-domain similarity matrix (dense, or blocked out-of-core top-k)
+3. Intelligent sampling based on semantic similarity (top-k or diversity-aware MMR)
+4. ANN-based candidate pair generation for large graphs
+   (or int8 / binary quantized scans with exact re-ranking)
 """
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional, Union, Iterable
+from concurrent.futures import ThreadPoolExecutor
 import json
 import numpy as np
 from pathlib import Path
 import os
-from openai import OpenAI
-from core.gemini_client import get_gemini_client
-import pickle
+import time
+from processors.embedding_cache import EmbeddingCache, embedding_key
+from processors.embedding_table import EmbeddingTable
+from processors.blocked_similarity import blocked_similarity, load_blocked_similarity, pairs_from_row_topk
+from processors.ann_index import AnnIndex, recall_at_k
+from processors.quantization import QuantizedIndex, QUANTIZATION_METHODS
+from processors.local_embedder import LocalEmbedder
+from processors.diverse_selection import mmr_select, group_codes, node_groups
+from core.pair_space import PairSpace
+import hashlib
+
+
+BACKEND_GEMINI = "gemini"
+BACKEND_OPENAI = "openai"
+BACKEND_LOCAL = "local"
+
+# Default corpus for fitting the local model: every subject graph in the dataset
+DEFAULT_LOCAL_CORPUS_DIR = Path(__file__).parent.parent / "dataset" / "graph"
 
 
 class SemanticProcessor:
     """Process semantic embeddings and similarity for knowledge graph nodes"""
     
-    def __init__(self, use_gemini: bool = True, cache_dir: str = "output/embeddings"):
+    def __init__(
+        self,
+        use_gemini: bool = True,
+        cache_dir: str = "output/embeddings",
+        batch_size: int = 64,
+        max_workers: int = 4,
+        max_retries: int = 3,
+        client: Optional[Any] = None,
+        embedding_dtype: str = "float32",
+        backend: Optional[str] = None,
+        local_dim: int = 256
+    ):
         """
         Initialize semantic processor
         
         Args:
-            use_gemini: Use Gemini API if True, otherwise OpenAI
+            use_gemini: Use Gemini API if True, otherwise OpenAI (ignored when backend is given)
             cache_dir: Directory to cache embeddings
+            batch_size: Number of texts sent in one embedding request
+            max_workers: Number of batches dispatched concurrently
+            max_retries: Retries per batch before it is split to isolate failures
+            client: Pre-built embedding client (optional, overrides use_gemini's default client)
+            embedding_dtype: Storage dtype of domain embedding tables ('float32' or 'float16')
+            backend: 'gemini', 'openai' or 'local' (offline, no API key needed)
+            local_dim: Embedding dimension of the local backend
         """
-        self.use_gemini = use_gemini
+        self.backend = backend or (BACKEND_GEMINI if use_gemini else BACKEND_OPENAI)
+        if self.backend not in (BACKEND_GEMINI, BACKEND_OPENAI, BACKEND_LOCAL):
+            raise ValueError(f"Unknown embedding backend: {self.backend}")
+        self.use_gemini = self.backend == BACKEND_GEMINI
+        self.local_dim = local_dim
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Initialize client
-        if use_gemini:
-            self.client = get_gemini_client()
-        else:
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max(0, max_retries)
+        self.embedding_model = {
+            BACKEND_GEMINI: "models/text-embedding-004",
+            BACKEND_OPENAI: "text-embedding-3-small",
+        }.get(self.backend)
+        self.embedding_dtype = embedding_dtype
+        
+        # Content-hash cache shared by all domains
+        self.embedding_cache = EmbeddingCache(self.cache_dir / "embedding_cache.sqlite")
+        
+        # Initialize client (API SDKs are imported only when their backend is used)
+        if client is not None:
+            self.client = client
+        elif self.backend == BACKEND_GEMINI:
+            self.client = self._create_gemini_client()
+        elif self.backend == BACKEND_OPENAI:
+            from openai import OpenAI
             self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        else:
+            self.client = self._load_local_embedder()
+        
+        if self.backend == BACKEND_LOCAL:
+            # The fitted model is part of the cache key, so refitting never reuses stale vectors
+            self.embedding_model = f"local-tfidf-svd-{self.client.fingerprint[:16]}"
+        
+        print(f"✓ SemanticProcessor initialized ({self.backend}: {self.embedding_model})")
+    
+    @staticmethod
+    def _create_gemini_client():
+        """Configure the google.generativeai module, which provides embed_content"""
+        import google.generativeai as genai
+        from config import Config
+        genai.configure(api_key=Config.GEMINI_API_KEY)
+        return genai
+    
+    def _load_local_embedder(self) -> LocalEmbedder:
+        """Load the saved local model, or fit it on the dataset graphs"""
+        model_path = self.cache_dir / "local_embedder.npz"
+        if model_path.exists():
+            embedder = LocalEmbedder.load(model_path)
+            if embedder.dim == self.local_dim:
+                return embedder
+        
+        graphs = []
+        for graph_file in sorted(DEFAULT_LOCAL_CORPUS_DIR.glob("*.json")):
+            with open(graph_file, 'r', encoding='utf-8') as f:
+                graph = json.load(f)
+            if isinstance(graph, dict) and graph.get('nodes'):
+                graphs.append(graph)
+        return self.fit_local_model(graphs, client=False)
+    
+    def fit_local_model(self, graphs: List[Dict[str, Any]], client: bool = True) -> LocalEmbedder:
+        """
+        Fit the local embedding model on the node texts of the given graphs
+        
+        Fit on all domains together so their vectors share one space.
         
-        print(f"✓ SemanticProcessor initialized ({'Gemini' if use_gemini else 'OpenAI'})")
+        Args:
+            graphs: Knowledge graphs whose node texts form the corpus
+            client: Also switch this processor to the new model
+            
+        Returns:
+            The fitted model (saved to {cache_dir}/local_embedder.npz)
+        """
+        texts = [self._get_node_text(node) for graph in graphs for node in graph.get('nodes', [])]
+        print(f"Fitting local embedding model on {len(texts)} node texts...")
+        embedder = LocalEmbedder(dim=self.local_dim).fit(texts)
+        embedder.save(self.cache_dir / "local_embedder.npz")
+        if client:
+            self.client = embedder
+            self.embedding_model = f"local-tfidf-svd-{embedder.fingerprint[:16]}"
+        return embedder
     
     def _get_node_text(self, node: Dict[str, Any]) -> str:
         """
@@ -55,13 +164,13 @@ class SemanticProcessor:
         if 'label' in node:
             parts.append(f"概念: {node['label']}")
         
-        # Add description
-        if 'properties' in node and 'description' in node['properties']:
-            parts.append(f"描述: {node['properties']['description']}")
+        # Add description (properties may be null in pipeline output graphs)
+        props = node.get('properties') or {}
+        if 'description' in props:
+            parts.append(f"描述: {props['description']}")
         
         # Add category/theme
-        if 'properties' in node:
-            props = node['properties']
+        if props:
             if 'category' in props:
                 parts.append(f"分类: {props['category']}")
             if 'theme' in props:
@@ -75,7 +184,7 @@ class SemanticProcessor:
     def _get_embedding_openai(self, text: str) -> List[float]:
         """Get embedding using OpenAI API"""
         response = self.client.embeddings.create(
-            model="text-embedding-3-small",
+            model=self.embedding_model,
             input=text
         )
         return response.data[0].embedding
@@ -83,81 +192,220 @@ class SemanticProcessor:
     def _get_embedding_gemini(self, text: str) -> List[float]:
         """Get embedding using Gemini API"""
         result = self.client.embed_content(
-            model="models/text-embedding-004",
+            model=self.embedding_model,
             content=text
         )
         return result['embedding']
     
     def get_embedding(self, text: str) -> List[float]:
         """Get embedding for text"""
+        if self.backend == BACKEND_LOCAL:
+            return self.client.transform([text])[0].tolist()
         if self.use_gemini:
             return self._get_embedding_gemini(text)
         else:
             return self._get_embedding_openai(text)
     
+    def _get_embeddings_openai(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for a list of texts in one OpenAI request"""
+        response = self.client.embeddings.create(
+            model=self.embedding_model,
+            input=texts
+        )
+        # The API may return items out of order; each carries its input index
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+    
+    def _get_embeddings_gemini(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for a list of texts in one Gemini request"""
+        result = self.client.embed_content(
+            model=self.embedding_model,
+            content=texts
+        )
+        return result['embedding']
+    
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for a batch of texts with a single API call"""
+        if self.backend == BACKEND_LOCAL:
+            embeddings = self.client.transform(texts)
+        elif self.use_gemini:
+            embeddings = self._get_embeddings_gemini(texts)
+        else:
+            embeddings = self._get_embeddings_openai(texts)
+        
+        if len(embeddings) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+        return embeddings
+    
+    def _embed_batch_with_retry(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embed one batch, retrying with exponential backoff
+        
+        A batch that keeps failing is split in half and each half retried, so a
+        single bad input only loses its own embedding instead of the whole batch.
+        
+        Returns:
+            Embeddings aligned with texts (None where an input failed)
+        """
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.get_embeddings(texts)
+            except Exception as e:
+                last_error = e
+                if attempt < self.max_retries:
+                    time.sleep(min(2 ** attempt, 30))
+        
+        if len(texts) == 1:
+            print(f"  ✗ Failed to embed text after {self.max_retries + 1} attempts: {last_error}")
+            return [None]
+        
+        mid = len(texts) // 2
+        return self._embed_batch_with_retry(texts[:mid]) + self._embed_batch_with_retry(texts[mid:])
+    
+    def embed_texts(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embed many texts using batched requests dispatched concurrently
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            Embeddings aligned with texts (None for inputs that failed after retries)
+        """
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results: List[Optional[List[float]]] = []
+        done = 0
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # map preserves batch order, so results stay aligned with texts
+            for batch, embeddings in zip(batches, executor.map(self._embed_batch_with_retry, batches)):
+                results.extend(embeddings)
+                done += len(batch)
+                print(f"  Processed {done}/{len(texts)} texts")
+        
+        return results
+    
     def generate_node_embeddings(
         self,
         graph: Dict[str, Any],
         domain: str,
         force_regenerate: bool = False
-    ) -> Dict[str, List[float]]:
+    ) -> EmbeddingTable:
         """
         Generate embeddings for all nodes in a knowledge graph
         
+        Vectors are looked up by hash(embedding model, node text), so only new or
+        edited nodes are sent to the API; unchanged nodes are served from the cache.
+        The result is written to `{cache_dir}/{domain}_embeddings.npy` and returned
+        memory-mapped; if the graph is unchanged that table is reused directly.
+        
         Args:
             graph: Knowledge graph with nodes
             domain: Domain name (e.g., 'physics', 'math')
-            force_regenerate: Force regeneration even if cache exists
+            force_regenerate: Re-embed every node even if its text is cached
             
         Returns:
-            Dictionary mapping node_id to embedding vector
+            EmbeddingTable mapping node_id to embedding vector
         """
-        cache_file = self.cache_dir / f"{domain}_embeddings.pkl"
-        
-        # Load from cache if exists
-        if cache_file.exists() and not force_regenerate:
-            print(f"Loading {domain} embeddings from cache...")
-            with open(cache_file, 'rb') as f:
-                return pickle.load(f)
-        
-        print(f"Generating embeddings for {domain} nodes...")
-        embeddings = {}
         nodes = graph.get('nodes', [])
-        
-        for i, node in enumerate(nodes):
-            node_id = node['id']
-            text = self._get_node_text(node)
-            
+        keys = {
+            node['id']: embedding_key(self.embedding_model, self._get_node_text(node))
+            for node in nodes
+        }
+        digest = hashlib.sha256(
+            "\n".join(f"{node_id}\t{key}" for node_id, key in keys.items()).encode('utf-8')
+        ).hexdigest()
+        table_path = self.cache_dir / f"{domain}_embeddings.npy"
+        
+        # Fast path: the domain table already matches the graph content
+        if not force_regenerate and table_path.exists():
             try:
-                embedding = self.get_embedding(text)
-                embeddings[node_id] = embedding
-                
-                if (i + 1) % 10 == 0:
-                    print(f"  Processed {i + 1}/{len(nodes)} nodes")
+                table = EmbeddingTable.load(table_path)
+                if (table.metadata.get('content_digest') == digest
+                        and str(table.matrix.dtype) == self.embedding_dtype):
+                    print(f"Loaded {len(table)} {domain} embeddings from {table_path}")
+                    return table
+            except (OSError, ValueError, KeyError):
+                pass
+        
+        cached = {} if force_regenerate else self.embedding_cache.get_many(keys.values())
+        missing = [node for node in nodes if keys[node['id']] not in cached]
+        print(f"{domain}: {len(nodes) - len(missing)} embeddings cached, "
+              f"{len(missing)} new or changed nodes to embed")
+        
+        if missing:
+            print(f"Generating embeddings for {domain} nodes "
+                  f"(batch_size={self.batch_size}, max_workers={self.max_workers})...")
+            vectors = self.embed_texts([self._get_node_text(node) for node in missing])
             
-            except Exception as e:
-                print(f"  ✗ Failed to get embedding for {node_id}: {e}")
-                continue
+            new_vectors = {}
+            for node, embedding in zip(missing, vectors):
+                if embedding is None:
+                    print(f"  ✗ Failed to get embedding for {node['id']}")
+                    continue
+                new_vectors[keys[node['id']]] = embedding
+            
+            self.embedding_cache.put_many(self.embedding_model, new_vectors)
+            cached.update(self.embedding_cache.get_many(new_vectors.keys()))
+        
+        ids = [node_id for node_id, key in keys.items() if key in cached]
+        dim = len(cached[keys[ids[0]]]) if ids else 0
+        matrix = np.empty((len(ids), dim), dtype=self.embedding_dtype)
+        for row, node_id in enumerate(ids):
+            matrix[row] = cached[keys[node_id]]
+        
+        # Record which vectors this domain uses, for orphan eviction
+        self.embedding_cache.set_domain_refs(domain, {node_id: keys[node_id] for node_id in ids})
+        
+        table = EmbeddingTable(ids, matrix)
+        if len(ids) == len(keys):
+            # Only a complete table may be reused by the fast path
+            table.metadata = {"content_digest": digest, "model": self.embedding_model}
+        table.save(table_path)
+        
+        print(f"✓ {len(table)} embeddings ready for {domain} ({table_path})")
+        return EmbeddingTable.load(table_path)
+    
+    def load_embedding_table(self, domain: str, mmap: bool = True) -> EmbeddingTable:
+        """
+        Open a domain's saved embedding table without touching the graph or the API
         
-        # Save to cache
-        with open(cache_file, 'wb') as f:
-            pickle.dump(embeddings, f)
+        Args:
+            domain: Domain name (e.g., 'physics', 'math')
+            mmap: Memory-map the matrix instead of reading it into RAM
+        """
+        return EmbeddingTable.load(self.cache_dir / f"{domain}_embeddings.npy", mmap=mmap)
+    
+    def evict_orphan_embeddings(self) -> int:
+        """
+        Delete cached vectors no longer used by any domain's current nodes
         
-        print(f"✓ Generated {len(embeddings)} embeddings for {domain}")
-        return embeddings
+        Returns:
+            Number of vectors deleted
+        """
+        removed = self.embedding_cache.evict_orphans()
+        print(f"✓ Evicted {removed} orphaned embeddings")
+        return removed
+    
+    @staticmethod
+    def _as_table(embeddings: Union[EmbeddingTable, Dict[str, List[float]]]) -> EmbeddingTable:
+        """Wrap a {node_id: vector} dict as an EmbeddingTable (tables pass through)"""
+        if isinstance(embeddings, EmbeddingTable):
+            return embeddings
+        return EmbeddingTable.from_dict({k: embeddings[k] for k in sorted(embeddings)})
     
     def calculate_similarity_matrix(
         self,
-        physics_embeddings: Dict[str, List[float]],
-        math_embeddings: Dict[str, List[float]],
+        physics_embeddings: Union[EmbeddingTable, Dict[str, List[float]]],
+        math_embeddings: Union[EmbeddingTable, Dict[str, List[float]]],
         output_file: str = "output/similarity_matrix.npz"
     ) -> Tuple[np.ndarray, List[str], List[str]]:
         """
         Calculate cosine similarity matrix between physics and math nodes
         
         Args:
-            physics_embeddings: Physics node embeddings
-            math_embeddings: Math node embeddings
+            physics_embeddings: Physics node embeddings (EmbeddingTable or dict)
+            math_embeddings: Math node embeddings (EmbeddingTable or dict)
             output_file: File to save the matrix
             
         Returns:
@@ -165,13 +413,14 @@ class SemanticProcessor:
         """
         print("Calculating similarity matrix...")
         
-        # Get sorted node IDs
-        physics_ids = sorted(physics_embeddings.keys())
-        math_ids = sorted(math_embeddings.keys())
+        # Tables are used in row order; plain dicts are packed in sorted id order
+        physics_table = self._as_table(physics_embeddings)
+        math_table = self._as_table(math_embeddings)
+        physics_ids = physics_table.ids
+        math_ids = math_table.ids
         
-        # Convert to numpy arrays
-        physics_matrix = np.array([physics_embeddings[pid] for pid in physics_ids])
-        math_matrix = np.array([math_embeddings[mid] for mid in math_ids])
+        physics_matrix = physics_table.as_float32()
+        math_matrix = math_table.as_float32()
         
         # Normalize vectors
         physics_norm = physics_matrix / np.linalg.norm(physics_matrix, axis=1, keepdims=True)
@@ -181,17 +430,187 @@ class SemanticProcessor:
         similarity_matrix = np.dot(physics_norm, math_norm.T)
         
         # Save matrix
+        self._save_similarity_matrix(output_file, similarity_matrix, physics_ids, math_ids, physics_matrix.shape[1])
+        
+        print(f"✓ Similarity matrix shape: {similarity_matrix.shape}")
+        print(f"✓ Saved to: {output_file}")
+        
+        return similarity_matrix, physics_ids, math_ids
+    
+    def update_similarity_matrix(
+        self,
+        physics_embeddings: Union[EmbeddingTable, Dict[str, List[float]]],
+        math_embeddings: Union[EmbeddingTable, Dict[str, List[float]]],
+        changed_physics: Iterable[str] = (),
+        changed_math: Iterable[str] = (),
+        previous_file: str = "output/similarity_matrix.npz",
+        output_file: Optional[str] = None
+    ) -> Tuple[np.ndarray, List[str], List[str]]:
+        """
+        Incrementally update a saved similarity matrix after graph edits
+        
+        Cells of nodes present in the previous matrix and not listed as changed
+        are copied over; only the rows of new/changed physics nodes and the
+        columns of new/changed math nodes are recomputed. Removed nodes drop out.
+        Falls back to calculate_similarity_matrix when there is no previous matrix
+        or it was built with a different embedding model or dimension.
+        
+        Args:
+            physics_embeddings: Current physics node embeddings
+            math_embeddings: Current math node embeddings
+            changed_physics: Physics node ids whose content changed
+            changed_math: Math node ids whose content changed
+            previous_file: Matrix saved by a previous run
+            output_file: Where to save the result (defaults to previous_file)
+            
+        Returns:
+            Tuple of (similarity_matrix, physics_node_ids, math_node_ids)
+        """
+        output_file = output_file or previous_file
+        if not Path(previous_file).exists():
+            return self.calculate_similarity_matrix(physics_embeddings, math_embeddings, output_file)
+        
+        physics_table = self._as_table(physics_embeddings)
+        math_table = self._as_table(math_embeddings)
+        physics_ids, math_ids = physics_table.ids, math_table.ids
+        
+        with np.load(previous_file) as previous:
+            old_model = str(previous["embedding_model"]) if "embedding_model" in previous else None
+            old_dim = int(previous["embedding_dim"]) if "embedding_dim" in previous else None
+            old_matrix = previous["similarity"]
+            old_physics = {node_id: i for i, node_id in enumerate(previous["physics_ids"].tolist())}
+            old_math = {node_id: j for j, node_id in enumerate(previous["math_ids"].tolist())}
+        
+        # Cells from another backend/model (or an unrecorded one) are not comparable
+        if old_model != self.embedding_model or old_dim != physics_table.dim:
+            print(f"Previous matrix was built with {old_model} (dim {old_dim}), "
+                  f"now {self.embedding_model} (dim {physics_table.dim}): recomputing in full")
+            return self.calculate_similarity_matrix(physics_table, math_table, output_file)
+        
+        changed_physics, changed_math = set(changed_physics), set(changed_math)
+        keep_rows = [(i, old_physics[node_id]) for i, node_id in enumerate(physics_ids)
+                     if node_id in old_physics and node_id not in changed_physics]
+        keep_cols = [(j, old_math[node_id]) for j, node_id in enumerate(math_ids)
+                     if node_id in old_math and node_id not in changed_math]
+        kept_rows = {i for i, _ in keep_rows}
+        kept_cols = {j for j, _ in keep_cols}
+        new_rows = np.array([i for i in range(len(physics_ids)) if i not in kept_rows], dtype=np.int64)
+        new_cols = np.array([j for j in range(len(math_ids)) if j not in kept_cols], dtype=np.int64)
+        
+        physics_matrix = physics_table.as_float32()
+        math_matrix = math_table.as_float32()
+        physics_norm = physics_matrix / np.linalg.norm(physics_matrix, axis=1, keepdims=True)
+        math_norm = math_matrix / np.linalg.norm(math_matrix, axis=1, keepdims=True)
+        
+        similarity_matrix = np.empty((len(physics_ids), len(math_ids)), dtype=np.float32)
+        if keep_rows and keep_cols:
+            rows_new, rows_old = (np.array(x) for x in zip(*keep_rows))
+            cols_new, cols_old = (np.array(x) for x in zip(*keep_cols))
+            similarity_matrix[np.ix_(rows_new, cols_new)] = old_matrix[np.ix_(rows_old, cols_old)]
+        if len(new_rows):
+            similarity_matrix[new_rows] = physics_norm[new_rows] @ math_norm.T
+        if len(new_cols):
+            similarity_matrix[:, new_cols] = physics_norm @ math_norm[new_cols].T
+        
+        self._save_similarity_matrix(output_file, similarity_matrix, physics_ids, math_ids, physics_matrix.shape[1])
+        
+        total = similarity_matrix.size
+        recomputed = len(new_rows) * len(math_ids) + len(new_cols) * len(physics_ids) - len(new_rows) * len(new_cols)
+        print(f"✓ Similarity matrix {similarity_matrix.shape}: recomputed {len(new_rows)} rows, "
+              f"{len(new_cols)} columns ({recomputed / max(total, 1):.1%} of cells)")
+        print(f"✓ Saved to: {output_file}")
+        
+        return similarity_matrix, physics_ids, math_ids
+    
+    def _save_similarity_matrix(
+        self,
+        output_file: str,
+        similarity_matrix: np.ndarray,
+        physics_ids: List[str],
+        math_ids: List[str],
+        dim: int
+    ):
+        """Save a dense matrix with the embedding model and dimension it was built from"""
         np.savez_compressed(
             output_file,
             similarity=similarity_matrix,
             physics_ids=physics_ids,
-            math_ids=math_ids
+            math_ids=math_ids,
+            embedding_model=str(self.embedding_model),
+            embedding_dim=dim
         )
+    
+    def calculate_similarity_blocked(
+        self,
+        physics_embeddings: Union[EmbeddingTable, Dict[str, List[float]]],
+        math_embeddings: Union[EmbeddingTable, Dict[str, List[float]]],
+        output_dir: str = "output/similarity_blocked",
+        top_k: int = 50,
+        threshold: Optional[float] = None,
+        block_size: int = 2048,
+        n_threads: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Calculate cross-domain similarities tile by tile without the dense P×M matrix
         
-        print(f"✓ Similarity matrix shape: {similarity_matrix.shape}")
-        print(f"✓ Saved to: {output_file}")
+        Keeps a running top-k per physics node and per math node (and optionally all
+        entries >= threshold as sparse COO), streaming results to output_dir.
+        Memory is bounded by the block size, not by P×M.
         
-        return similarity_matrix, physics_ids, math_ids
+        Args:
+            physics_embeddings: Physics node embeddings (EmbeddingTable or dict)
+            math_embeddings: Math node embeddings (EmbeddingTable or dict)
+            output_dir: Directory for the results
+            top_k: Neighbours kept per node
+            threshold: Also keep every similarity >= threshold as COO (optional)
+            block_size: Tile edge length
+            n_threads: BLAS thread count (None = all cores)
+            
+        Returns:
+            Result dictionary (see load_blocked_similarity), arrays memory-mapped
+        """
+        physics_table = self._as_table(physics_embeddings)
+        math_table = self._as_table(math_embeddings)
+        print(f"Calculating blocked similarity {len(physics_table)}×{len(math_table)} "
+              f"(block_size={block_size}, top_k={top_k}, threshold={threshold})...")
+        
+        manifest = blocked_similarity(
+            physics_table.matrix,
+            math_table.matrix,
+            output_dir,
+            top_k=top_k,
+            threshold=threshold,
+            block_size=block_size,
+            n_threads=n_threads,
+            physics_ids=physics_table.ids,
+            math_ids=math_table.ids
+        )
+        
+        print(f"✓ Blocked similarity done in {manifest['seconds']}s")
+        if threshold is not None:
+            print(f"✓ {manifest['nnz']} entries >= {threshold}")
+        print(f"✓ Saved to: {output_dir}")
+        return load_blocked_similarity(output_dir)
+    
+    def get_top_similar_pairs_blocked(
+        self,
+        result: Dict[str, Any],
+        top_k: int = 300,
+        min_similarity: float = 0.3,
+        max_per_physics: Optional[int] = None
+    ) -> List[Tuple[str, str, float]]:
+        """
+        Top similar pairs from a calculate_similarity_blocked result
+        
+        Same output as get_top_similar_pairs on the dense matrix, provided
+        max_per_physics (or top_k when uncapped) is at most the computed per-node k.
+        """
+        pairs = pairs_from_row_topk(
+            result, result["physics_ids"], result["math_ids"],
+            top_k=top_k, min_similarity=min_similarity, max_per_physics=max_per_physics
+        )
+        print(f"✓ Found {len(pairs)} pairs with similarity >= {min_similarity}")
+        return pairs
     
     def get_top_similar_pairs(
         self,
@@ -199,53 +618,289 @@ class SemanticProcessor:
         physics_ids: List[str],
         math_ids: List[str],
         top_k: int = 300,
-        min_similarity: float = 0.3
+        min_similarity: float = 0.3,
+        max_per_physics: Optional[int] = None,
+        block_rows: int = 1024
     ) -> List[Tuple[str, str, float]]:
         """
         Get top K most similar node pairs based on semantic similarity
         
+        Rows are scanned in blocks; each block keeps only its best candidates per
+        row via argpartition (no full sort of the P×M matrix), and the running pool
+        is trimmed back to top_k after every block, so extra memory stays bounded
+        by the block size.
+        
         Args:
             similarity_matrix: Precomputed similarity matrix
             physics_ids: List of physics node IDs
             math_ids: List of math node IDs
             top_k: Number of top pairs to return
             min_similarity: Minimum similarity threshold
+            max_per_physics: At most this many math partners per physics node (optional)
+            block_rows: Number of matrix rows processed at a time
             
         Returns:
-            List of (physics_id, math_id, similarity_score) tuples
+            List of (physics_id, math_id, similarity_score) tuples, best first
         """
-        print(f"Finding top {top_k} similar pairs (min_similarity={min_similarity})...")
+        print(f"Finding top {top_k} similar pairs (min_similarity={min_similarity}"
+              f"{f', max_per_physics={max_per_physics}' if max_per_physics else ''})...")
         
-        # Flatten matrix and get indices
-        flat_indices = np.argsort(similarity_matrix.ravel())[::-1]
+        pool_scores, pool_rows, pool_cols = self._top_pair_indices(
+            similarity_matrix, top_k, min_similarity, max_per_physics, block_rows
+        )
+        pairs = [
+            (physics_ids[r], math_ids[c], float(score))
+            for score, r, c in zip(pool_scores, pool_rows, pool_cols)
+        ]
         
-        pairs = []
-        seen = set()
+        print(f"✓ Found {len(pairs)} pairs with similarity >= {min_similarity}")
+        return pairs
+    
+    @staticmethod
+    def _top_pair_indices(
+        similarity_matrix: np.ndarray,
+        top_k: int,
+        min_similarity: float,
+        max_per_physics: Optional[int] = None,
+        block_rows: int = 1024
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Blocked argpartition top-k over the similarity matrix
         
-        for idx in flat_indices:
-            if len(pairs) >= top_k:
-                break
-            
-            # Convert flat index to 2D coordinates
-            i = idx // similarity_matrix.shape[1]
-            j = idx % similarity_matrix.shape[1]
-            
-            similarity = similarity_matrix[i, j]
-            
-            if similarity < min_similarity:
-                break
-            
-            physics_id = physics_ids[i]
-            math_id = math_ids[j]
-            pair_key = (physics_id, math_id)
+        Returns:
+            (scores, rows, cols) arrays, best first
+        """
+        n_rows, n_cols = similarity_matrix.shape
+        per_row = min(top_k, n_cols)
+        if max_per_physics:
+            per_row = min(per_row, max_per_physics)
+        
+        pool_scores = np.empty(0, dtype=np.float32)
+        pool_rows = np.empty(0, dtype=np.int64)
+        pool_cols = np.empty(0, dtype=np.int64)
+        
+        if top_k > 0 and per_row > 0:
+            for start in range(0, n_rows, block_rows):
+                block = np.asarray(similarity_matrix[start:start + block_rows], dtype=np.float32)
+                
+                # Best per_row columns of every row in the block (unordered)
+                if per_row < n_cols:
+                    cols = np.argpartition(block, n_cols - per_row, axis=1)[:, n_cols - per_row:]
+                else:
+                    cols = np.broadcast_to(np.arange(n_cols), block.shape)
+                scores = np.take_along_axis(block, cols, axis=1).ravel()
+                rows = np.repeat(np.arange(start, start + block.shape[0]), cols.shape[1])
+                cols = cols.ravel()
+                
+                # Vectorized threshold
+                keep = scores >= min_similarity
+                pool_scores = np.concatenate([pool_scores, scores[keep]])
+                pool_rows = np.concatenate([pool_rows, rows[keep]])
+                pool_cols = np.concatenate([pool_cols, cols[keep]])
+                
+                # Trim the running pool back to top_k
+                if len(pool_scores) > top_k:
+                    best = np.argpartition(pool_scores, len(pool_scores) - top_k)[len(pool_scores) - top_k:]
+                    pool_scores, pool_rows, pool_cols = pool_scores[best], pool_rows[best], pool_cols[best]
+        
+        # Final ordering: similarity descending, ties by (row, col) for determinism
+        order = np.lexsort((pool_cols, pool_rows, -pool_scores))
+        return pool_scores[order], pool_rows[order], pool_cols[order]
+    
+    def get_diverse_pairs(
+        self,
+        similarity_matrix: np.ndarray,
+        physics_ids: List[str],
+        math_ids: List[str],
+        top_k: int = 300,
+        min_similarity: float = 0.3,
+        diversity: float = 0.3,
+        pool_size: Optional[int] = None,
+        physics_embeddings: Optional[Union[EmbeddingTable, Dict[str, List[float]]]] = None,
+        math_embeddings: Optional[Union[EmbeddingTable, Dict[str, List[float]]]] = None,
+        max_per_physics: Optional[int] = None,
+        max_per_math: Optional[int] = None,
+        physics_graph: Optional[Dict[str, Any]] = None,
+        math_graph: Optional[Dict[str, Any]] = None,
+        quotas: Optional[Dict[str, int]] = None
+    ) -> List[Tuple[str, str, float]]:
+        """
+        Select similar but mutually diverse pairs with maximal marginal relevance
+        
+        Candidates are the pool_size most similar pairs; MMR then trades similarity
+        against redundancy with the pairs already chosen, so the result is not
+        dominated by a few hub nodes or a single pair of themes.
+        
+        Args:
+            similarity_matrix: Precomputed similarity matrix
+            physics_ids: List of physics node IDs
+            math_ids: List of math node IDs
+            top_k: Number of pairs to return
+            min_similarity: Minimum similarity threshold
+            diversity: Weight of redundancy vs similarity (0 = plain top-k)
+            pool_size: Candidate pool size (default 10 * top_k)
+            physics_embeddings, math_embeddings: Node embeddings for redundancy;
+                if omitted, nodes are compared by their similarity-matrix profiles
+            max_per_physics: At most this many pairs per physics node
+            max_per_math: At most this many pairs per math node
+            physics_graph, math_graph: Graphs providing node properties for quotas
+            quotas: Max pairs per property value on each side, e.g. {"theme": 30, "category": 20}
             
-            if pair_key not in seen:
-                pairs.append((physics_id, math_id, float(similarity)))
-                seen.add(pair_key)
+        Returns:
+            List of (physics_id, math_id, similarity_score) tuples, in selection order
+        """
+        pool_size = pool_size or 10 * top_k
+        print(f"Selecting {top_k} diverse pairs (diversity={diversity}, pool={pool_size})...")
+        
+        scores, rows, cols = self._top_pair_indices(similarity_matrix, pool_size, min_similarity)
+        if len(scores) == 0:
+            print(f"✓ Found 0 pairs with similarity >= {min_similarity}")
+            return []
+        
+        # Compact indices of the nodes present in the pool
+        pool_physics, physics_index = np.unique(rows, return_inverse=True)
+        pool_math, math_index = np.unique(cols, return_inverse=True)
+        if physics_embeddings is not None and math_embeddings is not None:
+            physics_table = self._as_table(physics_embeddings)
+            math_table = self._as_table(math_embeddings)
+            physics_vectors = physics_table.rows([physics_ids[r] for r in pool_physics])
+            math_vectors = math_table.rows([math_ids[c] for c in pool_math])
+        else:
+            physics_vectors = np.asarray(similarity_matrix[pool_physics], dtype=np.float32)
+            math_vectors = np.asarray(similarity_matrix[:, pool_math], dtype=np.float32).T
+        
+        constraints = []
+        if max_per_physics:
+            constraints.append((rows, max_per_physics))
+        if max_per_math:
+            constraints.append((cols, max_per_math))
+        for key, cap in (quotas or {}).items():
+            for ids, idx, graph in ((physics_ids, rows, physics_graph), (math_ids, cols, math_graph)):
+                if graph is None:
+                    continue
+                values = node_groups(graph, key)
+                constraints.append((group_codes([values.get(ids[i]) for i in idx]), cap))
+        
+        chosen = mmr_select(
+            scores, physics_index, math_index, physics_vectors, math_vectors,
+            k=top_k, diversity=diversity, constraints=constraints
+        )
+        pairs = [(physics_ids[rows[i]], math_ids[cols[i]], float(scores[i])) for i in chosen]
         
-        print(f"✓ Found {len(pairs)} pairs with similarity >= {min_similarity}")
+        print(f"✓ Selected {len(pairs)} pairs covering {len({p for p, _, _ in pairs})} physics "
+              f"and {len({m for _, m, _ in pairs})} math nodes")
         return pairs
     
+    def get_ann_index(
+        self,
+        table: EmbeddingTable,
+        domain: str,
+        backend: Optional[str] = None,
+        **params
+    ) -> Union[AnnIndex, QuantizedIndex]:
+        """
+        Load the domain's persisted ANN index, or build and persist it
+        
+        The index lives next to the embedding cache ({cache_dir}/{domain}_ann.*,
+        or {cache_dir}/{domain}_{int8|binary}.* for quantized codes) and is
+        rebuilt when the table's content changes.
+        
+        Args:
+            table: Domain embedding table
+            domain: Domain name
+            backend: 'hnswlib', 'faiss', 'ivf' (default: best available),
+                or 'int8' / 'binary' for a quantized scan with exact re-ranking
+            **params: Backend parameters (see AnnIndex and QuantizedIndex)
+        """
+        if backend in QUANTIZATION_METHODS:
+            path = self.cache_dir / f"{domain}_{backend}"
+            index = QuantizedIndex.load(path, table)
+            if index is None:
+                index = QuantizedIndex(table, backend, **params).build()
+                index.save(path)
+            index.params.update(params)
+            return index
+        
+        path = self.cache_dir / f"{domain}_ann"
+        index = AnnIndex.load(path, table)
+        if index is not None and (backend is None or index.backend == backend):
+            index.params.update(params)
+            return index
+        
+        index = AnnIndex(table, backend, **params).build()
+        index.save(path)
+        return index
+    
+    def candidate_pairs(
+        self,
+        k: int = 10,
+        physics_embeddings: Optional[EmbeddingTable] = None,
+        math_embeddings: Optional[EmbeddingTable] = None,
+        min_similarity: Optional[float] = None,
+        backend: Optional[str] = None,
+        report_recall: bool = True,
+        **params
+    ) -> List[Tuple[str, str, float]]:
+        """
+        Cross-domain candidate pairs from approximate nearest neighbours
+        
+        Each physics node's k nearest math nodes and each math node's k nearest
+        physics nodes are retrieved from per-domain ANN indexes; their union is
+        returned instead of scoring all P×M pairs.
+        
+        Args:
+            k: Neighbours retrieved per node in each direction
+            physics_embeddings: Physics table (default: saved 'physics' table)
+            math_embeddings: Math table (default: saved 'math' table)
+            min_similarity: Drop pairs below this similarity (optional)
+            backend: ANN backend (default: best available) or quantization ('int8', 'binary')
+            report_recall: Print recall@k against exact search on a sample
+            **params: Backend parameters (see AnnIndex)
+            
+        Returns:
+            List of (physics_id, math_id, similarity) tuples, best first
+        """
+        physics_table = self._as_table(
+            physics_embeddings if physics_embeddings is not None else self.load_embedding_table("physics")
+        )
+        math_table = self._as_table(
+            math_embeddings if math_embeddings is not None else self.load_embedding_table("math")
+        )
+        
+        physics_index = self.get_ann_index(physics_table, "physics", backend, **params)
+        math_index = self.get_ann_index(math_table, "math", backend, **params)
+        
+        pairs: Dict[Tuple[int, int], float] = {}
+        
+        # physics -> math neighbours
+        scores, rows = math_index.query(physics_table.matrix, k)
+        for p_row in range(len(physics_table)):
+            for score, m_row in zip(scores[p_row], rows[p_row]):
+                if m_row >= 0:
+                    pairs[(p_row, int(m_row))] = float(score)
+        
+        # math -> physics neighbours
+        scores, rows = physics_index.query(math_table.matrix, k)
+        for m_row in range(len(math_table)):
+            for score, p_row in zip(scores[m_row], rows[m_row]):
+                if p_row >= 0:
+                    pairs[(int(p_row), m_row)] = float(score)
+        
+        result = [
+            (physics_table.ids[p_row], math_table.ids[m_row], score)
+            for (p_row, m_row), score in pairs.items()
+            if min_similarity is None or score >= min_similarity
+        ]
+        result.sort(key=lambda x: -x[2])
+        
+        print(f"✓ {len(result)} candidate pairs from {physics_index.backend} ANN (k={k}), "
+              f"vs {len(physics_table) * len(math_table)} exhaustive pairs")
+        if report_recall:
+            print(f"  recall@{k} physics→math: {recall_at_k(math_index, physics_table.matrix, k):.3f}")
+            print(f"  recall@{k} math→physics: {recall_at_k(physics_index, math_table.matrix, k):.3f}")
+        
+        return result
+    
     def random_sample_pairs(
         self,
         physics_ids: List[str],
@@ -254,7 +909,11 @@ class SemanticProcessor:
         seed: int = 42
     ) -> List[Tuple[str, str]]:
         """
-        Randomly sample node pairs
+        Randomly sample node pairs without replacement
+        
+        Pairs are drawn as integer indices into the Cartesian product and decoded
+        to (physics, math) coordinates, so memory is O(n_samples) instead of
+        O(len(physics_ids) * len(math_ids)).
         
         Args:
             physics_ids: List of physics node IDs
@@ -265,16 +924,8 @@ class SemanticProcessor:
         Returns:
             List of (physics_id, math_id) tuples
         """
-        np.random.seed(seed)
-        
-        # Generate all possible pairs
-        all_pairs = [(p, m) for p in physics_ids for m in math_ids]
-        
-        # Random sample
-        n_samples = min(n_samples, len(all_pairs))
-        indices = np.random.choice(len(all_pairs), size=n_samples, replace=False)
-        
-        sampled_pairs = [all_pairs[i] for i in indices]
+        space = PairSpace(physics_ids, math_ids, math_major=False)
+        sampled_pairs = space.sample(n_samples, seed=seed)
         
         print(f"✓ Randomly sampled {len(sampled_pairs)} pairs")
         return sampled_pairs
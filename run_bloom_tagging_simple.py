@@ -70,7 +70,7 @@ def classify_knowledge_point(client: OpenAIClient, node: Dict[str, Any]) -> tupl
     """
     node_id = node.get("id", "")
     label = node.get("label", "")
-    properties = node.get("properties", {})
+    properties = node.get("properties") or {}
     description = properties.get("description", "")
     category = properties.get("category", "")
     theme = properties.get("theme", "")
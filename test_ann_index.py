@@ -0,0 +1,89 @@
+"""
+测试近似最近邻索引（纯 numpy IVF 后端）：召回率、保存/加载、内容变化或文件损坏时重建
+"""
+import sys
+import tempfile
+import contextlib
+import io
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from processors.ann_index import AnnIndex, recall_at_k
+from processors.embedding_table import EmbeddingTable
+
+
+def _clustered_table(n: int = 1200, dim: int = 16, clusters: int = 24, seed: int = 0) -> EmbeddingTable:
+    """围绕若干中心分布的向量，近似真实嵌入的聚类结构"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    matrix = centers[rng.integers(clusters, size=n)] + 0.3 * rng.standard_normal((n, dim))
+    return EmbeddingTable([f"n{i}" for i in range(n)], matrix.astype(np.float32))
+
+
+def _build(table: EmbeddingTable, **params) -> AnnIndex:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return AnnIndex(table, "ivf", **params).build()
+
+
+def test_ivf_recall():
+    """探测全部倒排表时与精确搜索一致；默认 nprobe 的召回率足够高"""
+    print("\n=== 测试 IVF 召回率 ===")
+    table = _clustered_table()
+    queries = _clustered_table(n=200, seed=1).matrix
+
+    exhaustive = _build(table, nlist=16, nprobe=16)
+    assert recall_at_k(exhaustive, queries, 10) == 1.0
+
+    index = _build(table)
+    recall = recall_at_k(index, queries, 10)
+    print(f"  recall@10 = {recall:.3f} (nlist={len(index.centroids)}, nprobe=8)")
+    assert recall >= 0.9
+
+    # 返回的相似度是真实余弦相似度，按降序排列
+    scores, rows = index.query(queries[:5], 10)
+    unit = table.matrix / np.linalg.norm(table.matrix, axis=1, keepdims=True)
+    q = queries[:5] / np.linalg.norm(queries[:5], axis=1, keepdims=True)
+    assert np.allclose(scores, np.take_along_axis(q @ unit.T, rows, axis=1), atol=1e-5)
+    assert np.all(np.diff(scores, axis=1) <= 0)
+    print("✓ IVF 召回率测试通过")
+
+
+def test_save_load():
+    """保存后加载得到相同结果；向量变化、文件损坏或缺失时返回 None 以便重建"""
+    print("\n=== 测试索引保存与加载 ===")
+    table = _clustered_table(n=300)
+    queries = table.matrix[:20]
+    index = _build(table, nlist=8)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        prefix = Path(tmp) / "math_ann"
+        data_path = index.save(prefix)
+        loaded = AnnIndex.load(prefix, table)
+        assert loaded is not None and loaded.params == {"nlist": 8}
+        assert np.array_equal(loaded.query(queries, 5)[1], index.query(queries, 5)[1])
+
+        changed = EmbeddingTable(table.ids, table.matrix * 2 + 1)
+        assert AnnIndex.load(prefix, changed) is None
+
+        data = data_path.read_bytes()
+        data_path.write_bytes(data[:len(data) // 2])
+        assert AnnIndex.load(prefix, table) is None
+        data_path.unlink()
+        assert AnnIndex.load(prefix, table) is None
+        assert AnnIndex.load(Path(tmp) / "missing_ann", table) is None
+
+    try:
+        AnnIndex(table, "annoy")
+        raise AssertionError("未知后端应报错")
+    except ValueError:
+        pass
+    print("✓ 索引保存与加载测试通过")
+
+
+if __name__ == "__main__":
+    test_ivf_recall()
+    test_save_load()
+    print("\n✓ 所有测试通过")
@@ -0,0 +1,67 @@
+"""
+测试原子写入与文件锁：并发读-改-写不丢数据、写入失败不破坏原文件、锁可重入
+"""
+import sys
+import json
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.atomic_io import atomic_open, atomic_write_text, file_lock
+from core.graph_io import update_json, read_json, write_json
+
+
+def _append_edges(path: str, worker: int, count: int):
+    for i in range(count):
+        with update_json(path) as data:
+            data["edges"].append({"source": f"w{worker}", "target": f"n{i}"})
+            data["metadata"]["total_edges"] = len(data["edges"])
+
+
+def test_concurrent_update():
+    """测试多个进程同时向同一文件追加边，不丢失任何一条"""
+    print("\n=== 测试并发读-改-写 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "edges.json")
+        write_json(path, {"metadata": {"total_edges": 0}, "edges": []})
+        workers = [multiprocessing.Process(target=_append_edges, args=(path, w, 25)) for w in range(4)]
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join()
+        data = read_json(path)
+        leftovers = [f.name for f in Path(tmp).iterdir() if f.name.endswith(".tmp")]
+    assert len(data["edges"]) == 100 and data["metadata"]["total_edges"] == 100
+    assert not leftovers
+    print("✓ 4 个进程 x 25 次追加，共 100 条边")
+
+
+def test_atomic_write_failure():
+    """测试写入中途出错时原文件保持不变、临时文件被清理"""
+    print("\n=== 测试写入失败 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "progress.json"
+        atomic_write_text(path, json.dumps({"done": 1}))
+        try:
+            with atomic_open(path, 'w') as f:
+                f.write('{"done": ')
+                raise RuntimeError("中断")
+        except RuntimeError:
+            pass
+        assert json.loads(path.read_text(encoding='utf-8')) == {"done": 1}
+        assert [f.name for f in Path(tmp).iterdir()] == ["progress.json"]
+
+        # 锁可重入：持锁的读-改-写里可以调用同样加锁的写入函数
+        with file_lock(path):
+            with file_lock(path):
+                atomic_write_text(path, json.dumps({"done": 2}))
+        assert read_json(path) == {"done": 2}
+    print("✓ 原文件未被破坏，锁可重入")
+
+
+if __name__ == "__main__":
+    test_concurrent_update()
+    test_atomic_write_failure()
+    print("\n✓ 所有测试通过")
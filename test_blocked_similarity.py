@@ -0,0 +1,116 @@
+"""
+测试分块相似度计算：逐块合并 top-k 与暴力结果一致、行/列 top-k 与阈值 COO、中断时不留下清单
+"""
+import sys
+import tempfile
+import contextlib
+import io
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from processors.blocked_similarity import (
+    MANIFEST, _merge_topk, blocked_similarity, load_blocked_similarity, pairs_from_row_topk
+)
+from processors.semantic_processor import SemanticProcessor
+
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return a @ b.T
+
+
+def _run(physics, math, output_dir, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return blocked_similarity(physics, math, output_dir, **kwargs)
+
+
+def test_merge_topk():
+    """分批合并的 top-k 与一次性取 top-k 相同"""
+    print("\n=== 测试 top-k 合并 ===")
+    rng = np.random.default_rng(0)
+    scores = rng.standard_normal((6, 40)).astype(np.float32)
+    k = 5
+    best_s = np.full((6, k), -np.inf, dtype=np.float32)
+    best_i = np.zeros((6, k), dtype=np.int64)
+    for c0 in range(0, 40, 7):
+        chunk = scores[:, c0:c0 + 7]
+        idx = np.broadcast_to(np.arange(c0, c0 + chunk.shape[1]), chunk.shape)
+        best_s, best_i = _merge_topk(best_s, best_i, chunk, idx, k)
+
+    expected = np.argsort(-scores, axis=1)[:, :k]
+    assert all(set(best_i[r]) == set(expected[r]) for r in range(6))
+    assert np.allclose(np.sort(best_s, axis=1), np.sort(np.take_along_axis(scores, expected, axis=1), axis=1))
+    print("✓ top-k 合并测试通过")
+
+
+def test_blocked_matches_dense():
+    """块大小不整除矩阵时，行/列 top-k 与阈值 COO 均与稠密矩阵一致"""
+    print("\n=== 测试分块结果与稠密矩阵一致 ===")
+    rng = np.random.default_rng(1)
+    physics = rng.standard_normal((23, 8)).astype(np.float32)
+    math = rng.standard_normal((17, 8)).astype(np.float32)
+    dense = _cosine(physics, math)
+    ids_p = [f"p{i}" for i in range(23)]
+    ids_m = [f"m{j}" for j in range(17)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = _run(physics, math, tmp, top_k=4, threshold=0.5, block_size=5,
+                        physics_ids=ids_p, math_ids=ids_m)
+        result = load_blocked_similarity(tmp)
+        assert manifest["nnz"] == int((dense >= 0.5).sum()) == len(result["coo_scores"])
+
+        assert np.array_equal(result["row_topk_index"], np.argsort(-dense, axis=1)[:, :4])
+        assert np.allclose(result["row_topk_scores"], -np.sort(-dense, axis=1)[:, :4], atol=1e-5)
+        assert np.array_equal(result["col_topk_index"], np.argsort(-dense.T, axis=1)[:, :4])
+
+        coo = set(zip(result["coo_rows"].tolist(), result["coo_cols"].tolist()))
+        assert coo == set(zip(*np.nonzero(dense >= 0.5)))
+
+        pairs = pairs_from_row_topk(result, ids_p, ids_m, top_k=10, min_similarity=0.3, max_per_physics=4)
+        scores, rows, cols = SemanticProcessor._top_pair_indices(dense, 10, 0.3, 4)
+        assert [(p, m) for p, m, _ in pairs] == [(ids_p[r], ids_m[c]) for r, c in zip(rows, cols)]
+        del result
+    print("✓ 分块结果与稠密矩阵一致测试通过")
+
+
+class FailingMatrix:
+    """读取到指定行时抛出异常，模拟计算中途被中断"""
+
+    def __init__(self, matrix: np.ndarray, fail_at: int):
+        self.matrix = matrix
+        self.shape = matrix.shape
+        self.fail_at = fail_at
+
+    def __getitem__(self, rows: slice):
+        if rows.start >= self.fail_at:
+            raise RuntimeError("interrupted")
+        return self.matrix[rows]
+
+
+def test_interrupted_run_has_no_manifest():
+    """覆盖已有结果时中途中断，旧清单已删除，不会把半写的文件当作完整结果"""
+    print("\n=== 测试中断不留下清单 ===")
+    rng = np.random.default_rng(2)
+    physics = rng.standard_normal((12, 4)).astype(np.float32)
+    math = rng.standard_normal((6, 4)).astype(np.float32)
+    with tempfile.TemporaryDirectory() as tmp:
+        _run(physics, math, tmp, top_k=3, block_size=4)
+        assert (Path(tmp) / MANIFEST).exists()
+        try:
+            _run(FailingMatrix(physics, fail_at=8), math, tmp, top_k=3, block_size=4)
+            raise AssertionError("应当中断")
+        except RuntimeError:
+            pass
+        assert not (Path(tmp) / MANIFEST).exists()
+    print("✓ 中断不留下清单测试通过")
+
+
+if __name__ == "__main__":
+    test_merge_topk()
+    test_blocked_matches_dense()
+    test_interrupted_run_has_no_manifest()
+    print("\n✓ 所有测试通过")
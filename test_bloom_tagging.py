@@ -0,0 +1,164 @@
+"""
+测试布鲁姆标注：单个标签只解析一次图谱、批量会话一次写回、异常回滚、并发合并，以及分页筛选查询
+"""
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import tools.bloom_taxonomy_tools as bloom_tools
+from tools.bloom_taxonomy_tools import (
+    BloomTaggingSession, tag_knowledge_point_apply, tag_knowledge_points_bulk,
+    clear_bloom_tags, get_knowledge_points, get_tagging_progress
+)
+
+GRAPH = {
+    "nodes": [
+        {"id": f"n{i}", "label": f"知识点{i}",
+         "properties": {"theme": "函数" if i % 2 else "几何", "description": f"描述{i}"}}
+        for i in range(7)
+    ] + [{"id": "n7", "label": "无属性", "properties": None}],
+    "edges": []
+}
+
+
+def _write_graph(directory: str) -> Path:
+    path = Path(directory) / "math_knowledge_graph_new.json"
+    path.write_text(json.dumps(GRAPH, ensure_ascii=False), encoding='utf-8')
+    return path
+
+
+def _read_levels(path: Path) -> dict:
+    data = json.loads(path.read_text(encoding='utf-8'))
+    return {n["id"]: (n.get("properties") or {}).get("bloom_level") for n in data["nodes"]}
+
+
+class CountingIO:
+    """统计标注工具读取和写回图谱的次数"""
+
+    def __init__(self):
+        self.loads = 0
+        self.saves = 0
+        self._load, self._save = bloom_tools.load_graph, bloom_tools.save_graph
+
+    def __enter__(self):
+        def load(*args, **kwargs):
+            self.loads += 1
+            return self._load(*args, **kwargs)
+
+        def save(*args, **kwargs):
+            self.saves += 1
+            return self._save(*args, **kwargs)
+        bloom_tools.load_graph, bloom_tools.save_graph = load, save
+        return self
+
+    def __exit__(self, *exc):
+        bloom_tools.load_graph, bloom_tools.save_graph = self._load, self._save
+        return False
+
+
+def test_single_tag_parses_once():
+    """单个标签：持锁读取一次、写回一次；层级无效或节点不存在时不写文件"""
+    print("\n=== 测试单个标签 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _write_graph(tmp)
+        with CountingIO() as io_count:
+            result = tag_knowledge_point_apply("n7", str(path), "需要在新情境中使用")
+        assert result["success"] and io_count.loads == 1 and io_count.saves == 1
+        data = json.loads(path.read_text(encoding='utf-8'))
+        assert data["nodes"][7]["properties"] == {"bloom_level": "Apply", "bloom_reasoning": "需要在新情境中使用"}
+
+        with CountingIO() as io_count:
+            assert not tag_knowledge_point_apply("missing", str(path))["success"]
+            assert not bloom_tools._tag_knowledge_point("n1", str(path), "Memorize")["success"]
+        assert io_count.saves == 0
+    print("✓ 单个标签测试通过")
+
+
+def test_bulk_session():
+    """批量标注一次读取、一次写回；with 块异常时丢弃；flush_every 分批提交"""
+    print("\n=== 测试批量标注会话 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _write_graph(tmp)
+        tags = [{"node_id": f"n{i}", "level": "Understand", "reasoning": "理解"} for i in range(4)]
+        with CountingIO() as io_count:
+            result = tag_knowledge_points_bulk(str(path), tags + [{"node_id": "missing", "level": "Apply"}])
+        assert result["tagged"] == 4 and [f["node_id"] for f in result["failed"]] == ["missing"]
+        # 创建会话时读取一次，提交时在文件锁内重新读取并合并一次
+        assert io_count.loads == 2 and io_count.saves == 1
+
+        try:
+            with BloomTaggingSession(str(path)) as session:
+                session.tag("n5", "Create")
+                raise RuntimeError("中断")
+        except RuntimeError:
+            pass
+        assert _read_levels(path)["n5"] is None
+
+        with BloomTaggingSession(str(path), flush_every=2) as session:
+            for node_id in ("n4", "n5", "n6"):
+                session.tag(node_id, "Evaluate")
+            assert session.committed == 2 and list(session.pending) == ["n6"]
+        assert session.committed == 3
+
+        levels = _read_levels(path)
+        assert [levels[f"n{i}"] for i in range(7)] == ["Understand"] * 4 + ["Evaluate"] * 3
+        assert levels["n7"] is None
+    print("✓ 批量标注会话测试通过")
+
+
+def test_concurrent_sessions_merge():
+    """两个会话交错提交，后提交的会话合并磁盘上的最新图谱，不覆盖对方的标签"""
+    print("\n=== 测试并发会话合并 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _write_graph(tmp)
+        first = BloomTaggingSession(str(path))
+        second = BloomTaggingSession(str(path))
+        first.tag("n0", "Remember")
+        second.tag("n1", "Analyze")
+        first.flush()
+        tag_knowledge_point_apply("n2", str(path))
+        second.flush()
+
+        levels = _read_levels(path)
+        assert (levels["n0"], levels["n1"], levels["n2"]) == ("Remember", "Analyze", "Apply")
+    print("✓ 并发会话合并测试通过")
+
+
+def test_paging_and_filters():
+    """分页与筛选；标注或清除标签后缓存的筛选结果随文件失效"""
+    print("\n=== 测试分页与筛选 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _write_graph(tmp)
+        page = get_knowledge_points("math", page=2, page_size=3, dataset_dir=tmp)
+        assert page["total"] == 8 and page["total_pages"] == 3
+        assert [n["id"] for n in page["nodes"]] == ["n3", "n4", "n5"]
+
+        functions = get_knowledge_points("math", page_size=10, dataset_dir=tmp, theme="函数")
+        assert [n["id"] for n in functions["nodes"]] == ["n1", "n3", "n5"]
+        assert functions["filters"]["theme"] == "函数"
+
+        tag_knowledge_points_bulk(str(path), [{"node_id": "n1", "level": "Apply"},
+                                              {"node_id": "n7", "level": "Apply"}])
+        untagged = get_knowledge_points("math", page_size=10, dataset_dir=tmp, untagged_only=True)
+        assert untagged["total"] == 6 and "n1" not in [n["id"] for n in untagged["nodes"]]
+        applied = get_knowledge_points("math", page_size=10, dataset_dir=tmp, bloom_level="Apply")
+        assert [n["id"] for n in applied["nodes"]] == ["n1", "n7"]
+
+        progress = get_tagging_progress("math", dataset_dir=tmp)
+        assert progress["tagged"] == 2 and progress["level_distribution"]["Apply"] == 2
+
+        assert clear_bloom_tags(str(path), ["n1", "n2"])["cleared"] == 1
+        assert get_knowledge_points("math", dataset_dir=tmp, untagged_only=True)["total"] == 7
+        assert not get_knowledge_points("physics", dataset_dir=tmp)["success"]
+    print("✓ 分页与筛选测试通过")
+
+
+if __name__ == "__main__":
+    test_single_tag_parses_once()
+    test_bulk_session()
+    test_concurrent_sessions_merge()
+    test_paging_and_filters()
+    print("\n✓ 所有测试通过")
@@ -0,0 +1,140 @@
+"""
+测试多轮对话检查点：保存/加载与失效，以及节点对讨论中途中断后从最后一个完整轮次继续
+"""
+import sys
+import copy
+import tempfile
+import contextlib
+import io
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.dialogue_checkpoint import DialogueCheckpointStore
+from core.node_pair_chatroom import NodePairChatroom
+
+PHYSICS = {"id": "p1", "label": "速度", "properties": {"description": "位移对时间的变化率"}}
+MATH = {"id": "m1", "label": "导数", "properties": {"description": "函数的瞬时变化率"}}
+SPEECH = "[p1] 与 [m1] 的关联：" + "速度是位移对时间的导数。" * 10
+CONTINUE = '{"continue": true, "reason": "继续探索"}'
+
+
+class StubClient:
+    """按顺序返回预设回复的模型客户端，回复为异常实例时抛出"""
+
+    def __init__(self, replies=None, default=""):
+        self.replies = list(replies or [])
+        self.default = default
+        self.calls = 0
+
+    def generate(self, prompt, system_instruction=None):
+        self.calls += 1
+        reply = self.replies.pop(0) if self.replies else self.default
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+class StubAgent:
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+        self.system_instruction = ""
+
+
+def _chatroom(speaker: StubClient, meta: StubClient, checkpoints: DialogueCheckpointStore) -> NodePairChatroom:
+    chatroom = NodePairChatroom.__new__(NodePairChatroom)
+    chatroom.physics_agent = StubAgent("物理专家", speaker)
+    chatroom.math_agent = StubAgent("数学专家", speaker)
+    chatroom.meta_agent = StubAgent("元协调者", meta)
+    chatroom.physics_nodes = {"p1": PHYSICS}
+    chatroom.math_nodes = {"m1": MATH}
+    chatroom.physics_edges, chatroom.math_edges = {}, {}
+    chatroom.cascade = None
+    chatroom.outcome_cache = None
+    chatroom.transcript_store = None
+    chatroom.checkpoint_store = checkpoints
+    return chatroom
+
+
+def test_checkpoint_store():
+    """检查点按节点对保存；节点内容或提示词版本变化、文件损坏时失效"""
+    print("\n=== 测试检查点存储 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DialogueCheckpointStore(Path(tmp), "v1")
+        transcript = {"turns": [{"round": 1, "speaker": "physics", "content": "..."}]}
+        store.save(PHYSICS, MATH, 1, transcript)
+        assert store.load(PHYSICS, MATH) == {"round": 1, "finished": False, "transcript": transcript}
+        assert store.pending_count() == 1
+
+        assert DialogueCheckpointStore(Path(tmp), "v2").load(PHYSICS, MATH) is None
+        assert store.pending_count() == 0
+
+        store.save(PHYSICS, MATH, 2, transcript, finished=True)
+        edited = copy.deepcopy(MATH)
+        edited["properties"]["description"] += "（修订）"
+        assert store.load(PHYSICS, edited) is None and store.load(PHYSICS, MATH) is None
+
+        store.save(PHYSICS, MATH, 2, transcript)
+        store._path("p1", "m1").write_text('{"state": ', encoding='utf-8')
+        assert store.load(PHYSICS, MATH) is None
+        store.clear("p1", "m1")
+        store.clear("p1", "m1")
+        assert store.pending_count() == 0
+    print("✓ 检查点存储测试通过")
+
+
+def test_resume_mid_pair():
+    """第 4 轮发言时中断：重新讨论只补第 4 轮，前 3 轮不再调用模型"""
+    print("\n=== 测试中途中断后继续 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoints = DialogueCheckpointStore(Path(tmp), "v1")
+        speaker = StubClient([SPEECH] * 6 + [ConnectionError("worker killed")], default=SPEECH)
+        meta = StubClient([CONTINUE])
+        chatroom = _chatroom(speaker, meta, checkpoints)
+
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                chatroom.discuss_node_pair("p1", "m1", max_rounds=4)
+            raise AssertionError("第 4 轮发言应当中断")
+        except ConnectionError:
+            pass
+        state = checkpoints.load(PHYSICS, MATH)
+        assert state["round"] == 3 and not state["finished"]
+        assert [t["round"] for t in state["transcript"]["turns"]] == [1, 1, 2, 2, 3, 3]
+
+        # 另一个 worker 领取该节点对：只发言第 4 轮，然后评估、提取
+        speaker.calls = 0
+        meta.replies = [CONTINUE, '{"exists": false, "reason": "无明确关联"}']
+        retry = _chatroom(speaker, meta, checkpoints)
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert retry.discuss_node_pair("p1", "m1", max_rounds=4) is None
+        assert speaker.calls == 2 and meta.replies == []
+        assert checkpoints.load(PHYSICS, MATH) is None
+    print("✓ 中途中断后继续测试通过")
+
+
+def test_stale_checkpoint_restarts():
+    """节点内容修改后旧检查点失效，从第 1 轮重新讨论"""
+    print("\n=== 测试失效检查点重新开始 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoints = DialogueCheckpointStore(Path(tmp), "v1")
+        checkpoints.save(PHYSICS, MATH, 1, {"turns": [{"round": 1, "speaker": "physics", "content": SPEECH}]})
+
+        edited = copy.deepcopy(PHYSICS)
+        edited["properties"]["description"] += "（修订）"
+        speaker = StubClient(default=SPEECH)
+        meta = StubClient(['{"exists": false, "reason": "无明确关联"}'])
+        chatroom = _chatroom(speaker, meta, checkpoints)
+        chatroom.physics_nodes = {"p1": edited}
+        with contextlib.redirect_stdout(io.StringIO()):
+            chatroom.discuss_node_pair("p1", "m1", max_rounds=1)
+        assert speaker.calls == 2 and checkpoints.pending_count() == 0
+    print("✓ 失效检查点重新开始测试通过")
+
+
+if __name__ == "__main__":
+    test_checkpoint_store()
+    test_resume_mid_pair()
+    test_stale_checkpoint_restarts()
+    print("\n✓ 所有测试通过")
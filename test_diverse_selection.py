@@ -0,0 +1,90 @@
+"""
+测试 MMR 多样性选取：diversity=0 退化为相似度排序、冗余惩罚、每节点上限与主题配额
+"""
+import sys
+import tempfile
+import contextlib
+import io
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from processors.diverse_selection import group_codes, node_groups, mmr_select
+from processors.semantic_processor import SemanticProcessor
+
+# 候选：(p0, m0) 与 (p0, m1) 几乎重复（m0 ≈ m1），(p1, m2) 与它们无关
+RELEVANCE = np.array([0.9, 0.89, 0.8, 0.7], dtype=np.float32)
+PHYSICS_INDEX = np.array([0, 0, 1, 1])
+MATH_INDEX = np.array([0, 1, 2, 0])
+PHYSICS_VECTORS = np.array([[1.0, 0.0], [0.0, 1.0]])
+MATH_VECTORS = np.array([[1.0, 0.0, 0.0], [0.99, 0.1, 0.0], [0.0, 0.0, 1.0]])
+
+
+def _select(k, diversity, constraints=None):
+    return mmr_select(RELEVANCE, PHYSICS_INDEX, MATH_INDEX, PHYSICS_VECTORS, MATH_VECTORS,
+                      k=k, diversity=diversity, constraints=constraints).tolist()
+
+
+def test_mmr_redundancy():
+    """diversity=0 按相似度排序；diversity>0 时跳过与已选节点对重复的候选"""
+    print("\n=== 测试 MMR 冗余惩罚 ===")
+    assert _select(4, 0.0) == [0, 1, 2, 3]
+    assert _select(2, 0.5) == [0, 2]
+    assert _select(10, 0.5) == [0, 2, 3, 1]
+    assert _select(0, 0.5) == []
+    assert mmr_select(np.zeros(0), np.zeros(0, int), np.zeros(0, int), np.zeros((0, 2)), np.zeros((0, 2)), k=3).size == 0
+    print("✓ MMR 冗余惩罚测试通过")
+
+
+def test_caps_and_quotas():
+    """分组上限：达到上限的分组不再入选，上限 0 排除整个分组，未标注（None）的候选不受限"""
+    print("\n=== 测试分组上限 ===")
+    assert group_codes(["力学", None, "电学", "力学", ""]).tolist() == [0, -1, 1, 0, -1]
+
+    per_physics = (PHYSICS_INDEX, 1)
+    assert _select(4, 0.0, [per_physics]) == [0, 2]
+
+    themes = group_codes(["力学", "力学", None, "电学"])
+    assert _select(4, 0.0, [(themes, 1)]) == [0, 2, 3]
+    assert _select(4, 0.0, [(themes, 0)]) == [2]
+
+    graph = {"nodes": [{"id": "p0", "properties": {"theme": "力学"}}, {"id": "p1", "properties": None}]}
+    assert node_groups(graph, "theme") == {"p0": "力学", "p1": None}
+    print("✓ 分组上限测试通过")
+
+
+def test_get_diverse_pairs():
+    """候选池上的端到端选取：每个物理节点的上限和数学主题配额同时生效"""
+    print("\n=== 测试多样性节点对选取 ===")
+    rng = np.random.default_rng(3)
+    matrix = rng.uniform(0.3, 1.0, size=(6, 8)).astype(np.float32)
+    matrix[0] += 1.0                                   # p0 是与所有数学节点都相似的枢纽节点
+    physics_ids = [f"p{i}" for i in range(6)]
+    math_ids = [f"m{j}" for j in range(8)]
+    math_graph = {"nodes": [{"id": m, "properties": {"theme": "代数" if j < 4 else "几何"}}
+                            for j, m in enumerate(math_ids)]}
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        processor = SemanticProcessor(cache_dir=tmp, client=object())
+        plain = processor.get_top_similar_pairs(matrix, physics_ids, math_ids, top_k=6, min_similarity=0.3)
+        pairs = processor.get_diverse_pairs(
+            matrix, physics_ids, math_ids, top_k=6, min_similarity=0.3, diversity=0.3,
+            max_per_physics=2, math_graph=math_graph, quotas={"theme": 4}
+        )
+        processor.embedding_cache.close()
+
+    assert all(p == "p0" for p, _, _ in plain)
+    assert len(pairs) == 6 and len(set((p, m) for p, m, _ in pairs)) == 6
+    assert max(sum(p == pid for p, _, _ in pairs) for pid in physics_ids) <= 2
+    themes = [int(m[1:]) < 4 for _, m, _ in pairs]
+    assert sum(themes) <= 4 and len(themes) - sum(themes) <= 4
+    print("✓ 多样性节点对选取测试通过")
+
+
+if __name__ == "__main__":
+    test_mmr_redundancy()
+    test_caps_and_quotas()
+    test_get_diverse_pairs()
+    print("\n✓ 所有测试通过")
@@ -0,0 +1,96 @@
+"""
+测试内容哈希向量缓存：命中/未命中、只重新嵌入新增或修改的节点、跨领域共享、孤立向量清理
+"""
+import sys
+import copy
+import tempfile
+import contextlib
+import io
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from processors.embedding_cache import EmbeddingCache, embedding_key
+from processors.semantic_processor import SemanticProcessor
+
+
+class StubEmbeddingClient:
+    """Gemini 风格的嵌入客户端：按文本生成确定性向量，并记录被嵌入的文本"""
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_content(self, model, content):
+        self.embedded.extend(content)
+        return {"embedding": [[float(len(text)), float(sum(map(ord, text)) % 97), 1.0] for text in content]}
+
+
+GRAPH = {"nodes": [
+    {"id": "p1", "label": "速度", "properties": {"description": "位移对时间的变化率"}},
+    {"id": "p2", "label": "加速度", "properties": {"description": "速度对时间的变化率"}},
+    {"id": "p3", "label": "质量", "properties": None}
+], "edges": []}
+
+
+def test_cache_store():
+    """按键查询只返回已存储的向量；未被任何领域引用的向量可被清理"""
+    print("\n=== 测试向量缓存存取 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EmbeddingCache(Path(tmp) / "embedding_cache.sqlite")
+        a, b = embedding_key("model", "速度"), embedding_key("model", "加速度")
+        assert a != embedding_key("other-model", "速度")
+        assert cache.get_many([a, b]) == {}
+
+        cache.put_many("model", {a: [1.0, 2.0], b: [3.0, 4.0]})
+        found = cache.get_many([a, a, embedding_key("model", "质量")])
+        assert list(found) == [a] and found[a].dtype == np.float32
+        assert np.allclose(found[a], [1.0, 2.0])
+
+        cache.set_domain_refs("physics", {"p1": a})
+        assert cache.stats() == {"vectors": 2, "orphans": 1, "domains": {"physics": 1}}
+        assert cache.evict_orphans() == 1
+        assert cache.get_many([a, b]).keys() == {a}
+        cache.close()
+    print("✓ 向量缓存存取测试通过")
+
+
+def test_incremental_embeddings():
+    """未修改的节点命中缓存，只有修改过的节点和未见过的文本才调用嵌入模型"""
+    print("\n=== 测试增量嵌入 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        client = StubEmbeddingClient()
+        with contextlib.redirect_stdout(io.StringIO()):
+            processor = SemanticProcessor(cache_dir=tmp, client=client, max_retries=0)
+            table = processor.generate_node_embeddings(GRAPH, "physics")
+        assert len(client.embedded) == 3 and list(table) == ["p1", "p2", "p3"]
+
+        # 图谱未变：直接复用整表，不查询也不嵌入
+        client.embedded.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            processor.generate_node_embeddings(GRAPH, "physics")
+            # 另一领域中相同的文本同样命中缓存
+            processor.generate_node_embeddings(copy.deepcopy(GRAPH), "math")
+        assert client.embedded == []
+
+        edited = copy.deepcopy(GRAPH)
+        edited["nodes"][0]["properties"]["description"] += "（修订）"
+        with contextlib.redirect_stdout(io.StringIO()):
+            updated = processor.generate_node_embeddings(edited, "physics")
+        assert client.embedded == [processor._get_node_text(edited["nodes"][0])]
+        assert np.allclose(updated["p2"], table["p2"]) and not np.allclose(updated["p1"], table["p1"])
+
+        # 旧的 p1 向量仍被 math 领域引用；math 也更新后才成为孤立向量
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert processor.evict_orphan_embeddings() == 0
+            processor.generate_node_embeddings(edited, "math")
+            assert processor.evict_orphan_embeddings() == 1
+        processor.embedding_cache.close()
+    print("✓ 增量嵌入测试通过")
+
+
+if __name__ == "__main__":
+    test_cache_store()
+    test_incremental_embeddings()
+    print("\n✓ 所有测试通过")
@@ -0,0 +1,69 @@
+"""
+测试内存映射向量表：ID 索引、float16 存储、只读内存映射加载、写入参数检查
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from processors.embedding_table import EmbeddingTable, sidecar_path
+
+
+def test_table_mapping():
+    """向量表可以当作 {node_id: 向量} 字典使用"""
+    print("\n=== 测试向量表索引 ===")
+    table = EmbeddingTable.from_dict({"p1": [1.0, 0.0], "p2": [0.0, 1.0], "p3": [1.0, 1.0]})
+    assert len(table) == 3 and table.dim == 2 and list(table) == ["p1", "p2", "p3"]
+    assert "p2" in table and "m1" not in table
+    assert np.allclose(table["p3"], [1.0, 1.0])
+    assert np.allclose(table.rows(["p3", "p1"]), [[1.0, 1.0], [1.0, 0.0]])
+    assert dict(table).keys() == {"p1", "p2", "p3"}
+    assert len(EmbeddingTable.from_dict({})) == 0
+
+    try:
+        EmbeddingTable(["p1"], np.zeros((2, 2), dtype=np.float32))
+        raise AssertionError("ID 数量与行数不一致时应报错")
+    except ValueError:
+        pass
+    print("✓ 向量表索引测试通过")
+
+
+def test_save_load_mmap():
+    """float16 存储后以只读内存映射加载，元数据随 ID 索引保存"""
+    print("\n=== 测试向量表保存与加载 ===")
+    rng = np.random.default_rng(0)
+    ids = [f"n{i}" for i in range(100)]
+    matrix = rng.standard_normal((100, 8)).astype(np.float32)
+    table = EmbeddingTable(ids, matrix, metadata={"content_digest": "abc"})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = table.save(Path(tmp) / "physics_embeddings.npy", dtype="float16")
+        assert sidecar_path(path).name == "physics_embeddings.ids.json"
+
+        loaded = EmbeddingTable.load(path)
+        assert isinstance(loaded.matrix, np.memmap) and not loaded.matrix.flags.writeable
+        assert loaded.matrix.dtype == np.float16 and loaded.ids == ids
+        assert loaded.metadata == {"content_digest": "abc"} and loaded.path == path
+        assert np.allclose(loaded.as_float32(), matrix, atol=1e-2)
+        assert np.allclose(loaded["n42"], matrix[42], atol=1e-2)
+
+        in_memory = EmbeddingTable.load(path, mmap=False)
+        assert not isinstance(in_memory.matrix, np.memmap)
+
+        try:
+            table.save(Path(tmp) / "bad.npy", dtype="float64")
+            raise AssertionError("不支持的存储类型应报错")
+        except ValueError:
+            pass
+        assert not (Path(tmp) / "bad.npy").exists()
+        del loaded
+    print("✓ 向量表保存与加载测试通过")
+
+
+if __name__ == "__main__":
+    test_table_mapping()
+    test_save_load_mmap()
+    print("\n✓ 所有测试通过")
@@ -0,0 +1,102 @@
+"""
+测试图谱差异与增量更新：节点/边的差异、相似度矩阵的行列增量更新、任务队列同步
+"""
+import sys
+import copy
+import json
+import tempfile
+import contextlib
+import io
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.graph_diff import diff_graphs
+from core.graph_index import GraphIndex
+from core.pair_queue import PairQueue
+from processors.semantic_processor import SemanticProcessor
+
+GRAPH_FILE = Path(__file__).parent / "dataset" / "graph" / "physics_knowledge_graph_new.json"
+
+
+def test_diff_graphs():
+    """测试新增/删除/修改节点与边的识别（忽略布鲁姆标签，容忍 properties 为 null）"""
+    print("\n=== 测试图谱差异 ===")
+    with open(GRAPH_FILE, 'r', encoding='utf-8') as f:
+        old = json.load(f)
+    # 流水线输出的图谱中有 properties 为 null 的节点
+    old["nodes"].append({"id": "null_props", "label": "空属性", "properties": None})
+    new = copy.deepcopy(old)
+    new["nodes"][0]["properties"]["description"] += "（修订）"
+    new["nodes"][1]["properties"]["bloom_level"] = "Create"     # 只改标签，不算修改
+    removed = new["nodes"].pop(2)["id"]
+    new["nodes"].append({"id": "added_node", "label": "新节点", "properties": {}})
+    new["edges"].pop(0)
+    new["edges"].append({"source": "added_node", "target": old["nodes"][0]["id"], "label": "test"})
+
+    diff = diff_graphs(old, new)
+    assert diff.added_nodes == ["added_node"]
+    assert diff.removed_nodes == [removed]
+    assert diff.modified_nodes == [old["nodes"][0]["id"]]
+    assert diff.added_edges == 1 and diff.removed_edges == 1
+    assert diff_graphs(old, copy.deepcopy(old)).is_empty
+    index = GraphIndex(new)
+    assert index.position["null_props"] in index.select(untagged_only=True)
+    print(f"  {diff.summary()}")
+    print("✓ 图谱差异测试通过")
+
+
+def test_incremental_similarity_and_queue():
+    """测试相似度矩阵增量更新与全量计算一致，以及任务队列的删除/重置"""
+    print("\n=== 测试增量相似度矩阵与任务队列 ===")
+    rng = np.random.default_rng(0)
+    physics = {f"p{i}": rng.standard_normal(16) for i in range(30)}
+    math = {f"m{i}": rng.standard_normal(16) for i in range(20)}
+    processor = SemanticProcessor.__new__(SemanticProcessor)
+    processor.embedding_model = "model-a"
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        previous = str(Path(tmp) / "similarity.npz")
+        processor.calculate_similarity_matrix(physics, math, previous)
+
+        del physics["p1"], math["m0"]
+        physics["p2"] = rng.standard_normal(16)
+        physics["p_new"] = rng.standard_normal(16)
+        math["m3"] = rng.standard_normal(16)
+        updated, physics_ids, math_ids = processor.update_similarity_matrix(
+            physics, math, ["p2", "p_new"], ["m3"], previous, str(Path(tmp) / "updated.npz")
+        )
+        full, full_physics, full_math = processor.calculate_similarity_matrix(
+            physics, math, str(Path(tmp) / "full.npz")
+        )
+        assert physics_ids == full_physics and math_ids == full_math
+        assert np.allclose(updated, full, atol=1e-6)
+
+        # 换用另一个嵌入模型（或维度）时不复用旧单元格
+        processor.embedding_model = "model-b"
+        other_physics = {k: rng.standard_normal(8) for k in physics}
+        other_math = {k: rng.standard_normal(8) for k in math}
+        switched, _, _ = processor.update_similarity_matrix(
+            other_physics, other_math, [], [], str(Path(tmp) / "full.npz"), str(Path(tmp) / "switched.npz")
+        )
+        expected, _, _ = processor.calculate_similarity_matrix(other_physics, other_math, str(Path(tmp) / "b.npz"))
+        assert np.allclose(switched, expected, atol=1e-6)
+
+        queue = PairQueue(Path(tmp) / "pair_queue.sqlite")
+        queue.enqueue_pairs([("p1", "m1"), ("p2", "m1"), ("p3", "m0"), ("p3", "m1")])
+        for physics_id, math_id in queue.lease("w1", 4):
+            queue.complete(physics_id, math_id, "w1", accepted=False)
+        assert queue.remove_nodes(["p1"], ["m0"]) == 2
+        assert queue.reset_nodes(["p2"], []) == 1
+        stats = queue.stats()
+        queue.close()
+    assert stats["total"] == 2 and stats["pending"] == 1 and stats["rejected"] == 1
+    print("✓ 增量相似度矩阵与任务队列测试通过")
+
+
+if __name__ == "__main__":
+    test_diff_graphs()
+    test_incremental_similarity_and_queue()
+    print("\n✓ 所有测试通过")
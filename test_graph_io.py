@@ -0,0 +1,83 @@
+"""
+测试图谱快速读写：JSON 输出格式与标准库一致，二进制快照在 JSON 修改后失效并自动重建
+"""
+import sys
+import json
+import math
+import os
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.graph_io import dumps_json, load_graph, save_graph, read_snapshot, snapshot_path
+
+GRAPH_FILE = Path(__file__).parent / "dataset" / "graph" / "physics_knowledge_graph_new.json"
+
+
+def test_snapshot_round_trip():
+    """测试快照的生成、命中与失效"""
+    print("\n=== 测试二进制快照 ===")
+    with open(GRAPH_FILE, 'r', encoding='utf-8') as f:
+        graph = json.load(f)
+    assert dumps_json(graph).decode('utf-8') == json.dumps(graph, ensure_ascii=False, indent=2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / GRAPH_FILE.name
+        path.write_bytes(GRAPH_FILE.read_bytes())
+
+        assert load_graph(path) == graph          # 首次解析 JSON 并写快照
+        assert snapshot_path(path).exists()
+        assert read_snapshot(path) == graph       # 之后直接读快照
+
+        # 只修改 mtime：内容摘要相同，快照仍然有效
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert read_snapshot(path) == graph
+
+        # 绕过 save_graph 修改 JSON（大小不变）：快照失效，重新加载得到新内容
+        graph["nodes"][0]["label"] = graph["nodes"][0]["label"][::-1]
+        path.write_bytes(dumps_json(graph))
+        assert read_snapshot(path) is None
+        assert load_graph(path) == graph
+
+        # 同长度改写并恢复 mtime（mtime 粒度内的重标或粗粒度文件系统）：快照同样失效
+        stat = path.stat()
+        graph["nodes"][1]["label"] = graph["nodes"][1]["label"][::-1]
+        path.write_bytes(dumps_json(graph))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert path.stat().st_size == stat.st_size
+        assert read_snapshot(path) is None
+        assert load_graph(path) == graph
+
+        # save_graph 同时刷新快照
+        graph["nodes"][0]["properties"]["bloom_level"] = "Create"
+        save_graph(path, graph)
+        assert read_snapshot(path) == graph
+    print("✓ 二进制快照测试通过")
+
+
+def test_dumps_json_values():
+    """测试浮点数、NaN、非字符串键和大整数的序列化结果与标准库读回的值一致"""
+    print("\n=== 测试 JSON 数值 ===")
+    data = {
+        "scores": [1e-05, 1e20, 0.1, -0.0, 2.5e-07, 123456789.125],
+        "nested": {"similarity": [0.5, float("nan")], "big": 2 ** 70},
+        1: "整数键"
+    }
+    text = dumps_json(data).decode('utf-8')
+    loaded = json.loads(text)
+    assert loaded["scores"] == data["scores"]
+    assert math.isnan(loaded["nested"]["similarity"][1])      # 不会被静默写成 null
+    assert loaded["nested"]["big"] == 2 ** 70
+    assert loaded["1"] == "整数键"
+
+    plain = {"a": [1.5, 3.0], "b": None}
+    assert dumps_json(plain).decode('utf-8') == json.dumps(plain, ensure_ascii=False, indent=2)
+    print("✓ JSON 数值测试通过")
+
+
+if __name__ == "__main__":
+    test_snapshot_round_trip()
+    test_dumps_json_values()
+    print("\n✓ 所有测试通过")
@@ -0,0 +1,94 @@
+"""
+测试 SQLite 图谱存储：JSON 往返、索引查询、单点更新，以及标注工具与边写入接口的 SQLite 后端
+"""
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.graph_store import GraphStore
+from core.node_pair_chatroom import write_edge_json, add_edge_to_json
+from tools.bloom_taxonomy_tools import tag_knowledge_points_bulk, get_knowledge_points
+
+GRAPH_FILE = Path(__file__).parent / "dataset" / "graph" / "math_knowledge_graph_new.json"
+
+
+def test_round_trip_and_queries():
+    """测试导入导出往返与按属性查询"""
+    print("\n=== 测试 JSON 往返与索引查询 ===")
+    with open(GRAPH_FILE, 'r', encoding='utf-8') as f:
+        graph = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with GraphStore.from_json(GRAPH_FILE, Path(tmp) / "math.db") as store:
+            assert store.export_graph() == graph
+            assert len(store) == len(graph["nodes"])
+            assert store.count_edges() == len(graph["edges"])
+
+            node = graph["nodes"][3]
+            assert store.get_node(node["id"]) == node
+
+            theme = next(n["properties"]["theme"] for n in graph["nodes"] if n["properties"].get("theme"))
+            expected = [n["id"] for n in graph["nodes"] if n["properties"].get("theme") == theme]
+            assert store.ids_where("theme", theme) == expected
+            assert [n["id"] for n in store.find_nodes(theme=theme, offset=1, limit=2)] == expected[1:3]
+
+            assert store.set_properties(node["id"], {"bloom_level": "Create", "note": "x"})
+            updated = store.get_node(node["id"])["properties"]
+            assert updated["bloom_level"] == "Create" and list(updated)[-1] == "note"
+            assert node["id"] in store.ids_where("bloom_level", "Create")
+            assert not store.set_properties("missing_node", {"bloom_level": "Apply"})
+    print("✓ JSON 往返与索引查询测试通过")
+
+
+def test_sqlite_backed_writers():
+    """测试标注工具和边写入接口直接写入 SQLite 存储"""
+    print("\n=== 测试 SQLite 后端的标注与边写入 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "math_knowledge_graph_new.db"
+        GraphStore.from_json(GRAPH_FILE, db_path).close()
+        with GraphStore(db_path) as store:
+            node_ids = [n["id"] for n in store.find_nodes(limit=2)]
+
+        result = tag_knowledge_points_bulk(str(db_path), [
+            {"node_id": node_ids[0], "level": "Evaluate", "reasoning": "测试"},
+            {"node_id": node_ids[1], "level": "Apply"},
+            {"node_id": "missing_node", "level": "Apply"},
+        ])
+        assert result["tagged"] == 2 and len(result["failed"]) == 1
+        with GraphStore(db_path) as store:
+            assert store.get_node(node_ids[0])["properties"]["bloom_reasoning"] == "测试"
+            assert store.get_node(node_ids[1])["properties"]["bloom_level"] == "Apply"
+            cleared = store.find_nodes(offset=2, limit=1)[0]["id"]
+            store.remove_properties([cleared], ("bloom_level", "bloom_reasoning"))
+
+        # 分页查询直接读取存储，看得到存储中最新的标签
+        page = get_knowledge_points("math", untagged_only=True, file_path=str(db_path))
+        assert page["success"] and [n["id"] for n in page["nodes"]] == [cleared]
+        page = get_knowledge_points("math", dataset_dir=tmp, bloom_level="Evaluate", page_size=1000)
+        assert page["file_path"] == str(db_path) and node_ids[0] in [n["id"] for n in page["nodes"]]
+
+        edges_path = Path(tmp) / "edges.db"
+        write_edge_json(str(edges_path), {"metadata": {"total_edges": 0}, "edges": []})
+        add_edge_to_json(str(edges_path), {"source": "p", "target": "m", "label": "test"})
+        with GraphStore(edges_path) as store:
+            exported = store.export_graph()
+        assert exported["edges"] == [{"source": "p", "target": "m", "label": "test"}]
+        assert exported["metadata"]["total_edges"] == 1
+        with GraphStore(edges_path) as store:
+            for key in ("nodes", "edges"):
+                for call in (lambda: store.get_meta(key), lambda: store.set_meta(key, [])):
+                    try:
+                        call()
+                        raise AssertionError(f"{key} 应当被拒绝")
+                    except ValueError:
+                        pass
+    print("✓ SQLite 后端写入测试通过")
+
+
+if __name__ == "__main__":
+    test_round_trip_and_queries()
+    test_sqlite_backed_writers()
+    print("\n✓ 所有测试通过")
@@ -0,0 +1,87 @@
+"""
+测试本地离线向量化：无需网络和 API Key 即可生成向量、计算相似度并生成候选节点对
+"""
+import sys
+import json
+import time
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from processors.local_embedder import LocalEmbedder
+from processors.semantic_processor import SemanticProcessor
+
+GRAPH_DIR = Path(__file__).parent / "dataset" / "graph"
+
+
+def _load_graph(name: str) -> dict:
+    with open(GRAPH_DIR / name, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_local_embedder():
+    """测试模型拟合、相似度排序与保存/加载"""
+    print("\n=== 测试本地向量模型 ===")
+    texts = ["匀变速直线运动的速度与时间关系", "匀速直线运动与位移", "集合的概念与表示",
+             "向量的加法与减法", "平面向量的数量积", "函数的单调性与最值"] * 3
+    embedder = LocalEmbedder(dim=16).fit(texts)
+    vectors = embedder.transform(["匀变速直线运动", "匀速直线运动", "集合的表示"])
+    assert vectors.shape == (3, embedder.components.shape[0])
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = embedder.save(Path(tmp) / "local_embedder.npz")
+        loaded = LocalEmbedder.load(path)
+        assert loaded.fingerprint == embedder.fingerprint
+        assert np.allclose(loaded.transform(["向量"]), embedder.transform(["向量"]))
+    print("✓ 本地向量模型测试通过")
+
+
+def test_offline_candidate_pairs():
+    """测试 SemanticProcessor 本地后端端到端生成候选节点对"""
+    print("\n=== 测试离线候选节点对 ===")
+    physics_graph = _load_graph("physics_knowledge_graph_cleaned.json")
+    math_graph = _load_graph("math_knowledge_graph_cleaned.json")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        processor = SemanticProcessor(backend="local", cache_dir=tmp, local_dim=64)
+        processor.fit_local_model([physics_graph, math_graph])
+
+        start = time.time()
+        physics_embeddings = processor.generate_node_embeddings(physics_graph, "physics")
+        math_embeddings = processor.generate_node_embeddings(math_graph, "math")
+        elapsed = time.time() - start
+        n_nodes = len(physics_embeddings) + len(math_embeddings)
+        print(f"  {n_nodes} nodes embedded in {elapsed:.2f}s ({n_nodes / max(elapsed, 1e-9):.0f} nodes/s)")
+        assert len(physics_embeddings) == len(physics_graph["nodes"])
+
+        pairs = processor.candidate_pairs(
+            k=5, physics_embeddings=physics_embeddings, math_embeddings=math_embeddings,
+            backend="ivf", report_recall=False
+        )
+        assert pairs
+        assert all(p in physics_embeddings and m in math_embeddings for p, m, _ in pairs)
+
+        # 同一模型再次处理时全部命中缓存：不应再调用嵌入模型
+        again = SemanticProcessor(backend="local", cache_dir=tmp, local_dim=64)
+        assert again.embedding_model == processor.embedding_model
+
+        def no_embedding_calls(texts):
+            raise AssertionError(f"缓存未命中: {len(texts)} 个节点被重新嵌入")
+        again.embed_texts = no_embedding_calls
+        for table in Path(tmp).glob("*_embeddings.npy"):
+            table.unlink()                       # 绕过整表快速路径，逐条查询向量缓存
+        cached_physics = again.generate_node_embeddings(physics_graph, "physics")
+        again.generate_node_embeddings(math_graph, "math")
+        assert all(np.allclose(cached_physics[k], physics_embeddings[k]) for k in physics_embeddings)
+    print("✓ 离线候选节点对测试通过")
+
+
+if __name__ == "__main__":
+    test_local_embedder()
+    test_offline_candidate_pairs()
+    print("\n✓ 所有测试通过")
@@ -0,0 +1,106 @@
+"""
+测试候选级联筛选：相似度剪枝、小模型 是/否/出错 三种判断、召回损失估计
+"""
+import sys
+import json
+import tempfile
+import contextlib
+import io
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.pair_cascade import PairCascade, STAGE_SIMILARITY, STAGE_TRIAGE
+
+
+class StubTriageClient:
+    """按物理节点ID返回预设回答的小模型客户端，回答为异常实例时抛出"""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = 0
+
+    def generate(self, prompt, temperature=None):
+        self.calls += 1
+        for physics_id, answer in self.answers.items():
+            if f"[{physics_id}]" in prompt:
+                if isinstance(answer, Exception):
+                    raise answer
+                return answer
+        return "YES"
+
+
+def _node(node_id: str) -> dict:
+    return {"id": node_id, "label": node_id, "properties": {"description": f"{node_id} 的描述"}}
+
+
+PHYSICS = {pid: _node(pid) for pid in ["p0", "p1", "p2", "p3", "p9"]}
+MATH = {"m0": _node("m0")}
+# p1 与 m0 正交（相似度 0），其余与 m0 同向；p9 没有嵌入
+PHYSICS_EMB = {"p0": [1.0, 0.0], "p1": [0.0, 1.0], "p2": [2.0, 0.1], "p3": [1.0, 0.2]}
+MATH_EMB = {"m0": [1.0, 0.0]}
+
+
+def _cascade() -> PairCascade:
+    client = StubTriageClient({"p2": "NO", "p3": TimeoutError("API error")})
+    return PairCascade(PHYSICS_EMB, MATH_EMB, similarity_threshold=0.5,
+                       triage_client=client, triage_enabled=True)
+
+
+def test_screen_stages():
+    """相似度低于阈值在第一级剪掉，小模型回答 NO 在第二级剪掉，出错和缺少嵌入时放行"""
+    print("\n=== 测试级联各阶段 ===")
+    cascade = _cascade()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = {pid: cascade.screen(PHYSICS[pid], MATH["m0"])[0] for pid in PHYSICS}
+
+    assert results == {"p0": True, "p1": False, "p2": False, "p3": True, "p9": True}
+    # 第一级剪掉的节点对不调用小模型
+    assert cascade.triage_client.calls == 4
+    report = cascade.get_report()
+    assert report["screened"] == 5 and report["passed"] == 3
+    assert report["pruned_similarity"] == 1 and report["pruned_triage"] == 1
+    assert report["triage_errors"] == 1 and report["no_embedding"] == 1
+    assert report["prune_rate"] == 0.4
+    print("✓ 级联各阶段测试通过")
+
+
+def test_recall_loss():
+    """在带标签样本上按阶段统计剪掉的正/负样本，不计入运行统计"""
+    print("\n=== 测试召回损失估计 ===")
+    cascade = _cascade()
+    labelled = [
+        ("p0", "m0", True),
+        ("p1", "m0", True),    # 被相似度剪掉的正样本
+        ("p2", "m0", False),   # 被小模型剪掉的负样本
+        ("p3", "m0", False),
+        ("p_missing", "m0", True)  # 图谱中不存在的节点被忽略
+    ]
+    with contextlib.redirect_stdout(io.StringIO()):
+        loss = cascade.estimate_recall_loss(labelled, PHYSICS, MATH)
+
+    assert loss["positives"] == 2 and loss["negatives"] == 2
+    assert loss["pruned_positives"] == {STAGE_SIMILARITY: 1, STAGE_TRIAGE: 0}
+    assert loss["pruned_negatives"] == {STAGE_SIMILARITY: 0, STAGE_TRIAGE: 1}
+    assert loss["recall_loss"] == {STAGE_SIMILARITY: 0.5, STAGE_TRIAGE: 0.0}
+    assert loss["total_recall_loss"] == 0.5 and loss["negative_prune_rate"] == 0.5
+    assert loss["triage_errors"] == 1
+    assert cascade.get_report()["screened"] == 0
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        sampled = cascade.estimate_recall_loss(labelled, PHYSICS, MATH, max_samples=2)
+    assert sampled["positives"] + sampled["negatives"] <= 2
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            path = cascade.save_report(Path(tmp) / "cascade_report.json", loss)
+        saved = json.loads(path.read_text(encoding='utf-8'))
+    assert saved["recall_loss"]["total_recall_loss"] == 0.5
+    assert saved["prune"]["thresholds"]["similarity"] == 0.5
+    print("✓ 召回损失估计测试通过")
+
+
+if __name__ == "__main__":
+    test_screen_stages()
+    test_recall_loss()
+    print("\n✓ 所有测试通过")
@@ -0,0 +1,146 @@
+"""
+测试节点对讨论结果缓存：重新标注不使缓存失效、命中的边写入输出文件、模型调用出错不缓存
+"""
+import sys
+import copy
+import tempfile
+import contextlib
+import io
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.pair_outcome_cache import PairOutcomeCache
+from core.dialogue_checkpoint import DialogueCheckpointStore
+from core.node_pair_chatroom import NodePairChatroom, write_edge_json, EXTRACTION_FAILED
+from core.graph_io import read_json
+
+PHYSICS = {"id": "p1", "label": "速度", "properties": {"description": "位移对时间的变化率"}}
+MATH = {"id": "m1", "label": "导数", "properties": {"description": "函数的瞬时变化率"}}
+EDGE = {"source": "p1", "target": "m1", "label": "数学基础", "properties": {}}
+
+
+class StubClient:
+    """按顺序返回预设回复的模型客户端，回复为异常实例时抛出"""
+
+    def __init__(self, replies=None, default=""):
+        self.replies = list(replies or [])
+        self.default = default
+        self.calls = 0
+
+    def generate(self, prompt, system_instruction=None):
+        self.calls += 1
+        reply = self.replies.pop(0) if self.replies else self.default
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+class StubAgent:
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+        self.system_instruction = ""
+
+
+def test_bloom_retag_keeps_cache():
+    """只修改布鲁姆标签时仍命中缓存，修改描述或邻居节点后失效"""
+    print("\n=== 测试缓存键忽略布鲁姆标签 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = PairOutcomeCache(Path(tmp) / "outcomes.sqlite", "v1")
+        cache.put(PHYSICS, MATH, True, EDGE, "通过")
+
+        retagged = copy.deepcopy(PHYSICS)
+        retagged["properties"].update(bloom_level="Apply", bloom_reasoning="应用")
+        assert cache.get(retagged, MATH)["edge"] == EDGE
+
+        edited = copy.deepcopy(PHYSICS)
+        edited["properties"]["description"] += "（修订）"
+        assert cache.get(edited, MATH) is None
+        cache.close()
+
+    # 布鲁姆标签不进入提示词；邻居节点变化会改变渲染后的上下文（即缓存键）
+    chatroom = NodePairChatroom.__new__(NodePairChatroom)
+    neighbour = {"id": "p2", "label": "位移", "properties": {"description": "位置的变化"}}
+    nodes = {"p1": retagged, "p2": neighbour}
+    context = chatroom._build_node_context("p1", nodes, {"p1": ["p2"]})
+    assert "bloom" not in context and context == chatroom._build_node_context(
+        "p1", {**nodes, "p1": PHYSICS}, {"p1": ["p2"]})
+    neighbour["properties"]["description"] = "位置矢量的变化"
+    assert chatroom._build_node_context("p1", nodes, {"p1": ["p2"]}) != context
+    print("✓ 缓存键测试通过")
+
+
+def test_cache_hit_writes_edge():
+    """命中缓存的已接受边写入输出文件，且不重复写入"""
+    print("\n=== 测试命中缓存的边写入输出文件 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = PairOutcomeCache(Path(tmp) / "outcomes.sqlite", "v1")
+        output_file = Path(tmp) / "edges.json"
+        write_edge_json(str(output_file), {"metadata": {"total_edges": 0}, "edges": []})
+
+        # 命中缓存时不需要任何模型客户端
+        chatroom = NodePairChatroom.__new__(NodePairChatroom)
+        chatroom.physics_nodes = {"p1": PHYSICS}
+        chatroom.math_nodes = {"m1": MATH}
+        chatroom.physics_edges, chatroom.math_edges = {}, {}
+        chatroom.outcome_cache = cache
+        chatroom.output_file = output_file
+        context = [chatroom._build_node_context("p1", chatroom.physics_nodes, {}),
+                   chatroom._build_node_context("m1", chatroom.math_nodes, {}), 6]
+        cache.put(PHYSICS, MATH, True, EDGE, "通过", context)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert chatroom.discuss_node_pair("p1", "m1") == EDGE
+            assert chatroom.discuss_node_pair("p1", "m1") == EDGE
+        data = read_json(output_file)
+        cache.close()
+    assert data["edges"] == [EDGE] and data["metadata"]["total_edges"] == 1
+    print("✓ 命中缓存的边已写入输出文件")
+
+
+def test_extraction_error_is_not_cached():
+    """边提取调用出错时不写入缓存、保留检查点；重试时从检查点继续"""
+    print("\n=== 测试提取出错不缓存 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = PairOutcomeCache(Path(tmp) / "outcomes.sqlite", "v1")
+        checkpoints = DialogueCheckpointStore(Path(tmp) / "checkpoints", "v1")
+        speech = "[p1] 与 [m1] 的关联：" + "速度是位移对时间的导数。" * 10
+        speaker = StubClient(default=speech)
+        meta = StubClient([TimeoutError("API error")])
+
+        chatroom = NodePairChatroom.__new__(NodePairChatroom)
+        chatroom.physics_agent = StubAgent("物理专家", speaker)
+        chatroom.math_agent = StubAgent("数学专家", speaker)
+        chatroom.meta_agent = StubAgent("元协调者", meta)
+        chatroom.physics_nodes = {"p1": PHYSICS}
+        chatroom.math_nodes = {"m1": MATH}
+        chatroom.physics_edges, chatroom.math_edges = {}, {}
+        chatroom.cascade = None
+        chatroom.outcome_cache = cache
+        chatroom.transcript_store = None
+        chatroom.checkpoint_store = checkpoints
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert chatroom.discuss_node_pair("p1", "m1", max_rounds=1) is None
+        assert chatroom.last_error == EXTRACTION_FAILED
+        assert cache.stats()["entries"] == 0
+        assert checkpoints.load(PHYSICS, MATH)["finished"]
+        spoken = speaker.calls
+
+        # 重试：不再重新对话，模型明确给出否定结论后才缓存并删除检查点
+        meta.replies = ['{"exists": false, "reason": "无明确关联"}']
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert chatroom.discuss_node_pair("p1", "m1", max_rounds=1) is None
+        assert chatroom.last_error is None and speaker.calls == spoken
+        assert cache.stats()["rejected"] == 1
+        assert checkpoints.load(PHYSICS, MATH) is None
+        cache.close()
+    print("✓ 提取出错时保留检查点，不缓存为拒绝")
+
+
+if __name__ == "__main__":
+    test_bloom_retag_keeps_cache()
+    test_cache_hit_writes_edge()
+    test_extraction_error_is_not_cached()
+    print("\n✓ 所有测试通过")
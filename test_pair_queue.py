@@ -0,0 +1,106 @@
+"""
+测试节点对任务队列（租约、心跳、重试）
+"""
+import tempfile
+import time
+from pathlib import Path
+
+from core.pair_queue import PairQueue
+
+
+def _make_queue(tmp_dir: str, **kwargs) -> PairQueue:
+    return PairQueue(Path(tmp_dir) / "queue.sqlite", **kwargs)
+
+
+def test_enqueue_is_idempotent():
+    """重复入队不会产生重复任务"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        queue = _make_queue(tmp_dir)
+        pairs = [("p1", "m1"), ("p1", "m2"), ("p2", "m1")]
+
+        assert queue.enqueue_pairs(pairs) == 3
+        assert queue.enqueue_pairs(pairs) == 0
+        assert queue.stats()["pending"] == 3
+        print("✓ 入队幂等测试通过")
+
+
+def test_lease_is_exclusive():
+    """两个 worker 不会领取到同一个节点对"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        queue = _make_queue(tmp_dir)
+        queue.enqueue_pairs([("p1", "m1"), ("p2", "m2"), ("p3", "m3")])
+
+        first = queue.lease("w1", n=2)
+        second = queue.lease("w2", n=2)
+
+        assert len(first) == 2
+        assert len(second) == 1
+        assert not set(first) & set(second)
+
+        assert queue.complete(*first[0], "w1", accepted=True, result={"source": "p1"})
+        assert queue.complete(*first[1], "w1", accepted=False)
+        # 不能完成别人持有的任务
+        assert not queue.complete(*second[0], "w1", accepted=True)
+
+        stats = queue.stats()
+        assert stats["accepted"] == 1
+        assert stats["rejected"] == 1
+        assert stats["running"] == 1
+        assert queue.accepted_edges() == [{"source": "p1"}]
+        print("✓ 租约互斥测试通过")
+
+
+def test_expired_lease_is_reclaimed():
+    """租约过期后任务会被其他 worker 回收，心跳可以续约"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        queue = _make_queue(tmp_dir, lease_seconds=0.2)
+        queue.enqueue_pairs([("p1", "m1")])
+
+        assert queue.lease("w1") == [("p1", "m1")]
+        assert queue.lease("w2") == []
+
+        time.sleep(0.1)
+        assert queue.heartbeat("w1") == 1
+        time.sleep(0.15)
+        assert queue.lease("w2") == []
+
+        time.sleep(0.25)
+        assert queue.lease("w2") == [("p1", "m1")]
+        assert queue.get_status("p1", "m1")["lease_owner"] == "w2"
+        print("✓ 租约回收测试通过")
+
+
+def test_retry_until_failed():
+    """失败任务重试，超过上限后标记为 failed，中断释放不计重试次数"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        queue = _make_queue(tmp_dir, max_attempts=2)
+        queue.enqueue_pairs([("p1", "m1")])
+
+        queue.lease("w1")
+        assert queue.release("w1") == 1
+        assert queue.get_status("p1", "m1")["attempts"] == 0
+
+        queue.lease("w1")
+        assert queue.fail("p1", "m1", "w1", "timeout") == "pending"
+        queue.lease("w1")
+        assert queue.fail("p1", "m1", "w1", "timeout") == "failed"
+        assert queue.lease("w1") == []
+
+        assert queue.requeue() == 1
+        assert queue.lease("w1") == [("p1", "m1")]
+        print("✓ 重试测试通过")
+
+
+if __name__ == "__main__":
+    print("="*60)
+    print("节点对任务队列测试")
+    print("="*60)
+    print()
+
+    test_enqueue_is_idempotent()
+    test_lease_is_exclusive()
+    test_expired_lease_is_reclaimed()
+    test_retry_until_failed()
+
+    print()
+    print("✨ 所有测试通过！")
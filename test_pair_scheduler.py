@@ -0,0 +1,122 @@
+"""
+测试产出优先调度器：预算停止（已用尽 / 下一对将超出）、min_yield 跳过、队列上限、运行报告
+"""
+import sys
+import json
+import tempfile
+import contextlib
+import io
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.pair_scheduler import PairScheduler
+from core.pair_space import PairSpace
+
+PHYSICS = {"nodes": [{"id": f"p{i}", "label": f"p{i}", "properties": {}} for i in range(4)], "edges": []}
+MATH = {"nodes": [{"id": f"m{j}", "label": f"m{j}", "properties": {}} for j in range(3)], "edges": []}
+
+
+def _yield(physics_id: str, math_id: str) -> float:
+    """确定性的预测产出：p3m2 最高，p0m0 最低"""
+    return (int(physics_id[1:]) * 3 + int(math_id[1:])) / 11
+
+
+class StubChatroom:
+    """每讨论一对花费固定 token，预测产出不低于 0.5 的节点对产出边"""
+
+    def __init__(self, tokens_per_pair: int = 100):
+        self.tokens_per_pair = tokens_per_pair
+        self.usage = {"prompt_tokens": 0, "completion_tokens": 0}
+        self.discussed = []
+
+    def get_token_usage(self):
+        return dict(self.usage, total_tokens=self.usage["prompt_tokens"] + self.usage["completion_tokens"])
+
+    def discuss_node_pair(self, physics_id, math_id, context_depth=1, max_rounds=6):
+        self.discussed.append((physics_id, math_id))
+        self.usage["prompt_tokens"] += self.tokens_per_pair // 2
+        self.usage["completion_tokens"] += self.tokens_per_pair - self.tokens_per_pair // 2
+        if _yield(physics_id, math_id) >= 0.5:
+            return {"source": physics_id, "target": math_id}
+        return None
+
+
+def _run(scheduler: PairScheduler, chatroom: StubChatroom):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return scheduler.run(chatroom)
+
+
+def test_budget_check():
+    """预算已用尽，或按平均单对花费估算下一对将超出时停止"""
+    print("\n=== 测试预算判断 ===")
+    scheduler = PairScheduler(PHYSICS, MATH, token_budget=250)
+    assert scheduler._budget_check(0, 0.0, 0) is None
+    assert scheduler._budget_check(100, 0.0, 1) is None
+    assert "不足以讨论下一对" in scheduler._budget_check(200, 0.0, 2)
+    assert "已用尽" in scheduler._budget_check(250, 0.0, 2)
+
+    # 下一对将超出：250 的预算讨论 2 对（200）后停止
+    scheduler = PairScheduler(PHYSICS, MATH, yield_fn=_yield, token_budget=250)
+    scheduler.push(PairSpace(["p0", "p1", "p2", "p3"], ["m0", "m1", "m2"]))
+    chatroom = StubChatroom()
+    _run(scheduler, chatroom)
+    assert chatroom.discussed == [("p3", "m2"), ("p3", "m1")]
+    assert "不足以讨论下一对" in scheduler.stop_reason
+
+    # 已用尽：200 的预算讨论 2 对后停止
+    scheduler = PairScheduler(PHYSICS, MATH, yield_fn=_yield, token_budget=200)
+    scheduler.push(PairSpace(["p0", "p1", "p2", "p3"], ["m0", "m1", "m2"]))
+    _run(scheduler, StubChatroom())
+    assert "已用尽" in scheduler.stop_reason and len(scheduler) == 10
+    print("✓ 预算判断测试通过")
+
+
+def test_min_yield_and_queue_bound():
+    """低于 min_yield 的节点对跳过；队列上限只保留预测产出最高的节点对"""
+    print("\n=== 测试跳过与队列上限 ===")
+    pairs = PairSpace(["p0", "p1", "p2", "p3"], ["m0", "m1", "m2"])
+    scheduler = PairScheduler(PHYSICS, MATH, yield_fn=_yield, min_yield=0.5)
+    assert scheduler.push(pairs) == 6 and scheduler.skipped == 6
+    chatroom = StubChatroom()
+    _run(scheduler, chatroom)
+    assert all(_yield(p, m) >= 0.5 for p, m in chatroom.discussed) and len(chatroom.discussed) == 6
+
+    bounded = PairScheduler(PHYSICS, MATH, yield_fn=_yield, max_queue_size=4)
+    bounded.push(pairs)
+    bounded.push([("p0", "m0"), ("p3", "m2")])
+    assert len(bounded) == 4 and bounded.dropped == 10
+    popped = [bounded.pop()[:2] for _ in range(4)]
+    # 同分（重复入队的 p3-m2）保留先入队的那一条，顺序与无上限时一致
+    assert popped == [("p3", "m2"), ("p3", "m2"), ("p3", "m1"), ("p3", "m0")]
+    print("✓ 跳过与队列上限测试通过")
+
+
+def test_report_curve():
+    """运行报告与“预期产出 - 花费”曲线"""
+    print("\n=== 测试运行报告 ===")
+    scheduler = PairScheduler(PHYSICS, MATH, yield_fn=_yield, token_budget=300, max_queue_size=5)
+    scheduler.push(PairSpace(["p0", "p1", "p2", "p3"], ["m0", "m1", "m2"]))
+    edges = _run(scheduler, StubChatroom())
+
+    report = scheduler.get_report()
+    assert report["pairs_discussed"] == 3 and report["pairs_remaining"] == 2
+    assert report["tokens_spent"] == 300 and report["accepted_edges"] == len(edges) == 3
+    assert report["pairs_dropped"] == 7 and report["weights"] == "custom"
+    assert report["expected_yield"] == round((11 + 10 + 9) / 11, 4)
+    assert [point["tokens"] for point in report["curve"]] == [100, 200, 300]
+    assert set(report["curve"][0]) == {"pairs", "physics_id", "math_id", "predicted_yield", "tokens",
+                                       "dollars", "expected_yield", "accepted_edges"}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            path = scheduler.save_report(Path(tmp) / "run_report.json")
+        assert json.loads(path.read_text(encoding='utf-8'))["stop_reason"] == report["stop_reason"]
+    print("✓ 运行报告测试通过")
+
+
+if __name__ == "__main__":
+    test_budget_check()
+    test_min_yield_and_queue_bound()
+    test_report_curve()
+    print("\n✓ 所有测试通过")
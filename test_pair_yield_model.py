@@ -0,0 +1,96 @@
+"""
+测试节点对产出模型：级联跳过和调用出错的节点对不作为样本、讨论记录作为样本来源、加载时核对特征配置
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.pair_queue import PairQueue
+from core.transcript_store import TranscriptStore
+from core.pair_scheduler import PairFeaturizer
+from core.pair_yield_model import PairYieldModel, load_outcomes
+
+
+def _graph(prefix: str, n: int) -> dict:
+    return {"nodes": [{"id": f"{prefix}{i}", "label": f"{prefix}{i}", "properties": {"theme": "运动"}}
+                      for i in range(n)], "edges": []}
+
+
+def test_pruned_pairs_are_not_samples():
+    """级联筛选跳过的节点对不进入训练样本"""
+    print("\n=== 测试级联跳过的节点对 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = PairQueue(Path(tmp) / "queue.sqlite")
+        queue.enqueue_pairs([("p0", "m0"), ("p1", "m1"), ("p2", "m2")])
+        leased = queue.lease("w1", 3)
+        results = {"p0": (True, {"source": "p0", "target": "m0"}), "p1": (False, None),
+                   "p2": (False, {"pruned": "相似度过低"})}
+        for physics_id, math_id in leased:
+            accepted, result = results[physics_id]
+            queue.complete(physics_id, math_id, "w1", accepted, result)
+        queue.close()
+        samples = load_outcomes(queue_dbs=[Path(tmp) / "queue.sqlite"])
+    assert samples == [("p0", "m0", True), ("p1", "m1", False)]
+    print("✓ 级联跳过的节点对已排除")
+
+
+def test_transcript_verdicts():
+    """讨论记录中的评估结论作为样本；调用出错的节点对即使队列记为拒绝也不作为负样本"""
+    print("\n=== 测试讨论记录样本 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        # 旧版 worker 把提取调用出错的节点对记成了 rejected
+        queue = PairQueue(Path(tmp) / "queue.sqlite")
+        queue.enqueue_pairs([("p5", "m5")])
+        queue.lease("w1", 1)
+        queue.complete("p5", "m5", "w1", False, None)
+        queue.close()
+
+        verdicts = {3: {"accepted": True, "reason": "通过"},
+                    4: {"accepted": False, "reason": "关联牵强"},
+                    5: {"accepted": False, "reason": "提取失败", "error": True},
+                    6: {"accepted": False, "reason": "评估失败"}}
+        store_path = Path(tmp) / "transcripts.w1.bin"
+        with TranscriptStore(store_path, chunk_size=2) as store:
+            for i, verdict in verdicts.items():
+                store.append({"physics_id": f"p{i}", "math_id": f"m{i}", "turns": [], "verdict": verdict})
+        # 仍在写入中的 worker：只读加载不能截掉它未写完的尾部
+        with open(store_path, 'ab') as f:
+            f.write(b"partial block")
+
+        samples = load_outcomes(queue_dbs=[Path(tmp) / "queue.sqlite"], transcript_stores=[store_path])
+        assert store_path.read_bytes().endswith(b"partial block")
+    assert samples == [("p3", "m3", True), ("p4", "m4", False)]
+    print("✓ 讨论记录样本测试通过")
+
+
+def test_load_checks_featurizer():
+    """加载时嵌入配置与训练时不一致给出明确错误"""
+    print("\n=== 测试加载时核对特征配置 ===")
+    physics, math = _graph("p", 6), _graph("m", 6)
+    rng = np.random.default_rng(0)
+    physics_emb = {n["id"]: rng.standard_normal(8) for n in physics["nodes"]}
+    math_emb = {n["id"]: rng.standard_normal(8) for n in math["nodes"]}
+    samples = [(f"p{i}", f"m{j}", (i + j) % 3 == 0) for i in range(6) for j in range(6)]
+
+    with_embeddings = PairFeaturizer(physics, math, physics_emb, math_emb)
+    model = PairYieldModel(with_embeddings, epochs=20).fit(samples)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = model.save(Path(tmp) / "model.npz")
+        assert PairYieldModel.load(path, with_embeddings).weights.shape == model.weights.shape
+        try:
+            PairYieldModel.load(path, PairFeaturizer(physics, math))
+            raise AssertionError("应当报错")
+        except ValueError as e:
+            print(f"  {e}")
+    print("✓ 特征配置核对测试通过")
+
+
+if __name__ == "__main__":
+    test_pruned_pairs_are_not_samples()
+    test_transcript_verdicts()
+    test_load_checks_featurizer()
+    print("\n✓ 所有测试通过")
@@ -0,0 +1,96 @@
+"""
+测试量化向量索引：int8 / 二值编码 + 精确重排序与精确 top-k 对比、内存占用、保存/加载与损坏文件
+"""
+import sys
+import tempfile
+import contextlib
+import io
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from processors.embedding_table import EmbeddingTable
+from processors.quantization import QuantizedIndex
+
+
+def _table(n: int = 800, dim: int = 32, seed: int = 0) -> EmbeddingTable:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((16, dim))
+    matrix = centers[rng.integers(16, size=n)] + 0.5 * rng.standard_normal((n, dim))
+    return EmbeddingTable([f"n{i}" for i in range(n)], matrix.astype(np.float32))
+
+
+def _cosine(table: EmbeddingTable, queries: np.ndarray) -> np.ndarray:
+    unit = table.matrix / np.linalg.norm(table.matrix, axis=1, keepdims=True)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True) @ unit.T
+
+
+def _build(table: EmbeddingTable, backend: str, **params) -> QuantizedIndex:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return QuantizedIndex(table, backend, **params).build()
+
+
+def test_matches_exact_topk():
+    """重排序后的相似度是精确值；int8 与二值编码的 top-k 与精确搜索基本一致"""
+    print("\n=== 测试量化检索与精确 top-k 对比 ===")
+    table = _table()
+    queries = _table(n=50, seed=1).matrix
+    sims = _cosine(table, queries)
+    exact_rows = np.argsort(-sims, axis=1)[:, :10]
+
+    for backend, min_recall in (("int8", 0.99), ("binary", 0.9)):
+        index = _build(table, backend, block_size=128)
+        scores, rows = index.query(queries, 10)
+        recall = np.mean([len(np.intersect1d(e, r)) / 10 for e, r in zip(exact_rows, rows)])
+        print(f"  {backend}: recall@10 = {recall:.3f}, {index.memory_bytes} bytes "
+              f"vs {table.matrix.nbytes} float32")
+        assert recall >= min_recall
+        assert np.allclose(scores, np.take_along_axis(sims, rows, axis=1), atol=1e-5)
+        assert np.all(np.diff(scores, axis=1) <= 0)
+
+    assert _build(table, "int8").memory_bytes < table.matrix.nbytes / 3
+    assert _build(table, "binary").memory_bytes == len(table) * 8
+
+    # 候选集覆盖全表时结果即精确 top-k
+    full = _build(table, "binary", rerank=len(table))
+    assert np.array_equal(full.query(queries, 10)[1], exact_rows)
+    print("✓ 量化检索与精确 top-k 对比测试通过")
+
+
+def test_save_load():
+    """保存后加载结果一致；向量变化、编码文件截断或元数据缺失时返回 None"""
+    print("\n=== 测试量化索引保存与加载 ===")
+    table = _table(n=200)
+    queries = table.matrix[:10]
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in ("int8", "binary"):
+            index = _build(table, backend, seed=7)
+            prefix = Path(tmp) / f"math_{backend}"
+            data_path = index.save(prefix)
+            loaded = QuantizedIndex.load(prefix, table)
+            assert loaded is not None and loaded.backend == backend
+            assert np.array_equal(loaded.query(queries, 5)[1], index.query(queries, 5)[1])
+
+            assert QuantizedIndex.load(prefix, EmbeddingTable(table.ids, table.matrix + 1)) is None
+            data = data_path.read_bytes()
+            data_path.write_bytes(data[:len(data) // 2])
+            assert QuantizedIndex.load(prefix, table) is None
+
+            index.save(prefix)
+            prefix.with_name(f"{prefix.name}.meta.json").unlink()
+            assert QuantizedIndex.load(prefix, table) is None
+
+    try:
+        QuantizedIndex(table, "int4")
+        raise AssertionError("未知量化方式应报错")
+    except ValueError:
+        pass
+    print("✓ 量化索引保存与加载测试通过")
+
+
+if __name__ == "__main__":
+    test_matches_exact_topk()
+    test_save_load()
+    print("\n✓ 所有测试通过")
@@ -0,0 +1,101 @@
+"""
+测试节点文本倒排索引：关键词检索与逐节点子串扫描一致、关键词节点对、主题匹配
+"""
+import sys
+import json
+import random
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.text_index import TextIndex, keyword_pairs
+from core.graph_index import GraphIndex
+
+GRAPH_DIR = Path(__file__).parent / "dataset" / "graph"
+
+
+def _load_graph(name: str) -> dict:
+    with open(GRAPH_DIR / name, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _scan(nodes, keyword):
+    """原来的逐节点扫描"""
+    return [
+        i for i, node in enumerate(nodes)
+        if keyword in ((node.get('properties') or {}).get('description', '') or '') or keyword in node.get('label', '')
+    ]
+
+
+def _keywords(nodes, count: int, seed: int = 0):
+    """从节点文本中随机截取的子串，加上若干边界情况"""
+    rng = random.Random(seed)
+    texts = [node.get('label', '') for node in nodes] + [
+        (node.get('properties') or {}).get('description', '') or '' for node in nodes
+    ]
+    texts = [t for t in texts if t]
+    keywords = []
+    for _ in range(count):
+        text = rng.choice(texts)
+        start = rng.randrange(len(text))
+        keywords.append(text[start:start + rng.randint(1, 4)])
+    return keywords + ["速度", "函数", "不存在的关键词", "v", "V", "m/s", "，", "（", "a b"]
+
+
+def test_search_matches_scan():
+    """在真实图谱上，任意关键词（中文、英文、标点、大小写）的检索结果与子串扫描一致"""
+    print("\n=== 测试倒排检索与扫描一致 ===")
+    nodes = _load_graph("physics_knowledge_graph_cleaned.json")["nodes"]
+    nodes = nodes + [
+        {"id": "x1", "label": "Newton's second law F=ma", "properties": {"description": "Force equals mass times acceleration"}},
+        {"id": "x2", "label": "无属性节点", "properties": None}
+    ]
+    index = TextIndex(nodes)
+    for keyword in _keywords(nodes, 300) + ["Newton", "newton", "acceler", "F=ma", "ma", "属性"]:
+        assert index.search(keyword) == _scan(nodes, keyword), keyword
+    print("✓ 倒排检索与扫描一致测试通过")
+
+
+def test_keyword_pairs():
+    """关键词节点对与按数学节点、物理节点、关键词三重循环的结果一致（含数量上限）"""
+    print("\n=== 测试关键词节点对 ===")
+    physics = _load_graph("physics_knowledge_graph_cleaned.json")["nodes"]
+    math = _load_graph("math_knowledge_graph_cleaned.json")["nodes"]
+    keywords = ["函数", "向量", "速度", "变化", "运动"]
+
+    expected = []
+    for m, math_node in enumerate(math):
+        for p, physics_node in enumerate(physics):
+            if any(_scan([physics_node], k) and _scan([math_node], k) for k in keywords):
+                expected.append((p, m))
+
+    physics_index, math_index = TextIndex(physics), TextIndex(math)
+    assert keyword_pairs(physics_index, math_index, keywords, max_pairs=10 ** 6) == expected
+    assert keyword_pairs(physics_index, math_index, keywords, max_pairs=7) == expected[:7]
+    assert keyword_pairs(physics_index, math_index, ["不存在的关键词"], max_pairs=10) == []
+    print("✓ 关键词节点对测试通过")
+
+
+def test_match_themes():
+    """theme / category 包含任一主题的节点，按图谱顺序返回"""
+    print("\n=== 测试主题匹配 ===")
+    graph = _load_graph("math_knowledge_graph_new.json")
+    graph["nodes"].append({"id": "null_props", "label": "空", "properties": None})
+    index = GraphIndex(graph)
+    themes = [index.values("theme")[0][:2], "不存在的主题"]
+
+    expected = [
+        i for i, node in enumerate(graph["nodes"])
+        if any(t in ((node.get('properties') or {}).get('theme') or '')
+               or t in ((node.get('properties') or {}).get('category') or '') for t in themes)
+    ]
+    assert expected and index.match_themes(themes) == expected
+    assert index.text.search("空") == _scan(graph["nodes"], "空")
+    print("✓ 主题匹配测试通过")
+
+
+if __name__ == "__main__":
+    test_search_matches_scan()
+    test_keyword_pairs()
+    test_match_themes()
+    print("\n✓ 所有测试通过")
@@ -0,0 +1,75 @@
+"""
+测试分块 argpartition 选取最相似节点对：与全排序结果一致、相似度阈值、每个物理节点的配对上限
+"""
+import sys
+import tempfile
+import contextlib
+import io
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from processors.semantic_processor import SemanticProcessor
+
+
+def _brute_force(matrix: np.ndarray, top_k: int, min_similarity: float, max_per_physics=None):
+    """全排序的参考实现：相似度降序，同分按 (行, 列)"""
+    cells = sorted(
+        ((-float(matrix[r, c]), r, c) for r in range(matrix.shape[0]) for c in range(matrix.shape[1])
+         if matrix[r, c] >= min_similarity)
+    )
+    if max_per_physics:
+        counts = {}
+        capped = []
+        # 每行只保留其最高的 max_per_physics 个
+        for cell in cells:
+            if counts.get(cell[1], 0) < max_per_physics:
+                counts[cell[1]] = counts.get(cell[1], 0) + 1
+                capped.append(cell)
+        cells = capped
+    return [(r, c, -s) for s, r, c in cells[:top_k]]
+
+
+def test_matches_full_sort():
+    """分块结果与全排序一致（含跨块、阈值与每行上限）"""
+    print("\n=== 测试分块选取与全排序一致 ===")
+    rng = np.random.default_rng(7)
+    matrix = rng.uniform(-1, 1, size=(37, 23)).astype(np.float32)
+    # 量化到一位小数制造大量同分：截断处同分的节点对可任取其一，只比较相似度序列
+    tied = np.round(matrix, 1)
+
+    for top_k, min_similarity, cap, block_rows in [
+        (50, 0.3, None, 8), (500, 0.0, None, 5), (40, 0.2, 2, 4), (10, 0.9, 1, 1024), (0, 0.0, None, 8)
+    ]:
+        scores, rows, cols = SemanticProcessor._top_pair_indices(matrix, top_k, min_similarity, cap, block_rows)
+        got = [(int(r), int(c), float(s)) for s, r, c in zip(scores, rows, cols)]
+        assert got == _brute_force(matrix, top_k, min_similarity, cap), (top_k, min_similarity, cap)
+
+        scores, _, _ = SemanticProcessor._top_pair_indices(tied, top_k, min_similarity, cap, block_rows)
+        assert scores.tolist() == [s for _, _, s in _brute_force(tied, top_k, min_similarity, cap)]
+    print("✓ 分块选取与全排序一致测试通过")
+
+
+def test_get_top_similar_pairs():
+    """返回 (物理ID, 数学ID, 相似度)，相似度降序"""
+    print("\n=== 测试最相似节点对 ===")
+    matrix = np.array([[0.9, 0.1, 0.5],
+                       [0.8, 0.7, 0.2]], dtype=np.float32)
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        processor = SemanticProcessor(cache_dir=tmp, client=object())
+        pairs = processor.get_top_similar_pairs(matrix, ["p0", "p1"], ["m0", "m1", "m2"], top_k=3, min_similarity=0.3)
+        capped = processor.get_top_similar_pairs(matrix, ["p0", "p1"], ["m0", "m1", "m2"], top_k=3,
+                                                 min_similarity=0.3, max_per_physics=1)
+        processor.embedding_cache.close()
+    assert [(p, m) for p, m, _ in pairs] == [("p0", "m0"), ("p1", "m0"), ("p1", "m1")]
+    assert abs(pairs[0][2] - 0.9) < 1e-6 and isinstance(pairs[0][2], float)
+    assert [(p, m) for p, m, _ in capped] == [("p0", "m0"), ("p1", "m0")]
+    print("✓ 最相似节点对测试通过")
+
+
+if __name__ == "__main__":
+    test_matches_full_sort()
+    test_get_top_similar_pairs()
+    print("\n✓ 所有测试通过")
@@ -0,0 +1,127 @@
+"""
+测试讨论记录存储：分块压缩写入、按节点对随机读取、中断后的残缺数据块处理
+"""
+import os
+import sys
+import signal
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.transcript_store import TranscriptStore, transcript_key
+from core.node_pair_chatroom import NodePairChatroom
+
+
+def _transcript(i: int, verdict: bool = False) -> dict:
+    return {
+        "physics_id": f"p{i}",
+        "math_id": f"m{i}",
+        "turns": [{"round": 1, "speaker": "physics", "content": f"物理发言 {i}" * 20}],
+        "verdict": {"accepted": verdict, "reason": f"理由 {i}"}
+    }
+
+
+def test_random_access():
+    """测试跨多个数据块按节点对读取"""
+    print("\n=== 测试随机读取 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "transcripts.bin"
+        with TranscriptStore(path, chunk_size=4) as store:
+            for i in range(10):
+                store.append(_transcript(i))
+            # 缓冲区中未写盘的记录也能读到
+            assert store.get("p9", "m9")["verdict"]["reason"] == "理由 9"
+
+        store = TranscriptStore(path, chunk_size=4)
+        assert len(store) == 10
+        assert store.get("p5", "m5")["turns"][0]["content"].startswith("物理发言 5")
+        assert store.get("p0", "m9") is None
+        assert [t["physics_id"] for t in store.iter_transcripts()] == [f"p{i}" for i in range(10)]
+
+        # 同一节点对重跑后以最新记录为准
+        store.append(_transcript(3, verdict=True))
+        store.close()
+        store = TranscriptStore(path)
+        assert store.get("p3", "m3")["verdict"]["accepted"] is True
+        assert len(list(store.iter_transcripts())) == 10
+    print("✓ 随机读取测试通过")
+
+
+def test_truncated_tail():
+    """测试数据块写入后、索引写入前中断时，残缺数据被截掉"""
+    print("\n=== 测试残缺数据块 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "transcripts.bin"
+        with TranscriptStore(path, chunk_size=2) as store:
+            for i in range(4):
+                store.append(_transcript(i))
+        size = path.stat().st_size
+
+        with open(path, 'ab') as f:
+            f.write(b"partial block")
+
+        store = TranscriptStore(path, chunk_size=2)
+        assert path.stat().st_size == size
+        assert transcript_key("p1", "m1") in store
+        store.append(_transcript(4))
+        store.append(_transcript(5))
+        assert store.get("p5", "m5")["verdict"]["reason"] == "理由 5"
+        assert store.get("p2", "m2")["verdict"]["reason"] == "理由 2"
+    print("✓ 残缺数据块测试通过")
+
+
+def test_truncated_index_line():
+    """测试索引最后一行写了一半时，重新打开后继续追加的记录不会丢失"""
+    print("\n=== 测试残缺索引行 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "transcripts.bin"
+        with TranscriptStore(path, chunk_size=1) as store:
+            store.append(_transcript(0))
+        index_path = path.with_name(path.name + ".idx")
+        size = index_path.stat().st_size
+        with open(index_path, 'ab') as f:
+            f.write(b'{"key": "p9|m9", "off')
+
+        with TranscriptStore(path, chunk_size=1) as store:
+            assert index_path.stat().st_size == size
+            store.append(_transcript(1))
+            store.append(_transcript(2))
+
+        store = TranscriptStore(path, chunk_size=1)
+        assert len(store) == 3
+        for i in range(3):
+            assert store.get(f"p{i}", f"m{i}")["verdict"]["reason"] == f"理由 {i}"
+    print("✓ 残缺索引行测试通过")
+
+
+def _save_and_kill(path: str):
+    """以默认 chunk_size 保存一条讨论记录后立即被杀，不调用 close()"""
+    chatroom = NodePairChatroom.__new__(NodePairChatroom)
+    chatroom.transcript_store = TranscriptStore(Path(path))
+    chatroom._save_transcript(_transcript(7), True, "通过")
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def test_killed_worker_keeps_transcript():
+    """测试讨论记录保存后 worker 被杀（未 close），记录不丢失"""
+    print("\n=== 测试进程被杀 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "transcripts.bin"
+        worker = multiprocessing.Process(target=_save_and_kill, args=(str(path),))
+        worker.start()
+        worker.join()
+        assert worker.exitcode == -signal.SIGKILL
+
+        store = TranscriptStore(path)
+        assert store.get("p7", "m7")["verdict"] == {"accepted": True, "reason": "通过"}
+    print("✓ 被杀前保存的讨论记录已落盘")
+
+
+if __name__ == "__main__":
+    test_random_access()
+    test_truncated_tail()
+    test_truncated_index_line()
+    test_killed_worker_keeps_transcript()
+    print("\n✓ 所有测试通过")
@@ -9,6 +9,9 @@ from .bloom_taxonomy_tools import (
     tag_knowledge_point_analyze,
     tag_knowledge_point_evaluate,
     tag_knowledge_point_create,
+    tag_knowledge_points_bulk,
+    BloomTaggingSession,
+    clear_bloom_tags,
     get_knowledge_points,
     get_all_knowledge_points,
     get_tagging_progress,
@@ -22,6 +25,9 @@ __all__ = [
     "tag_knowledge_point_analyze",
     "tag_knowledge_point_evaluate",
     "tag_knowledge_point_create",
+    "tag_knowledge_points_bulk",
+    "BloomTaggingSession",
+    "clear_bloom_tags",
     "get_knowledge_points",
     "get_all_knowledge_points",
     "get_tagging_progress",
@@ -3,12 +3,17 @@
 
 包含：
 1. 六个打标签工具（对应布鲁姆六个认知层级）
-2. 知识点批量查看工具
+2. 批量打标签工具、标注会话（BloomTaggingSession）与清除标签工具
+3. 知识点批量查看工具
 """
 
-import json
 from typing import List, Dict, Any, Optional
 from pathlib import Path
+import contextlib
+from core.graph_index import GraphIndex, load_graph_index
+from core.graph_store import GraphStore, is_graph_store_path, STORE_SUFFIXES
+from core.graph_io import load_graph, save_graph
+from core.atomic_io import file_lock
 
 
 # 布鲁姆认知层级定义
@@ -23,15 +28,173 @@ BLOOM_LEVELS = {
 
 
 def load_knowledge_graph(file_path: str) -> Dict[str, Any]:
-    """加载知识图谱JSON文件"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """加载知识图谱JSON文件（二进制快照匹配时直接读取快照）"""
+    return load_graph(file_path)
 
 
 def save_knowledge_graph(file_path: str, data: Dict[str, Any]) -> None:
-    """保存知识图谱JSON文件"""
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """在文件锁内原子保存知识图谱JSON文件（同时刷新二进制快照）"""
+    with file_lock(file_path):
+        save_graph(file_path, data)
+
+
+class BloomTaggingSession:
+    """
+    布鲁姆标注会话（事务）
+
+    图谱只解析一次并建立 ID 索引，标签先记录在内存中，flush 时一次性写回：
+    在文件锁内重新读取磁盘上的最新图谱、合并本会话的标签、原子替换文件，
+    因此多个并发标注进程不会互相覆盖。with 块正常结束时自动提交，异常时丢弃未提交的标签。
+    hold_lock=True 时整个会话都持有文件锁，磁盘上的图谱不会被其他写入者修改，
+    flush 直接写回会话内的副本，图谱只解析一次（适合单个标签这类短会话）。
+    file_path 为 SQLite 图谱存储（.db / .sqlite）时，只按 ID 查询节点，flush 在一个数据库事务内更新。
+
+        with BloomTaggingSession(path) as session:
+            session.tag("set_concepts", "Understand", "需要解释集合概念")
+            session.tag("function_monotonicity", "Analyze")
+    """
+
+    def __init__(self, file_path: str, flush_every: Optional[int] = None, hold_lock: bool = False):
+        """
+        Args:
+            file_path: 知识图谱JSON文件（或 SQLite 图谱存储）路径
+            flush_every: 每累计多少个标签自动提交一次（默认只在结束时提交）
+            hold_lock: 从读取图谱到会话结束一直持有文件锁（JSON 图谱）
+        """
+        self.file_path = Path(file_path)
+        self.flush_every = flush_every
+        self.pending: Dict[str, Dict[str, str]] = {}
+        self.committed = 0
+        self.store = GraphStore(self.file_path) if is_graph_store_path(self.file_path) else None
+        self.hold_lock = hold_lock and self.store is None
+        self._lock = contextlib.ExitStack()
+        try:
+            if self.hold_lock:
+                self._lock.enter_context(file_lock(self.file_path))
+            self._load()
+        except BaseException:
+            self._lock.close()
+            raise
+
+    def _load(self):
+        """读取图谱并建立节点索引（会话私有副本，可以直接修改）"""
+        if self.store is not None:
+            return
+        self.data = load_knowledge_graph(str(self.file_path))
+        self.index = GraphIndex(self.data, self.file_path)
+
+    def __enter__(self) -> "BloomTaggingSession":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.flush()
+            else:
+                self.rollback()
+        finally:
+            self._lock.close()
+            self.hold_lock = False
+            if self.store is not None:
+                self.store.close()
+        return False
+
+    @staticmethod
+    def _apply(node: Dict[str, Any], tag: Dict[str, str]):
+        if node.get("properties") is None:
+            node["properties"] = {}
+        props = node["properties"]
+        props["bloom_level"] = tag["level"]
+        if tag.get("reasoning"):
+            props["bloom_reasoning"] = tag["reasoning"]
+
+    def tag(self, node_id: str, level: str, reasoning: str = "") -> Dict[str, Any]:
+        """
+        给知识点打标签（提交前仅修改内存）
+
+        Args:
+            node_id: 知识点ID
+            level: 布鲁姆认知层级（BLOOM_LEVELS 中的键）
+            reasoning: 打标签的理由
+
+        Returns:
+            操作结果
+        """
+        if level not in BLOOM_LEVELS:
+            return {
+                "success": False,
+                "message": f"未知的布鲁姆层级 {level}，可选: {', '.join(BLOOM_LEVELS)}",
+                "node_id": node_id
+            }
+        if self.store is not None:
+            exists = node_id in self.store
+        else:
+            node = self.index.get(node_id)
+            exists = node is not None
+        if not exists:
+            return {
+                "success": False,
+                "message": f"未找到ID为 {node_id} 的知识点",
+                "node_id": node_id
+            }
+
+        tag = {"level": level, "reasoning": reasoning}
+        if self.store is None:
+            self._apply(node, tag)
+        self.pending[node_id] = tag
+        if self.flush_every and len(self.pending) >= self.flush_every:
+            self.flush()
+
+        return {
+            "success": True,
+            "message": f"成功为知识点 {node_id} 打上 {level} 标签",
+            "node_id": node_id,
+            "level": level,
+            "reasoning": reasoning
+        }
+
+    def flush(self) -> int:
+        """
+        提交未写入的标签
+
+        Returns:
+            本次提交的标签数量
+        """
+        if not self.pending:
+            return 0
+        if self.store is not None:
+            updates = {}
+            for node_id, tag in self.pending.items():
+                props = {"bloom_level": tag["level"]}
+                if tag.get("reasoning"):
+                    props["bloom_reasoning"] = tag["reasoning"]
+                updates[node_id] = props
+            self.store.update_nodes(updates)
+        else:
+            self._flush_json()
+        count = len(self.pending)
+        self.committed += count
+        self.pending = {}
+        return count
+
+    def _flush_json(self):
+        if self.hold_lock:
+            # 会话持有文件锁：磁盘上的图谱未被修改，内存中的副本已包含全部标签
+            save_graph(self.file_path, self.data)
+            return
+        with file_lock(self.file_path):
+            # 合并到磁盘上的最新版本，保留其他进程在此期间写入的标签
+            self._load()
+            for node_id, tag in self.pending.items():
+                node = self.index.get(node_id)
+                if node is not None:
+                    self._apply(node, tag)
+            save_graph(self.file_path, self.data)
+
+    def rollback(self):
+        """丢弃未提交的标签"""
+        self.pending = {}
+        self._load()
 
 
 def tag_knowledge_point_remember(node_id: str, file_path: str, reasoning: str = "") -> Dict[str, Any]:
@@ -138,45 +301,98 @@ def _tag_knowledge_point(node_id: str, file_path: str, level: str, reasoning: st
         操作结果
     """
     try:
-        # 加载知识图谱
-        data = load_knowledge_graph(file_path)
+        # 单个标签的会话：持锁读取一次、原子写回（批量标注请使用 tag_knowledge_points_bulk）
+        with BloomTaggingSession(file_path, hold_lock=True) as session:
+            return session.tag(node_id, level, reasoning)
         
-        # 查找知识点
-        node_found = False
-        for node in data.get("nodes", []):
-            if node.get("id") == node_id:
-                # 添加布鲁姆层级标签
-                if "properties" not in node:
-                    node["properties"] = {}
-                node["properties"]["bloom_level"] = level
-                if reasoning:
-                    node["properties"]["bloom_reasoning"] = reasoning
-                node_found = True
-                break
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"操作失败: {str(e)}",
+            "node_id": node_id
+        }
+
+
+def tag_knowledge_points_bulk(file_path: str, tags: List[Dict[str, str]]) -> Dict[str, Any]:
+    """
+    批量给知识点打标签（一次读取、一次写回）
+    
+    Args:
+        file_path: JSON文件路径
+        tags: 标签列表，每项为 {"node_id": 知识点ID, "level": 布鲁姆层级, "reasoning": 理由}，
+            level 取值为 Remember / Understand / Apply / Analyze / Evaluate / Create
         
-        if not node_found:
-            return {
-                "success": False,
-                "message": f"未找到ID为 {node_id} 的知识点",
-                "node_id": node_id
-            }
+    Returns:
+        操作结果（成功数量、失败的知识点及原因）
+    """
+    try:
+        with BloomTaggingSession(file_path) as session:
+            results = [
+                session.tag(tag.get("node_id", ""), tag.get("level", ""), tag.get("reasoning", ""))
+                for tag in tags
+            ]
+        failed = [
+            {"node_id": r["node_id"], "message": r["message"]}
+            for r in results if not r["success"]
+        ]
+        return {
+            "success": not failed,
+            "message": f"成功标注 {len(results) - len(failed)} 个知识点，失败 {len(failed)} 个",
+            "tagged": len(results) - len(failed),
+            "failed": failed
+        }
         
-        # 保存知识图谱
-        save_knowledge_graph(file_path, data)
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"操作失败: {str(e)}",
+            "tagged": 0,
+            "failed": []
+        }
+
+
+def clear_bloom_tags(file_path: str, node_ids: List[str]) -> Dict[str, Any]:
+    """
+    清除知识点的布鲁姆标签（知识点内容修改后需要重新标注时使用）
+    
+    清除后这些知识点会出现在 get_knowledge_points(untagged_only=True) 的结果中。
+    
+    Args:
+        file_path: JSON文件（或 SQLite 图谱存储）路径
+        node_ids: 知识点ID列表
         
+    Returns:
+        操作结果（清除数量）
+    """
+    try:
+        keys = ("bloom_level", "bloom_reasoning")
+        if is_graph_store_path(file_path):
+            with GraphStore(file_path) as store:
+                cleared = store.remove_properties(node_ids, keys)
+        else:
+            with file_lock(Path(file_path)):
+                data = load_knowledge_graph(file_path)
+                index = GraphIndex(data, Path(file_path))
+                cleared = 0
+                for node_id in node_ids:
+                    props = (index.get(node_id) or {}).get("properties") or {}
+                    if any(key in props for key in keys):
+                        for key in keys:
+                            props.pop(key, None)
+                        cleared += 1
+                if cleared:
+                    save_graph(file_path, data)
         return {
             "success": True,
-            "message": f"成功为知识点 {node_id} 打上 {level} 标签",
-            "node_id": node_id,
-            "level": level,
-            "reasoning": reasoning
+            "message": f"已清除 {cleared} 个知识点的布鲁姆标签",
+            "cleared": cleared
         }
         
     except Exception as e:
         return {
             "success": False,
             "message": f"操作失败: {str(e)}",
-            "node_id": node_id
+            "cleared": 0
         }
 
 
@@ -184,24 +400,42 @@ def get_knowledge_points(
     subject: str,
     page: int = 1,
     page_size: int = 10,
-    dataset_dir: str = "dataset/graph"
+    dataset_dir: str = "dataset/graph",
+    untagged_only: bool = False,
+    theme: Optional[str] = None,
+    bloom_level: Optional[str] = None,
+    file_path: Optional[str] = None
 ) -> Dict[str, Any]:
     """
-    批量获取知识点
+    批量获取知识点（分页，可筛选）
+    
+    图谱解析结果和筛选后的节点下标都会缓存，文件未修改时翻页只需切片当前页。
+    SQLite 图谱存储（.db / .sqlite）直接用索引列筛选和分页，能看到 BloomTaggingSession 写入存储的标签。
     
     Args:
         subject: 科目名称 (如 "math", "physics")
         page: 页码（从1开始）
         page_size: 每页数量
         dataset_dir: 数据集目录路径
+        untagged_only: 只返回尚未标注布鲁姆层级的知识点
+        theme: 只返回该主题的知识点
+        bloom_level: 只返回该布鲁姆层级的知识点
+        file_path: 图谱文件（JSON 或 SQLite 图谱存储）路径，默认为 dataset_dir 下的
+            {subject}_knowledge_graph_new.json，不存在时查找同名的 .db / .sqlite / .sqlite3 存储
         
     Returns:
         知识点列表和分页信息
     """
     try:
         # 构建文件路径
-        file_name = f"{subject}_knowledge_graph_new.json"
-        file_path = Path(dataset_dir) / file_name
+        if file_path is None:
+            file_path = Path(dataset_dir) / f"{subject}_knowledge_graph_new.json"
+            if not file_path.exists():
+                for suffix in STORE_SUFFIXES:
+                    if file_path.with_suffix(suffix).exists():
+                        file_path = file_path.with_suffix(suffix)
+                        break
+        file_path = Path(file_path)
         
         if not file_path.exists():
             return {
@@ -210,17 +444,20 @@ def get_knowledge_points(
                 "subject": subject
             }
         
-        # 加载知识图谱
-        data = load_knowledge_graph(str(file_path))
-        nodes = data.get("nodes", [])
-        
-        # 计算分页
-        total = len(nodes)
         start_idx = (page - 1) * page_size
         end_idx = start_idx + page_size
-        
-        # 获取当前页的知识点
-        page_nodes = nodes[start_idx:end_idx]
+        filters = {"theme": theme, "bloom_level": bloom_level, "untagged_only": untagged_only}
+        
+        if is_graph_store_path(file_path):
+            with GraphStore(file_path) as store:
+                total = store.count_nodes(**filters)
+                page_nodes = store.find_nodes(**filters, offset=start_idx, limit=page_size)
+        else:
+            # 共享的图谱索引与筛选结果（文件修改后自动失效）
+            index = load_graph_index(file_path)
+            positions = index.select(**filters)
+            total = len(positions)
+            page_nodes = [index.nodes[i] for i in positions[start_idx:end_idx]]
         
         return {
             "success": True,
@@ -230,6 +467,7 @@ def get_knowledge_points(
             "page": page,
             "page_size": page_size,
             "total_pages": (total + page_size - 1) // page_size,
+            "filters": {"untagged_only": untagged_only, "theme": theme, "bloom_level": bloom_level},
             "nodes": page_nodes
         }
         
@@ -264,9 +502,8 @@ def get_all_knowledge_points(subject: str, dataset_dir: str = "dataset/graph") -
                 "subject": subject
             }
         
-        # 加载知识图谱
-        data = load_knowledge_graph(str(file_path))
-        nodes = data.get("nodes", [])
+        # 共享的图谱索引：文件未修改时不重复解析
+        nodes = load_graph_index(file_path).nodes
         
         return {
             "success": True,
@@ -309,7 +546,7 @@ def get_tagging_progress(subject: str, dataset_dir: str = "dataset/graph") -> Di
         tagged_count = 0
         
         for node in nodes:
-            bloom_level = node.get("properties", {}).get("bloom_level")
+            bloom_level = (node.get("properties") or {}).get("bloom_level")
             if bloom_level:
                 tagged_count += 1
                 if bloom_level in level_counts:
@@ -79,7 +79,7 @@ def create_bloom_taxonomy_workflow(subject: str = "math", model: str = "gpt-4o")
       - Analyze（分析）：需要分解、比较、推导的知识
       - Evaluate（评价）：需要做出判断和论证的知识
       - Create（创造）：需要构建新模型、设计新方法的知识
-   c. 调用对应的标注工具（tag_knowledge_point_XXX）
+   c. 调用对应的标注工具（tag_knowledge_point_XXX），一次判断多个知识点时用 tag_knowledge_points_bulk 批量提交
    d. 在 reasoning 参数中提供简短的判断理由
 
 3. 建议的标注策略：